@@ -1,6 +1,6 @@
 from gymnasium import spaces
 
-from pybg.agents import RandomAgent, HumanAgent, BaseAgent  # Example
+from pybg.agents import RandomAgent, HumanAgent, BaseAgent, GnubgAgent
 
 
 def create_agent(agent_type: str, player_type, game) -> BaseAgent:
@@ -11,5 +11,7 @@ def create_agent(agent_type: str, player_type, game) -> BaseAgent:
         return HumanAgent(player_type, game)
     elif agent_type == "random":
         return RandomAgent(action_space, action_list)
+    elif agent_type == "gnubg":
+        return GnubgAgent(action_list)
     else:
         raise ValueError(f"Unknown agent type: {agent_type}")
@@ -0,0 +1,53 @@
+from pybg.agents import BaseAgent
+
+
+class GnubgAgent(BaseAgent):
+    """
+    Plays the best play by the analysis evaluator, or by the opening book
+    when it has the position, doubles, takes and drops by cube_decision(),
+    and always accepts resignations.
+    """
+
+    uses_opening_book = True
+    uses_cube_decisions = True
+
+    def __init__(self, action_list, evaluator="pubeval", depth=0):
+        self._action_list = action_list
+        self.evaluator = evaluator
+        self.depth = depth
+        self._analyser = None
+
+    @property
+    def analyser(self):
+        """The agent's Analyser, for its plays and its cube decisions."""
+        from pybg.gnubg.analysis import Analyser
+
+        if self._analyser is None:
+            self._analyser = Analyser(self.evaluator, self.depth)
+        return self._analyser
+
+    def best_play(self, legal_plays):
+        from pybg.gnubg.neural_net import equity
+
+        if len(legal_plays) == 1:
+            return legal_plays[0]
+        equities = equity(self.analyser.play_values(legal_plays))
+        return legal_plays[int(equities.argmax())]
+
+    def make_decision(self, observation=None, action_mask=None, legal_plays=None):
+        if legal_plays and legal_plays[0].moves:
+            play = self.best_play(legal_plays)
+            return [("move", m.source, m.destination) for m in play.moves]
+
+        legal = (
+            [a for a, ok in zip(self._action_list, action_mask) if ok]
+            if action_mask is not None
+            else []
+        )
+        for action in ("roll", "take"):
+            if action in legal:
+                return [action]
+        accepts = [a for a in legal if isinstance(a, tuple) and a[0] == "accept"]
+        if accepts:
+            return [accepts[0]]
+        return ["pass"]
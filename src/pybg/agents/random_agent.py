@@ -31,6 +31,12 @@ class RandomAgent(BaseAgent):
             )
         ]
 
+        # Bar entries and bearoffs are missing from the action list, so when
+        # they are the only moves the mask shows none: pick one of the plays.
+        if not non_resign_indices and legal_plays and legal_plays[0].moves:
+            play = random.choice(legal_plays)
+            return [("move", m.source, m.destination) for m in play.moves]
+
         # If no legal non-resign actions are available, return an empty list or a pass equivalent
         if not non_resign_indices:
             logger.debug("No non-resign actions available — agent will pass or skip.")
@@ -86,4 +86,5 @@ DEFAULT_SETTINGS = {
     "player_agent": "human",  # Options: "human", "random", "rl", "gnubg", "online"
     "opponent_agent": "random",  # Same as above
     "hint_top_n": 5,  # ← Add this!
+    "history_journal": "",  # Directory for binary history journals, "" for none
 }
@@ -0,0 +1,182 @@
+# pybg/core/aceydeucey_moves.py
+"""
+Move generation for acey-deucey.
+
+Acey-deucey games start with every checker off the board, which position IDs
+record as checkers on the bar. They enter in the opponent's home board like
+checkers coming off the bar, but a side need not enter them all before moving
+the ones it has in play, so entering is one more kind of move rather than a
+move that has to come first. Position IDs cannot tell a hit checker from one
+that has not entered yet, so hit checkers follow the same rule.
+
+The roll of 1-2, the acey-deucey, is played as the 1 and the 2, then four
+moves of a double of the player's choosing; Board.end_turn() gives the extra
+roll that follows it.
+
+With a dozen checkers to enter and up to six dice to play, the move
+sequences of a roll run into the millions while the positions they reach
+are only thousands. Plays are generated a die at a time instead of
+recursively: every position reached after k dice is kept once, however many
+move orders lead to it, and the next die is played from those alone. Dice
+sequences that start the same share their layers, so the six doubles after
+a 1-2 are played from the one set of positions the 1 and the 2 lead to.
+"""
+
+from typing import Dict, List, Tuple
+
+from pybg.core.moves import Move, Play
+from pybg.gnubg.position import POINTS, POINTS_PER_QUADRANT, Position
+
+ACEY_DEUCEY = (2, 1)
+
+# A state is the mover's 24 points followed by these.
+BAR, OFF, OPPONENT_BAR = POINTS, POINTS + 1, POINTS + 2
+
+State = Tuple[int, ...]
+Layer = Dict[State, Tuple[Move, ...]]
+
+
+def to_state(position: Position) -> State:
+    return position.board_points + (
+        position.player_bar,
+        position.player_off,
+        position.opponent_bar,
+    )
+
+
+def to_position(state: State, opponent_off: int) -> Position:
+    return Position(
+        state[:POINTS], state[BAR], state[OFF], state[OPPONENT_BAR], opponent_off
+    )
+
+
+def apply(state: State, source: int, destination: int) -> State:
+    """Returns state after moving a checker from source (-1 the bar) to destination (-1 off)."""
+    new = list(state)
+    if source == -1:
+        new[BAR] -= 1
+    else:
+        new[source] -= 1
+    if destination == -1:
+        new[OFF] += 1
+    elif new[destination] == -1:
+        new[destination] = 1
+        new[OPPONENT_BAR] += 1
+    else:
+        new[destination] += 1
+    return tuple(new)
+
+
+def single_moves(state: State, pips: int) -> List[Tuple[Move, State]]:
+    """
+    Returns the ways of playing one die in state.
+
+    Args:
+        state: The side to move's points, bar, off and the opponent's bar.
+        pips: The die.
+
+    Returns:
+        list: (Move, state after it) pairs.
+    """
+    moves = []
+    if state[BAR] > 0:
+        destination = POINTS - pips
+        if state[destination] >= -1:
+            moves.append((Move(pips, -1, destination), apply(state, -1, destination)))
+
+    bearing_off = state[BAR] == 0 and all(
+        n <= 0 for n in state[POINTS_PER_QUADRANT:POINTS]
+    )
+    for point in range(POINTS):
+        if state[point] <= 0:
+            continue
+        destination = point - pips
+        if destination >= 0:
+            if state[destination] < -1:
+                continue
+        elif not bearing_off:
+            continue
+        elif destination < -1 and any(
+            n > 0 for n in state[point + 1 : POINTS_PER_QUADRANT]
+        ):
+            continue
+        else:
+            destination = -1
+        moves.append((Move(pips, point, destination), apply(state, point, destination)))
+    return moves
+
+
+def expand(layer: Layer, pips: int) -> Layer:
+    """Plays one more die from every state of layer, keeping each new state once."""
+    following: Layer = {}
+    for state, moves in layer.items():
+        for move, new_state in single_moves(state, pips):
+            if new_state not in following:
+                following[new_state] = moves + (move,)
+    return following
+
+
+def dice_sequences(dice: Tuple[int, int]) -> List[Tuple[int, ...]]:
+    """Returns the orders the dice of a roll can be played in."""
+    high, low = max(dice), min(dice)
+    if (high, low) == ACEY_DEUCEY:
+        return [
+            order + (double,) * 4
+            for order in ((1, 2), (2, 1))
+            for double in range(1, 7)
+        ]
+    if high == low:
+        return [(high,) * 4]
+    return [(high, low), (low, high)]
+
+
+def generate_acey_deucey_plays(
+    position: Position, dice: Tuple[int, int], partial: bool = False
+) -> List[Play]:
+    """
+    Generate and return the legal acey-deucey plays of position.
+
+    As in backgammon a play uses as many dice as it can, and the higher die
+    when only one of two can be used.
+
+    Args:
+        position: The position, from the point of view of the side to move.
+        dice: The roll. No plays are returned for (0, 0).
+        partial: Return all partial plays too (not just max-length).
+
+    Returns:
+        list: One Play per resulting position.
+    """
+    if not any(d > 0 for d in dice):
+        return []
+
+    layers: Dict[Tuple[int, ...], Layer] = {(): {to_state(position): ()}}
+
+    def layer(prefix: Tuple[int, ...]) -> Layer:
+        if prefix not in layers:
+            layers[prefix] = expand(layer(prefix[:-1]), prefix[-1])
+        return layers[prefix]
+
+    # Layers are played until they run dry, so a sequence's deepest layer
+    # is the last one found.
+    for sequence in dice_sequences(dice):
+        for depth in range(1, len(sequence) + 1):
+            if not layer(sequence[:depth]):
+                break
+
+    if partial:
+        found = list(layers.values())
+    else:
+        most = max(len(prefix) for prefix, states in layers.items() if states)
+        found = [states for prefix, states in layers.items() if len(prefix) == most]
+        if most == 1 and dice[0] != dice[1] and layers[(max(dice),)]:
+            found = [layers[(max(dice),)]]
+
+    plays: Layer = {}
+    for states in found:
+        for state, moves in states.items():
+            plays.setdefault(state, moves)
+    return [
+        Play(moves, to_position(state, position.opponent_off))
+        for state, moves in plays.items()
+    ]
@@ -8,9 +8,11 @@ import random
 from copy import deepcopy
 from gymnasium import spaces
 from typing import Any, TypeVar
-from typing import List, NamedTuple, Optional, Tuple
+from typing import List, Optional, Tuple
 
 from pybg.core.logger import logger
+from pybg.core.moves import CHECKERS, Move, Play, generate_plays
+from pybg.core.profiler import StepProfiler
 from pybg.gnubg.match import GameState, Match, Resign
 from pybg.core.player import Player, PlayerType
 from pybg.gnubg.position import Position
@@ -20,10 +22,12 @@ ObsType = TypeVar("ObsType")
 
 POINTS = 24
 POINTS_PER_QUADRANT = int(POINTS / 4)
-CHECKERS = 15
+OBSERVATION_SIZE = 54
 
 ASCII_BOARD_HEIGHT = 11
 ASCII_MAX_CHECKERS = 5
+# GNUBG's limit; the match ID has four bits for the cube's log2.
+MAX_CUBE = 2**12
 ASCII_13_24 = "+13-14-15-16-17-18------19-20-21-22-23-24-+"
 ASCII_12_01 = "+12-11-10--9--8--7-------6--5--4--3--2--1-+"
 
@@ -52,17 +56,6 @@ class MoveState(enum.Enum):
     DEFAULT = enum.auto()
 
 
-class Move(NamedTuple):
-    pips: int
-    source: Optional[int]
-    destination: Optional[int]
-
-
-class Play(NamedTuple):
-    moves: Tuple[Move, ...]
-    position: Position
-
-
 # gym.Env
 class Board(gym.Env):
     checkers: int = CHECKERS
@@ -80,6 +73,7 @@ class Board(gym.Env):
         jacoby: bool = False,
         cont: bool = False,
         ref: str = "",
+        fast: bool = False,
     ):
         self.ref = ref if not None else str(uuid4())
         self.position: Position = Position.decode(position_id)
@@ -139,83 +133,29 @@ class Board(gym.Env):
         self.invalid_actions_taken = 0
         self.time_elapsed = 0
 
+        # Fast step mode: the observation, mask and info are preallocated and
+        # only recomputed when the game state changes. Callers must copy them
+        # if they keep them across steps.
+        self.fast = fast
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        self._observation = np.zeros((1, OBSERVATION_SIZE), dtype=np.float32)
+        self._observation_key = None
+        self._points = np.zeros(POINTS, dtype=np.int8)
+        self._colours = np.zeros(POINTS, dtype=np.int8)
+        self._mask = np.zeros(self.action_count, dtype=bool)
+        self._mask_key = None
+        self._info = {"invalid actions taken": 0}
+
+        # Set by enable_profiling().
+        self.profiler: Optional[StepProfiler] = None
+
     def generate_plays(self, partial: bool = False) -> List[Play]:
         """
         Generate and return legal plays.
 
         If `partial` is True, return all partial plays too (not just max-length).
         """
-
-        def generate(
-            position: Position,
-            dice: Tuple[int, ...],
-            die: int = 0,
-            moves: Tuple[Move, ...] = (),
-            plays: List[Play] = [],
-        ) -> List[Play]:
-            if die < len(dice):
-                pips = dice[die]
-
-                if position.player_bar > 0:
-                    new_position, destination = position.enter(pips)
-                    if new_position:
-                        generate(
-                            new_position,
-                            dice,
-                            die + 1,
-                            moves + (Move(pips, -1, destination),),
-                            plays,
-                        )
-                elif sum(position.player_home()) + position.player_off == self.checkers:
-                    for point in range(POINTS_PER_QUADRANT):
-                        new_position, destination = position.off(point, pips)
-                        if new_position:
-                            generate(
-                                new_position,
-                                dice,
-                                die + 1,
-                                moves + (Move(pips, point, destination),),
-                                plays,
-                            )
-                else:
-                    for point in range(len(position.board_points)):
-                        new_position, destination = position.move(point, pips)
-                        if new_position:
-                            generate(
-                                new_position,
-                                dice,
-                                die + 1,
-                                moves + (Move(pips, point, destination),),
-                                plays,
-                            )
-
-            plays.append(Play(moves, position))
-            return plays
-
-        if not any(d > 0 for d in self.match.dice):
-            return []
-
-        doubles = self.match.dice[0] == self.match.dice[1]
-        dice = self.match.dice * 2 if doubles else self.match.dice
-
-        plays = generate(self.position, dice)
-        if not doubles:
-            plays += generate(self.position, dice[::-1])
-
-        if not partial and len(plays) > 0:
-            max_moves = max(len(p.moves) for p in plays)
-            plays = [p for p in plays if len(p.moves) == max_moves]
-
-        # Deduplicate by final position
-        seen = set()
-        unique_plays = []
-        for play in sorted(plays, key=lambda p: hash(p.position)):
-            h = hash(play.position)
-            if h not in seen:
-                seen.add(h)
-                unique_plays.append(play)
-
-        return unique_plays
+        return generate_plays(self.position, self.match.dice, self.checkers, partial)
 
     def start(self, length: int = 3) -> None:
         """
@@ -281,30 +221,35 @@ class Board(gym.Env):
         Raises:
             BoardError: if the partial play is invalid.
         """
-        legal_plays = self.generate_plays(partial=True)
+        legal_plays = self.generate_plays()
 
         if not legal_plays:
             self.end_turn()
             return
 
-        # Convert to Move objects to compare
-        def to_moves(seq):
-            return tuple(
-                Move(abs(s - d) if s is not None and d is not None else 0, s, d)
-                for s, d in seq
+        # Compare (source, destination) pairs; the pips of bar entries and
+        # bearoffs cannot be worked out from them.
+        requested_moves = tuple((s, d) for s, d in moves)
+
+        def find(plays):
+            """Returns the first of plays that starts with the requested moves."""
+            return next(
+                (
+                    play
+                    for play in plays
+                    if tuple(
+                        (m.source, m.destination)
+                        for m in play.moves[: len(requested_moves)]
+                    )
+                    == requested_moves
+                ),
+                None,
             )
 
-        requested_moves = to_moves(moves)
-
-        # Filter for any legal play that starts with this sequence
-        matching_play = next(
-            (
-                play
-                for play in legal_plays
-                if play.moves[: len(requested_moves)] == requested_moves
-            ),
-            None,
-        )
+        # Both lists keep one play per resulting position, so a full play in
+        # one order may only be among the full plays, and the start of a play
+        # only among the partial ones.
+        matching_play = find(legal_plays) or find(self.generate_plays(partial=True))
 
         if matching_play:
             # Apply each move in order to reach that intermediate position
@@ -325,6 +270,8 @@ class Board(gym.Env):
         if (
             self.match.player == self.match.turn
             and self.match.game_state == GameState.ON_ROLL
+            and self.match.cube_value < MAX_CUBE
+            and not self.match.crawford
             and (
                 self.match.cube_holder == self.match.player
                 or self.match.cube_holder == Player.CENTERED
@@ -334,11 +281,11 @@ class Board(gym.Env):
             self.match.double = True
             self.match.game_state = GameState.DOUBLED
             self.match.swap_turn()
-            logger.debug(
-                f"Double offered - new turn: {self.match.turn} {type(self.match.turn)} {self.match.turn == PlayerType.ZERO}"
-            )
+            logger.debug("Double offered - new turn: %s", self.match.turn)
         else:
             logger.debug("Double failed validation")
+            if self.match.crawford:
+                raise BoardError("You cannot double in the Crawford game.")
             if self.match.cube_holder != self.match.player:
                 raise BoardError("You cannot double until you hold the cube.")
             else:
@@ -354,6 +301,7 @@ class Board(gym.Env):
         if (
             self.match.turn != self.match.cube_holder
             and self.match.game_state == GameState.DOUBLED
+            and self.match.cube_value < MAX_CUBE
         ):
             self.match.cube_value = self.match.cube_value * 2
             self.take()
@@ -419,7 +367,10 @@ class Board(gym.Env):
 
     def take(self) -> None:
         logger.debug(
-            f"Taking - player: {self.match.player}, turn: {self.match.turn}, cube_holder: {self.match.cube_holder}"
+            "Taking - player: %s, turn: %s, cube_holder: %s",
+            self.match.player,
+            self.match.turn,
+            self.match.cube_holder,
         )
         if (
             self.match.turn != self.match.cube_holder
@@ -430,7 +381,9 @@ class Board(gym.Env):
             self.match.reset_dice()
             self.match.game_state = GameState.ON_ROLL
             logger.debug(
-                f"Double accepted - new turn: {self.match.turn}, cube_holder: {self.match.cube_holder}"
+                "Double accepted - new turn: %s, cube_holder: %s",
+                self.match.turn,
+                self.match.cube_holder,
             )
             self.match.swap_turn()
         else:
@@ -494,13 +447,23 @@ class Board(gym.Env):
             None
         """
         score = self.calculate_score(cube, multiplier)
+        scores = [self.match.player_0_score, self.match.player_1_score]
+        crawford_score = self.match.length - 1
+
+        # The next game is the Crawford game if this one took the winner,
+        # and not the loser before them, to one point away.
+        self.match.crawford = (
+            self.match.length > 0
+            and scores[int(winner)] + score == crawford_score
+            and scores[1 - int(winner)] < crawford_score
+        )
 
         if winner == 0:
             self.match.player_0_score += score
         else:
             self.match.player_1_score += score
 
-        logger.debug(f"Player {winner} wins {score} points")
+        logger.debug("Player %s wins %s points", winner, score)
 
     def multiplier(self) -> Resign:
         """
@@ -654,10 +617,15 @@ class Board(gym.Env):
         if self.match.game_state == GameState.ON_ROLL:
             actions.append("roll")
 
-            # ...if they own the cube, or it is centered they can double.
+            # ...if they own the cube, or it is centered they can double,
+            # except in the Crawford game.
             if (
-                self.match.cube_holder == self.match.turn
-                or self.match.cube_holder == PlayerType.CENTERED
+                self.match.cube_value < MAX_CUBE
+                and not self.match.crawford
+                and (
+                    self.match.cube_holder == self.match.turn
+                    or self.match.cube_holder == PlayerType.CENTERED
+                )
             ):
                 actions.append("double")
 
@@ -665,7 +633,8 @@ class Board(gym.Env):
         if self.match.game_state == GameState.DOUBLED:
             actions.append("take")
             actions.append("drop")
-            actions.append("redouble")
+            if self.match.cube_value < MAX_CUBE:
+                actions.append("redouble")
             return actions  # ✅ ADD THIS EARLY RETURN
 
         # Check for the legal moves and append these to the actions.
@@ -685,19 +654,47 @@ class Board(gym.Env):
         """
         Returns a boolean array of length len(ALL_ACTIONS),
         where each True means the action is currently legal.
+
+        In fast mode the board's own mask buffer is refilled only when the
+        state has changed since the last call, and returned.
         """
-        legal_action_mask = np.zeros(self.action_count, dtype=bool)
+        if self.fast:
+            key = self.state_key()
+            if key == self._mask_key:
+                return self._mask
+            legal_action_mask = self._mask
+            legal_action_mask.fill(False)
+            self._mask_key = key
+        else:
+            legal_action_mask = np.zeros(self.action_count, dtype=bool)
 
         for action in self.valid_actions():
-            try:
-                idx = self.actions.index(action)
+            idx = self.action_index.get(action)
+            if idx is not None:
                 legal_action_mask[idx] = True
-            except ValueError:
-                pass
 
         return legal_action_mask
 
+    def state_key(self) -> tuple:
+        """
+        Returns a key that changes whenever the observation or the legal actions can.
+        """
+        match = self.match
+        return (
+            self.position,
+            match.dice,
+            match.game_state,
+            match.turn,
+            match.player,
+            match.cube_holder,
+            match.cube_value,
+            match.crawford,
+        )
+
     def get_observation(self):
+        if self.fast:
+            return self.update_observation()
+
         match = self.match
         position = self.position
 
@@ -731,6 +728,37 @@ class Board(gym.Env):
 
         return obs
 
+    def update_observation(self) -> np.ndarray:
+        """
+        Fills the preallocated (1, 54) observation in place, with the same
+        layout as get_observation, and returns it.
+        """
+        key = self.state_key()
+        if key == self._observation_key:
+            return self._observation
+
+        match = self.match
+        position = self.position
+        obs = self._observation[0]
+
+        obs[0] = match.dice[0] if len(match.dice) > 0 else 0
+        obs[1] = match.dice[1] if len(match.dice) > 1 else 0
+        obs[2] = position.opponent_bar
+        obs[3] = position.player_bar
+        obs[4] = position.opponent_off
+        obs[5] = position.player_off
+
+        # Points: colour 1 for the player, 2 for the opponent, then the count.
+        points = self._points
+        points[:] = position.board_points
+        np.sign(points, out=self._colours)
+        np.mod(self._colours, 3, out=self._colours)
+        obs[6::2] = self._colours
+        np.abs(points, out=obs[7::2])
+
+        self._observation_key = key
+        return self._observation
+
     def render(self, mode="human"):
         """Renders the board. 'w' is player1 and 'b' is player2."""
         if mode == "human":
@@ -808,7 +836,8 @@ class Board(gym.Env):
         try:
             if isinstance(action, tuple):
                 if action[0] == "move":
-                    logger.debug(f"action move tuple {action}")
+                    if __debug__ and logger.debug_enabled:
+                        logger.debug("action move tuple %s", action)
                     self.play(((action[1], action[2]),))
                 elif action[0] == "resign":
                     self.resign(Resign[action[1].upper()])
@@ -835,13 +864,38 @@ class Board(gym.Env):
                     raise BoardError(f"Unknown string action: {action}")
             return 0  # No shaped reward by default
         except BoardError as e:
-            logger.warning(f"Invalid action attempted: {action} | {e}")
+            logger.warning("Invalid action attempted: %s | %s", action, e)
             self.invalid_actions_taken += 1
             return -10
 
+    def enable_profiling(self, profiler: Optional[StepProfiler] = None) -> StepProfiler:
+        """
+        Times each phase of step(), including the opponent's decision if an
+        opponent has been set. Call again after replacing the opponent.
+
+        Returns:
+            StepProfiler: The profiler recording this board.
+        """
+        self.profiler = profiler or self.profiler or StepProfiler()
+        for method_name in (
+            "step",
+            "generate_plays",
+            "action_mask",
+            "get_observation",
+            "apply_action",
+        ):
+            self.profiler.attach(self, method_name)
+        if getattr(self, "opponent", None) is not None:
+            self.profiler.attach(self.opponent, "make_decision", "opponent")
+        return self.profiler
+
     def get_info(self):
         """Returns useful info for debugging, etc."""
 
+        if self.fast:
+            self._info["invalid actions taken"] = self.invalid_actions_taken
+            return self._info
+
         return {
             "time elapsed": time.time() - self.time_elapsed,
             "invalid actions taken": self.invalid_actions_taken,
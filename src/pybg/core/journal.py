@@ -0,0 +1,334 @@
+# pybg/core/journal.py
+"""
+An append-only, binary journal of match history.
+
+HistoryManager keeps (position_id, match_id, message) for every recorded
+move, and saving it as JSON rewrites everything each time. A journal instead
+appends one fixed-width record per event to <path>.pbj, and the message text
+to <path>.msg:
+
+    kind      B     MOVE, NEW_MATCH or DELETE_MATCH
+    match     I     number of the match in the journal, from 0
+    position  10s   the position ID's bits (14 base64 characters)
+    match_id  9s    the match ID's bits (12 base64 characters)
+    offset    Q     where the message starts in the .msg file
+    length    I     bytes of message, UTF-8
+    crc       I     CRC-32 of the fields above
+
+A NEW_MATCH record's message is the match's ref. Because records are fixed
+width, record n is at HEADER_SIZE + n * RECORD_SIZE, and the index of each
+match's record numbers makes goto O(1).
+
+Writes are buffered and fsynced every sync_every records, messages before
+records, so a record never points past the messages on disk. Opening a
+journal truncates a torn tail: records that are incomplete, fail their CRC or
+point at missing message bytes. Existing records are read through mmap.
+"""
+
+import base64
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+MAGIC = b"PBGJ"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+HEADER_SIZE = HEADER.size
+RECORD = struct.Struct("<BxxxI10s9sxQII")
+RECORD_SIZE = RECORD.size
+RECORD_DTYPE = np.dtype(
+    {
+        "names": ["kind", "match", "position", "match_id", "offset", "length"],
+        "formats": ["u1", "<u4", ("u1", 10), ("u1", 9), "<u8", "<u4"],
+        "offsets": [0, 4, 8, 18, 28, 36],
+        "itemsize": RECORD_SIZE,
+    }
+)
+
+MOVE = 1
+NEW_MATCH = 2
+DELETE_MATCH = 3
+
+SYNC_EVERY = 64
+
+
+class JournalError(Exception):
+    pass
+
+
+def pack_id(text: str, size: int) -> bytes:
+    """Returns the bits of a base64 position or match ID."""
+    if not text:
+        return bytes(size)
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def unpack_id(data: bytes, length: int) -> str:
+    """Returns the base64 ID, without padding, of packed bits."""
+    return base64.b64encode(data).decode("ascii")[:length]
+
+
+def read_journal(path: str):
+    """
+    Maps a journal's records read-only, without recovering it first, so it
+    can be read while a session is still appending to it.
+
+    Args:
+        path (str): The journal, without its extension.
+
+    Returns:
+        tuple: (records, refs): the whole records on disk as a RECORD_DTYPE
+            array, and the ref of each match number.
+    """
+    record_path = path + ".pbj"
+    with open(record_path, "rb") as f:
+        magic, version, size = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or size != RECORD_SIZE:
+        raise JournalError(f"{record_path} is not a version 1 journal")
+    count = (os.path.getsize(record_path) - HEADER_SIZE) // RECORD_SIZE
+    if count == 0:
+        return np.zeros(0, RECORD_DTYPE), []
+
+    records = np.memmap(
+        record_path, RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)
+    )
+    starts = records[records["kind"] == NEW_MATCH]
+    if len(starts) == 0:
+        return records, []
+    with open(path + ".msg", "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as messages:
+        refs = [
+            messages[offset : offset + length].decode("utf-8")
+            for offset, length in zip(
+                starts["offset"].tolist(), starts["length"].tolist()
+            )
+        ]
+    return records, refs
+
+
+class MatchJournal:
+    """
+    Args:
+        path (str): The journal's files are path + ".pbj" and path + ".msg".
+        sync_every (int): Records written between fsyncs. flush() and close()
+            sync too.
+    """
+
+    def __init__(self, path: str, sync_every: int = SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self.record_path = path + ".pbj"
+        self.message_path = path + ".msg"
+
+        self.refs: List[str] = []
+        # Ref -> match number, for the matches not deleted.
+        self.numbers: Dict[str, int] = {}
+        # Match number -> record numbers of its moves.
+        self.index: Dict[int, List[int]] = {}
+        self.unsynced = 0
+
+        self._map = None
+        self._messages_map = None
+        self._mapped = 0
+        # Records written since the files were mapped.
+        self._tail: List[Tuple[str, str, str]] = []
+
+        self.recover()
+        self._records = open(self.record_path, "ab")
+        self._messages = open(self.message_path, "ab")
+        self.message_end = self._messages.tell()
+        self.count = (self._records.tell() - HEADER_SIZE) // RECORD_SIZE
+        self.load()
+        self.matches = JournalMatches(self)
+
+    def recover(self):
+        """Creates the files, or cuts them back to their last whole record."""
+        if not os.path.exists(self.record_path):
+            with open(self.record_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+            open(self.message_path, "wb").close()
+            return
+
+        message_size = (
+            os.path.getsize(self.message_path)
+            if os.path.exists(self.message_path)
+            else 0
+        )
+        with open(self.record_path, "r+b") as f:
+            magic, version, size = HEADER.unpack(f.read(HEADER_SIZE))
+            if magic != MAGIC or size != RECORD_SIZE:
+                raise JournalError(f"{self.record_path} is not a version 1 journal")
+            good = HEADER_SIZE
+            message_end = 0
+            while True:
+                data = f.read(RECORD_SIZE)
+                if len(data) < RECORD_SIZE:
+                    break
+                *_, offset, length, crc = RECORD.unpack(data)
+                if zlib.crc32(data[:-4]) != crc or offset + length > message_size:
+                    break
+                good += RECORD_SIZE
+                message_end = offset + length
+            f.truncate(good)
+        with open(self.message_path, "ab") as f:
+            f.truncate(message_end)
+
+    def load(self):
+        """Maps the records on disk and indexes them."""
+        self._mapped = self.count
+        self._tail = []
+        if self.count == 0:
+            return
+        self._records.flush()
+        with open(self.record_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.message_end:
+            with open(self.message_path, "rb") as f:
+                self._messages_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        records = np.frombuffer(
+            self._map, RECORD_DTYPE, count=self.count, offset=HEADER_SIZE
+        )
+        kinds = records["kind"]
+        matches = records["match"]
+        for number in np.flatnonzero(kinds == NEW_MATCH):
+            ref = self.read(int(number))[2]
+            self.numbers[ref] = len(self.refs)
+            self.refs.append(ref)
+        for match in matches[kinds == DELETE_MATCH]:
+            self.numbers.pop(self.refs[match], None)
+        moves = np.flatnonzero(kinds == MOVE)
+        order = np.argsort(matches[moves], kind="stable")
+        groups = np.split(
+            moves[order], np.flatnonzero(np.diff(matches[moves][order])) + 1
+        )
+        for group in groups:
+            if len(group):
+                self.index[int(matches[group[0]])] = group.tolist()
+
+    def read(self, number: int) -> Tuple[str, str, str]:
+        """Returns (position_id, match_id, message) of record number."""
+        if number >= self._mapped:
+            return self._tail[number - self._mapped]
+        start = HEADER_SIZE + number * RECORD_SIZE
+        _, _, position, match_id, offset, length, _ = RECORD.unpack_from(
+            self._map, start
+        )
+        message = (
+            self._messages_map[offset : offset + length].decode("utf-8")
+            if length
+            else ""
+        )
+        return unpack_id(position, 14), unpack_id(match_id, 12), message
+
+    def write(self, kind, match, position_id="", match_id="", message=""):
+        """Appends a record. Returns its number."""
+        data = message.encode("utf-8")
+        self._messages.write(data)
+        record = RECORD.pack(
+            kind,
+            match,
+            pack_id(position_id, 10),
+            pack_id(match_id, 9),
+            self.message_end,
+            len(data),
+            0,
+        )
+        self._records.write(record[:-4] + struct.pack("<I", zlib.crc32(record[:-4])))
+        self.message_end += len(data)
+        self._tail.append((position_id, match_id, message))
+        number = self.count
+        self.count += 1
+
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.flush()
+        return number
+
+    def new_match(self, ref: str) -> int:
+        """Starts a match. Returns its number."""
+        match = len(self.refs)
+        self.write(NEW_MATCH, match, message=ref)
+        self.numbers[ref] = match
+        self.refs.append(ref)
+        return match
+
+    def record_move(self, match: int, position_id: str, match_id: str, message=""):
+        number = self.write(MOVE, match, position_id, match_id, message)
+        self.index.setdefault(match, []).append(number)
+
+    def delete_match(self, match: int):
+        """Hides a match. Its records stay in the files."""
+        self.write(DELETE_MATCH, match)
+        self.numbers.pop(self.refs[match], None)
+
+    def flush(self):
+        """Writes and fsyncs everything appended so far."""
+        # Messages first, so that no record on disk points past them.
+        for f in (self._messages, self._records):
+            f.flush()
+            os.fsync(f.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        if self._records.closed:
+            return
+        self.flush()
+        self._records.close()
+        self._messages.close()
+        for mapped in (self._map, self._messages_map):
+            if mapped is not None:
+                mapped.close()
+
+
+class JournalMoves(Sequence):
+    """The recorded moves of one match, read from the journal on demand."""
+
+    def __init__(self, journal: MatchJournal, match: int):
+        self.journal = journal
+        self.match = match
+
+    def __len__(self):
+        return len(self.journal.index.get(self.match, ()))
+
+    def __getitem__(self, i):
+        numbers = self.journal.index.get(self.match, [])
+        if isinstance(i, slice):
+            return [self.journal.read(n) for n in numbers[i]]
+        return self.journal.read(numbers[i])
+
+    def append(self, state: Tuple[str, str, str]):
+        self.journal.record_move(self.match, *state)
+
+
+class JournalMatches(Mapping):
+    """
+    Match ref -> JournalMoves, standing in for HistoryManager's dict of
+    lists. Deleting a ref writes a DELETE_MATCH record.
+    """
+
+    def __init__(self, journal: MatchJournal):
+        self.journal = journal
+
+    def __getitem__(self, ref: str) -> JournalMoves:
+        return JournalMoves(self.journal, self.journal.numbers[ref])
+
+    def __setitem__(self, ref: str, moves):
+        if moves:
+            raise JournalError("A journal match can only start empty.")
+        self.journal.new_match(ref)
+
+    def __delitem__(self, ref: str):
+        self.journal.delete_match(self.journal.numbers[ref])
+
+    def __iter__(self):
+        return iter(self.journal.numbers)
+
+    def __len__(self):
+        return len(self.journal.numbers)
@@ -1,8 +1,135 @@
-from aws_lambda_powertools import Logger
-from os import getenv
+"""
+The engine's logger.
 
-# Initialize the Powertools Logger
-logger = Logger(service=getenv("POWERTOOLS_SERVICE_NAME", "pybg"))
+`logger` stands in front of the Powertools JSON Logger and only creates it,
+importing aws_lambda_powertools, for the first record that passes the level.
+Records below the level cost a method call and a comparison. Messages take
+%-style arguments, which are only formatted when the record is written:
 
-# Set the log level from the environment variable, default to ERROR if not set
-logger.setLevel(level=getenv("LOG_LEVEL", "ERROR"))
+    logger.debug("Applying action: %s", action)
+
+In hot paths, where even building the arguments costs, hoist the check:
+
+    if __debug__ and logger.debug_enabled:
+        logger.debug(f"GameId: {game.encode()}")
+
+`python -O` removes such blocks when compiling, so they cost nothing at all.
+Without -O, training and analysis runs can call strip_debug(), or set
+PYBG_STRIP_DEBUG=1, to turn debug records off whatever the level.
+"""
+
+import logging
+from os import environ, getenv
+
+SERVICE = getenv("POWERTOOLS_SERVICE_NAME", "pybg")
+# The log level from the environment variable, ERROR if not set.
+LOG_LEVEL = getenv("LOG_LEVEL", "ERROR")
+
+
+def _ignore(msg, *args, **kwargs):
+    pass
+
+
+class LazyLogger:
+    """
+    The Powertools Logger, created on the first record that passes the level.
+
+    Attributes:
+        debug_enabled (bool): Whether debug records are written, for hoisting
+            the check out of hot paths.
+    """
+
+    def __init__(self, service: str, level="ERROR"):
+        self.service = service
+        self.level = logging.NOTSET
+        self.debug_enabled = False
+        self.debug_stripped = False
+        self._logger = None
+        self.setLevel(level)
+
+    @property
+    def powertools(self):
+        """The Powertools Logger, created on first use."""
+        if self._logger is None:
+            from aws_lambda_powertools import Logger
+
+            self._logger = Logger(service=self.service)
+            self._logger.setLevel(level=self.level)
+        return self._logger
+
+    def setLevel(self, level):
+        self.level = logging._checkLevel(
+            level.upper() if isinstance(level, str) else level
+        )
+        self.debug_enabled = self.level <= logging.DEBUG and not self.debug_stripped
+        if self._logger is not None:
+            self._logger.setLevel(level=self.level)
+
+    def strip_debug(self):
+        """Turns debug records off for good, whatever the level is set to."""
+        self.debug_stripped = True
+        self.debug_enabled = False
+        self.debug = _ignore
+
+    def isEnabledFor(self, level: int) -> bool:
+        if level <= logging.DEBUG and self.debug_stripped:
+            return False
+        return level >= self.level
+
+    def log(self, level: int, msg, *args, **kwargs):
+        if self.isEnabledFor(level):
+            # Point the record's location at our caller, not at this proxy.
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        if self.debug_enabled:
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.debug(msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self.level <= logging.INFO:
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.info(msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        if self.level <= logging.WARNING:
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.warning(msg, *args, **kwargs)
+
+    warn = warning
+
+    def error(self, msg, *args, **kwargs):
+        if self.level <= logging.ERROR:
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.error(msg, *args, **kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        if self.level <= logging.ERROR:
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.exception(msg, *args, **kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        if self.level <= logging.CRITICAL:
+            kwargs.setdefault("stacklevel", 3)
+            self.powertools.critical(msg, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Anything else, e.g. append_keys(), goes to the Powertools Logger.
+        return getattr(self.powertools, name)
+
+
+logger = LazyLogger(SERVICE, LOG_LEVEL)
+
+
+def strip_debug():
+    """
+    Turns the engine's debug logging off for the rest of the process, and for
+    the processes it starts.
+    """
+    environ["PYBG_STRIP_DEBUG"] = "1"
+    logger.strip_debug()
+
+
+if getenv("PYBG_STRIP_DEBUG", "") not in ("", "0"):
+    strip_debug()
@@ -0,0 +1,671 @@
+# pybg/core/match_file.py
+"""
+Import and export of matches in the .mat text format of GNU Backgammon and
+Jellyfish:
+
+    ; [Player 1 "alice"]
+    ; [Player 2 "bob"]
+
+     5 point match
+
+     Game 1
+     alice : 0                          bob : 0
+      1) 31: 8/5 6/5                    52: 13/8 13/11
+      2) 64: 24/18* 13/9                 Doubles => 2
+      3)  Takes                         43: bar/21 13/10
+      ...
+          Wins 1 point
+
+The player in the left column is PlayerType.ZERO and the right one
+PlayerType.ONE. Points are numbered from the side to move, 25 or "bar" being
+its bar and 0 or "off" off the board.
+
+parse() reads a match a line at a time and yields a GameStart per game and an
+Action per move or cube action, so files of any size stream through. replay()
+follows them with the rules engine and yields a Step, the position and match
+IDs the side to act saw, for each action. A move's notation is applied with
+Position.apply_move, the way Board.play applies its moves, and checked
+against one generate_plays() of the roll; notation that skips the hit marks
+of a checker moving through several points is resolved from the legal plays.
+
+write_match() goes the other way, from the (position_id, match_id, message)
+states HistoryManager records. import_files() replays many files across a
+process pool into a history journal and, for analysis, a file of the
+"position_id:match_id" of every roll, as pybg.gnubg.analysis reads them.
+
+    python -m pybg.core.match_file import matches/ --journal imported --workers 8
+    python -m pybg.core.match_file import matches/ --queue rolls.txt
+    python -m pybg.core.match_file export match_history.json exported/
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from pybg.core.journal import MatchJournal
+from pybg.core.logger import logger, strip_debug
+from pybg.core.moves import CHECKERS, Play, generate_plays
+from pybg.core.player import PlayerType
+from pybg.gnubg.match import GameState, Match, Resign
+from pybg.gnubg.position import Position
+
+STARTING_POSITION_ID = "4HPwATDgc/ABMA"
+
+# Actions starting at or right of this column are the right-hand player's.
+RIGHT_COLUMN = 20
+LEFT_WIDTH = 28
+
+TAG = re.compile(r'^;\s*\[(.+?)\s+"(.*)"\]')
+LENGTH = re.compile(r"^\s*(\d+)\s+point match", re.IGNORECASE)
+GAME = re.compile(r"^\s*Game\s+(\d+)", re.IGNORECASE)
+SCORES = re.compile(r"^\s*(.*?)\s*:\s*(\d+)(?:\s*\(.*?\))?\s+(.*?)\s*:\s*(\d+)")
+NUMBER = re.compile(r"^\s*(\d+)\)")
+ACTION = re.compile(
+    r"(\d\d:|Doubles|Beavers|Raccoons|Takes|Accepts|Drops|Passes|Rejects|Wins)",
+    re.IGNORECASE,
+)
+KINDS = {
+    "doubles": "double",
+    "beavers": "beaver",
+    "raccoons": "beaver",
+    "takes": "take",
+    "accepts": "take",
+    "drops": "drop",
+    "passes": "drop",
+    "rejects": "drop",
+    "wins": "win",
+}
+
+
+class MatchFileError(Exception):
+    pass
+
+
+class GameStart(NamedTuple):
+    game: int
+    length: int
+    players: Tuple[str, str]
+    scores: Tuple[int, int]
+    tags: dict
+
+
+class Action(NamedTuple):
+    """
+    kind: "move", "double", "beaver", "take", "drop" or "win".
+    dice: The roll of a move.
+    moves: A move's notation, "" if it could not move.
+    value: The cube value of a double or beaver, the points of a win.
+    """
+
+    game: int
+    number: int
+    side: int
+    kind: str
+    dice: Tuple[int, int] = (0, 0)
+    moves: str = ""
+    value: int = 0
+    line: int = 0
+
+    def __str__(self):
+        if self.kind == "move":
+            return f"{self.dice[0]}{self.dice[1]}: {self.moves}".strip()
+        if self.kind in ("double", "beaver"):
+            return f"{self.kind.capitalize()}s => {self.value}"
+        if self.kind == "win":
+            return f"Wins {self.value} point{'s' if self.value != 1 else ''}"
+        return f"{self.kind.capitalize()}s"
+
+
+class Step(NamedTuple):
+    """An action and the position and match IDs its side saw before it."""
+
+    game: int
+    number: int
+    side: int
+    action: str
+    position_id: str
+    match_id: str
+
+
+def parse(lines: Iterable[str]) -> Iterator[Union[GameStart, Action]]:
+    """
+    Reads a .mat match.
+
+    Yields:
+        GameStart before the actions of each game, then an Action for each
+        move, cube action and win, in the order they were played.
+    """
+    tags = {}
+    length = 0
+    players = ("Player 1", "Player 2")
+    game = 0
+    started = False
+    number = 0
+
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        tag = TAG.match(line)
+        if tag:
+            tags[tag.group(1)] = tag.group(2)
+            continue
+        if line.lstrip().startswith(";"):
+            continue
+        if LENGTH.match(line):
+            length = int(LENGTH.match(line).group(1))
+            continue
+        if GAME.match(line):
+            game = int(GAME.match(line).group(1))
+            started = False
+            continue
+        if game and not started:
+            scores = SCORES.match(line)
+            if scores:
+                players = (scores.group(1), scores.group(3))
+                started = True
+                yield GameStart(
+                    game,
+                    length,
+                    players,
+                    (int(scores.group(2)), int(scores.group(4))),
+                    tags,
+                )
+                continue
+
+        numbered = NUMBER.match(line)
+        if numbered:
+            number = int(numbered.group(1))
+        if not started:
+            continue
+        starts = [m.start() for m in ACTION.finditer(line)]
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else len(line)
+            text = line[start:end].strip()
+            if len(starts) == 2:
+                side = i
+            else:
+                side = 0 if start < RIGHT_COLUMN else 1
+            yield parse_action(text, game, number, side, line_number)
+
+
+def parse_action(text: str, game: int, number: int, side: int, line: int) -> Action:
+    """Returns the Action of one column's text, like "31: 8/5 6/5"."""
+    if text[0].isdigit():
+        dice, _, moves = text.partition(":")
+        return Action(
+            game,
+            number,
+            side,
+            "move",
+            (int(dice[0]), int(dice[1])),
+            moves.strip(),
+            line=line,
+        )
+    word = text.split()[0].lower()
+    value = re.search(r"(\d+)", text)
+    return Action(
+        game,
+        number,
+        side,
+        KINDS[word],
+        value=int(value.group(1)) if value else 0,
+        line=line,
+    )
+
+
+def parse_moves(text: str) -> List[Tuple[int, int]]:
+    """
+    Returns the (source, destination) hops of move notation, as Move has
+    them: bar is a source of -1 and off a destination of -1. "13/7*/5" is
+    two hops and "13/11(2)" the same hop twice.
+    """
+    hops = []
+    for token in text.replace("*", "").split():
+        repeat = re.match(r"^(.*)\((\d)\)$", token)
+        count = int(repeat.group(2)) if repeat else 1
+        points = (repeat.group(1) if repeat else token).split("/")
+        indexes = []
+        for i, point in enumerate(points):
+            point = point.lower()
+            if point in ("bar", "25") and i == 0:
+                indexes.append(-1)
+            elif point in ("off", "0") and i == len(points) - 1:
+                indexes.append(-1)
+            else:
+                indexes.append(int(point) - 1)
+        hops.extend(list(zip(indexes, indexes[1:])) * count)
+    return hops
+
+
+def apply_notation(position: Position, dice, text: str, validate=True) -> Position:
+    """
+    Returns the position after the move notation, from the mover's point of
+    view. With validate, the result must be one of the roll's legal plays.
+    """
+    try:
+        after = position
+        for source, destination in parse_moves(text):
+            after = after.apply_move(source, destination)
+    except (ValueError, IndexError) as e:
+        raise MatchFileError(f"Cannot read the move {text!r}: {e}")
+    if not validate:
+        return after
+
+    plays = generate_plays(position, dice)
+    if not plays:
+        if text:
+            raise MatchFileError(f"{text!r} is played with {dice} but no play is legal")
+        return position
+    finals = {play.position for play in plays}
+    if after in finals:
+        return after
+    # Notation like 24/13 does not mark a hit on the way: find the legal play
+    # that leaves the mover's checkers where the notation does.
+    mine = checkers(after)
+    matching = [final for final in finals if checkers(final) == mine]
+    if matching:
+        return max(matching, key=lambda final: final.opponent_bar)
+    raise MatchFileError(f"{text!r} is not a legal play of {dice}")
+
+
+def checkers(position: Position) -> tuple:
+    """The mover's checkers: points, bar and off."""
+    return (
+        tuple(max(n, 0) for n in position.board_points),
+        position.player_bar,
+        position.player_off,
+    )
+
+
+def replay(lines: Iterable[str], validate=True) -> Iterator[Step]:
+    """
+    Plays a .mat match through the rules engine.
+
+    Args:
+        lines: The match file's lines.
+        validate (bool): Check every move against the legal plays.
+
+    Yields:
+        Step: For each action, the position and match IDs from the point of
+            view of the side that was to act, the dice rolled for a move.
+            After a win the IDs are those of the finished game, with the new
+            score.
+    """
+    match: Optional[Match] = None
+    position: Optional[Position] = None
+    view = 0
+    crawford_played = False
+
+    for event in parse(lines):
+        if isinstance(event, GameStart):
+            p0, p1 = event.scores
+            crawford = (
+                event.length > 0
+                and not crawford_played
+                and event.length - 1 in (p0, p1)
+                and max(p0, p1) < event.length
+            )
+            crawford_played = crawford_played or crawford
+            match = Match(
+                cube_value=1,
+                cube_holder=PlayerType.CENTERED,
+                player=PlayerType.ZERO,
+                crawford=crawford,
+                game_state=GameState.ON_ROLL,
+                turn=PlayerType.ZERO,
+                double=False,
+                resign=Resign.NONE,
+                dice=(0, 0),
+                length=event.length,
+                player_0_score=p0,
+                player_1_score=p1,
+            )
+            position = Position.decode(STARTING_POSITION_ID)
+            view = 0
+            first = True
+            continue
+        if match is None:
+            raise MatchFileError(f"Line {event.line}: an action before any game")
+
+        side = PlayerType(event.side)
+        if event.kind in ("move", "double") and (event.side != view or first):
+            if event.side != view:
+                position = position.swap_players()
+                view = event.side
+            match.player = match.turn = side
+        first = False
+
+        try:
+            if event.kind == "move":
+                match.dice = event.dice
+                match.game_state = GameState.ROLLED
+                yield step(event, position, match)
+                position = apply_notation(position, event.dice, event.moves, validate)
+                match.dice = (0, 0)
+                match.game_state = GameState.ON_ROLL
+            elif event.kind == "double":
+                match.game_state = GameState.ON_ROLL
+                yield step(event, position, match)
+                match.cube_value = event.value or 2 * match.cube_value
+                match.double = True
+                match.turn = PlayerType(1 - event.side)
+                match.game_state = GameState.DOUBLED
+            elif event.kind in ("take", "beaver"):
+                yield step(event, position, match)
+                if event.kind == "beaver":
+                    match.cube_value = event.value or 2 * match.cube_value
+                match.double = False
+                match.cube_holder = side
+                match.turn = match.player
+                match.game_state = GameState.ON_ROLL
+            elif event.kind == "drop":
+                yield step(event, position, match)
+                match.double = False
+                match.game_state = GameState.DROP
+            elif event.kind == "win":
+                if event.side == 0:
+                    match.player_0_score += event.value
+                else:
+                    match.player_1_score += event.value
+                match.game_state = GameState.GAME_OVER
+                yield step(event, position, match)
+        except MatchFileError as e:
+            raise MatchFileError(f"Line {event.line}, game {event.game}: {e}")
+
+
+def step(action: Action, position: Position, match: Match) -> Step:
+    return Step(
+        action.game,
+        action.number,
+        action.side,
+        str(action),
+        position.encode(),
+        match.encode(),
+    )
+
+
+def format_play(position: Position, play: Play) -> str:
+    """Returns a play's notation, with hits marked, from position."""
+    moves = []
+    for move in play.moves:
+        source = "bar" if move.source == -1 else str(move.source + 1)
+        destination = "off" if move.destination == -1 else str(move.destination + 1)
+        hit = move.destination != -1 and position.board_points[move.destination] == -1
+        moves.append(f"{source}/{destination}{'*' if hit else ''}")
+        position = position.apply_move(move.source, move.destination)
+    return " ".join(moves)
+
+
+def history_actions(states) -> Iterator[Union[GameStart, Action]]:
+    """
+    Works out the actions between recorded (position_id, match_id, ...)
+    states of a pybg match, from their match IDs and positions.
+
+    Yields:
+        GameStart and Action, as parse() does.
+    """
+    previous = None
+    game = 0
+    for state in states:
+        position, match = Position.decode(state[0]), Match.decode(state[1])
+        scores = (match.player_0_score, match.player_1_score)
+        if previous is None:
+            game = 1
+            yield GameStart(game, match.length, ("", ""), scores, {})
+            previous = position, match
+            continue
+
+        last_position, last = previous
+        last_scores = (last.player_0_score, last.player_1_score)
+        scored = scores != last_scores
+        if last.game_state == GameState.GAME_OVER:
+            # Replayed .mat files end each game on its win.
+            game += 1
+            yield GameStart(game, match.length, ("", ""), scores, {})
+        if last.game_state == GameState.ROLLED and 0 not in last.dice:
+            mover = last.player
+            plays = generate_plays(last_position, last.dice)
+            after = position if match.player == mover else position.swap_players()
+            play = next((p for p in plays if p.position == after), None)
+            if play is None and scored:
+                play = next(
+                    (p for p in plays if p.position.player_off == CHECKERS), None
+                )
+            if play is not None:
+                moves = format_play(last_position, play)
+                yield Action(game, 0, mover.value, "move", last.dice, moves)
+            elif not plays and match.player != mover:
+                yield Action(game, 0, mover.value, "move", last.dice, "")
+        if (
+            match.game_state == GameState.DOUBLED
+            and last.game_state != GameState.DOUBLED
+        ):
+            yield Action(game, 0, match.player.value, "double", value=match.cube_value)
+        if (
+            last.game_state == GameState.DOUBLED
+            and match.game_state != GameState.DOUBLED
+        ):
+            kind = "drop" if scored else "take"
+            yield Action(game, 0, last.turn.value, kind)
+        if scored:
+            winner = 0 if scores[0] > last_scores[0] else 1
+            points = scores[winner] - last_scores[winner]
+            yield Action(game, 0, winner, "win", value=points)
+            if match.game_state != GameState.GAME_OVER:
+                game += 1
+                yield GameStart(game, match.length, ("", ""), scores, {})
+        previous = position, match
+
+
+def write_match(states, stream, players=("Player 0", "Player 1"), tags=None):
+    """
+    Writes recorded (position_id, match_id, ...) states of a match to
+    stream in .mat format.
+
+    Returns:
+        int: The games written.
+    """
+    tags = {"Player 1": players[0], "Player 2": players[1], **(tags or {})}
+    for name, value in tags.items():
+        stream.write(f'; [{name} "{value}"]\n')
+
+    rows: List[List[str]] = []
+    games = 0
+    length = 0
+    scores = [0, 0]
+
+    def flush_rows():
+        for number, (left, right) in enumerate(rows, 1):
+            stream.write(f"{number:3d}) {left:<{LEFT_WIDTH}} {right}".rstrip() + "\n")
+        rows.clear()
+
+    for event in history_actions(states):
+        if isinstance(event, GameStart):
+            flush_rows()
+            if not games:
+                length = event.length
+                stream.write(f"\n {length} point match\n")
+            games += 1
+            scores = list(event.scores)
+            score_0 = f"{players[0]} : {event.scores[0]}"
+            stream.write(
+                f"\n Game {event.game}\n {score_0:<33} {players[1]} : {event.scores[1]}\n"
+            )
+        elif event.kind == "win":
+            flush_rows()
+            text = str(event)
+            scores[event.side] += event.value
+            if length and scores[event.side] >= length:
+                text += " and the match"
+            indent = 6 if event.side == 0 else 5 + LEFT_WIDTH + 1
+            stream.write(" " * indent + text + "\n")
+        elif event.side == 0 or not rows or rows[-1][1]:
+            rows.append([str(event), ""] if event.side == 0 else ["", str(event)])
+        else:
+            rows[-1][1] = str(event)
+    flush_rows()
+    return games
+
+
+def replay_file(path: str):
+    """
+    Replays a .mat file.
+
+    Returns:
+        tuple: The path, its steps and an error message, "" if it read.
+    """
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return path, list(replay(f)), ""
+    except (MatchFileError, ValueError, KeyError) as e:
+        return path, [], str(e)
+
+
+def find_files(paths: Iterable[str]) -> Iterator[str]:
+    """Yields the .mat files among paths, searching directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    if name.lower().endswith(".mat"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def import_files(
+    paths: Iterable[str],
+    journal: Optional[MatchJournal] = None,
+    queue=None,
+    workers: int = 0,
+    verbose: int = 0,
+):
+    """
+    Replays .mat files, in worker processes if workers > 0, into a journal
+    and/or an analysis queue, in the order they finish.
+
+    Args:
+        paths: The .mat files.
+        journal (MatchJournal): Gets a match per file, referenced by its path,
+            with a record per step.
+        queue: A text stream that gets a "position_id:match_id" line for
+            each move's roll.
+        workers (int): Processes to replay in, 0 to replay in this one.
+        verbose (int): Report progress every this many files.
+
+    Returns:
+        dict: Counts of the files, steps and failed files.
+    """
+    counts = {"files": 0, "steps": 0, "failed": 0}
+    pool = mp.Pool(workers) if workers > 0 else None
+    try:
+        results = (
+            pool.imap_unordered(replay_file, paths, chunksize=4)
+            if pool
+            else map(replay_file, paths)
+        )
+        for path, steps, error in results:
+            counts["files"] += 1
+            if error:
+                counts["failed"] += 1
+                logger.warning("Skipping %s: %s", path, error)
+                continue
+            counts["steps"] += len(steps)
+            if journal is not None:
+                match = journal.new_match(path)
+                for s in steps:
+                    journal.record_move(match, s.position_id, s.match_id, s.action)
+            if queue is not None:
+                for s in steps:
+                    if s.action[0].isdigit():
+                        queue.write(f"{s.position_id}:{s.match_id}\n")
+            if verbose and counts["files"] % verbose == 0:
+                logger.info("%d files, %d steps", counts["files"], counts["steps"])
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return counts
+
+
+def load_matches(path: str) -> dict:
+    """Returns the recorded matches, ref -> states, of a history file or journal."""
+    if path.endswith(".pbj"):
+        journal = MatchJournal(path[: -len(".pbj")])
+        matches = {ref: list(moves) for ref, moves in journal.matches.items()}
+        journal.close()
+        return matches
+    with open(path) as f:
+        return json.load(f)["matches"]
+
+
+def export_matches(matches: dict, directory: str) -> List[str]:
+    """Writes each match to a .mat file in directory. Returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for ref, states in matches.items():
+        if not states:
+            continue
+        name = re.sub(r"[^\w.-]+", "_", os.path.basename(str(ref))) or "match"
+        path = os.path.join(directory, os.path.splitext(name)[0] + ".mat")
+        with open(path, "w") as f:
+            write_match(states, f)
+        written.append(path)
+    return written
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Import and export .mat match files.")
+    COMMANDS = PARSER.add_subparsers(dest="command", required=True)
+    IMPORT = COMMANDS.add_parser("import", help="Replay .mat files.")
+    IMPORT.add_argument("paths", nargs="+", help=".mat files or directories of them.")
+    IMPORT.add_argument(
+        "--journal", help="Journal path to record the matches in, without .pbj."
+    )
+    IMPORT.add_argument(
+        "--queue", help="File to write the rolls' position and match IDs to."
+    )
+    IMPORT.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Replay processes, 0 for none.",
+    )
+    IMPORT.add_argument(
+        "--verbose",
+        type=int,
+        default=100,
+        help="Report progress every this many files.",
+    )
+    EXPORT = COMMANDS.add_parser("export", help="Write recorded matches as .mat files.")
+    EXPORT.add_argument("history", help="A history .json file or .pbj journal.")
+    EXPORT.add_argument("directory", help="Directory to write the .mat files to.")
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    if ARGS.command == "export":
+        for written in export_matches(load_matches(ARGS.history), ARGS.directory):
+            print(written)
+    else:
+        JOURNAL = MatchJournal(ARGS.journal) if ARGS.journal else None
+        QUEUE = open(ARGS.queue, "w") if ARGS.queue else None
+        START = time.perf_counter()
+        try:
+            COUNTS = import_files(
+                find_files(ARGS.paths), JOURNAL, QUEUE, ARGS.workers, ARGS.verbose
+            )
+        finally:
+            if JOURNAL:
+                JOURNAL.close()
+            if QUEUE:
+                QUEUE.close()
+        ELAPSED = time.perf_counter() - START
+        print(
+            f"{COUNTS['files']} files ({COUNTS['failed']} failed), "
+            f"{COUNTS['steps']} steps in {ELAPSED:.1f}s"
+        )
@@ -0,0 +1,117 @@
+# pybg/core/moves.py
+"""
+Move generation: the legal plays of a position and a roll.
+
+This is the part of Board that the rules need, kept free of gymnasium and the
+logger so that the rules engine (Position, Match and generate_plays) imports
+with the standard library and NumPy only. Board.generate_plays calls it with
+the board's position and dice.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from pybg.gnubg.position import POINTS_PER_QUADRANT, Position
+
+CHECKERS = 15
+
+
+class Move(NamedTuple):
+    pips: int
+    source: Optional[int]
+    destination: Optional[int]
+
+
+class Play(NamedTuple):
+    moves: Tuple[Move, ...]
+    position: Position
+
+
+def generate_plays(
+    position: Position,
+    dice: Tuple[int, int],
+    checkers: int = CHECKERS,
+    partial: bool = False,
+) -> List[Play]:
+    """
+    Generate and return the legal plays of position for the side to move.
+
+    Args:
+        position: The position, from the point of view of the side to move.
+        dice: The roll. No plays are returned for (0, 0).
+        checkers: Checkers per side, for deciding when bearing off starts.
+        partial: Return all partial plays too (not just max-length).
+
+    Returns:
+        list: One Play per resulting position.
+    """
+
+    def generate(
+        position: Position,
+        dice: Tuple[int, ...],
+        die: int,
+        moves: Tuple[Move, ...],
+        plays: List[Play],
+    ) -> List[Play]:
+        if die < len(dice):
+            pips = dice[die]
+
+            if position.player_bar > 0:
+                new_position, destination = position.enter(pips)
+                if new_position:
+                    generate(
+                        new_position,
+                        dice,
+                        die + 1,
+                        moves + (Move(pips, -1, destination),),
+                        plays,
+                    )
+            elif sum(position.player_home()) + position.player_off == checkers:
+                for point in range(POINTS_PER_QUADRANT):
+                    new_position, destination = position.off(point, pips)
+                    if new_position:
+                        generate(
+                            new_position,
+                            dice,
+                            die + 1,
+                            moves + (Move(pips, point, destination),),
+                            plays,
+                        )
+            else:
+                for point in range(len(position.board_points)):
+                    new_position, destination = position.move(point, pips)
+                    if new_position:
+                        generate(
+                            new_position,
+                            dice,
+                            die + 1,
+                            moves + (Move(pips, point, destination),),
+                            plays,
+                        )
+
+        plays.append(Play(moves, position))
+        return plays
+
+    if not any(d > 0 for d in dice):
+        return []
+
+    doubles = dice[0] == dice[1]
+    dice = tuple(dice) * 2 if doubles else tuple(dice)
+
+    plays = generate(position, dice, 0, (), [])
+    if not doubles:
+        generate(position, dice[::-1], 0, (), plays)
+
+    if not partial and len(plays) > 0:
+        max_moves = max(len(p.moves) for p in plays)
+        plays = [p for p in plays if len(p.moves) == max_moves]
+
+    # Deduplicate by final position
+    seen = set()
+    unique_plays = []
+    for play in sorted(plays, key=lambda p: hash(p.position)):
+        h = hash(play.position)
+        if h not in seen:
+            seen.add(h)
+            unique_plays.append(play)
+
+    return unique_plays
@@ -0,0 +1,431 @@
+# pybg/core/position_archive.py
+"""
+A columnar archive of recorded positions, indexed for queries.
+
+The archive is a directory of NumPy columns, one row per recorded position:
+
+    position         (N, 10) u1   the position ID's bits
+    match_id         (N, 9)  u1   the match ID's bits
+    game, move       (N,)    u4   game number in the archive, move in the game
+    position_class   (N,)    u1   index into CLASSES
+    player_pips      (N,)    u2   pip counts, bar checkers counting 25
+    opponent_pips    (N,)    u2
+    player_bearoff   (N,)    i4   GNUBG bear-off signature of the side's
+    opponent_bearoff (N,)    i4   home board, -1 unless all its checkers
+                                  are home or off
+
+and of indexes, each a permutation of the rows sorted by one key, stored with
+the sorted keys: a 64-bit hash of the position, the class, the pip counts
+and the bear-off signatures. Queries are binary searches into the sorted
+keys, so they take milliseconds over millions of rows. The files are
+memory-mapped when an archive is opened, and ingest() rewrites them with the
+new rows appended.
+
+Rows come from history journals (see pybg.core.journal), the JSON files
+HistoryManager.save_to_file writes, or any (ref, [(position_id, match_id,
+...)]) pairs. Positions are decoded, classified and counted with NumPy on
+the packed bits, not through Position.
+
+The classes follow Position.classify, except that checkers on the bar count
+as the side's 25th point as in GNUBG. They are stored as indexes into CLASSES
+because PositionClass's members alias each other: CONTACT is CRASHED, and
+BEAROFF1 and BEAROFF2 are OVER.
+
+    python -m pybg.core.position_archive ingest archive/ journals/*.pbj
+    python -m pybg.core.position_archive query archive/ --class crashed
+    python -m pybg.core.position_archive query archive/ --position 4HPwATDgc/ABMA
+"""
+
+import argparse
+import json
+import os
+import time
+from math import comb
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from pybg.core.journal import DELETE_MATCH, MOVE, pack_id, read_journal, unpack_id
+
+CLASSES = ("over", "crashed", "contact", "race", "bearoff1", "bearoff2")
+OVER, CRASHED, CONTACT, RACE, BEAROFF1, BEAROFF2 = range(len(CLASSES))
+
+COLUMNS = {
+    "position": ("u1", (10,)),
+    "match_id": ("u1", (9,)),
+    "game": ("<u4", ()),
+    "move": ("<u4", ()),
+    "position_class": ("u1", ()),
+    "player_pips": ("<u2", ()),
+    "opponent_pips": ("<u2", ()),
+    "player_bearoff": ("<i4", ()),
+    "opponent_bearoff": ("<i4", ()),
+}
+# Column -> the sort key of its index.
+INDEXES = {
+    "key": "position",
+    "class": "position_class",
+    "player_pips": "player_pips",
+    "opponent_pips": "opponent_pips",
+    "player_bearoff": "player_bearoff",
+    "opponent_bearoff": "opponent_bearoff",
+}
+# C(n, r) for the bear-off signature, n up to 21.
+COMBINATIONS = np.array([[comb(n, r) for r in range(7)] for n in range(22)])
+
+
+def position_keys(positions: np.ndarray) -> np.ndarray:
+    """Returns a 64-bit hash of each row of packed position bits."""
+    padded = np.zeros((len(positions), 16), dtype=np.uint8)
+    padded[:, :10] = positions
+    low, high = padded.view("<u8").T
+    with np.errstate(over="ignore"):
+        return low ^ (high * np.uint64(0x9E3779B97F4A7C15))
+
+
+def decode_checkers(positions: np.ndarray) -> np.ndarray:
+    """
+    Returns the checkers in each of GNUBG's 50 slots, for rows of packed
+    position bits: the opponent's points from its ace, its bar, then the
+    player's points from its ace and its bar.
+    """
+    rows = len(positions)
+    bits = np.unpackbits(positions, axis=1, bitorder="little").astype(bool)
+    # Each 1 is a checker in the slot numbered by the 0s before it.
+    slots = np.cumsum(~bits, axis=1)
+    row, column = np.nonzero(bits & (slots < 50))
+    counts = np.bincount(row * 50 + slots[row, column], minlength=rows * 50)
+    return counts.reshape(rows, 50)
+
+
+def bearoff_signatures(home: np.ndarray) -> np.ndarray:
+    """
+    Returns GNUBG's bear-off signature of rows of six home points, as
+    Position.classify computes it.
+    """
+    home = home.astype(np.int64)
+    j = 5 + home.sum(axis=1)
+    f_bits = np.zeros(len(home), dtype=np.int64)
+    f_bits[j < 63] = 1 << j[j < 63]
+    for x in home.T:
+        j = j - (x + 1)
+        valid = j >= 0
+        f_bits[valid] |= 1 << j[valid]
+
+    signature = np.zeros(len(home), dtype=np.int64)
+    r = np.full(len(home), 6)
+    for n in range(21, 0, -1):
+        active = r < n
+        taken = active & ((f_bits >> (n - 1)) & 1).astype(bool)
+        signature[taken] += COMBINATIONS[n - 1, r[taken]]
+        r[taken] -= 1
+    return signature
+
+
+def describe(positions: np.ndarray) -> dict:
+    """Returns the derived columns of rows of packed position bits."""
+    checkers = decode_checkers(positions)
+    opponent = checkers[:, :25]
+    player = checkers[:, 25:]
+    distance = np.arange(1, 26)
+
+    def back(side):
+        # The furthest-back occupied point, the bar being 24; -1 if none.
+        occupied = side > 0
+        return np.where(occupied.any(axis=1), 24 - occupied[:, ::-1].argmax(axis=1), -1)
+
+    def crashed(side):
+        total = side.sum(axis=1)
+        anchored = side[:, 0] > 1
+        return (
+            (total <= 6)
+            | anchored & (total - side[:, 0] <= 6)
+            | anchored & (side[:, 1] > 1) & (1 + total - side[:, 0] - side[:, 1] <= 6)
+            | ~anchored & (total - (side[:, 1] - 1) <= 6)
+        )
+
+    player_back, opponent_back = back(player), back(opponent)
+    player_home = player_back < 6
+    opponent_home = opponent_back < 6
+    player_bearoff = np.where(player_home, bearoff_signatures(player[:, :6]), -1)
+    opponent_bearoff = np.where(opponent_home, bearoff_signatures(opponent[:, :6]), -1)
+
+    position_class = np.select(
+        [
+            (player_back < 0) | (opponent_back < 0),
+            (player_back + opponent_back > 22)
+            & (crashed(player[:, :24]) | crashed(opponent[:, :24])),
+            player_back + opponent_back > 22,
+            ~(player_home & opponent_home),
+            (player_bearoff > 923) | (opponent_bearoff > 923),
+        ],
+        [OVER, CRASHED, CONTACT, RACE, BEAROFF1],
+        BEAROFF2,
+    )
+    return {
+        "position_class": position_class,
+        "player_pips": (player * distance).sum(axis=1),
+        "opponent_pips": (opponent * distance).sum(axis=1),
+        "player_bearoff": player_bearoff,
+        "opponent_bearoff": opponent_bearoff,
+    }
+
+
+def journal_games(path: str):
+    """Yields the games of a history journal, less deleted matches, for ingest()."""
+    stem = path[: -len(".pbj")] if path.endswith(".pbj") else path
+    records, refs = read_journal(stem)
+    deleted = set(records["match"][records["kind"] == DELETE_MATCH].tolist())
+    moves = records[records["kind"] == MOVE]
+    order = np.argsort(moves["match"], kind="stable")
+    moves = moves[order]
+    matches, starts = np.unique(moves["match"], return_index=True)
+    ends = np.append(starts[1:], len(moves))
+    for match, start, end in zip(matches.tolist(), starts, ends):
+        if match not in deleted:
+            yield (
+                f"{stem}:{refs[match]}",
+                moves["position"][start:end],
+                moves["match_id"][start:end],
+            )
+
+
+def match_games(matches, source: str = ""):
+    """Yields the games of (ref, states) pairs for ingest()."""
+    for ref, states in matches:
+        if len(states):
+            yield (
+                f"{source}:{ref}",
+                [list(pack_id(state[0], 10)) for state in states],
+                [list(pack_id(state[1], 9)) for state in states],
+            )
+
+
+def file_games(path: str):
+    """Yields the games of a history journal (.pbj) or a saved JSON history."""
+    if path.endswith(".pbj"):
+        yield from journal_games(path)
+        return
+    with open(path) as f:
+        matches = json.load(f).get("matches", {})
+    yield from match_games(matches.items(), path)
+
+
+class PositionArchive:
+    """
+    Args:
+        path (str): The archive's directory. It is created, empty, if it does
+            not exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"version": 1, "rows": 0, "games": []}
+        self.columns = {}
+        self.indexes = {}
+        self.load()
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.npy")
+
+    def load(self):
+        """Maps the columns and indexes on disk."""
+        if not len(self):
+            self.columns = {
+                name: np.zeros((0,) + shape, dtype)
+                for name, (dtype, shape) in COLUMNS.items()
+            }
+            self.indexes = {name: np.zeros(0, np.int64) for name in INDEXES}
+            self.sorted = {name: np.zeros(0) for name in INDEXES}
+            return
+        self.columns = {
+            name: np.load(self.file(name), mmap_mode="r") for name in COLUMNS
+        }
+        self.indexes = {
+            name: np.load(self.file(f"index_{name}"), mmap_mode="r") for name in INDEXES
+        }
+        self.sorted = {
+            name: np.load(self.file(f"sorted_{name}"), mmap_mode="r")
+            for name in INDEXES
+        }
+
+    def ingest(self, games: Iterable[Tuple[str, np.ndarray, np.ndarray]]) -> int:
+        """
+        Appends games and rebuilds the indexes.
+
+        Args:
+            games: (source, positions, match_ids) for each game, the packed
+                bits of each of its recorded states in order.
+
+        Returns:
+            int: The rows added.
+        """
+        sources = []
+        positions: List[np.ndarray] = []
+        match_ids: List[np.ndarray] = []
+        for source, game_positions, game_match_ids in games:
+            sources.append(source)
+            positions.append(np.asarray(game_positions, dtype=np.uint8))
+            match_ids.append(np.asarray(game_match_ids, dtype=np.uint8))
+        if not sources:
+            return 0
+
+        first_game = len(self.meta["games"])
+        lengths = np.array([len(p) for p in positions])
+        new = {
+            "position": np.concatenate(positions).reshape(-1, 10),
+            "match_id": np.concatenate(match_ids).reshape(-1, 9),
+            "game": np.repeat(
+                np.arange(first_game, first_game + len(sources)), lengths
+            ),
+            "move": np.arange(lengths.sum())
+            - np.repeat(np.cumsum(lengths) - lengths, lengths),
+        }
+        new.update(describe(new["position"]))
+
+        columns = {}
+        for name, (dtype, _) in COLUMNS.items():
+            columns[name] = np.concatenate(
+                [self.columns[name], new[name].astype(dtype)]
+            )
+        keys = {name: columns[column] for name, column in INDEXES.items()}
+        keys["key"] = position_keys(columns["position"])
+
+        # Drop the maps before overwriting the files under them.
+        self.columns, self.indexes, self.sorted = {}, {}, {}
+        for name, values in columns.items():
+            np.save(self.file(name), values)
+        for name, values in keys.items():
+            order = np.argsort(values, kind="stable")
+            np.save(self.file(f"index_{name}"), order)
+            np.save(self.file(f"sorted_{name}"), values[order])
+        self.meta["rows"] = len(keys["key"])
+        self.meta["games"].extend(sources)
+        with open(self.meta_path, "w") as f:
+            json.dump(self.meta, f)
+        self.load()
+        return int(lengths.sum())
+
+    def ingest_journal(self, path: str) -> int:
+        """Ingests the matches of a history journal, less deleted ones."""
+        return self.ingest(journal_games(path))
+
+    def ingest_matches(self, matches, source: str = "") -> int:
+        """
+        Ingests (ref, states) pairs, each state starting with a position ID
+        and a match ID, as in HistoryManager.matches.
+        """
+        return self.ingest(match_games(matches, source))
+
+    def ingest_file(self, path: str) -> int:
+        """Ingests a history journal (.pbj) or a saved JSON history."""
+        return self.ingest(file_games(path))
+
+    def ingest_files(self, paths: Iterable[str]) -> int:
+        """
+        Ingests the games of several files at once, so that the columns and
+        indexes are rewritten once rather than once per file.
+        """
+        return self.ingest(game for path in paths for game in file_games(path))
+
+    def lookup(self, index: str, low, high=None) -> np.ndarray:
+        """
+        Returns the rows whose key in index is between low and high,
+        inclusive, or equal to low.
+        """
+        order, values = self.indexes[index], self.sorted[index]
+        high = low if high is None else high
+        start = np.searchsorted(values, low, side="left")
+        end = np.searchsorted(values, high, side="right")
+        return np.sort(order[start:end])
+
+    def find(self, position_id: str) -> np.ndarray:
+        """Returns the rows of a position."""
+        packed = np.frombuffer(pack_id(position_id, 10), dtype=np.uint8)
+        key = position_keys(packed[None, :])[0]
+        rows = self.lookup("key", key)
+        # Keys are hashes: keep the rows that really are the position.
+        return rows[(self.columns["position"][rows] == packed).all(axis=1)]
+
+    def by_class(self, name: str) -> np.ndarray:
+        """Returns the rows of a class, one of CLASSES."""
+        return self.lookup("class", CLASSES.index(name.lower()))
+
+    def by_pips(self, low: int, high: int, side: str = "player") -> np.ndarray:
+        """Returns the rows with side's pip count between low and high."""
+        return self.lookup(f"{side}_pips", low, high)
+
+    def by_bearoff(self, signature: int, side: str = "player") -> np.ndarray:
+        """Returns the rows whose side has this bear-off signature."""
+        return self.lookup(f"{side}_bearoff", signature)
+
+    def rows(self, rows: Iterable[int]) -> List[dict]:
+        """Returns the rows as dicts, with IDs in base64."""
+        c = self.columns
+        return [
+            {
+                "position_id": unpack_id(c["position"][row].tobytes(), 14),
+                "match_id": unpack_id(c["match_id"][row].tobytes(), 12),
+                "game": self.meta["games"][c["game"][row]],
+                "move": int(c["move"][row]),
+                "class": CLASSES[c["position_class"][row]],
+                "pips": (int(c["player_pips"][row]), int(c["opponent_pips"][row])),
+                "bearoff": (
+                    int(c["player_bearoff"][row]),
+                    int(c["opponent_bearoff"][row]),
+                ),
+            }
+            for row in rows
+        ]
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Build and query a position archive")
+    COMMANDS = PARSER.add_subparsers(dest="command", required=True)
+    INGEST = COMMANDS.add_parser("ingest", help="Add journals or JSON histories")
+    INGEST.add_argument("archive")
+    INGEST.add_argument("files", nargs="+")
+    QUERY = COMMANDS.add_parser("query", help="Print the rows matching a query")
+    QUERY.add_argument("archive")
+    QUERY.add_argument("--position", "-p", help="Position ID")
+    QUERY.add_argument("--class", "-c", dest="position_class", choices=CLASSES)
+    QUERY.add_argument("--pips", help="Player pip range, e.g. 60:80")
+    QUERY.add_argument("--bearoff", type=int, help="Player bear-off signature")
+    QUERY.add_argument("--limit", "-n", type=int, default=20, help="Rows to print")
+    ARGS = PARSER.parse_args()
+
+    ARCHIVE = PositionArchive(ARGS.archive)
+    START = time.perf_counter()
+    if ARGS.command == "ingest":
+        ADDED = ARCHIVE.ingest_files(ARGS.files)
+        print(
+            f"Added {ADDED} rows in {time.perf_counter() - START:.2f}s, "
+            f"{len(ARCHIVE)} in all"
+        )
+    else:
+        RESULTS = [np.arange(len(ARCHIVE))]
+        if ARGS.position:
+            RESULTS.append(ARCHIVE.find(ARGS.position))
+        if ARGS.position_class:
+            RESULTS.append(ARCHIVE.by_class(ARGS.position_class))
+        if ARGS.pips:
+            LOW, _, HIGH = ARGS.pips.partition(":")
+            RESULTS.append(ARCHIVE.by_pips(int(LOW), int(HIGH or LOW)))
+        if ARGS.bearoff is not None:
+            RESULTS.append(ARCHIVE.by_bearoff(ARGS.bearoff))
+        FOUND = RESULTS[-1]
+        for RESULT in RESULTS[1:-1]:
+            FOUND = np.intersect1d(FOUND, RESULT, assume_unique=True)
+        ELAPSED = time.perf_counter() - START
+        for ROW in ARCHIVE.rows(FOUND[: ARGS.limit]):
+            print(json.dumps(ROW))
+        print(f"{len(FOUND)} rows in {1000 * ELAPSED:.1f}ms")
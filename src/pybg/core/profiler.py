@@ -0,0 +1,79 @@
+"""
+Opt-in wall-clock profiling for environment steps.
+
+A StepProfiler wraps chosen methods of an object (the board, the game engine,
+the opponent agent) with timers, so nothing is measured, and nothing costs,
+until it is attached. Phases nest: "step" includes the move generation and
+opponent time spent inside it, so the phases do not add up to the total.
+"""
+
+import time
+from functools import wraps
+from typing import Dict, Tuple
+
+
+class StepProfiler:
+    """Cumulative wall time and call counts per named phase."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def attach(self, obj, method_name: str, phase: str = None) -> None:
+        """
+        Replaces obj.method_name with a timed wrapper recording into phase.
+
+        Args:
+            obj: The instance to instrument; the class is left untouched.
+                Methods that are already timed, by any profiler, are left
+                alone so shared objects are not counted twice.
+            method_name: Name of the method to wrap.
+            phase: Name to record under, defaults to method_name.
+        """
+        method = getattr(obj, method_name)
+        if hasattr(method, "__profiler__"):
+            return
+
+        phase = phase or method_name
+        self.seconds.setdefault(phase, 0.0)
+        self.calls.setdefault(phase, 0)
+        seconds, calls = self.seconds, self.calls
+        clock = time.perf_counter
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds[phase] += clock() - start
+                calls[phase] += 1
+
+        timed.__profiler__ = self
+        setattr(obj, method_name, timed)
+
+    def snapshot(self) -> Dict[str, Tuple[float, int]]:
+        """Returns {phase: (seconds, calls)} as of now."""
+        return {
+            phase: (self.seconds[phase], self.calls[phase]) for phase in self.seconds
+        }
+
+    def reset(self) -> None:
+        for phase in self.seconds:
+            self.seconds[phase] = 0.0
+            self.calls[phase] = 0
+
+    def __getstate__(self):
+        # Only the numbers travel, e.g. back from a SubprocVecEnv worker.
+        return {"seconds": dict(self.seconds), "calls": dict(self.calls)}
+
+    def __str__(self):
+        lines = []
+        for phase, (seconds, calls) in sorted(
+            self.snapshot().items(), key=lambda item: -item[1][0]
+        ):
+            per_call = 1e6 * seconds / calls if calls else 0.0
+            lines.append(
+                f"{phase:<16} {seconds:10.3f}s {calls:10d} calls {per_call:10.1f}us/call"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,358 @@
+# pybg/core/shell.py
+"""
+The command shell behind the pygame window, without the window.
+
+BaseShell owns the game, the settings, the CommandRouter and its modules, and
+plays the bots' turns: all at once with play_turn(), or a step at a time
+from a frame loop with update_opponent(), which never waits for a bot. It
+draws and makes sounds only through hooks: draw() and the sound manager do
+nothing here, and show_opponent_action() only pauses when given a delay. main.GameShell fills them in with pygame;
+pybg.headless.HeadlessShell uses them as they are.
+"""
+
+import copy
+import json
+import os.path
+import time
+import traceback
+from typing import Optional
+
+from pybg.agents import HumanAgent
+from pybg.constants import DEFAULT_SETTINGS, SETTINGS_PATH
+from pybg.core.board import Board, BoardError
+from pybg.core.command_router import CommandRouter
+from pybg.core.help import Help
+from pybg.core.logger import logger
+from pybg.core.player import PlayerType
+from pybg.core.worker import BackgroundWorker
+from pybg.gnubg.cube import cube_decision
+from pybg.gnubg.match import GameState, Match
+from pybg.gnubg.opening_book import load_book
+from pybg.gnubg.position import Position
+
+
+def decide(agent, board):
+    """
+    Returns the agent's action sequence for the board's current state.
+    Agents with uses_opening_book set play the opening book's best play
+    when it has the position and roll, and agents with uses_cube_decisions
+    set double, take and drop by cube_decision(), with their own analyser,
+    or evaluator and depth, if they have one.
+    """
+    state = board.match.game_state
+    # On roll, the cube is only worth evaluating when doubling is legal.
+    if getattr(agent, "uses_cube_decisions", False) and (
+        state == GameState.DOUBLED
+        or (state == GameState.ON_ROLL and "double" in board.valid_actions())
+    ):
+        decision = cube_decision(
+            board,
+            getattr(agent, "evaluator", "pubeval"),
+            getattr(agent, "depth", 0),
+            getattr(agent, "analyser", None),
+        )
+        if state == GameState.DOUBLED:
+            return ["take" if decision.take else "drop"]
+        if decision.double:
+            return ["double"]
+
+    legal_plays = board.generate_plays()
+    if getattr(agent, "uses_opening_book", False) and legal_plays:
+        book = load_book()
+        play = book and book.best_play(board.position, board.match.dice, legal_plays)
+        if play:
+            return [("move", m.source, m.destination) for m in play.moves]
+    return agent.make_decision(
+        board.get_observation(),
+        board.action_mask(),
+        legal_plays=legal_plays,
+    )
+
+
+class SilentSoundManager:
+    """Stands in for SoundManager where there is no audio."""
+
+    def play_sound(self, action):
+        pass
+
+
+class BaseShell:
+    def __init__(self):
+        self.settings = self.load_settings()
+        self.help = Help()
+        self.router = CommandRouter(self)  # 🚀 Only now, after full initialization
+
+        self.game: Optional[Board] = None
+        self.command_buffer = ""
+        self.shell_prompt = "> "
+        self.output_text = str(self)
+        self.running = True
+
+        # Game initialization.
+        self.opponent = None
+        self.player0_agent = None
+        self.player1_agent = None
+
+        self.sound_manager = SilentSoundManager()
+
+        # Non-blocking bot turns, see update_opponent().
+        self.opponent_playing = False
+        self.opponent_steps = []
+        self.opponent_delay_timer = 0
+        self.opponent_delay = 0  # Milliseconds each step stays on screen.
+        self.bots_paused = False
+        self._opponent_game = None
+        self._worker = None
+
+    def draw(self):
+        pass
+
+    def show_opponent_action(self, delay: float = 0.0):
+        """Shows output_text after a bot's action, then waits `delay` seconds."""
+        self.draw()
+        if delay:
+            time.sleep(delay)
+
+    def quit(self):
+        self.running = False
+
+    def update_output_text(
+        self, output_message="", opponent_move_str="", show_board=True
+    ):
+        move_block = f"\n\n{opponent_move_str}" if opponent_move_str else ""
+        header = str(self) if show_board else ""
+        return header + move_block + ("\n\n" + output_message if output_message else "")
+
+    def run_command(self, command: str, suppress_board: bool = False):
+        output = self.router.handle(command)
+        self.output_text = output
+        if not suppress_board:
+            self.draw()
+        return output
+
+    def execute(self, command: str) -> str:
+        """
+        Runs a command as typed at the prompt, turning errors into messages.
+
+        Returns:
+            str: The text to show for it.
+        """
+        self.bots_paused = False
+        try:
+            output = self.run_command(command)
+            if output:
+                self.output_text = output  # Already formatted in run_command
+                self.draw()
+        except BoardError as be:
+            self.output_text = self.update_output_text(str(be))
+        except Exception as e:
+            # Log full traceback to file and also show simplified error to user
+            logger.error("Unhandled Exception:\n" + traceback.format_exc())
+            self.output_text = self.update_output_text(f"Unexpected error:\n{str(e)}")
+        return self.output_text
+
+    def load_settings(self):
+        try:
+            if os.path.exists(SETTINGS_PATH):
+                with open(SETTINGS_PATH, "r") as f:
+                    return json.load(f)
+            else:
+                return DEFAULT_SETTINGS.copy()
+        except Exception as e:
+            logger.error("Failed to load settings: %s", e)
+            return DEFAULT_SETTINGS.copy()
+
+    def save_settings(self):
+        try:
+            with open(SETTINGS_PATH, "w") as f:
+                json.dump(self.settings, f, indent=4)
+        except Exception as e:
+            logger.error("Failed to save settings: %s", e)
+
+    def load_from_history(self):
+        pos_id, match_id, message = self.history_module.get_current_state()
+
+        if not self.game:
+            return  # Avoid decoding into a None game
+
+        self.game.position = Position.decode(pos_id)
+        self.game.match = Match.decode(match_id)
+        self.output_text = self.update_output_text(
+            output_message=message, show_board=True
+        )
+        self.draw()
+
+    def log_current_state(self, message: str = ""):
+        if not hasattr(self, "history_module"):
+            return
+        self.history_module.record_move(
+            match_ref=self.current_match_ref,
+            position_id=self.game.position.encode(),
+            match_id=self.game.match.encode(),
+            message=message,
+        )
+
+    def is_viewing_latest_move(self) -> bool:
+        ref = self.current_match_ref
+        return (
+            ref in self.history_module.matches
+            and self.history_module.current_move_index
+            == len(self.history_module.matches[ref]) - 1
+        )
+
+    def guard_game(self):
+        if self.game is None:
+            raise ValueError("Start a game first with 'new'.")
+
+    def current_agent(self):
+        return (
+            self.player1_agent
+            if self.game.match.turn == PlayerType.ONE
+            else self.player0_agent
+        )
+
+    def bots_to_play(self) -> bool:
+        """Whether the side on turn is a bot with something to do."""
+        if self.game is None or self.game.match.game_state == GameState.GAME_OVER:
+            return False
+        agent = self.current_agent()
+        return agent is not None and not isinstance(agent, HumanAgent)
+
+    def play_turn(self, delay: float = 0.0):
+        # return if no game has been started
+        if not self.game:
+            return
+
+        while self.bots_to_play():
+            action_sequence = decide(self.current_agent(), self.game)
+            self.apply_opponent_actions(action_sequence, delay)
+
+    def apply_opponent_actions(self, action_sequence, delay: float = 0.0):
+        """Plays a bot's decision on the board and shows each step of it."""
+        for step in self.opponent_steps_for(action_sequence):
+            step()
+            self.show_opponent_action(delay)
+
+    def decision_key(self):
+        """Identifies the game and state a bot decision was asked for."""
+        return id(self.game), self.game.encode()
+
+    def update_opponent(self, now: int):
+        """
+        Moves the bots' turns on without blocking, for a frame loop to call
+        with the time in milliseconds.
+
+        Decisions are made on a BackgroundWorker, from a copy of the board.
+        The steps of a returned decision go on the opponent_steps queue and
+        are applied one per opponent_delay, and the next decision is asked
+        for once the last step has been shown for that long. A decision for a
+        game that has changed in the meantime, e.g. by a command, is dropped.
+        """
+        if self.opponent_playing:
+            if now - self.opponent_delay_timer < self.opponent_delay:
+                return
+            if self.opponent_steps and self.game is self._opponent_game:
+                step = self.opponent_steps.pop(0)
+                self.opponent_delay_timer = now
+                try:
+                    step()
+                except Exception as e:
+                    logger.error("Bot action failed:\n" + traceback.format_exc())
+                    self.output_text = self.update_output_text(f"Bot error:\n{e}")
+                    self.opponent_steps = []
+                    self.bots_paused = True
+                self.draw()
+                return
+            self.opponent_steps = []
+            self.opponent_playing = False
+
+        if self._worker is None:
+            self._worker = BackgroundWorker()
+        result = self._worker.poll()
+        if result is not None and self.game is not None:
+            if result.key != self.decision_key():
+                return
+            if result.error is not None:
+                logger.error("Bot decision failed: %r", result.error)
+                self.output_text = self.update_output_text(
+                    f"Bot error:\n{result.error}"
+                )
+                self.bots_paused = True
+                return
+            self.opponent_steps = self.opponent_steps_for(result.value)
+            self._opponent_game = self.game
+            self.opponent_playing = True
+            # The first step is shown straight away.
+            self.opponent_delay_timer = now - self.opponent_delay
+            return
+
+        if not self._worker.busy and not self.bots_paused and self.bots_to_play():
+            self._worker.submit(
+                self.decision_key(),
+                decide,
+                self.current_agent(),
+                copy.deepcopy(self.game),
+            )
+
+    def opponent_steps_for(self, action_sequence):
+        """
+        Splits a bot's decision into the steps shown one at a time: a whole
+        play of moves, or each other action.
+
+        Returns:
+            list: Functions that each apply a step and set output_text.
+        """
+        formatted_moves = [
+            self.format_move(a) for a in action_sequence if self.format_move(a)
+        ]
+        opponent_move_str = (
+            f"Opponent plays: {' '.join(formatted_moves)}"
+            if formatted_moves
+            else f"Opponent action: {', '.join(str(a) for a in action_sequence)}"
+        )
+
+        if __debug__ and logger.debug_enabled:
+            logger.debug(
+                "GameId: %s, Dice %s, Action sequence: %s",
+                self.game.encode(),
+                self.game.match.dice,
+                action_sequence,
+            )
+
+        def show():
+            self.log_current_state(opponent_move_str)
+            self.output_text = self.update_output_text(
+                opponent_move_str=opponent_move_str
+            )
+
+        def play_moves(move_sequence):
+            move_tuples = tuple((m[1], m[2]) for m in move_sequence)
+            logger.debug("Applying move sequence: %s", move_tuples)
+            self.game.play(move_tuples)
+            for move in move_sequence:
+                self.sound_manager.play_sound(move)
+            show()
+
+        def apply(action):
+            logger.debug("Applying action: %s", action)
+            self.game.apply_action(action)
+            self.sound_manager.play_sound(action)
+            show()
+
+        move_sequence = [
+            a for a in action_sequence if isinstance(a, tuple) and a[0] == "move"
+        ]
+        if move_sequence:
+            return [lambda: play_moves(move_sequence)]
+        return [lambda action=action: apply(action) for action in action_sequence]
+
+    @staticmethod
+    def format_move(action):
+        if isinstance(action, tuple) and action[0] == "move":
+            src = "bar" if action[1] == -1 else str(action[1] + 1)
+            dst = "off" if action[2] == -1 else str(action[2] + 1)
+            return f"{src}/{dst}"
+        return None
+
+    def __str__(self):
+        return str(self.game) if self.game else "No game started. Type `new`."
@@ -77,7 +77,7 @@ class SoundManager:
 
     def play_sound(self, action: Union[str, tuple]):
         """Plays a sound based on the action name."""
-        logger.debug(f"Sound play requested for action {action}")
+        logger.debug("Sound play requested for action %s", action)
         if isinstance(action, tuple):
             action = action[0]
 
@@ -95,7 +95,7 @@ class SoundManager:
 
         sound = sound_map.get(action)
         if sound:
-            logger.debug(f"Playing sound for {action}")
+            logger.debug("Playing sound for %s", action)
             sound.play()
 
     # def play_background_music(self):
@@ -0,0 +1,157 @@
+# pybg/core/text_renderer.py
+"""
+Draws the shell's lines of text onto a pygame surface, redrawing only what
+changed.
+
+Rendered lines are cached by their text, so a line that comes back (a row of
+the board, the prompt) is blitted from the cache instead of going through
+font.render again. Each row remembers the text it last showed, and only the
+rows whose text changed are cleared and blitted. render() returns the dirty
+rectangles, for pygame.display.update(), and an empty list when nothing
+changed, so an idle window does no drawing at all.
+
+FrameTimer keeps the time spent drawing, so the saving can be seen: average
+and worst draw time, and how many frames had nothing to draw.
+"""
+
+import time
+from collections import OrderedDict
+
+import pygame
+
+LINE_CACHE_SIZE = 256
+
+
+class TextRenderer:
+    """
+    Args:
+        font (pygame.font.Font): The font to render with.
+        color (tuple): Text colour.
+        background (tuple): Colour rows are cleared to.
+        line_height (int): Pixels from one row to the next.
+        cache_size (int): Rendered lines kept, least recently used dropped
+            first.
+    """
+
+    def __init__(
+        self,
+        font,
+        color=(255, 255, 255),
+        background=(0, 0, 0),
+        line_height=20,
+        cache_size=LINE_CACHE_SIZE,
+    ):
+        self.font = font
+        self.color = color
+        self.background = background
+        self.line_height = line_height
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # (x, y) of each row drawn -> the text it shows.
+        self.rows = {}
+        self.size = None
+
+    def line_surface(self, text: str) -> pygame.Surface:
+        """Returns the rendered line, from the cache when it has it."""
+        surface = self.cache.get(text)
+        if surface is not None:
+            self.cache.move_to_end(text)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.font.render(text, True, self.color, self.background)
+        self.cache[text] = surface
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return surface
+
+    def invalidate(self):
+        """Forgets what is on screen, so the next render draws everything."""
+        self.rows = {}
+        self.size = None
+
+    def render(self, surface, blocks):
+        """
+        Brings the text on surface up to date.
+
+        Args:
+            surface (pygame.Surface): Where to draw, usually the display.
+            blocks (list): (x, y, lines) for each block of text, drawn from
+                (x, y) down, one row per line.
+
+        Returns:
+            list: The pygame.Rect areas that changed.
+        """
+        if surface.get_size() != self.size:
+            self.size = surface.get_size()
+            self.rows = {}
+            surface.fill(self.background)
+            full = [surface.get_rect()]
+        else:
+            full = None
+
+        width = self.size[0]
+        wanted = {}
+        for x, y, lines in blocks:
+            for i, line in enumerate(lines):
+                wanted[(x, y + i * self.line_height)] = line
+
+        dirty = []
+        # Rows that are no longer shown, and rows whose text changed.
+        for (x, y), text in self.rows.items():
+            if wanted.get((x, y)) != text:
+                rect = pygame.Rect(x, y, width - x, self.line_height)
+                surface.fill(self.background, rect)
+                dirty.append(rect)
+        for (x, y), text in wanted.items():
+            if self.rows.get((x, y)) != text:
+                if text:
+                    surface.blit(self.line_surface(text), (x, y))
+                if (x, y) not in self.rows:
+                    dirty.append(pygame.Rect(x, y, width - x, self.line_height))
+        self.rows = wanted
+
+        return full or dirty
+
+
+class FrameTimer:
+    """Times each draw and counts the frames that had nothing to draw."""
+
+    def __init__(self):
+        self.frames = 0
+        self.idle_frames = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self._start = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self, drew: bool):
+        elapsed = time.perf_counter() - self._start
+        self.frames += 1
+        self.total += elapsed
+        self.worst = max(self.worst, elapsed)
+        if not drew:
+            self.idle_frames += 1
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: frames, idle_frames, mean_ms and worst_ms of draw time.
+        """
+        return {
+            "frames": self.frames,
+            "idle_frames": self.idle_frames,
+            "mean_ms": 1000 * self.total / self.frames if self.frames else 0.0,
+            "worst_ms": 1000 * self.worst,
+        }
+
+    def __str__(self):
+        stats = self.stats()
+        return (
+            f"{stats['frames']} frames, {stats['idle_frames']} idle, "
+            f"draw {stats['mean_ms']:.3f}ms mean, {stats['worst_ms']:.3f}ms worst"
+        )
@@ -0,0 +1,67 @@
+# pybg/core/worker.py
+"""
+Runs slow calls, like a bot's decision, off the GUI thread.
+
+A BackgroundWorker has one daemon thread and takes one job at a time: the
+caller submits a function with a key, carries on with its frames, and polls
+for the result. The key comes back with it, so a result for a game that has
+since changed can be recognised and dropped.
+
+Agents that spend their time in numpy or torch release the GIL while they
+think; pure-Python ones still share the interpreter with the event loop, but
+the loop keeps getting its turns between their bytecodes.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, NamedTuple, Optional
+
+
+class Result(NamedTuple):
+    key: Any
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+class BackgroundWorker:
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self.pending = None  # Key of the job in progress, if any.
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self) -> bool:
+        return self.pending is not None
+
+    def submit(self, key, function: Callable, *args):
+        """Queues function(*args). Raises RuntimeError if a job is running."""
+        if self.busy:
+            raise RuntimeError("The worker is still busy")
+        self.pending = key
+        self._jobs.put((key, function, args))
+
+    def poll(self) -> Optional[Result]:
+        """Returns the finished job's Result, or None if it is not done."""
+        try:
+            result = self._results.get_nowait()
+        except queue.Empty:
+            return None
+        self.pending = None
+        return result
+
+    def stop(self):
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            key, function, args = job
+            try:
+                self._results.put(Result(key, function(*args)))
+            except Exception as e:
+                self._results.put(Result(key, error=e))
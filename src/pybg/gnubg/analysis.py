@@ -0,0 +1,482 @@
+"""
+Batch analysis of positions given by GNUBG position and match IDs.
+
+An Analyser evaluates positions to a depth in plies with one of EVALUATORS:
+
+    pubeval      Tesauro's pubeval, which only estimates the chance of winning
+    gnubg        the contact, crashed and race networks of a GNUBG weights
+                 file, such as one td_train exports
+    hypergammon  the exact values of pybg.gnubg.hypergammon's solved table,
+                 for hypergammon positions only
+
+At depth 0 a position is evaluated statically. At depth n its value is the
+average over the 21 rolls of the value, at depth n - 1, of the play the side
+on roll would choose, the positions a roll's plays leave being evaluated in
+one batch. Values are the five GNUBG outputs for the side on roll (win, win
+gammon, win backgammon, lose gammon, lose backgammon) and their cubeless
+equity. When the match ID has the dice rolled, the roll's plays are ranked by
+the value of the position each leaves, and the best one's value is reported.
+When it has not, the cube decision of pybg.gnubg.cube is reported too.
+
+Run as a script, it reads "position_id:match_id" lines from files, or stdin,
+and writes a JSON line or CSV row per position as soon as it and the lines
+before it are done. Lines are analysed in chunks, each evaluated as one
+batch, across a process pool with a bounded number of chunks in flight, so
+input of any length streams through in constant memory. Progress and positions per second go to stderr.
+
+    python -m pybg.gnubg.analysis positions.txt --depth 1 --workers 8 -o out.jsonl
+    python -m pybg.gnubg.analysis -e gnubg --weights td.weights -f csv < ids.txt
+"""
+
+import argparse
+import csv
+import fileinput
+import itertools
+import json
+import multiprocessing as mp
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from pybg.core.helpers import format_move
+from pybg.core.logger import strip_debug
+from pybg.core.moves import CHECKERS, generate_plays
+from pybg.gnubg.cube import cube_efficiency, cube_info, decide_cube
+from pybg.gnubg.hypergammon import TABLE_FILE, load_table
+from pybg.gnubg.match import Match
+from pybg.gnubg.neural_net import (
+    WEIGHTS_FILE,
+    GnubgEvaluator,
+    classify_boards,
+    encode_arrays,
+    encode_boards,
+    equity,
+    network_keys,
+    outcome,
+)
+from pybg.gnubg.position import Position
+from pybg.gnubg.pub_eval import pubeval_to_win_probability, pubeval_x
+
+EVALUATORS = ("pubeval", "gnubg", "hypergammon")
+FORMATS = ("jsonl", "csv")
+OUTPUTS = ("win", "win_gammon", "win_backgammon", "lose_gammon", "lose_backgammon")
+
+ROLLS = [(d1, d2) for d1 in range(1, 7) for d2 in range(d1, 7)]
+ROLL_WEIGHTS = [(1 if d1 == d2 else 2) / 36 for d1, d2 in ROLLS]
+
+
+def flip(outputs):
+    """Returns numpy (..., 5) outputs from the other side's point of view."""
+    flipped = outputs[..., [0, 3, 4, 1, 2]]
+    flipped[..., 0] = 1 - flipped[..., 0]
+    return flipped
+
+
+def finished(position):
+    """Returns the outputs for the side on roll if the game is over, else None."""
+    if position.opponent_off == CHECKERS:
+        return flip(outcome(position.swap_players()))
+    if position.player_off == CHECKERS:
+        return outcome(position)
+    return None
+
+
+class NetworkEvaluator:
+    """
+    The contact, crashed and race networks of a GNUBG weights file. Bearoff
+    positions use the race network.
+    """
+
+    def __init__(self, weights_file=WEIGHTS_FILE):
+        networks = GnubgEvaluator(weights_file).load_all_networks()
+        self.networks = {
+            key: networks[key] for key in ("contact_contact250", "crashed", "race")
+        }
+        self.inputs = max(net.cInput for net in self.networks.values())
+
+    def evaluate(self, positions):
+        """Returns the (N, 5) outputs of unfinished positions for their side on roll."""
+        features = encode_boards(positions, self.inputs)
+        return self.evaluate_features(features, np.array(network_keys(positions)))
+
+    def evaluate_arrays(self, board, bars_offs):
+        """evaluate for positions held in arrays, as encode_arrays takes them."""
+        contact, crashed = classify_boards(board)
+        keys = np.where(
+            crashed, "crashed", np.where(contact, "contact_contact250", "race")
+        )
+        return self.evaluate_features(
+            encode_arrays(board, bars_offs, self.inputs), keys
+        )
+
+    def evaluate_features(self, features, keys):
+        outputs = np.zeros((len(features), len(OUTPUTS)))
+        for key, net in self.networks.items():
+            rows = keys == key
+            if rows.any():
+                outputs[rows] = net.evaluate(features[rows, : net.cInput])
+        return outputs
+
+
+class PubevalEvaluator:
+    """Tesauro's pubeval. Its gammon outputs are always 0."""
+
+    def evaluate(self, positions):
+        outputs = np.zeros((len(positions), len(OUTPUTS)))
+        races = [key == "race" for key in network_keys(positions)]
+        for i, (position, race) in enumerate(zip(positions, races)):
+            # pubeval rates a position for the side that has just moved to
+            # it, which here is the opponent.
+            score = pubeval_x(race, position.swap_players().to_array())
+            outputs[i, 0] = 1 - pubeval_to_win_probability(score)
+        return outputs
+
+
+class HypergammonEvaluator:
+    """Looks hypergammon positions up in the solved table."""
+
+    def __init__(self, table_file=TABLE_FILE):
+        self.table = load_table(table_file)
+        if self.table is None:
+            raise ValueError(f"No hypergammon table at {table_file}")
+
+    def evaluate(self, positions):
+        outputs = np.zeros((len(positions), len(OUTPUTS)))
+        for i, position in enumerate(positions):
+            values = self.table.outputs(position)
+            if values is None:
+                raise ValueError(f"Not a hypergammon position: {position.encode()}")
+            outputs[i] = values
+        return outputs
+
+
+def make_evaluator(name, weights_file=None):
+    """Builds one of EVALUATORS. weights_file is the table of hypergammon."""
+    if name == "gnubg":
+        return NetworkEvaluator(weights_file or WEIGHTS_FILE)
+    if name == "pubeval":
+        return PubevalEvaluator()
+    if name == "hypergammon":
+        return HypergammonEvaluator(weights_file or TABLE_FILE)
+    raise ValueError(f"Unknown evaluator: {name}")
+
+
+class Analyser:
+    """
+    Args:
+        evaluator (str): One of EVALUATORS.
+        depth (int): Plies to look ahead, 0 to evaluate statically.
+        plays (int): Plays to list, best first, when the dice are rolled.
+        weights_file (str): Networks of the gnubg evaluator.
+    """
+
+    def __init__(self, evaluator="pubeval", depth=0, plays=5, weights_file=None):
+        self.name = evaluator
+        self.evaluator = make_evaluator(evaluator, weights_file)
+        self.depth = depth
+        self.plays = plays
+
+    def values(self, positions, depth):
+        """Returns the (N, 5) outputs of positions at depth for their side on roll."""
+        outputs = np.zeros((len(positions), len(OUTPUTS)))
+        pending = []
+        for i, position in enumerate(positions):
+            result = finished(position)
+            if result is None:
+                pending.append(i)
+            else:
+                outputs[i] = result
+        if not pending:
+            return outputs
+        if depth == 0:
+            outputs[pending] = self.evaluator.evaluate([positions[i] for i in pending])
+            return outputs
+
+        # (row, weight, first child, end of children) for each roll.
+        rolls, children = [], []
+        for i in pending:
+            for roll, weight in zip(ROLLS, ROLL_WEIGHTS):
+                plays = generate_plays(positions[i], roll)
+                after = [play.position for play in plays] or [positions[i]]
+                rolls.append((i, weight, len(children), len(children) + len(after)))
+                children.extend(position.swap_players() for position in after)
+
+        # The children are evaluated for the opponent, who is on roll in them.
+        values = flip(self.values(children, depth - 1))
+        equities = equity(values)
+        for i, weight, start, end in rolls:
+            outputs[i] += weight * values[start + int(np.argmax(equities[start:end]))]
+        return outputs
+
+    def play_values(self, plays, depth=None):
+        """
+        Returns the (N, 5) outputs of the positions plays leave for the side
+        that played them, evaluated together at depth.
+        """
+        depth = self.depth if depth is None else depth
+        after = [play.position.swap_players() for play in plays]
+        return flip(self.values(after, depth))
+
+    def analyse(self, position_id, match_id=""):
+        """
+        Returns the analysis of a position as a dict of its IDs, the outputs
+        and equity for the side on roll and, if the dice are rolled, the best
+        plays.
+        """
+        return self.analyse_many([(position_id, match_id)])[0]
+
+    def analyse_many(self, ids, depth=None):
+        """
+        Analyses (position_id, match_id) pairs, evaluating the positions of
+        them all in one batch. A pair that cannot be decoded gets a result
+        with an "error" instead.
+
+        Args:
+            ids: (position_id, match_id) pairs. The match ID may be "".
+            depth (int): Plies to look ahead, the analyser's depth if None.
+
+        Returns:
+            list: A result dict per pair, as analyse() returns.
+        """
+        depth = self.depth if depth is None else depth
+        results, jobs, positions = [], [], []
+        for position_id, match_id in ids:
+            try:
+                position = Position.decode(position_id)
+                match = Match.decode(match_id) if match_id else None
+                dice = match.dice if match else (0, 0)
+                # Rolled dice are analysed through the positions the plays
+                # leave, with the opponent on roll.
+                plays = None if 0 in dice else generate_plays(position, dice)
+            except Exception as e:
+                results.append(
+                    {"position_id": position_id, "match_id": match_id, "error": str(e)}
+                )
+                jobs.append(None)
+                continue
+            if plays is None:
+                after = [position]
+            else:
+                after = [p.position.swap_players() for p in plays]
+                after = after or [position.swap_players()]
+            jobs.append((match, plays, len(positions), len(positions) + len(after)))
+            positions.extend(after)
+            results.append(
+                {
+                    "position_id": position_id,
+                    "match_id": match_id,
+                    "evaluator": self.name,
+                    "depth": depth,
+                    "dice": list(dice),
+                }
+            )
+
+        values = self.values(positions, depth)
+        for result, job in zip(results, jobs):
+            if job is None:
+                continue
+            match, plays, start, end = job
+            if plays is None:
+                outputs = values[start]
+                if match is not None:
+                    decision = decide_cube(
+                        outputs, cube_info(match), cube_efficiency(positions[start])
+                    )
+                    result["cube"] = {
+                        "action": decision.action,
+                        "no_double": round(decision.no_double, 6),
+                        "double_take": round(decision.double_take, 6),
+                        "double_pass": round(decision.double_pass, 6),
+                    }
+            else:
+                play_values = flip(values[start:end])
+                equities = equity(play_values)
+                order = np.argsort(-equities, kind="stable")
+                outputs = play_values[order[0]]
+                result["plays"] = [
+                    {
+                        "play": " ".join(format_move(move) for move in plays[i].moves),
+                        "equity": round(float(equities[i]), 6),
+                        **dict(zip(OUTPUTS, np.round(play_values[i], 6).tolist())),
+                    }
+                    for i in order[: self.plays]
+                    if plays
+                ]
+            result["equity"] = round(float(equity(outputs)), 6)
+            result.update(zip(OUTPUTS, np.round(outputs, 6).tolist()))
+        return results
+
+    def analyse_lines(self, lines):
+        """Analyses "position_id:match_id" lines, as analyse_many()."""
+        return self.analyse_many(
+            [tuple(line.strip().partition(":")[::2]) for line in lines]
+        )
+
+
+_WORKER = {}
+
+
+def init_worker(evaluator, depth, plays, weights_file):
+    _WORKER["analyser"] = Analyser(evaluator, depth, plays, weights_file)
+
+
+def run_chunk(lines):
+    return _WORKER["analyser"].analyse_lines(lines)
+
+
+def run_batch(ids, depth=None):
+    return _WORKER["analyser"].analyse_many(ids, depth)
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, result):
+        self.stream.write(json.dumps(result) + "\n")
+
+
+class CsvWriter:
+    """Writes a row per position, with its best play when the dice are rolled."""
+
+    FIELDS = (
+        ("position_id", "match_id", "evaluator", "depth", "dice", "equity")
+        + OUTPUTS
+        + ("best_play", "error")
+    )
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, self.FIELDS, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, result):
+        row = dict(result)
+        if "dice" in row:
+            row["dice"] = "".join(map(str, row["dice"]))
+        if row.get("plays"):
+            row["best_play"] = row["plays"][0]["play"]
+        self.writer.writerow(row)
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}
+
+
+def analyse_stream(
+    lines,
+    writer,
+    evaluator="pubeval",
+    depth=0,
+    plays=5,
+    weights_file=None,
+    workers=0,
+    chunk_size=16,
+    in_flight=0,
+    verbose=0,
+):
+    """
+    Analyses "position_id:match_id" lines and writes the results in order.
+
+    Args:
+        lines: Iterable of lines. Blank lines and lines starting with # are
+            skipped.
+        writer: A WRITERS object. Its stream is flushed after every chunk.
+        workers (int): Processes to analyse in, 0 to analyse in this one.
+        chunk_size (int): Lines sent to a worker at a time.
+        in_flight (int): Chunks submitted and not yet written before reading
+            more input, by default 2 per worker.
+        verbose (int): Print progress to stderr every `verbose` positions.
+
+    Returns:
+        int: The positions analysed.
+    """
+    lines = (line for line in lines if line.strip() and not line.startswith("#"))
+    chunks = iter(lambda: list(itertools.islice(lines, chunk_size)), [])
+    initargs = (evaluator, depth, plays, weights_file)
+    start = time.perf_counter()
+    done = 0
+
+    def write(results):
+        nonlocal done
+        for result in results:
+            writer.write(result)
+        writer.stream.flush()
+        before, done = done, done + len(results)
+        if verbose and done // verbose > before // verbose:
+            rate = done / (time.perf_counter() - start)
+            print(f"{done} positions, {rate:.1f}/sec", file=sys.stderr)
+
+    if not workers:
+        init_worker(*initargs)
+        for chunk in chunks:
+            write(run_chunk(chunk))
+        return done
+
+    in_flight = in_flight or 2 * workers
+    with mp.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(run_chunk, (chunk,)))
+            if len(pending) >= in_flight:
+                write(pending.popleft().get())
+        while pending:
+            write(pending.popleft().get())
+    return done
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(
+        description='Analyse "position_id:match_id" lines from files or stdin'
+    )
+    PARSER.add_argument("inputs", nargs="*", help="Files to read, stdin if none")
+    PARSER.add_argument("--evaluator", "-e", default="pubeval", choices=EVALUATORS)
+    PARSER.add_argument(
+        "--depth", "-d", default=0, type=int, help="Plies, 0 for static evaluation"
+    )
+    PARSER.add_argument(
+        "--plays", "-p", default=5, type=int, help="Plays listed when dice are rolled"
+    )
+    PARSER.add_argument(
+        "--weights",
+        default=None,
+        help="Optional: weights file for gnubg, or table for hypergammon",
+    )
+    PARSER.add_argument("--format", "-f", default="jsonl", choices=FORMATS)
+    PARSER.add_argument(
+        "--output", "-o", default=None, help="Optional: results file, stdout if none"
+    )
+    PARSER.add_argument("--workers", "-w", default=0, type=int)
+    PARSER.add_argument("--chunk_size", "-c", default=16, type=int)
+    PARSER.add_argument(
+        "--in_flight", default=0, type=int, help="Chunks queued, 2 per worker if 0"
+    )
+    PARSER.add_argument("--verbose", "-v", default=0, type=int)
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    OUTPUT = open(ARGS.output, "w", newline="") if ARGS.output else sys.stdout
+    START = time.perf_counter()
+    try:
+        with fileinput.input(ARGS.inputs) as LINES:
+            COUNT = analyse_stream(
+                LINES,
+                WRITERS[ARGS.format](OUTPUT),
+                evaluator=ARGS.evaluator,
+                depth=ARGS.depth,
+                plays=ARGS.plays,
+                weights_file=ARGS.weights,
+                workers=ARGS.workers,
+                chunk_size=ARGS.chunk_size,
+                in_flight=ARGS.in_flight,
+                verbose=ARGS.verbose,
+            )
+    finally:
+        if ARGS.output:
+            OUTPUT.close()
+    ELAPSED = time.perf_counter() - START
+    print(
+        f"{COUNT} positions in {ELAPSED:.1f}s, {COUNT / ELAPSED:.1f}/sec",
+        file=sys.stderr,
+    )
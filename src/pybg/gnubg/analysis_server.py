@@ -0,0 +1,429 @@
+"""
+A local HTTP/JSON service for position analysis.
+
+Built on asyncio's streams, with nothing beyond the standard library and the
+engine. It serves:
+
+    GET  /analyse?position_id=...&match_id=...&depth=0
+    POST /analyse   {"position_id": ..., "match_id": ..., "depth": 0}
+    POST /analyse   {"positions": ["position_id:match_id", ...], "depth": 0}
+    GET  /stats
+
+A single position is answered with one result, as Analyser.analyse returns
+it, and a "positions" list, whose entries may also be objects with
+position_id and match_id, with {"results": [...]}. Position IDs contain "+",
+which is taken literally in query strings.
+
+Depth 0 requests go into a queue. One task takes whatever is waiting, up to
+max_batch after waiting max_wait for company, and evaluates it as one batch
+on a thread, so concurrent requests share the evaluator's calls. Deeper
+requests are sent one each to a process pool. Results are cached by position
+ID, dice and depth and, for the cube decision of an unrolled position, the
+cube and score of the match ID: the only parts of the IDs an analysis
+depends on. Identical requests in flight share one evaluation. /stats reports request
+counts, cache hits, batch sizes, latency percentiles and throughput.
+
+    python -m pybg.gnubg.analysis_server --port 8780 --workers 4
+    curl -d '{"position_id": "4HPwATDgc/ABMA"}' localhost:8780/analyse
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from pybg.core.logger import logger, strip_debug
+from pybg.gnubg.analysis import EVALUATORS, Analyser, init_worker, run_batch
+from pybg.gnubg.cube import cube_info
+from pybg.gnubg.match import Match
+
+HOST = "127.0.0.1"
+PORT = 8780
+# Largest request body accepted, in bytes.
+MAX_BODY = 1 << 20
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Metrics:
+    """
+    Counters and the latencies of the last `window` requests.
+
+    Args:
+        window (int): Latencies kept for the percentiles.
+    """
+
+    def __init__(self, window: int = 10000):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.positions = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.shared = 0
+        self.batches = 0
+        self.batched_positions = 0
+        self.deep = 0
+        self.latencies = deque(maxlen=window)
+        # (time, positions) of recent requests, for the current rate.
+        self.recent = deque(maxlen=window)
+
+    def record(self, positions: int, seconds: float):
+        self.requests += 1
+        self.positions += positions
+        self.latencies.append(seconds)
+        self.recent.append((time.monotonic(), positions))
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        uptime = now - self.started
+        latencies = np.array(self.latencies) * 1000
+        last_minute = sum(n for t, n in self.recent if now - t <= 60)
+        percentiles = (
+            dict(zip(("p50", "p95", "p99"), np.percentile(latencies, [50, 95, 99])))
+            if len(latencies)
+            else {}
+        )
+        return {
+            "uptime": round(uptime, 1),
+            "requests": self.requests,
+            "positions": self.positions,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "shared_in_flight": self.shared,
+            "batches": self.batches,
+            "mean_batch": round(self.batched_positions / max(self.batches, 1), 2),
+            "deep_analyses": self.deep,
+            "latency_ms": {key: round(value, 3) for key, value in percentiles.items()},
+            "positions_per_sec": round(self.positions / max(uptime, 1e-9), 1),
+            "positions_per_sec_last_minute": round(last_minute / min(uptime, 60), 1),
+        }
+
+
+class AnalysisServer:
+    """
+    Args:
+        evaluator (str): One of EVALUATORS.
+        weights_file (str): Networks of the gnubg evaluator.
+        plays (int): Plays listed when the dice are rolled.
+        max_batch (int): Depth 0 positions evaluated in one batch at most.
+        max_wait (float): Seconds a batch waits for more requests.
+        workers (int): Processes for deeper analyses, 0 to run them on the
+            batching thread.
+        max_depth (int): Deepest analysis accepted.
+        cache_size (int): Results kept, least recently used dropped first.
+    """
+
+    def __init__(
+        self,
+        evaluator="pubeval",
+        weights_file=None,
+        plays=5,
+        max_batch=64,
+        max_wait=0.002,
+        workers=2,
+        max_depth=2,
+        cache_size=100000,
+    ):
+        self.analyser = Analyser(evaluator, 0, plays, weights_file)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_depth = max_depth
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.metrics = Metrics()
+
+        self._thread = ThreadPoolExecutor(1)
+        self._pool = (
+            ProcessPoolExecutor(
+                workers,
+                initializer=init_worker,
+                initargs=(evaluator, 0, plays, weights_file),
+            )
+            if workers
+            else None
+        )
+        self._queue = None
+        self._batcher = None
+        self._tasks = set()
+        self._server = None
+
+    async def start(self, host=HOST, port=PORT):
+        """Starts batching and listening. Returns the asyncio Server."""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher:
+            self._batcher.cancel()
+        self._thread.shutdown(wait=False)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def analyse(self, position_id: str, match_id: str = "", depth: int = 0):
+        """Returns the analysis of a position, from the cache if it is there."""
+        try:
+            match = Match.decode(match_id) if match_id else None
+        except Exception as e:
+            self.metrics.errors += 1
+            return {"position_id": position_id, "match_id": match_id, "error": str(e)}
+
+        dice = match.dice if match else (0, 0)
+        # Unrolled positions of a match also get a cube decision.
+        cube = cube_info(match) if match and 0 in dice else None
+        key = (position_id, dice, depth, cube)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.metrics.cache_hits += 1
+            result = self.cache[key]
+        else:
+            future = self.pending.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self.pending[key] = future
+                if depth == 0:
+                    self._queue.put_nowait((key, position_id, match_id))
+                else:
+                    task = asyncio.create_task(
+                        self._run_deep(key, position_id, match_id, depth)
+                    )
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            else:
+                self.metrics.shared += 1
+            result = await asyncio.shield(future)
+        if "error" in result:
+            self.metrics.errors += 1
+        return {**result, "match_id": match_id}
+
+    def _finish(self, key, result=None, error=None):
+        """Caches a result and hands it, or the error, to its requests."""
+        if error is None and "error" not in result:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        future = self.pending.pop(key)
+        if not future.done():
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            ids = [(position_id, match_id) for _, position_id, match_id in batch]
+            try:
+                results = await loop.run_in_executor(
+                    self._thread, self.analyser.analyse_many, ids
+                )
+            except Exception as e:
+                logger.exception("Analysis batch failed")
+                for key, _, _ in batch:
+                    self._finish(key, error=e)
+                continue
+            self.metrics.batches += 1
+            self.metrics.batched_positions += len(batch)
+            for (key, _, _), result in zip(batch, results):
+                self._finish(key, result)
+
+    async def _run_deep(self, key, position_id, match_id, depth):
+        self.metrics.deep += 1
+        if self._pool:
+            executor, function = self._pool, run_batch
+        else:
+            executor, function = self._thread, self.analyser.analyse_many
+        try:
+            (result,) = await asyncio.get_running_loop().run_in_executor(
+                executor, function, [(position_id, match_id)], depth
+            )
+        except Exception as e:
+            logger.exception("Deep analysis failed")
+            self._finish(key, error=e)
+        else:
+            self._finish(key, result)
+
+    async def handle_request(self, method: str, target: str, body: bytes):
+        """Returns the JSON response of a request, or raises RequestError."""
+        url = urlsplit(target)
+        if url.path == "/stats":
+            if method != "GET":
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+            return {**self.metrics.snapshot(), "cache_size": len(self.cache)}
+        if url.path != "/analyse":
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
+
+        if method == "GET":
+            # Position IDs are base64, so "+" is a plus and not a space.
+            request = dict(parse_qsl(url.query.replace("+", "%2B")))
+        elif method == "POST":
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+            if not isinstance(request, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+        else:
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET or POST")
+
+        try:
+            depth = int(request.get("depth", 0))
+        except (TypeError, ValueError):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "depth must be an integer")
+        if not 0 <= depth <= self.max_depth:
+            raise RequestError(
+                HTTPStatus.BAD_REQUEST, f"depth must be from 0 to {self.max_depth}"
+            )
+
+        start = time.perf_counter()
+        if "positions" in request:
+            ids = [parse_position(entry) for entry in request["positions"]]
+            results = await asyncio.gather(
+                *(self.analyse(*position, depth) for position in ids)
+            )
+            response = {"results": results}
+        elif "position_id" in request:
+            ids = [parse_position(request)]
+            response = await self.analyse(*ids[0], depth)
+        else:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Give position_id or positions")
+        self.metrics.record(len(ids), time.perf_counter() - start)
+        return response
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves the requests of one connection, keeping it alive between them."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                try:
+                    if length > MAX_BODY:
+                        raise RequestError(
+                            HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large"
+                        )
+                    body = await reader.readexactly(length) if length else b""
+                    status = HTTPStatus.OK
+                    response = await self.handle_request(method, target, body)
+                except RequestError as e:
+                    status, response = e.status, {"error": str(e)}
+                except Exception as e:
+                    logger.exception("Request failed")
+                    status = HTTPStatus.INTERNAL_SERVER_ERROR
+                    response = {"error": str(e)}
+
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version == "HTTP/1.1"
+                    and status != HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+                )
+                data = json.dumps(response).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def parse_position(entry):
+    """Returns (position_id, match_id) of "position_id:match_id" or an object."""
+    if isinstance(entry, str):
+        position_id, _, match_id = entry.strip().partition(":")
+        return position_id, match_id
+    if isinstance(entry, dict) and "position_id" in entry:
+        return str(entry["position_id"]), str(entry.get("match_id") or "")
+    raise RequestError(HTTPStatus.BAD_REQUEST, f"Not a position: {entry!r}")
+
+
+async def serve(host, port, **kwargs):
+    server = AnalysisServer(**kwargs)
+    listening = await server.start(host, port)
+    address = listening.sockets[0].getsockname()
+    print(f"Serving analyses on http://{address[0]}:{address[1]}")
+    try:
+        await listening.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Serve position analyses over HTTP")
+    PARSER.add_argument("--host", default=HOST, help="Address to listen on")
+    PARSER.add_argument("--port", "-p", default=PORT, type=int)
+    PARSER.add_argument("--evaluator", "-e", default="pubeval", choices=EVALUATORS)
+    PARSER.add_argument(
+        "--weights", default=None, help="Optional: weights file for gnubg"
+    )
+    PARSER.add_argument("--plays", default=5, type=int)
+    PARSER.add_argument("--max_batch", default=64, type=int)
+    PARSER.add_argument(
+        "--max_wait", default=0.002, type=float, help="Seconds a batch waits"
+    )
+    PARSER.add_argument(
+        "--workers", "-w", default=2, type=int, help="Processes for depth > 0"
+    )
+    PARSER.add_argument("--max_depth", default=2, type=int)
+    PARSER.add_argument("--cache_size", default=100000, type=int)
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    try:
+        asyncio.run(
+            serve(
+                ARGS.host,
+                ARGS.port,
+                evaluator=ARGS.evaluator,
+                weights_file=ARGS.weights,
+                plays=ARGS.plays,
+                max_batch=ARGS.max_batch,
+                max_wait=ARGS.max_wait,
+                workers=ARGS.workers,
+                max_depth=ARGS.max_depth,
+                cache_size=ARGS.cache_size,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
@@ -113,7 +113,7 @@ class _BearoffReader:
     def evaluate_position(self, position: Position) -> dict:
         pos_id = position.encode()
         if pos_id in self.cache:
-            logger.debug(f"Cache hit for position {pos_id}")
+            logger.debug("Cache hit for position %s", pos_id)
             return self.cache[pos_id]
 
         board_opp, board_player = position.to_board_array()
@@ -0,0 +1,382 @@
+"""
+Cube decisions from the five network outputs.
+
+The outputs (win, win gammon, win backgammon, lose gammon, lose backgammon)
+of the side on roll only value the game with a dead cube. Rick Janowski's
+model turns them into cubeful equities: with a fully live cube the equity
+is linear in the chance of winning between the points where the cube turns
+(the take and cash points), and the real cube sits between the two, its
+efficiency x weighting the live equity against the dead one:
+
+    cubeful = x * live + (1 - x) * dead
+
+Money games are valued in points per cube as Janowski gives them. Matches
+are valued in match winning chances (MWC), the outcomes of the game being
+looked up in a match equity table (MET) and the take and cash points being
+those of the MET after the double. The MET is computed from a gammon rate
+for every score up to a length, for the Crawford game and post-Crawford
+games too, and cached:
+
+    pre[i, j]   MWC needing i points against j, pre-Crawford, row or
+                column 1 being the Crawford game
+    post[j]     MWC of the side 1-away against j, post-Crawford, where the
+                trailer doubles at once
+
+cube_decision(board) evaluates the board's position and decides whether the
+side on roll should double and its opponent take. decide_cube() does the same
+for outputs already evaluated, as batch analysis has them.
+
+    python -m pybg.gnubg.cube 4HPwATDgc/ABMA cAgAAAAAAAAA --depth 1
+"""
+
+import argparse
+import functools
+from typing import NamedTuple
+
+import numpy as np
+
+from pybg.core.logger import strip_debug
+from pybg.core.player import PlayerType
+from pybg.gnubg.match import GameState, Match
+from pybg.gnubg.neural_net import equity
+from pybg.gnubg.position import Position, PositionClass
+
+# Matches up to this length share one cached table.
+MET_LENGTH = 25
+# Shares of the games won that are gammons or backgammons, and backgammons.
+GAMMON_RATE = 0.26
+BACKGAMMON_RATE = 0.02
+# Cube efficiency of contact positions. Races get one from their length.
+CUBE_EFFICIENCY = 0.68
+
+# Cube ownership from the point of view of the side on roll.
+CENTERED, OWNED, UNAVAILABLE = 0, 1, 2
+
+EPSILON = 1e-7
+
+
+class MatchEquityTable(NamedTuple):
+    pre: np.ndarray
+    post: np.ndarray
+
+    def mwc(self, away: int, opponent_away: int, post_crawford=False) -> float:
+        """Returns the MWC of the side needing away points against opponent_away."""
+        if away <= 0:
+            return 1.0
+        if opponent_away <= 0:
+            return 0.0
+        if post_crawford and away == 1:
+            return float(self.post[opponent_away])
+        if post_crawford and opponent_away == 1:
+            return 1.0 - float(self.post[away])
+        return float(self.pre[away, opponent_away])
+
+
+@functools.lru_cache(maxsize=None)
+def match_equity_table(
+    length: int = MET_LENGTH,
+    gammon_rate: float = GAMMON_RATE,
+    backgammon_rate: float = BACKGAMMON_RATE,
+) -> MatchEquityTable:
+    """
+    Computes the MET of every score up to length, assuming either side wins
+    a game half the time, gammon_rate of the wins being gammons or better.
+    Games before the Crawford game are valued cubeless.
+
+    Returns:
+        MatchEquityTable: Read-only tables, indexed by points needed.
+    """
+    # Points won, as multiples of the cube, and their share of the wins.
+    outcomes = (
+        (1, 1 - gammon_rate),
+        (2, gammon_rate - backgammon_rate),
+        (3, backgammon_rate),
+    )
+
+    post = np.zeros(length + 1)
+    for j in range(1, length + 1):
+        post[j] = 0.5 + 0.5 * sum(
+            share * post[j - 2 * points]
+            for points, share in outcomes
+            if j - 2 * points > 0
+        )
+
+    pre = np.zeros((length + 1, length + 1))
+    pre[0, 1:] = 1.0
+    pre[1, 1] = 0.5
+    for j in range(2, length + 1):
+        pre[1, j] = 0.5 + 0.5 * sum(
+            share * post[j - points] for points, share in outcomes if j - points > 0
+        )
+        pre[j, 1] = 1.0 - pre[1, j]
+    for i in range(2, length + 1):
+        for j in range(2, length + 1):
+            pre[i, j] = 0.5 * sum(
+                share * (pre[max(i - points, 0), j] + pre[i, max(j - points, 0)])
+                for points, share in outcomes
+            )
+
+    pre.setflags(write=False)
+    post.setflags(write=False)
+    return MatchEquityTable(pre, post)
+
+
+class CubeInfo(NamedTuple):
+    cube: int
+    owner: int
+    away: int = 0  # 0 for money games
+    opponent_away: int = 0
+    crawford: bool = False
+    post_crawford: bool = False
+
+    @property
+    def money(self) -> bool:
+        return self.away == 0
+
+
+def cube_info(match: Match) -> CubeInfo:
+    """
+    Returns the cube of the match for match.player, the side whose position
+    it is. While a double is offered that is the doubler, and the cube is
+    the one before the double.
+    """
+    cube = match.cube_value
+    if match.game_state == GameState.DOUBLED:
+        cube //= 2
+    if match.cube_holder == PlayerType.CENTERED:
+        owner = CENTERED
+    elif match.cube_holder == match.player:
+        owner = OWNED
+    else:
+        owner = UNAVAILABLE
+    if match.length <= 0:
+        return CubeInfo(cube, owner)
+
+    scores = (match.player_0_score, match.player_1_score)
+    away = match.length - scores[int(match.player)]
+    opponent_away = match.length - scores[1 - int(match.player)]
+    one_away = 1 in (away, opponent_away)
+    return CubeInfo(
+        cube,
+        owner,
+        away,
+        opponent_away,
+        crawford=one_away and match.crawford,
+        post_crawford=one_away and not match.crawford,
+    )
+
+
+def cube_efficiency(position: Position) -> float:
+    """Returns the cube efficiency x of a position, higher in longer races."""
+    if position.classify() in (PositionClass.CONTACT, PositionClass.CRASHED):
+        return CUBE_EFFICIENCY
+    pips = position.pip_count()[0]
+    return min(0.7, max(0.6, 0.55 + 0.00125 * pips))
+
+
+def money_equity(outputs, owner: int, x: float = CUBE_EFFICIENCY):
+    """
+    Returns the Janowski cubeful money equity of (..., 5) outputs, per cube,
+    for the side on roll with the cube centered, owned or unavailable.
+    """
+    outputs = np.asarray(outputs, dtype=np.float64)
+    p = outputs[..., 0]
+    wins = 1 + (outputs[..., 1] + outputs[..., 2]) / np.maximum(p, EPSILON)
+    losses = 1 + (outputs[..., 3] + outputs[..., 4]) / np.maximum(1 - p, EPSILON)
+
+    # The opponent's cash point, where a take is worth as much as a pass,
+    # and the side on roll's own.
+    take = (losses - 0.5) / (wins + losses + 0.5)
+    cash = (losses + 1) / (wins + losses + 0.5)
+    lost = -losses + (losses - 1) * p / take
+    won = 1 + (wins - 1) * (p - cash) / (1 - cash)
+    if owner == CENTERED:
+        live = np.where(
+            p <= take,
+            lost,
+            np.where(p >= cash, won, -1 + 2 * (p - take) / (cash - take)),
+        )
+    elif owner == OWNED:
+        live = np.where(p <= cash, -losses + (1 + losses) * p / cash, won)
+    else:
+        live = np.where(p <= take, lost, -1 + (wins + 1) * (p - take) / (1 - take))
+    return x * live + (1 - x) * equity(outputs)
+
+
+def match_mwc(outputs, info: CubeInfo, cube: int, owner: int, x=CUBE_EFFICIENCY):
+    """
+    Returns the Janowski cubeful MWC of (..., 5) outputs for the side on
+    roll, playing for cube with the given owner at the score of info.
+    """
+    met = match_equity_table(max(info.away, info.opponent_away, MET_LENGTH))
+    post = info.post_crawford or info.crawford
+
+    def mwcs(value):
+        win = [
+            met.mwc(info.away - k * value, info.opponent_away, post) for k in (1, 2, 3)
+        ]
+        lose = [
+            met.mwc(info.away, info.opponent_away - k * value, post) for k in (1, 2, 3)
+        ]
+        return win, lose
+
+    outputs = np.asarray(outputs, dtype=np.float64)
+    p = outputs[..., 0]
+    won = (p - outputs[..., 1], outputs[..., 1] - outputs[..., 2], outputs[..., 2])
+    lost = (1 - p - outputs[..., 3], outputs[..., 3] - outputs[..., 4], outputs[..., 4])
+
+    def averages(value):
+        win, lose = mwcs(value)
+        wins = sum(share * mwc for share, mwc in zip(won, win))
+        losses = sum(share * mwc for share, mwc in zip(lost, lose))
+        return (
+            wins / np.maximum(p, EPSILON),
+            losses / np.maximum(1 - p, EPSILON),
+            win[0],
+            lose[0],
+        )
+
+    wins, losses, cashed, passed = averages(cube)
+    dead = p * wins + (1 - p) * losses
+    if info.crawford:
+        return dead
+
+    # Take and cash points of a double to 2 * cube, the cube dead after it.
+    wins2, losses2, _, _ = averages(2 * cube)
+    spread = np.maximum(wins2 - losses2, EPSILON)
+    take = (passed - losses2) / spread
+    cash = (cashed - losses2) / spread
+    usable = (0 < take) & (take < cash) & (cash < 1)
+    take = np.where(usable, take, 0.5)
+    cash = np.where(usable, cash, 0.75)
+
+    lost = losses + (passed - losses) * p / take
+    won = cashed + (wins - cashed) * (p - cash) / (1 - cash)
+    if owner == CENTERED:
+        live = np.where(
+            p <= take,
+            lost,
+            np.where(
+                p >= cash, won, passed + (cashed - passed) * (p - take) / (cash - take)
+            ),
+        )
+    elif owner == OWNED:
+        live = np.where(p <= cash, losses + (cashed - losses) * p / cash, won)
+    else:
+        live = np.where(
+            p <= take, lost, passed + (wins - passed) * (p - take) / (1 - take)
+        )
+    return np.where(usable, x * live + (1 - x) * dead, dead)
+
+
+class CubeDecision(NamedTuple):
+    """
+    Equities of the side on roll, in points for money games and in MWC for
+    matches, after no double, double and take, and double and pass.
+    """
+
+    no_double: float
+    double_take: float
+    double_pass: float
+    available: bool
+    double: bool
+    take: bool
+
+    @property
+    def action(self) -> str:
+        if not self.available:
+            return "no double"
+        if self.double:
+            return "double, take" if self.take else "double, pass"
+        return "no double, take" if self.take else "too good, pass"
+
+
+def decide_cube(outputs, info: CubeInfo, x: float = CUBE_EFFICIENCY) -> CubeDecision:
+    """
+    Decides the cube of one position from its (5,) outputs for the side on
+    roll.
+
+    Args:
+        outputs: The evaluator's outputs, before the side on roll rolls.
+        info (CubeInfo): The cube and score, as cube_info() gives them.
+        x (float): Cube efficiency.
+
+    Returns:
+        CubeDecision
+    """
+    cube = info.cube
+    if info.money:
+        no_double = cube * money_equity(outputs, info.owner, x)
+        double_take = 2 * cube * money_equity(outputs, UNAVAILABLE, x)
+        double_pass = float(cube)
+    else:
+        no_double = match_mwc(outputs, info, cube, info.owner, x)
+        double_take = match_mwc(outputs, info, 2 * cube, UNAVAILABLE, x)
+        met = match_equity_table(max(info.away, info.opponent_away, MET_LENGTH))
+        double_pass = met.mwc(
+            info.away - cube,
+            info.opponent_away,
+            info.post_crawford or info.crawford,
+        )
+    no_double, double_take = float(no_double), float(double_take)
+
+    available = info.owner != UNAVAILABLE and not info.crawford
+    take = double_take <= double_pass
+    double = available and min(double_take, double_pass) > no_double
+    return CubeDecision(no_double, double_take, double_pass, available, double, take)
+
+
+_ANALYSERS = {}
+
+
+def cube_decision(board, evaluator="pubeval", depth=0, analyser=None) -> CubeDecision:
+    """
+    Decides the cube of a board for the side whose turn it is to roll, or
+    who has just doubled.
+
+    Args:
+        board (Board): The game, on roll or with a double offered.
+        evaluator (str): One of analysis.EVALUATORS, unless analyser is given.
+        depth (int): Plies to look ahead.
+        analyser (Analyser): Evaluates the position, if given.
+
+    Returns:
+        CubeDecision
+    """
+    if analyser is None:
+        # Imported here so that analysis can import decide_cube() from this module.
+        from pybg.gnubg.analysis import Analyser
+
+        key = (evaluator, depth)
+        if key not in _ANALYSERS:
+            _ANALYSERS[key] = Analyser(evaluator, depth)
+        analyser = _ANALYSERS[key]
+    outputs = analyser.values([board.position], analyser.depth)[0]
+    return decide_cube(outputs, cube_info(board.match), cube_efficiency(board.position))
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Decide the cube of a position.")
+    PARSER.add_argument("position_id")
+    PARSER.add_argument("match_id")
+    PARSER.add_argument("--evaluator", "-e", default="pubeval")
+    PARSER.add_argument("--depth", "-d", default=0, type=int)
+    PARSER.add_argument(
+        "--weights", default=None, help="Optional: weights file for gnubg"
+    )
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    from pybg.gnubg.analysis import Analyser
+
+    POSITION = Position.decode(ARGS.position_id)
+    MATCH = Match.decode(ARGS.match_id)
+    ANALYSER = Analyser(ARGS.evaluator, ARGS.depth, weights_file=ARGS.weights)
+    DECISION = decide_cube(
+        ANALYSER.values([POSITION], ARGS.depth)[0],
+        cube_info(MATCH),
+        cube_efficiency(POSITION),
+    )
+    print(DECISION.action)
+    for FIELD in ("no_double", "double_take", "double_pass"):
+        print(f"  {FIELD:<12} {getattr(DECISION, FIELD):+.4f}")
@@ -1,8 +1,9 @@
-from typing import List
+from typing import List, Optional
 from pybg.gnubg.pub_eval import pubeval, pubeval_to_win_probability
 from pybg.core.board import Board
 from pybg.gnubg.position import PositionClass
 from pybg.gnubg.bearoff_database import BearoffDatabase
+from pybg.gnubg.hypergammon import load_table
 
 
 def n_ply_evaluate(
@@ -131,7 +132,13 @@ class Eval:
         if key in self.cache:
             return self.cache[key]
 
-        # 3. Branch logic by position class
+        # 3. Hypergammon is exact in its solved table, once there is one
+        exact = self._eval_hypergammon(board)
+        if exact is not None:
+            self.cache[key] = exact
+            return exact
+
+        # 4. Branch logic by position class
         if pc == PositionClass.OVER:
             result = self._eval_terminal(position)
         elif pc in (PositionClass.BEAROFF1, PositionClass.BEAROFF2):
@@ -139,7 +146,7 @@ class Eval:
         else:
             result = self._eval_static(position, pc)
 
-        # 4. Sanity postprocessing
+        # 5. Sanity postprocessing
         result = self._sanity_check(position, result)
 
         self.cache[key] = result
@@ -167,6 +174,16 @@ class Eval:
     def _eval_bearoff(self, board, position_class) -> dict:
         return self.bearoff_db.evaluate(board, position_class)
 
+    def _eval_hypergammon(self, board) -> Optional[dict]:
+        if getattr(board, "variant_name", "") != "Hypergammon":
+            return None
+        table = load_table()
+        outputs = table and table.outputs(board.position)
+        if outputs is None:
+            return None
+        keys = ("win", "win_gammon", "win_backgammon", "lose_gammon", "lose_backgammon")
+        return dict(zip(keys, outputs.tolist()))
+
     def _eval_static(self, position, pc) -> dict:
         pos_array = position.to_array()
         race = pc == PositionClass.RACE
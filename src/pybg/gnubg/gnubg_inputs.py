@@ -1,20 +1,24 @@
 import ctypes
+import functools
 import numpy as np
 import os
 from pybg.constants import ASSETS_DIR
-from pybg.core.board import Board
 from pybg.gnubg.position import PositionClass
 
-# Load the compiled shared library
-lib = ctypes.CDLL(os.path.abspath(f"{ASSETS_DIR}/gnubg/libinputs.so"))
 
-# Define function signature
-lib.call_get_inputs.argtypes = [
-    ctypes.POINTER((ctypes.c_int * 25) * 2),  # board[2][25]
-    ctypes.POINTER(ctypes.c_int),  # which[] array
-    ctypes.POINTER(ctypes.c_float),  # output[] array
-    ctypes.c_int,  # length of which[]
-]
+@functools.lru_cache(maxsize=None)
+def load_library() -> ctypes.CDLL:
+    """Loads the compiled shared library, on the first call only."""
+    lib = ctypes.CDLL(os.path.abspath(f"{ASSETS_DIR}/gnubg/libinputs.so"))
+
+    # Define function signature
+    lib.call_get_inputs.argtypes = [
+        ctypes.POINTER((ctypes.c_int * 25) * 2),  # board[2][25]
+        ctypes.POINTER(ctypes.c_int),  # which[] array
+        ctypes.POINTER(ctypes.c_float),  # output[] array
+        ctypes.c_int,  # length of which[]
+    ]
+    return lib
 
 
 def call_get_inputs(board_array: np.ndarray, which: np.ndarray) -> np.ndarray:
@@ -27,7 +31,7 @@ def call_get_inputs(board_array: np.ndarray, which: np.ndarray) -> np.ndarray:
     which_c = (ctypes.c_int * len(which))(*which)
     out_c = (ctypes.c_float * len(which))()
 
-    lib.call_get_inputs(board_c, which_c, out_c, len(which))
+    load_library().call_get_inputs(board_c, which_c, out_c, len(which))
     return np.array(out_c[:], dtype=np.float32)
 
 
@@ -42,6 +46,8 @@ INPUT_COUNTS = {
 }
 
 if __name__ == "__main__":
+    from pybg.core.board import Board
+
     board = Board(position_id="4HPwATDgc/ABMA")
     print(board)
 
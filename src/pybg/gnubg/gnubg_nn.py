@@ -170,7 +170,7 @@ class GnubgEvaluator:
         Parameters:
           weights_file: path to the weights file (defaults to "gnubg.weights" in the same directory).
         """
-        self.weights_file = WEIGHTS_FILE
+        self.weights_file = weights_file
         # Load all network objects from the file.
         nets = self.load_all_networks()
         # Create a mapping from PositionClass to the appropriate network.
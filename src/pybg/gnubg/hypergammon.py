@@ -0,0 +1,403 @@
+"""
+Exact cubeless evaluation of hypergammon, solved by value iteration.
+
+Hypergammon is played with 3 checkers a side (GNUBG also has 1 and 2
+checker versions), few enough for every position to be listed. A side's
+checkers are a sorted tuple of locations, 0 to 23 for the points from its
+own point of view, 24 for the bar and 25 for off, and the S sides of a
+number of checkers are ranked in lexicographic order (S = 3276 for 3).
+A position, with one side on roll, has the dense index
+
+    index = S * rank(side on roll) + rank(other side)
+
+Indexes whose sides share a point are never reached. Those where the side
+not on roll has borne everything off are finished games, lost by the side
+on roll; their outputs are fixed.
+
+solve() computes the outputs (win, win gammon, win backgammon, lose gammon,
+lose backgammon) of the side on roll, before it rolls, of every position:
+
+    value(position) = sum over the 21 rolls of weight * flip(value(best
+                      afterstate, with the other side on roll))
+
+The first sweep generates the afterstates of the positions, a chunk at a
+time, with the vectorized move generator of pybg.rl.simulation, and each
+sweep updates the positions' values in place from their afterstates', the
+chunks in order of total pip count so that values flow back from the end of
+the game. Sweeps repeat until no equity moves by more than the tolerance.
+The afterstate graph is kept for later sweeps in memory or, past
+CACHE_LIMIT, in scratch files next to the table: about 4 GB for 3 checkers,
+whose graph takes hours of one core to generate, shared out by --workers.
+
+The table is written as an (S * S, 5) float32 .npy file and memory-mapped by
+load_table(). Eval and the "hypergammon" evaluator of pybg.gnubg.analysis
+look positions of the variant up in it, from TABLE_FILE when it exists:
+
+    python -m pybg.gnubg.hypergammon --checkers 3
+"""
+
+import argparse
+import functools
+import itertools
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+
+from pybg.constants import ASSETS_DIR
+from pybg.core.logger import strip_debug
+from pybg.gnubg.neural_net import equity
+from pybg.gnubg.position import Position
+
+CHECKERS = 3
+POINTS = 24
+BAR, OFF = 24, 25
+LOCATIONS = 26
+TABLE_FILE = f"{ASSETS_DIR}/gnubg/hypergammon{CHECKERS}.npy"
+
+ROLLS = [(d1, d2) for d1 in range(1, 7) for d2 in range(d1, 7)]
+ROLL_WEIGHTS = np.array([(1 if d1 == d2 else 2) / 36 for d1, d2 in ROLLS])
+
+TOLERANCE = 1e-6
+CHUNK_SIZE = 4096
+# Afterstates kept in memory between sweeps: 4 bytes each, and 8 a roll.
+CACHE_LIMIT = 50_000_000
+
+
+@functools.lru_cache(maxsize=None)
+def sides(checkers: int = CHECKERS):
+    """
+    Returns the sides of a number of checkers, in rank order, and the rank of
+    each side by its key, as side_keys() computes it.
+
+    Returns:
+        tuple: (S, checkers) int64 sorted locations, and the ranks.
+    """
+    configs = np.array(
+        list(itertools.combinations_with_replacement(range(LOCATIONS), checkers)),
+        dtype=np.int64,
+    )
+    ranks = np.full(LOCATIONS**checkers, -1, dtype=np.int64)
+    ranks[side_keys(configs)] = np.arange(len(configs))
+    configs.setflags(write=False)
+    ranks.setflags(write=False)
+    return configs, ranks
+
+
+def side_keys(locations):
+    """Returns the key of (N, checkers) sorted locations."""
+    return locations @ LOCATIONS ** np.arange(locations.shape[1] - 1, -1, -1)
+
+
+def side_ranks(counts, checkers: int = CHECKERS):
+    """Returns the ranks of (N, 26) checker counts of sides."""
+    totals = np.cumsum(counts, axis=1)
+    locations = np.stack([(totals <= k).sum(axis=1) for k in range(checkers)], axis=1)
+    return sides(checkers)[1][side_keys(locations)]
+
+
+def split_sides(points, bar, off):
+    """
+    Returns the (N, 26) checker counts of the side to move and of its
+    opponent, each from its own point of view, of boards held as
+    BackgammonVectorEnv holds them.
+    """
+    mover = np.concatenate([np.maximum(points, 0), bar[:, :1], off[:, :1]], axis=1)
+    opponent = np.concatenate(
+        [np.maximum(-points[:, ::-1], 0), bar[:, 1:], off[:, 1:]], axis=1
+    )
+    return mover, opponent
+
+
+def side_counts(checkers: int = CHECKERS):
+    """Returns the (S, 26) checker counts of every side."""
+    configs, _ = sides(checkers)
+    counts = np.zeros((len(configs), LOCATIONS), dtype=np.int8)
+    for k in range(checkers):
+        np.add.at(counts, (np.arange(len(configs)), configs[:, k]), 1)
+    return counts
+
+
+def position_index(position: Position, checkers: int = CHECKERS) -> Optional[int]:
+    """
+    Returns the index of a position for its side on roll, or None if either
+    side has more checkers on the board than the variant.
+    """
+    points = np.array(position.board_points)
+    bars = (position.player_bar, abs(position.opponent_bar))
+    counts = []
+    for side, bar in (
+        (np.maximum(points, 0), bars[0]),
+        (np.maximum(-points[::-1], 0), bars[1]),
+    ):
+        on_board = int(side.sum()) + bar
+        if on_board > checkers:
+            return None
+        counts.append(np.concatenate([side, [bar, checkers - on_board]]))
+    ranks = side_ranks(np.array(counts), checkers)
+    return int(ranks[0]) * len(sides(checkers)[0]) + int(ranks[1])
+
+
+def finished_outputs(checkers: int = CHECKERS):
+    """
+    Returns the outputs of every index whose game is over, and which they
+    are. The side on roll has lost when the other side is all off, and a
+    gammon or backgammon as GNUBG scores them.
+    """
+    counts = side_counts(checkers)
+    size = len(counts)
+    all_off = counts[:, OFF] == checkers
+    none_off = counts[:, OFF] == 0
+    # Checkers on the bar or in the winner's home board.
+    trapped = counts[:, 18:25].sum(axis=1) > 0
+
+    loser = np.repeat(np.arange(size), size)
+    winner = np.tile(np.arange(size), size)
+    over = all_off[winner] & ~all_off[loser]
+    outputs = np.zeros((size * size, 5), dtype=np.float32)
+    outputs[over, 3] = none_off[loser[over]]
+    outputs[over, 4] = (none_off & trapped)[loser[over]]
+    return outputs, over
+
+
+def conflicts(checkers: int = CHECKERS):
+    """Returns which indexes have both sides on one point."""
+    counts = side_counts(checkers)
+    on_roll = counts[:, :POINTS] > 0
+    # The other side's point p is point 23 - p of the side on roll.
+    other = counts[:, POINTS - 1 :: -1] > 0
+    return (on_roll.astype(np.int8) @ other.T.astype(np.int8) > 0).ravel()
+
+
+def boards(indexes, checkers: int = CHECKERS):
+    """
+    Returns the points, bar and off of indexes, from the point of view of
+    the side on roll, as BackgammonVectorEnv holds them.
+    """
+    counts = side_counts(checkers)
+    size = len(counts)
+    mover, opponent = counts[indexes // size], counts[indexes % size]
+    points = (mover[:, :POINTS] - opponent[:, POINTS - 1 :: -1]).astype(np.int8)
+    bar = np.stack([mover[:, BAR], opponent[:, BAR]], axis=1).astype(np.int8)
+    off = np.stack([mover[:, OFF], opponent[:, OFF]], axis=1).astype(np.int8)
+    return points, bar, off
+
+
+def afterstate_graph(indexes, checkers: int = CHECKERS):
+    """
+    Returns the afterstates of every roll of positions, as the indexes of
+    the positions they leave for the other side on roll.
+
+    Returns:
+        tuple: (M,) int32 next indexes, sorted by (position, roll), and the
+            (len(indexes) * 21,) start of each (position, roll)'s.
+    """
+    # Imported here so that looking positions up does not load the
+    # reinforcement learning stack.
+    from pybg.rl.simulation import generate_afterstates, roll_dice
+
+    points, bar, off = boards(np.repeat(indexes, len(ROLLS)), checkers)
+    dice = roll_dice(np.tile(np.array(ROLLS), (len(indexes), 1)))
+    owner, points, bar, off, _ = generate_afterstates(points, bar, off, dice)
+    mover, opponent = split_sides(points, bar, off)
+    size = len(sides(checkers)[0])
+    following = side_ranks(opponent, checkers) * size + side_ranks(mover, checkers)
+    starts = np.searchsorted(owner, np.arange(len(indexes) * len(ROLLS)))
+    return following.astype(np.int32), starts
+
+
+def sweep_chunk(values, indexes, following, starts):
+    """
+    Updates the values of positions from those of their afterstates.
+
+    Returns:
+        float: The largest change of equity.
+    """
+    # Imported here for the same reason as in afterstate_graph.
+    from pybg.gnubg.analysis import flip
+
+    after = flip(values[following].astype(np.float64))
+    scores = equity(after)
+    top = np.maximum.reduceat(scores, starts)
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(scores))))
+    candidates = np.flatnonzero(scores == top[group])
+    chosen = candidates[np.searchsorted(group[candidates], np.arange(len(starts)))]
+    best = after[chosen].reshape(len(indexes), len(ROLLS), 5)
+    updated = np.einsum("r,nrk->nk", ROLL_WEIGHTS, best)
+    change = np.abs(equity(updated) - equity(values[indexes].astype(np.float64)))
+    values[indexes] = updated
+    return float(change.max(initial=0.0))
+
+
+class GraphCache:
+    """
+    Keeps the afterstate graphs of chunks for later sweeps, in memory up to
+    CACHE_LIMIT afterstates and past it in .npy files in directory, which
+    are memory-mapped back.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.graphs = []
+        self.cached = 0
+
+    def keep(self, graph):
+        following, starts = graph
+        if self.cached + len(following) <= CACHE_LIMIT:
+            self.cached += len(following)
+            self.graphs.append(graph)
+            return
+        paths = []
+        for name, array in (("following", following), ("starts", starts)):
+            paths.append(f"{self.directory}/{name}{len(self.graphs)}.npy")
+            np.save(paths[-1], array)
+        self.graphs.append(tuple(paths))
+
+    def __iter__(self):
+        for graph in self.graphs:
+            if isinstance(graph[0], str):
+                graph = tuple(np.load(path, mmap_mode="r") for path in graph)
+            yield graph
+
+
+def solve(
+    checkers: int = CHECKERS,
+    path: Optional[str] = None,
+    tolerance: float = TOLERANCE,
+    max_sweeps: int = 1000,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 0,
+    verbose: bool = False,
+):
+    """
+    Solves hypergammon with a number of checkers a side.
+
+    Args:
+        path (str): Writes the table there as it is solved, if given.
+        tolerance (float): Stops once no equity changes by more.
+        max_sweeps (int): Stops after this many sweeps regardless.
+        chunk_size (int): Positions whose afterstates are generated at once.
+        workers (int): Processes generating the afterstates, 0 for none.
+
+    Returns:
+        np.ndarray: The (S * S, 5) float32 outputs of every index.
+    """
+    size = len(sides(checkers)[0])
+    if path is None:
+        values = np.zeros((size * size, 5), dtype=np.float32)
+    else:
+        values = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=(size * size, 5)
+        )
+    fixed, over = finished_outputs(checkers)
+    values[over] = fixed[over]
+
+    # A side on roll that is all off has won; such positions are never
+    # played from, only reached, and only as the other side's.
+    counts = side_counts(checkers)
+    playable = ~over & ~conflicts(checkers)
+    playable &= np.repeat(counts[:, OFF] < checkers, size)
+    indexes = np.flatnonzero(playable)
+    values[indexes, 0] = 0.5
+
+    # The end of the game first.
+    pips = (counts[:, :POINTS] * np.arange(1, POINTS + 1)).sum(axis=1)
+    pips += counts[:, BAR] * (POINTS + 1)
+    indexes = indexes[
+        np.argsort(pips[indexes // size] + pips[indexes % size], kind="stable")
+    ]
+    chunks = [indexes[i : i + chunk_size] for i in range(0, len(indexes), chunk_size)]
+
+    generate = functools.partial(afterstate_graph, checkers=checkers)
+    pool = mp.Pool(workers) if workers > 0 else None
+    scratch = os.path.dirname(os.path.abspath(path)) if path else None
+    try:
+        with tempfile.TemporaryDirectory(dir=scratch) as directory:
+            cache = GraphCache(directory)
+            for sweep in range(1, max_sweeps + 1):
+                start, change = time.perf_counter(), 0.0
+                # The first sweep generates the graphs, in chunk order.
+                if sweep == 1:
+                    graphs = (
+                        pool.imap(generate, chunks) if pool else map(generate, chunks)
+                    )
+                else:
+                    graphs = iter(cache)
+                for chunk, graph in zip(chunks, graphs):
+                    if sweep == 1:
+                        cache.keep(graph)
+                    change = max(change, sweep_chunk(values, chunk, *graph))
+                if verbose:
+                    print(
+                        f"sweep {sweep}: largest change {change:.2e}"
+                        f" in {time.perf_counter() - start:.1f}s"
+                    )
+                if change <= tolerance:
+                    break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if path is not None:
+        values.flush()
+    return values
+
+
+class HypergammonTable:
+    """
+    Args:
+        path (str): A table written by solve(), of 1, 2 or 3 checkers a side.
+    """
+
+    def __init__(self, path: str = TABLE_FILE):
+        self.values = np.load(path, mmap_mode="r")
+        self.checkers = next(
+            checkers
+            for checkers in (1, 2, 3)
+            if len(sides(checkers)[0]) ** 2 == len(self.values)
+        )
+
+    def outputs(self, position: Position) -> Optional[np.ndarray]:
+        """Returns the (5,) outputs of a position for its side on roll, or None."""
+        index = position_index(position, self.checkers)
+        if index is None:
+            return None
+        return np.array(self.values[index], dtype=np.float64)
+
+
+@functools.lru_cache(maxsize=None)
+def load_table(path: str = TABLE_FILE) -> Optional[HypergammonTable]:
+    """Returns the table at path, memory-mapped once, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    return HypergammonTable(path)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Solve hypergammon.")
+    PARSER.add_argument(
+        "--checkers", "-c", default=CHECKERS, type=int, choices=(1, 2, 3)
+    )
+    PARSER.add_argument("--tolerance", default=TOLERANCE, type=float)
+    PARSER.add_argument("--max-sweeps", default=1000, type=int)
+    PARSER.add_argument("--chunk-size", default=CHUNK_SIZE, type=int)
+    PARSER.add_argument("--workers", "-w", default=os.cpu_count() or 1, type=int)
+    PARSER.add_argument("--output", "-o", default=None)
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    OUTPUT = ARGS.output or f"{ASSETS_DIR}/gnubg/hypergammon{ARGS.checkers}.npy"
+    START = time.perf_counter()
+    solve(
+        ARGS.checkers,
+        OUTPUT,
+        ARGS.tolerance,
+        ARGS.max_sweeps,
+        ARGS.chunk_size,
+        ARGS.workers,
+        verbose=True,
+    )
+    print(f"Solved in {time.perf_counter() - START:.1f}s, written to {OUTPUT}")
@@ -99,14 +99,12 @@ class Match:
             self.player = PlayerType.ZERO
 
     def swap_turn(self):
-        logger.debug(
-            f"Swap turn: self.turn == PlayerType.ZERO? {self.turn == PlayerType.ZERO}"
-        )
+        # Called every turn: check the level once, see pybg.core.logger.
+        if __debug__ and logger.debug_enabled:
+            logger.debug("Swap turn: swapping from %s", self.turn.name)
         if self.turn == PlayerType.ZERO:
-            logger.debug("Swapping to ONE")
             self.turn = PlayerType.ONE
         else:
-            logger.debug("Swapping to ZERO")
             self.turn = PlayerType.ZERO
 
     def other_player(self) -> PlayerType:
@@ -4,11 +4,22 @@ import os
 import numpy as np
 
 from pybg.core.board import Board
-from pybg.gnubg.position import PositionClass
+from pybg.gnubg.position import POINTS_PER_QUADRANT, PositionClass
 from pybg.constants import ASSETS_DIR
 from pybg.core.logger import logger
 
 WEIGHTS_FILE = f"{ASSETS_DIR}/gnubg/nngnubg.weights"
+WEIGHTS_VERSION = "GNU Backgammon 1.01"
+
+# Network names in the order they are written to a weights file.
+NETWORK_NAMES = (
+    "race",
+    "prune race",
+    "crashed",
+    "prune crashed",
+    "contact contact250",
+    "prune contact",
+)
 
 
 def sigmoid(x):
@@ -87,6 +98,136 @@ def encode_board(position, cInput):
     return np.array(features, dtype=np.float32)
 
 
+def encode_boards(positions, cInput):
+    """
+    encode_board for many positions at once, as an (N, cInput) array.
+
+    The same features are computed with array operations over all positions,
+    which is much faster than encoding them one at a time when evaluating
+    every play of a roll.
+    """
+    board = np.array([p.board_points for p in positions], dtype=np.int64)
+    bars_offs = np.array(
+        [
+            (p.player_bar, p.player_off, p.opponent_bar, p.opponent_off)
+            for p in positions
+        ],
+        dtype=np.int64,
+    )
+    return encode_arrays(board, bars_offs, cInput)
+
+
+def encode_arrays(board, bars_offs, cInput):
+    """
+    encode_boards for positions held in arrays: board is (N, 24) signed
+    checkers and bars_offs (N, 4) the player's bar and off, then the
+    opponent's.
+    """
+    board = np.asarray(board, dtype=np.int64)
+    bars_offs = np.asarray(bars_offs, dtype=np.int64)
+    player = np.maximum(board, 0)
+    opponent = np.maximum(-board, 0)
+
+    def occupied_and_extra(checkers):
+        # Interleaved [occupied, capped extra checkers] per point.
+        extra = np.where(checkers > 1, np.minimum(checkers - 1, 4) / 4.0, 0.0)
+        return np.stack([checkers > 0, extra], axis=-1).reshape(len(checkers), -1)
+
+    points = np.arange(1, 25)
+    player_pips = (player * points).sum(axis=1) + 25 * bars_offs[:, 0]
+    opponent_pips = (opponent * points[::-1]).sum(axis=1) + 25 * bars_offs[:, 2]
+    ramps = 2 * np.arange(6)
+
+    features = np.concatenate(
+        [
+            occupied_and_extra(player),
+            occupied_and_extra(opponent),
+            np.minimum(bars_offs, [5, 15, 5, 15]) / [5.0, 15.0, 5.0, 15.0],
+            occupied_and_extra(player[:, 0:6]),
+            occupied_and_extra(opponent[:, 18:24]),
+            np.stack([player_pips, opponent_pips, opponent_pips - player_pips], axis=1)
+            / 167.0,
+            bars_offs[:, 1:2] > ramps,
+            bars_offs[:, 3:4] > ramps,
+        ],
+        axis=1,
+    )
+
+    encoded = np.zeros((len(board), cInput), dtype=np.float32)
+    width = min(cInput, features.shape[1])
+    encoded[:, :width] = features[:, :width]
+    return encoded
+
+
+def network_keys(positions):
+    """
+    Returns the key of the network that evaluates each position, following
+    Position.classify. Races, bearoffs included, go to the race network. The
+    classes are worked out here because PositionClass.CONTACT and CRASHED
+    have equal values, so classify's result cannot tell them apart.
+    """
+    board = np.array([p.board_points for p in positions], dtype=np.int64)
+    contact, crash = classify_boards(board)
+    return [
+        "crashed" if c else "contact_contact250" if k else "race"
+        for c, k in zip(crash, contact)
+    ]
+
+
+def classify_boards(board):
+    """
+    Returns boolean arrays marking the (N, 24) boards that are contact
+    positions, and those of them that are crashed.
+    """
+    board = np.asarray(board, dtype=np.int64)
+    player = np.maximum(board, 0)
+    opponent = np.maximum(-board, 0)[:, ::-1]
+
+    def back(side):
+        # Index of the furthest-back checker, -1 if there are none.
+        occupied = side > 0
+        return np.where(occupied.any(axis=1), 23 - occupied[:, ::-1].argmax(axis=1), -1)
+
+    def crashed(side):
+        total = side.sum(axis=1)
+        anchored = side[:, 0] > 1
+        return (
+            (total <= 6)
+            | anchored & (total - side[:, 0] <= 6)
+            | anchored & (side[:, 1] > 1) & (1 + total - side[:, 0] - side[:, 1] <= 6)
+            | ~anchored & (total - (side[:, 1] - 1) <= 6)
+        )
+
+    contact = back(player) + back(opponent) > 22
+    crash = contact & (crashed(player) | crashed(opponent))
+    return contact, crash
+
+
+def equity(outputs):
+    """Cubeless equity of (..., 5) outputs for the side they belong to."""
+    return (
+        2 * outputs[..., 0]
+        - 1
+        + outputs[..., 1]
+        - outputs[..., 3]
+        + outputs[..., 2]
+        - outputs[..., 4]
+    )
+
+
+def outcome(position):
+    """
+    Returns the outputs a finished game should have had for the side that has
+    just borne off its last checker, with position from its point of view.
+    """
+    gammon = position.opponent_off == 0
+    backgammon = gammon and (
+        position.opponent_bar > 0
+        or any(point < 0 for point in position.board_points[:POINTS_PER_QUADRANT])
+    )
+    return np.array([1.0, gammon, backgammon, 0.0, 0.0], dtype=np.float32)
+
+
 # ------------------------------------------------------------------------------
 # Internal class representing a single neural network.
 # This class holds the network parameters and implements evaluation.
@@ -159,6 +300,36 @@ class GnubgNetwork:
         return output
 
 
+def save_all_networks(
+    networks: dict[str, GnubgNetwork],
+    weights_file: str,
+    version: str = WEIGHTS_VERSION,
+) -> None:
+    """
+    Write networks in the format GnubgEvaluator.load_all_networks reads.
+
+    Parameters:
+      networks: mapping from keys like "prune_race" to GnubgNetwork objects,
+        one for each of NETWORK_NAMES.
+      weights_file: path of the file to write.
+      version: the first line of the file.
+    """
+    with open(weights_file, "w") as f:
+        f.write(f"{version}\n")
+        for name in NETWORK_NAMES:
+            net = networks[name.replace(" ", "_")]
+            f.write(f"{name}\n")
+            f.write(
+                f"{net.cInput} {net.cHidden} {net.cOutput} {net.nTrained} "
+                f"{net.rBetaHidden:.7f} {net.rBetaOutput:.7f}\n"
+            )
+            # Weights are stored one hidden (or output) neuron at a time.
+            values = np.concatenate(
+                [net.weights1.T.ravel(), net.weights2.T.ravel(), net.bias1, net.bias2]
+            )
+            f.writelines(f"{value:.7f}\n" for value in values)
+
+
 # ------------------------------------------------------------------------------
 # Container class that loads all networks from the weights file and
 # provides a simple evaluation interface.
@@ -171,7 +342,7 @@ class GnubgEvaluator:
         Parameters:
           weights_file: path to the weights file (defaults to "gnubg.weights" in the same directory).
         """
-        self.weights_file = WEIGHTS_FILE
+        self.weights_file = weights_file
         # Load all network objects from the file.
         nets = self.load_all_networks()
         # Create a mapping from PositionClass to the appropriate network.
@@ -211,7 +382,13 @@ class GnubgEvaluator:
                 rBetaOutput = float(params[5])
 
                 logger.debug(
-                    cInput, cHidden, cOutput, nTrained, rBetaHidden, rBetaOutput
+                    "Net: %d inputs, %d hidden, %d outputs, %d trained, betas %s %s",
+                    cInput,
+                    cHidden,
+                    cOutput,
+                    nTrained,
+                    rBetaHidden,
+                    rBetaOutput,
                 )
 
                 # Load hidden layer weights
@@ -0,0 +1,322 @@
+"""
+Opening book: the ranked plays of the first two rolls of a game.
+
+Every game of a variant starts from the same position, so the plays of its
+15 opening rolls, and of the 21 replies to the best of them, can be ranked
+once, with the strongest evaluator and depth there is time for, and looked
+up afterwards instead of being evaluated again:
+
+    python -m pybg.gnubg.opening_book --depth 1 --workers 8
+    python -m pybg.gnubg.opening_book -e gnubg --weights td.weights -o book.npz
+
+The book is one .npz file. Its entries are sorted by key, the position's
+10 bytes of position ID followed by the dice, higher die first, and
+entry i owns rows starts[i] to starts[i + 1] of the plays, best first:
+
+    keys      (K,)     S12      position and dice
+    starts    (K + 1,) int32    first play row of each entry
+    moves     (P, 8)   int8     (source, destination) of up to 4 moves, -2 pads
+    equities  (P,)     float32  cubeless equity for the side to play
+    outputs   (P, 5)   float32  the evaluator's outputs
+
+Acey-deucey is left out: its games start with every checker off the board,
+which generate_plays does not handle.
+
+shell.decide() plays the book's best play for bots that ask for it, and
+hint lists the book's plays, from BOOK_FILE when it exists.
+"""
+
+import argparse
+import functools
+import itertools
+import multiprocessing as mp
+import os
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from pybg.constants import ASSETS_DIR
+from pybg.core.journal import pack_id
+from pybg.core.logger import strip_debug
+from pybg.core.moves import CHECKERS, Play, generate_plays
+from pybg.gnubg.neural_net import equity
+from pybg.gnubg.position import Position
+
+BOOK_FILE = f"{ASSETS_DIR}/gnubg/opening_book.npz"
+
+# Starting position and checkers per side of each variant. Position IDs
+# count the checkers hypergammon does without as borne off.
+VARIANTS = {
+    "backgammon": ("4HPwATDgc/ABMA", CHECKERS),
+    "nackgammon": ("4Dl4ADbgOXgANg", CHECKERS),
+    "hypergammon": ("AACgAgAAKgAAAA", CHECKERS),
+}
+OPENING_ROLLS = [(d1, d2) for d1 in range(6, 0, -1) for d2 in range(d1 - 1, 0, -1)]
+ROLLS = [(d1, d2) for d1 in range(6, 0, -1) for d2 in range(d1, 0, -1)]
+MAX_MOVES = 4
+PAD = -2
+
+
+class BookPlay(NamedTuple):
+    moves: Tuple[Tuple[int, int], ...]
+    equity: float
+    outputs: Tuple[float, ...]
+
+
+def book_key(position: Position, dice) -> bytes:
+    high, low = max(dice), min(dice)
+    return pack_id(position.encode(), 10) + bytes((high, low))
+
+
+def play_moves(play: Play) -> Tuple[Tuple[int, int], ...]:
+    return tuple((move.source, move.destination) for move in play.moves)
+
+
+def after(position: Position, moves) -> Position:
+    """Returns position after (source, destination) moves."""
+    for source, destination in moves:
+        position = position.apply_move(source, destination)
+    return position
+
+
+class OpeningBook:
+    """
+    Args:
+        path (str): A book written by write_book().
+    """
+
+    def __init__(self, path: str = BOOK_FILE):
+        with np.load(path) as data:
+            self.keys = data["keys"]
+            self.starts = data["starts"]
+            self.moves = data["moves"]
+            self.equities = data["equities"]
+            self.outputs = data["outputs"]
+            self.evaluator = str(data["evaluator"])
+            self.depth = int(data["depth"])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, position: Position, dice) -> Optional[List[BookPlay]]:
+        """Returns the book's plays of position and dice, best first, or None."""
+        if 0 in dice:
+            return None
+        key = book_key(position, dice)
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        plays = []
+        for row in range(self.starts[i], self.starts[i + 1]):
+            moves = self.moves[row].reshape(MAX_MOVES, 2)
+            plays.append(
+                BookPlay(
+                    tuple((int(s), int(d)) for s, d in moves if s != PAD),
+                    float(self.equities[row]),
+                    tuple(self.outputs[row].tolist()),
+                )
+            )
+        return plays
+
+    def rank(self, position: Position, dice, plays: List[Play]):
+        """
+        Returns (equity, play) for those of the legal plays that are in the
+        book, best first, or None if the position and dice are not. Plays
+        are matched by the position they lead to, as the same play can be
+        written with its moves in another order.
+        """
+        entries = self.lookup(position, dice)
+        if entries is None:
+            return None
+        by_position = {play.position: play for play in plays}
+        ranked = []
+        for entry in entries:
+            play = by_position.get(after(position, entry.moves))
+            if play is not None:
+                ranked.append((entry.equity, play))
+        return ranked
+
+    def best_play(self, position: Position, dice, plays: List[Play]):
+        """Returns the best of the legal plays by the book, or None."""
+        ranked = self.rank(position, dice, plays)
+        return ranked[0][1] if ranked else None
+
+
+@functools.lru_cache(maxsize=None)
+def load_book(path: str = BOOK_FILE) -> Optional[OpeningBook]:
+    """Returns the book at path, loaded once, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+_WORKER = {}
+
+
+def init_worker(evaluator, depth, plays, weights_file):
+    # Imported here so that looking plays up does not load the evaluators.
+    from pybg.gnubg.analysis import Analyser
+
+    _WORKER["analyser"] = Analyser(evaluator, depth, plays, weights_file)
+
+
+def run_chunk(entries):
+    """
+    Ranks the plays of (position_id, dice, checkers) entries.
+
+    Returns:
+        list: The best BookPlays of each entry, best first.
+    """
+    analyser = _WORKER["analyser"]
+    jobs, plays = [], []
+    for position_id, dice, checkers in entries:
+        legal = generate_plays(Position.decode(position_id), dice, checkers)
+        jobs.append((len(plays), len(plays) + len(legal)))
+        plays.extend(legal)
+    outputs = analyser.play_values(plays)
+    equities = equity(outputs)
+
+    ranked = []
+    for start, end in jobs:
+        order = start + np.argsort(-equities[start:end], kind="stable")
+        ranked.append(
+            [
+                BookPlay(
+                    play_moves(plays[i]),
+                    float(equities[i]),
+                    tuple(outputs[i].tolist()),
+                )
+                for i in order[: analyser.plays]
+            ]
+        )
+    return ranked
+
+
+def rank_entries(entries, pool=None, chunk_size=4):
+    chunks = [entries[i : i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    results = pool.map(run_chunk, chunks) if pool else map(run_chunk, chunks)
+    return list(itertools.chain.from_iterable(results))
+
+
+def build_book(
+    variants=tuple(VARIANTS),
+    evaluator="pubeval",
+    depth=1,
+    plays=8,
+    replies=3,
+    weights_file=None,
+    workers=0,
+):
+    """
+    Ranks the opening rolls of each variant, then the 21 rolls after each of
+    the best `replies` plays of every opening roll.
+
+    Args:
+        evaluator (str): One of analysis.EVALUATORS.
+        depth (int): Plies the Analyser looks ahead.
+        plays (int): Plays kept per entry.
+
+    Returns:
+        dict: (position, dice) -> list of BookPlay.
+    """
+    initargs = (evaluator, depth, plays, weights_file)
+    pool = mp.Pool(workers, init_worker, initargs) if workers > 0 else None
+    if pool is None:
+        init_worker(*initargs)
+    book = {}
+    try:
+        for variant in variants:
+            position_id, checkers = VARIANTS[variant]
+            start = Position.decode(position_id)
+            openings = [(position_id, dice, checkers) for dice in OPENING_ROLLS]
+            ranked = rank_entries(openings, pool)
+
+            answers = {}
+            for dice, entries in zip(OPENING_ROLLS, ranked):
+                book[start, dice] = entries
+                for entry in entries[:replies]:
+                    reply = after(start, entry.moves).swap_players()
+                    for roll in ROLLS:
+                        answers[reply, roll] = (reply.encode(), roll, checkers)
+            answers = {k: v for k, v in answers.items() if k not in book}
+            for key, entries in zip(
+                answers, rank_entries(list(answers.values()), pool)
+            ):
+                book[key] = entries
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return book
+
+
+def write_book(book, path, evaluator="", depth=0):
+    """Writes a build_book() result to path."""
+    entries = sorted(
+        (book_key(position, dice), plays) for (position, dice), plays in book.items()
+    )
+    rows = sum(len(plays) for _, plays in entries)
+    moves = np.full((rows, MAX_MOVES * 2), PAD, dtype=np.int8)
+    equities = np.zeros(rows, dtype=np.float32)
+    outputs = np.zeros((rows, 5), dtype=np.float32)
+    starts = np.zeros(len(entries) + 1, dtype=np.int32)
+    row = 0
+    for i, (_, plays) in enumerate(entries):
+        for play in plays:
+            flat = [point for move in play.moves for point in move]
+            moves[row, : len(flat)] = flat
+            equities[row] = play.equity
+            outputs[row] = play.outputs
+            row += 1
+        starts[i + 1] = row
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            keys=np.array([key for key, _ in entries], dtype="S12"),
+            starts=starts,
+            moves=moves,
+            equities=equities,
+            outputs=outputs,
+            evaluator=np.array(evaluator),
+            depth=np.array(depth),
+        )
+    load_book.cache_clear()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Build the opening book.")
+    PARSER.add_argument(
+        "--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS
+    )
+    PARSER.add_argument("--evaluator", "-e", default="pubeval")
+    PARSER.add_argument("--depth", "-d", default=1, type=int)
+    PARSER.add_argument(
+        "--weights", default=None, help="Optional: weights file for gnubg"
+    )
+    PARSER.add_argument("--plays", default=8, type=int, help="Plays kept per entry")
+    PARSER.add_argument(
+        "--replies",
+        default=3,
+        type=int,
+        help="Opening plays per roll to book replies to",
+    )
+    PARSER.add_argument("--workers", "-w", default=os.cpu_count() or 1, type=int)
+    PARSER.add_argument("--output", "-o", default=BOOK_FILE)
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    START = time.perf_counter()
+    BOOK = build_book(
+        ARGS.variants,
+        ARGS.evaluator,
+        ARGS.depth,
+        ARGS.plays,
+        ARGS.replies,
+        ARGS.weights,
+        ARGS.workers,
+    )
+    write_book(BOOK, ARGS.output, ARGS.evaluator, ARGS.depth)
+    print(
+        f"{len(BOOK)} entries in {time.perf_counter() - START:.1f}s, written to {ARGS.output}"
+    )
@@ -0,0 +1,154 @@
+"""
+The pybg shell without pygame.
+
+HeadlessShell drives the same CommandRouter and modules as the window, with no
+display, no sound and no pause between the bots' actions, for servers, batch
+jobs and scripted sessions. Run as a module it reads commands from script
+files, or stdin, and prints each command's output:
+
+    python -m pybg.headless session.txt
+    echo "new" | python -m pybg.headless --set player_agent=random
+    python -m pybg.headless --games 1000 --set player_agent=random --quiet
+
+After every command the bots play until it is a human's turn or the game is
+over, as they do between frames in the window. Blank lines and lines
+starting with "#" are skipped.
+"""
+
+import argparse
+import contextlib
+import sys
+import time
+
+from pybg.agents import HumanAgent
+from pybg.constants import DEFAULT_SETTINGS
+from pybg.core.shell import BaseShell
+from pybg.gnubg.match import GameState
+
+
+class HeadlessShell(BaseShell):
+    """
+    Args:
+        settings (dict): Overrides for the saved settings.
+        persist_settings (bool): Write `set` changes to the settings file, as
+            the window does.
+    """
+
+    def __init__(self, settings=None, persist_settings=False):
+        self.persist_settings = persist_settings
+        super().__init__()
+        # Settings files written by older versions may lack newer keys.
+        self.settings = {**DEFAULT_SETTINGS, **self.settings, **(settings or {})}
+
+    def save_settings(self):
+        if self.persist_settings:
+            super().save_settings()
+
+    def execute(self, command: str) -> str:
+        """Runs a command, lets the bots reply, and returns the output."""
+        super().execute(command)
+        self.play_turn()
+        return self.output_text
+
+    def run_script(self, lines):
+        """
+        Runs commands until they run out or one quits.
+
+        Yields:
+            tuple: (command, output) for each command run.
+        """
+        for line in lines:
+            command = line.strip()
+            if not command or command.startswith("#"):
+                continue
+            output = self.execute(command)
+            yield command, output
+            if not self.running:
+                break
+
+    def play_games(self, games: int):
+        """
+        Plays games between the two bots of the settings.
+
+        Returns:
+            list: (player 0's points, player 1's points) for each game.
+        """
+        results = []
+        for _ in range(games):
+            self.execute("new")
+            if self.game is None or self.game.match.game_state != GameState.GAME_OVER:
+                if any(
+                    isinstance(agent, HumanAgent)
+                    for agent in (self.player0_agent, self.player1_agent)
+                ):
+                    raise ValueError(
+                        "Set player_agent and opponent_agent to bots to play games."
+                    )
+                raise RuntimeError(f"The game did not finish:\n{self.output_text}")
+            match = self.game.match
+            results.append((match.player_0_score, match.player_1_score))
+        return results
+
+
+def parse_setting(text):
+    """Splits "key=value", converting the value as the settings file would."""
+    key, _, value = text.partition("=")
+    if value.lower() in ("true", "false"):
+        return key, value.lower() == "true"
+    if value.lstrip("-").isdigit():
+        return key, int(value)
+    return key, value
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run pybg without a window")
+    PARSER.add_argument(
+        "scripts", nargs="*", help="Files of commands, one per line; stdin if none"
+    )
+    PARSER.add_argument(
+        "--set",
+        "-s",
+        action="append",
+        default=[],
+        help="Override a setting for this run, e.g. --set opponent_agent=random",
+    )
+    PARSER.add_argument(
+        "--games",
+        "-g",
+        default=0,
+        type=int,
+        help="Play this many bot-vs-bot games instead of running commands",
+    )
+    PARSER.add_argument(
+        "--quiet", "-q", action="store_true", help="Only print a summary"
+    )
+    ARGS = PARSER.parse_args()
+
+    SHELL = HeadlessShell(dict(parse_setting(s) for s in ARGS.set))
+    START = time.perf_counter()
+    if ARGS.games:
+        RESULTS = SHELL.play_games(ARGS.games)
+        if not ARGS.quiet:
+            for GAME, (ZERO, ONE) in enumerate(RESULTS, 1):
+                print(f"game {GAME}: {ZERO}-{ONE}")
+        COUNT = len(RESULTS)
+        print(
+            f"player0 won {sum(zero > one for zero, one in RESULTS)} of {COUNT} games"
+        )
+    else:
+        COUNT = 0
+        for script in ARGS.scripts or ["-"]:
+            with (
+                contextlib.nullcontext(sys.stdin) if script == "-" else open(script)
+            ) as LINES:
+                for COMMAND, OUTPUT in SHELL.run_script(LINES):
+                    COUNT += 1
+                    if not ARGS.quiet:
+                        print(f"{SHELL.shell_prompt}{COMMAND}\n{OUTPUT}\n")
+            if not SHELL.running:
+                break
+    ELAPSED = time.perf_counter() - START
+    print(
+        f"{COUNT} {'games' if ARGS.games else 'commands'} in {ELAPSED:.2f}s",
+        file=sys.stderr,
+    )
@@ -5,8 +5,10 @@ from pybg.gnubg.pub_eval import pubeval_x
 from pybg.agents.factory import create_agent
 from pybg.core.board import BoardError
 from pybg.core.logger import logger
+from pybg.gnubg.cube import cube_decision, cube_info
 from pybg.gnubg.match import GameState
 from pybg.gnubg.match import Resign
+from pybg.gnubg.opening_book import load_book
 from pybg.core.player import PlayerType
 from pybg.modules.base_module import BaseModule
 from pybg.variants import AceyDeucey, Backgammon, Hypergammon, Nackgammon
@@ -63,7 +65,7 @@ class CoreModule(BaseModule):
 
     def cmd_new(self, args):
         s = self.shell
-        s.current_match_ref = s.history_module.get_current_match_ref()
+        s.current_match_ref = s.history_module.new_match()
         game_class = {
             "backgammon": Backgammon,
             "nackgammon": Nackgammon,
@@ -202,9 +204,18 @@ class CoreModule(BaseModule):
             if not plays:
                 return "No legal moves. Resign or end turn."
 
+            # 📖 The opening book has the cubeless equities of its best plays
+            # of the first two rolls. They come first, labelled, as they are
+            # not on the same scale as the pubeval scores of the others.
+            book = load_book()
+            booked = (book and book.rank(s.game.position, match.dice, plays)) or []
+            in_book = {id(play) for _, play in booked}
+
             # 🧠 Evaluate each play
             evaluated_plays = []
             for play in plays:
+                if id(play) in in_book:
+                    continue
                 position = play.position
                 pos_array = position.to_array()
                 is_race = position.classify().name == "RACE"
@@ -213,6 +224,8 @@ class CoreModule(BaseModule):
 
             # 🔥 Sort plays by best evaluation
             evaluated_plays.sort(reverse=True, key=lambda x: x[0])
+            source = ["book"] * len(booked) + ["pubeval"] * len(evaluated_plays)
+            evaluated_plays = booked + evaluated_plays
 
             # ✂️ Prune to top 5
             evaluated_plays = evaluated_plays[:max_hint_moves]
@@ -232,22 +245,37 @@ class CoreModule(BaseModule):
             max_move_length = max(len(ms) for ms in move_strings)
 
             # Now, format nicely
-            for index, ((score, play), move_str) in enumerate(
-                zip(evaluated_plays, move_strings), start=1
+            for index, ((score, play), move_str, label) in enumerate(
+                zip(evaluated_plays, move_strings, source), start=1
             ):
                 prefix = "> " if index == 1 else "  "  # Best move gets '>'
+                label = f"   ({label})" if booked else ""
                 hint_lines.append(
-                    f"{prefix}{index:2d}. {move_str.ljust(max_move_length)}   {score:+.3f}"
+                    f"{prefix}{index:2d}. {move_str.ljust(max_move_length)}   {score:+.3f}{label}"
                 )
 
             return self.shell.update_output_text(
                 output_message="\n".join(hint_lines), show_board=True
             )
 
-        if match.game_state == GameState.DOUBLED:
-            return f"Cube offered at {match.cube_value}, take, drop or redouble?"
-        if match.game_state == GameState.ON_ROLL:
-            return "Roll, double or resign?"
+        if match.game_state in (GameState.DOUBLED, GameState.ON_ROLL):
+            if match.game_state == GameState.DOUBLED:
+                prompt = f"Cube offered at {match.cube_value}, take, drop or redouble?"
+            else:
+                prompt = "Roll, double or resign?"
+
+            # 🎲 Cubeful equities in points, or match winning chances
+            decision = cube_decision(s.game)
+            money = cube_info(match).money
+            lines = [prompt, f"Proper cube action: {decision.action}"]
+            for label, value in (
+                ("No double", decision.no_double),
+                ("Double, take", decision.double_take),
+                ("Double, pass", decision.double_pass),
+            ):
+                value = f"{value:+.3f}" if money else f"{value:.1%}"
+                lines.append(f"  {label:<14}{value}")
+            return "\n".join(lines)
         if match.game_state == GameState.TAKE:
             return "Double accepted, roll or resign?"
 
@@ -1,7 +1,10 @@
 import json
 import os
+import time
 import uuid
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+from pybg.core.journal import MatchJournal
+from pybg.core.match_file import MatchFileError, replay, write_match
 from pybg.modules.base_module import BaseModule
 
 
@@ -16,8 +19,32 @@ class HistoryManager(BaseModule):
         self.match_refs: List[str] = []
         self.current_match_index: int = 0
         self.current_move_index: int = 0
+        # With the history_journal setting, matches are appended to a journal
+        # in that directory instead of being kept in memory.
+        self.journal: Optional[MatchJournal] = None
+
+    def open_journal(self, path: str):
+        """
+        Keeps the history in the journal at path, without its extension,
+        picking up the matches already in it.
+        """
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = MatchJournal(path)
+        self.matches = self.journal.matches
+        self.match_refs = list(self.matches)
+        self.current_match_index = max(0, len(self.match_refs) - 1)
+        self.current_move_index = max(
+            0, len(self.matches.get(self.get_current_match_ref(), ())) - 1
+        )
 
     def new_match(self) -> str:
+        journal_dir = self.shell.settings.get("history_journal")
+        if self.journal is None and journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+            self.open_journal(
+                os.path.join(journal_dir, time.strftime("session-%Y%m%d-%H%M%S"))
+            )
         match_ref = str(uuid.uuid4())
         self.matches[match_ref] = []
         self.match_refs.append(match_ref)
@@ -83,7 +110,9 @@ class HistoryManager(BaseModule):
         with open(path, "w") as f:
             json.dump(
                 {
-                    "matches": self.matches,
+                    "matches": {
+                        ref: list(moves) for ref, moves in self.matches.items()
+                    },
                     "match_refs": self.match_refs,
                     "current_match_index": self.current_match_index,
                     "current_move_index": self.current_move_index,
@@ -92,6 +121,14 @@ class HistoryManager(BaseModule):
             )
 
     def load_from_file(self, path: str):
+        if path.endswith(".pbj"):
+            self.open_journal(path[: -len(".pbj")])
+            return
+
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
         if not os.path.exists(path) or os.stat(path).st_size == 0:
             # Safeguard against empty or missing file
             self.matches = {}
@@ -116,6 +153,21 @@ class HistoryManager(BaseModule):
                 self.current_match_index = 0
                 self.current_move_index = 0
 
+    def import_match(self, path: str) -> str:
+        """Adds the match in a .mat file as a new match. Returns its ref."""
+        with open(path, encoding="utf-8", errors="replace") as f:
+            steps = list(replay(f))
+        match_ref = self.new_match()
+        for step in steps:
+            self.record_move(match_ref, step.position_id, step.match_id, step.action)
+        self.current_move_index = 0
+        return match_ref
+
+    def export_match(self, path: str) -> int:
+        """Writes the current match to a .mat file. Returns the games written."""
+        with open(path, "w") as f:
+            return write_match(self.matches[self.get_current_match_ref()], f)
+
     def cmd_history(self, args):
         if (
             not self.get_current_match_ref()
@@ -153,6 +205,7 @@ class HistoryManager(BaseModule):
         if 0 <= move_index < len(self.matches[self.get_current_match_ref()]):
             self.current_move_index = move_index
             self.shell.load_from_history()
+            return self.shell.output_text
         else:
             return self.shell.update_output_text(
                 "Invalid move number.", show_board=False
@@ -163,11 +216,48 @@ class HistoryManager(BaseModule):
         return self.shell.update_output_text("Deleted current match.")
 
     def cmd_save_history(self, args):
+        if self.journal is not None:
+            self.journal.flush()
+            return self.shell.update_output_text(
+                f"Match history synced to {self.journal.record_path}."
+            )
         self.save_to_file(
             f"{self.shell.settings.get('assets_path', './assets')}/match_history.json"
         )
         return self.shell.update_output_text("Match history saved.")
 
+    def cmd_import_match(self, args):
+        if len(args) != 1:
+            return self.shell.update_output_text(
+                "Usage: import_match <path.mat>", show_board=False
+            )
+        try:
+            match_ref = self.import_match(args[0])
+        except (OSError, MatchFileError) as e:
+            return self.shell.update_output_text(
+                f"Cannot import {args[0]}: {e}", show_board=False
+            )
+        moves = len(self.matches[match_ref])
+        if moves:
+            self.shell.load_from_history()
+        return self.shell.update_output_text(
+            f"Imported {args[0]} as match {match_ref[:8]} ({moves} moves)."
+        )
+
+    def cmd_export_match(self, args):
+        if len(args) != 1:
+            return self.shell.update_output_text(
+                "Usage: export_match <path.mat>", show_board=False
+            )
+        if not self.matches.get(self.get_current_match_ref()):
+            return self.shell.update_output_text(
+                "No match history found.", show_board=False
+            )
+        games = self.export_match(args[0])
+        return self.shell.update_output_text(
+            f"Exported {games} games to {args[0]}.", show_board=False
+        )
+
     def register(self):
         return (
             {
@@ -175,6 +265,8 @@ class HistoryManager(BaseModule):
                 "goto": self.cmd_goto,
                 "delete_history": self.cmd_delete_history,
                 "save_history": self.cmd_save_history,
+                "import_match": self.cmd_import_match,
+                "export_match": self.cmd_export_match,
             },
             {},
             {
@@ -182,6 +274,8 @@ class HistoryManager(BaseModule):
                 "goto": "Jump to the nth move in the current match",
                 "delete_history": "Delete the current match history",
                 "save_history": "Save match history to file",
+                "import_match": "Import a .mat match file as a new match",
+                "export_match": "Export the current match to a .mat file",
             },
         )
 
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+"""
+Batched policy inference for policy opponents.
+
+With a PolicyAgent in every environment, each opponent decision is its own
+predict() call and pays SB3's and torch's per-call overhead for a single
+observation. A PolicyServer owns one copy of the model instead. Environments
+get BatchedPolicyAgent clients, which send their observation and action mask
+to the server and wait for the answer; the server gathers the requests that
+arrive within max_wait, up to max_batch of them, and answers them all from one
+predict().
+
+Clients reach the server over a multiprocessing.connection socket and only
+carry its address, so they can be pickled into SubprocVecEnv workers with any
+start method and connect on their first decision. In one process, requests
+only overlap when the environments step at the same time, which
+ThreadedVecEnv (pybg.rl.envs.threaded_vec_env) arranges for a DummyVecEnv.
+"""
+
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener, wait
+
+import numpy as np
+import torch
+from gymnasium import spaces
+from sb3_contrib import MaskablePPO
+
+from pybg.rl.agents.agent import Agent
+from pybg.rl.agents.policy import algorithm_class
+
+# How often, in seconds, an idle server looks for new clients and for stop().
+POLL_INTERVAL = 0.05
+
+
+class BatchedPolicyAgent(Agent):
+    """An opponent whose decisions are made by a PolicyServer."""
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._connection = None
+
+    def make_decision(self, observation=None, action_mask=None):
+        """Returns the server's action for the observation."""
+
+        if self._connection is None:
+            self._connection = Client(self.address, authkey=self.authkey)
+        self._connection.send(
+            (
+                np.asarray(observation, dtype=np.float32),
+                None if action_mask is None else np.asarray(action_mask, dtype=bool),
+            )
+        )
+        action = self._connection.recv()
+        if isinstance(action, Exception):
+            raise action
+        return action
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        # A connection belongs to one process; copies open their own.
+        return {"address": self.address, "authkey": self.authkey}
+
+    def __setstate__(self, state):
+        self.__init__(state["address"], state["authkey"])
+
+
+class PolicyServer:
+    """
+    Answers BatchedPolicyAgent requests from one model, a batch at a time.
+
+    Args:
+        model: A loaded SB3 model, or the path of one to load on the CPU.
+        algorithm (str): The algorithm name, as for PolicyAgent, when model is a path.
+        max_batch (int): Most requests answered by one predict().
+        max_wait (float): Seconds to wait for more requests once one has arrived.
+        torch_threads (int): If set, passed to torch.set_num_threads() on
+            start(). This applies to the whole process, training included.
+        deterministic (bool): Passed to predict().
+    """
+
+    def __init__(
+        self,
+        model,
+        algorithm="ppo",
+        max_batch=64,
+        max_wait=0.001,
+        torch_threads=None,
+        deterministic=False,
+    ):
+        if isinstance(model, str):
+            model = algorithm_class(algorithm).load(model, device="cpu")
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.torch_threads = torch_threads
+        self.deterministic = deterministic
+
+        # Only MaskablePPO's predict() takes action masks.
+        self._masked = isinstance(model, MaskablePPO)
+        if isinstance(model.action_space, spaces.Discrete):
+            self._actions = int(model.action_space.n)
+        else:
+            self._actions = None
+
+        self._listener = None
+        self._authkey = None
+        self._connections = []
+        self._serving = None
+        self._accepting = None
+        self._stopping = False
+
+        self.batches = 0
+        self.requests = 0
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    @property
+    def mean_batch_size(self):
+        return self.requests / self.batches if self.batches else 0.0
+
+    def client(self):
+        """Returns a new BatchedPolicyAgent answered by this server."""
+
+        if self._listener is None:
+            raise RuntimeError("Start the PolicyServer before creating clients")
+        return BatchedPolicyAgent(self.address, self._authkey)
+
+    def predict(self, observations, masks=None):
+        """
+        Runs one predict() over a batch.
+
+        Args:
+            observations: (N, observation size) array.
+            masks: (N, actions) boolean array, or None.
+
+        Returns:
+            np.ndarray: One action per observation.
+        """
+        kwargs = {}
+        if self._masked and masks is not None:
+            kwargs["action_masks"] = masks
+        with torch.inference_mode():
+            actions, _ = self.model.predict(
+                np.asarray(observations, dtype=np.float32),
+                deterministic=self.deterministic,
+                **kwargs,
+            )
+        return actions
+
+    def _masks(self, batch):
+        """Stacks the batch's masks; unmasked requests allow every action."""
+
+        if not self._masked or all(mask is None for _, _, mask in batch):
+            return None
+        masks = np.ones((len(batch), self._actions), dtype=bool)
+        for row, (_, _, mask) in enumerate(batch):
+            if mask is not None:
+                masks[row] = mask
+        return masks
+
+    def _drop(self, connection):
+        """Forgets a client that has gone away."""
+
+        if connection in self._connections:
+            self._connections.remove(connection)
+        connection.close()
+
+    def _read(self, ready, batch):
+        """Adds the request of each ready connection, dropping closed ones."""
+
+        for connection in ready:
+            try:
+                observation, mask = connection.recv()
+            except (EOFError, OSError):
+                self._drop(connection)
+                continue
+            batch.append((connection, observation, mask))
+
+    def _collect(self):
+        """
+        Waits for a request, then for more until max_batch or max_wait.
+
+        Returns:
+            list: (connection, observation, mask) requests, empty if none
+            arrived within POLL_INTERVAL.
+        """
+        batch = []
+        self._read(wait(list(self._connections), POLL_INTERVAL), batch)
+        if not batch:
+            return batch
+
+        # A client waits for its answer, so it has at most one request.
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            waiting = {id(connection) for connection, _, _ in batch}
+            pending = [c for c in self._connections if id(c) not in waiting]
+            remaining = deadline - time.perf_counter()
+            if not pending or remaining <= 0:
+                break
+            ready = wait(pending, remaining)
+            if not ready:
+                break
+            self._read(ready[: self.max_batch - len(batch)], batch)
+        return batch
+
+    def serve(self):
+        """Answers batches until stop() is called."""
+
+        while not self._stopping:
+            if not self._connections:
+                time.sleep(POLL_INTERVAL)
+                continue
+            batch = self._collect()
+            if not batch:
+                continue
+
+            try:
+                actions = self.predict(
+                    np.stack([observation for _, observation, _ in batch]),
+                    self._masks(batch),
+                )
+                answers = [
+                    action.item() if np.ndim(action) == 0 else action
+                    for action in actions
+                ]
+            except Exception as e:
+                answers = [e] * len(batch)
+
+            # A client that went away mid-batch must not stop the others'.
+            for (connection, _, _), answer in zip(batch, answers):
+                try:
+                    connection.send(answer)
+                except (EOFError, OSError):
+                    self._drop(connection)
+            self.batches += 1
+            self.requests += len(batch)
+
+    def _accept(self):
+        listener = self._listener
+        while not self._stopping:
+            try:
+                connection = listener.accept()
+            except (EOFError, OSError):
+                if self._stopping:
+                    return
+                continue
+            if self._stopping:
+                connection.close()
+                return
+            self._connections.append(connection)
+
+    def start(self):
+        """Listens for clients and serves them on daemon threads."""
+
+        if self.torch_threads:
+            torch.set_num_threads(self.torch_threads)
+        self._authkey = os.urandom(16)
+        self._listener = Listener(authkey=self._authkey)
+        self._stopping = False
+        self._accepting = threading.Thread(target=self._accept, daemon=True)
+        self._accepting.start()
+        self._serving = threading.Thread(target=self.serve, daemon=True)
+        self._serving.start()
+        return self
+
+    def stop(self):
+        if self._listener is None:
+            return
+        self._stopping = True
+        self._serving.join()
+        # Closing the listener does not interrupt accept(), so wake it with
+        # one last connection before closing.
+        try:
+            Client(self.address, authkey=self._authkey).close()
+        except (EOFError, OSError):
+            pass
+        self._accepting.join()
+        self._listener.close()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._listener = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
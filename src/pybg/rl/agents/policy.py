@@ -12,32 +12,40 @@ Sabanci University
 The Policy agent takes an action according to a DNN.
 """
 
+import importlib
 import os
-from sb3_contrib import MaskablePPO  # 👈 use this!
-from stable_baselines3 import A2C, DDPG, DQN, SAC
 
 from pybg.rl.agents.agent import Agent
 
+# Module and class of each algorithm. They are imported when first asked for,
+# as torch and SB3 take seconds to import.
+ALGORITHMS = {
+    "a2c": ("stable_baselines3", "A2C"),
+    "ddpg": ("stable_baselines3", "DDPG"),
+    "dqn": ("stable_baselines3", "DQN"),
+    "ppo": ("sb3_contrib", "MaskablePPO"),  # 👈 use this!
+    "sac": ("stable_baselines3", "SAC"),
+}
+
+
+def algorithm_class(algorithm):
+    """Returns the SB3 class for an algorithm name, e.g. MaskablePPO for "ppo"."""
+
+    try:
+        module, name = ALGORITHMS[algorithm.lower()]
+    except KeyError:
+        raise ValueError("Unidentified algorithm chosen")
+    return getattr(importlib.import_module(module), name)
+
 
 class PolicyAgent(Agent):
     def __init__(self, algorithm, model):
-        if algorithm.lower() == "a2c":
-            self.algorithm_class = A2C
-        elif algorithm.lower() == "ddpg":
-            self.algorithm_class = DDPG
-        elif algorithm.lower() == "dqn":
-            self.algorithm_class = DQN
-        elif algorithm.lower() == "ppo":
-            self.algorithm_class = MaskablePPO
-        elif algorithm.lower() == "sac":
-            self.algorithm_class = SAC
-        else:
-            raise ValueError("Unidentified algorithm chosen")
+        self.algorithm_class = algorithm_class(algorithm)
 
         if not os.path.exists(model):
             self.__policy = None
         else:
-            self.__policy: MaskablePPO = self.algorithm_class.load(model)
+            self.__policy = self.algorithm_class.load(model)
 
     def make_decision(self, observation=None, action_mask=None):
         """Returns the action according to the policy and observation."""
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+"""
+Compact Q-table for the SARSA agent.
+
+States (the strings from SarsaGame.get_state3) are hashed to 64-bit integers
+and interned to dense IDs, actions are interned separately, and each
+(state, action) pair is stored as one int64 key and one float64 value.
+
+On disk a table is a directory:
+    state_hashes.npy    sorted state hashes, the index is the state ID
+    keys.npy            sorted (state ID << 16 | action ID) keys
+    values.npy          Q-values, aligned with keys
+    actions.json        the action tuples, the index is the action ID
+    delta-NNNNNN.npz    incremental checkpoints written since the last save
+
+The saved arrays are memory-mapped on load and searched with binary search,
+so loading does not rebuild a dictionary of every entry.
+"""
+
+import glob
+import json
+import os
+from hashlib import blake2b
+
+import numpy as np
+
+ACTION_BITS = 16
+ACTION_MASK = (1 << ACTION_BITS) - 1
+
+
+def state_hash(state):
+    """Returns a stable 64-bit hash of a state string."""
+    return int.from_bytes(blake2b(state.encode(), digest_size=8).digest(), "little")
+
+
+class QTable:
+    """
+    Drop-in replacement for the dict SarsaAgent keeps its Q-values in. It
+    supports the operations the agent uses: get((state, action), default),
+    q[(state, action)] = value, `in` and len().
+    """
+
+    def __init__(self, capacity=1024):
+        self._actions = {}
+        self._action_list = []
+
+        # Saved entries, sorted for binary search. May be memory-mapped.
+        self._base_hashes = np.zeros(0, dtype=np.uint64)
+        self._base_keys = np.zeros(0, dtype=np.int64)
+        self._base_values = np.zeros(0, dtype=np.float64)
+
+        # States and entries added since the last save.
+        self._states = {}
+        self._new_hashes = []
+        self._index = {}
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._size = 0
+
+        # Keys written since the last checkpoint.
+        self._dirty = set()
+        self._path = None
+        self._deltas = 0
+
+        # SarsaAgent looks up every action of a state in a row.
+        self._last_state = None
+        self._last_state_id = None
+
+    def __len__(self):
+        return len(self._base_keys) + self._size
+
+    def __contains__(self, item):
+        return self.get(item) is not None
+
+    def __getitem__(self, item):
+        value = self.get(item)
+        if value is None:
+            raise KeyError(item)
+        return value
+
+    def get(self, item, default=None):
+        state, action = item
+        state_id = self._state_id(state, create=False)
+        action_id = self._actions.get(action)
+        if state_id is None or action_id is None:
+            return default
+
+        key = state_id << ACTION_BITS | action_id
+        i = self._base_position(key)
+        if i is not None:
+            return float(self._base_values[i])
+        slot = self._index.get(key)
+        return default if slot is None else float(self._values[slot])
+
+    def __setitem__(self, item, value):
+        state, action = item
+        state_id = self._state_id(state, create=True)
+        self._set(state_id << ACTION_BITS | self._action_id(action), value)
+
+    def _set(self, key, value):
+        i = self._base_position(key)
+        if i is not None:
+            self._base_values[i] = value
+        else:
+            slot = self._index.get(key)
+            if slot is None:
+                slot = self._size
+                if slot == len(self._keys):
+                    self._keys = np.resize(self._keys, 2 * slot)
+                    self._values = np.resize(self._values, 2 * slot)
+                self._keys[slot] = key
+                self._index[key] = slot
+                self._size += 1
+            self._values[slot] = value
+        self._dirty.add(key)
+
+    def _state_id(self, state, create):
+        if state == self._last_state:
+            return self._last_state_id
+        state_id = self._state_id_for_hash(state_hash(state), create)
+        if state_id is not None:
+            self._last_state, self._last_state_id = state, state_id
+        return state_id
+
+    def _state_id_for_hash(self, hashed, create):
+        hashes = self._base_hashes
+        i = int(np.searchsorted(hashes, np.uint64(hashed)))
+        if i < len(hashes) and hashes[i] == hashed:
+            return i
+
+        state_id = self._states.get(hashed)
+        if state_id is None and create:
+            state_id = len(hashes) + len(self._new_hashes)
+            self._states[hashed] = state_id
+            self._new_hashes.append(hashed)
+        return state_id
+
+    def _action_id(self, action):
+        action_id = self._actions.get(action)
+        if action_id is None:
+            action_id = len(self._action_list)
+            if action_id > ACTION_MASK:
+                raise ValueError(f"Too many distinct actions for a QTable: {action}")
+            self._actions[action] = action_id
+            self._action_list.append(action)
+        return action_id
+
+    def _base_position(self, key):
+        keys = self._base_keys
+        i = int(np.searchsorted(keys, key))
+        if i < len(keys) and keys[i] == key:
+            return i
+        return None
+
+    def _hashes(self):
+        """Returns the hash of every state, indexed by state ID."""
+        return np.concatenate(
+            [self._base_hashes, np.array(self._new_hashes, dtype=np.uint64)]
+        )
+
+    def _merged(self):
+        """Returns every entry as sorted (hashes, keys, values) arrays."""
+        hashes = self._hashes()
+        keys = np.concatenate([self._base_keys, self._keys[: self._size]])
+        values = np.concatenate([self._base_values, self._values[: self._size]])
+
+        # Renumber states in hash order so the hash array stays sorted.
+        order = np.argsort(hashes, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        keys = rank[keys >> ACTION_BITS] << ACTION_BITS | (keys & ACTION_MASK)
+
+        key_order = np.argsort(keys, kind="stable")
+        return hashes[order], keys[key_order], values[key_order]
+
+    def _reset_base(self, hashes, keys, values):
+        self._base_hashes = hashes
+        self._base_keys = keys
+        self._base_values = values
+        self._states = {}
+        self._new_hashes = []
+        self._index = {}
+        self._size = 0
+        self._last_state = None
+        self._last_state_id = None
+
+    def save(self, path):
+        """Writes the whole table to a directory and drops its checkpoints."""
+        os.makedirs(path, exist_ok=True)
+        hashes, keys, values = self._merged()
+        np.save(os.path.join(path, "state_hashes.npy"), hashes)
+        np.save(os.path.join(path, "keys.npy"), keys)
+        np.save(os.path.join(path, "values.npy"), values)
+        self._save_actions(path)
+        for delta in glob.glob(os.path.join(path, "delta-*.npz")):
+            os.remove(delta)
+
+        self._reset_base(hashes, keys, values)
+        self._dirty = set()
+        self._path = path
+        self._deltas = 0
+
+    def checkpoint(self, path=None):
+        """
+        Writes only the entries changed since the last checkpoint or save. A
+        full save is done instead if the table has not been saved to path.
+        """
+        path = path or self._path
+        if path != self._path or not os.path.exists(os.path.join(path, "keys.npy")):
+            self.save(path)
+            return
+
+        keys = np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty))
+        values = np.array([self._value(key) for key in keys], dtype=np.float64)
+        self._save_actions(path)
+        np.savez(
+            os.path.join(path, f"delta-{self._deltas:06d}.npz"),
+            state_hashes=self._hashes()[keys >> ACTION_BITS],
+            actions=keys & ACTION_MASK,
+            values=values,
+        )
+        self._dirty = set()
+        self._deltas += 1
+
+    def _value(self, key):
+        i = self._base_position(key)
+        if i is not None:
+            return self._base_values[i]
+        return self._values[self._index[key]]
+
+    def _save_actions(self, path):
+        with open(os.path.join(path, "actions.json"), "w") as f:
+            json.dump(self._action_list, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="c"):
+        """
+        Loads a saved table and replays its checkpoints.
+
+        Args:
+            path (str): Directory written by save() or checkpoint().
+            mmap_mode (str): Passed to np.load. The default, copy-on-write,
+                keeps updates in memory and never modifies the files.
+        """
+        table = cls()
+        table._reset_base(
+            np.load(os.path.join(path, "state_hashes.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "keys.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode),
+        )
+        with open(os.path.join(path, "actions.json")) as f:
+            for action in json.load(f):
+                table._action_id(tuple(action) if isinstance(action, list) else action)
+
+        deltas = sorted(glob.glob(os.path.join(path, "delta-*.npz")))
+        for delta in deltas:
+            with np.load(delta) as data:
+                for hashed, action_id, value in zip(
+                    data["state_hashes"].tolist(),
+                    data["actions"].tolist(),
+                    data["values"].tolist(),
+                ):
+                    state_id = table._state_id_for_hash(hashed, create=True)
+                    table._set(state_id << ACTION_BITS | action_id, value)
+
+        table._dirty = set()
+        table._path = path
+        table._deltas = len(deltas)
+        return table
+
+    def __getstate__(self):
+        hashes, keys, values = self._merged()
+        return {
+            "state_hashes": hashes,
+            "keys": keys,
+            "values": values,
+            "actions": self._action_list,
+        }
+
+    def __setstate__(self, state):
+        self.__init__()
+        self._reset_base(state["state_hashes"], state["keys"], state["values"])
+        for action in state["actions"]:
+            self._action_id(action)
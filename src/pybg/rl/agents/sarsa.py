@@ -17,8 +17,9 @@ import random
 
 
 class SarsaAgent:
-    def __init__(self, actions=None, epsilon=0.2, alpha=0.2, gamma=0.9):
-        self.q = {}
+    def __init__(self, actions=None, epsilon=0.2, alpha=0.2, gamma=0.9, q=None):
+        # Any mapping with get and item assignment, e.g. a QTable.
+        self.q = {} if q is None else q
 
         self.epsilon = epsilon
         self.alpha = alpha
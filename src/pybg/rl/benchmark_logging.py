@@ -0,0 +1,64 @@
+"""
+Measures what debug logging costs the engine when it is off.
+
+Times Match.swap_turn, which logs on every turn, against the same method with
+no logging at all and against the f-string call it used to make, with debug
+off and after strip_debug(). Run it with `python -O` as well to see the
+guarded blocks compiled away.
+"""
+
+import argparse
+import time
+
+from pybg.core.board import STARTING_MATCH_ID
+from pybg.core.logger import logger, strip_debug
+from pybg.core.player import PlayerType
+from pybg.gnubg.match import Match
+
+
+def swap_turn_without_logging(match):
+    if match.turn == PlayerType.ZERO:
+        match.turn = PlayerType.ONE
+    else:
+        match.turn = PlayerType.ZERO
+
+
+def swap_turn_with_fstring(match):
+    logger.debug(
+        f"Swap turn: self.turn == PlayerType.ZERO? {match.turn == PlayerType.ZERO}"
+    )
+    swap_turn_without_logging(match)
+
+
+def time_calls(function, match, calls):
+    """Returns nanoseconds per call."""
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        function(match)
+    return (time.perf_counter_ns() - start) / calls
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(
+        description="Measure the cost of disabled debug logging"
+    )
+    PARSER.add_argument(
+        "--calls", "-c", help="swap_turn calls per run.", default=500000, type=int
+    )
+    ARGS = PARSER.parse_args()
+
+    MATCH = Match.decode(STARTING_MATCH_ID)
+    print(f"python -O: {not __debug__}")
+    BASELINE = time_calls(swap_turn_without_logging, MATCH, ARGS.calls)
+    print(f"{'no logging':26} {BASELINE:8.1f} ns/call")
+    for mode in ("debug off", "stripped"):
+        if mode == "stripped":
+            strip_debug()
+        for name, function in (
+            ("swap_turn", Match.swap_turn),
+            ("old f-string", swap_turn_with_fstring),
+        ):
+            NS = time_calls(function, MATCH, ARGS.calls)
+            print(
+                f"{name + ', ' + mode:26} {NS:8.1f} ns/call ({NS - BASELINE:+.1f} ns)"
+            )
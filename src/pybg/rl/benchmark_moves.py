@@ -0,0 +1,106 @@
+import argparse
+import random
+import time
+
+from pybg.core.aceydeucey_moves import (
+    ACEY_DEUCEY,
+    dice_sequences,
+    generate_acey_deucey_plays,
+    single_moves,
+    to_state,
+)
+from pybg.core.moves import generate_plays
+from pybg.gnubg.position import Position
+from pybg.variants.aceydeucey import STARTING_POSITION_ID as ACEY_DEUCEY_START
+
+VARIANTS = {
+    "backgammon": ("4HPwATDgc/ABMA", generate_plays),
+    "aceydeucey": (ACEY_DEUCEY_START, generate_acey_deucey_plays),
+}
+
+
+def sample_rolls(variant, rolls, seed):
+    """Returns (position, dice) of the first `rolls` rolls of random games."""
+    position_id, generate = VARIANTS[variant]
+    rng = random.Random(seed)
+    samples = []
+    position = Position.decode(position_id)
+    while len(samples) < rolls:
+        dice = (rng.randint(1, 6), rng.randint(1, 6))
+        samples.append((position, dice))
+        play = rng.choice(generate(position, dice))
+        if play.position.player_off == 15:
+            position = Position.decode(position_id)
+        elif (
+            variant == "aceydeucey" and tuple(sorted(dice, reverse=True)) == ACEY_DEUCEY
+        ):
+            position = play.position
+        else:
+            position = play.position.swap_players()
+    return samples
+
+
+def count_sequences(position, dice):
+    """
+    Returns the number of move sequences a generator without transposition
+    tables walks for an acey-deucey roll, counted by paths into each state.
+    """
+    total = 0
+    for sequence in dice_sequences(dice):
+        paths = {to_state(position): 1}
+        for pips in sequence:
+            following = {}
+            for state, count in paths.items():
+                for _, new_state in single_moves(state, pips):
+                    following[new_state] = following.get(new_state, 0) + count
+            if not following:
+                break
+            total += sum(following.values())
+            paths = following
+    return total
+
+
+def benchmark(variant, rolls, seed):
+    """Returns (plays per roll, most plays of a roll, rolls per second, plays per second)."""
+    _, generate = VARIANTS[variant]
+    samples = sample_rolls(variant, rolls, seed)
+    start = time.perf_counter()
+    counts = [len(generate(position, dice)) for position, dice in samples]
+    seconds = time.perf_counter() - start
+    return (
+        sum(counts) / len(counts),
+        max(counts),
+        len(counts) / seconds,
+        sum(counts) / seconds,
+    )
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(
+        description="Compare move generation in acey-deucey and backgammon"
+    )
+    PARSER.add_argument(
+        "--rolls", "-r", help="Rolls per variant.", default=2000, type=int
+    )
+    PARSER.add_argument("--seed", help="Random seed.", default=0, type=int)
+    ARGS = PARSER.parse_args()
+
+    for VARIANT in VARIANTS:
+        MEAN, MOST, ROLL_RATE, PLAY_RATE = benchmark(VARIANT, ARGS.rolls, ARGS.seed)
+        print(
+            f"{VARIANT:<11} {MEAN:8.1f} plays/roll (max {MOST:5d}) "
+            f"{ROLL_RATE:10.1f} rolls/sec {PLAY_RATE:10.1f} plays/sec"
+        )
+
+    SAMPLES = [
+        sample
+        for sample in sample_rolls("aceydeucey", ARGS.rolls, ARGS.seed)
+        if tuple(sorted(sample[1], reverse=True)) == ACEY_DEUCEY
+    ]
+    if SAMPLES:
+        PLAYS = sum(len(generate_acey_deucey_plays(p, d)) for p, d in SAMPLES)
+        SEQUENCES = sum(count_sequences(p, d) for p, d in SAMPLES)
+        print(
+            f"1-2 rolls: {PLAYS / len(SAMPLES):.1f} plays from "
+            f"{SEQUENCES / len(SAMPLES):.0f} move sequences per roll"
+        )
@@ -0,0 +1,75 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from pybg.core.board import Board
+from pybg.rl.envs.vector_env import BackgammonVectorEnv
+
+RESIGN_ACTIONS = ("resign", "accept", "reject")
+
+
+class MaskedRandomPlayer:
+    """Picks a random legal action index, leaving resignations as a last resort."""
+
+    def __init__(self, actions, seed=None):
+        self.playable = np.array(
+            [not (isinstance(a, tuple) and a[0] in RESIGN_ACTIONS) for a in actions]
+        )
+        self.rng = random.Random(seed)
+
+    def make_decision(self, observation, mask):
+        candidates = np.flatnonzero(mask & self.playable)
+        if len(candidates) == 0:
+            candidates = np.flatnonzero(mask)
+        return int(candidates[self.rng.randrange(len(candidates))])
+
+
+def benchmark(fast, steps, seed):
+    """Returns the number of Board.step calls per second."""
+    random.seed(seed)
+    board = Board(fast=fast)
+    board.opponent = MaskedRandomPlayer(board.actions, seed)
+    player = MaskedRandomPlayer(board.actions, seed + 1)
+
+    observation, info = board.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        action = player.make_decision(observation, board.action_mask())
+        observation, reward, done, truncated, info = board.step(action)
+        if done:
+            observation, info = board.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def benchmark_vector(num_envs, steps, seed):
+    """Returns the number of game steps per second of BackgammonVectorEnv."""
+    env = BackgammonVectorEnv(num_envs=num_envs, seed=seed)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(env._sample(env.action_masks()))
+    return steps * num_envs / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(
+        description="Measure Board.step throughput with and without fast mode, and the vectorized env's"
+    )
+    PARSER.add_argument("--steps", "-s", help="Steps per run.", default=5000, type=int)
+    PARSER.add_argument("--seed", help="Random seed.", default=0, type=int)
+    PARSER.add_argument(
+        "--envs", help="Games in the vectorized env.", default=256, type=int
+    )
+    PARSER.add_argument(
+        "--vector-steps", help="Vectorized env steps.", default=2000, type=int
+    )
+    ARGS = PARSER.parse_args()
+
+    before = benchmark(False, ARGS.steps, ARGS.seed)
+    after = benchmark(True, ARGS.steps, ARGS.seed)
+    print(f"default: {before:10.1f} steps/sec")
+    print(f"fast:    {after:10.1f} steps/sec ({after / before:.2f}x)")
+    vector = benchmark_vector(ARGS.envs, ARGS.vector_steps, ARGS.seed)
+    print(f"vector:  {vector:10.1f} steps/sec ({ARGS.envs} games)")
@@ -0,0 +1,99 @@
+import time
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+class ThroughputCallback(BaseCallback):
+    """
+    Reports env-steps/sec, episodes/sec and, for environments with profiling
+    enabled, the time spent in each step phase since the last report.
+
+    The time between the end of one rollout and the start of the next is the
+    SB3 update, recorded as the "update" phase. Values go to the SB3 logger
+    (TensorBoard when tensorboard_log is set) and, when verbose, the console.
+
+    Args:
+        interval (int): Number of callback calls (vectorised steps) between reports.
+        verbose (int): 1 to also print each report.
+    """
+
+    def __init__(self, interval=1000, verbose=0):
+        super().__init__(verbose)
+        self.interval = interval
+        self.episodes = 0
+        self.update_seconds = 0.0
+        self._rollout_end = None
+        self._last_time = None
+        self._last_timesteps = 0
+        self._last_episodes = 0
+        self._last_phases = {}
+
+    def _on_training_start(self) -> None:
+        self._last_time = time.perf_counter()
+        self._last_timesteps = self.num_timesteps
+        self._last_phases = self._phase_totals()
+
+    def _on_rollout_start(self) -> None:
+        if self._rollout_end is not None:
+            self.update_seconds += time.perf_counter() - self._rollout_end
+            self._rollout_end = None
+
+    def _on_rollout_end(self) -> None:
+        self._rollout_end = time.perf_counter()
+
+    def _on_step(self) -> bool:
+        for info in self.locals.get("infos", []):
+            if "episode" in info:
+                self.episodes += 1
+
+        if self.n_calls % self.interval == 0:
+            self.report()
+        return True
+
+    def _phase_totals(self):
+        """Sums {phase: (seconds, calls)} over every sub-environment's profiler."""
+        try:
+            profilers = self.training_env.get_attr("profiler")
+        except AttributeError:
+            return {}
+
+        # Envs that step their games together share one profiler.
+        unique = {id(p): p for p in profilers if p is not None}
+        totals = {}
+        for profiler in unique.values():
+            for phase, (seconds, calls) in profiler.snapshot().items():
+                total_seconds, total_calls = totals.get(phase, (0.0, 0))
+                totals[phase] = (total_seconds + seconds, total_calls + calls)
+        return totals
+
+    def report(self) -> None:
+        now = time.perf_counter()
+        elapsed = max(now - self._last_time, 1e-9)
+        steps = self.num_timesteps - self._last_timesteps
+        episodes = self.episodes - self._last_episodes
+
+        self.logger.record("throughput/steps_per_sec", steps / elapsed)
+        self.logger.record("throughput/episodes_per_sec", episodes / elapsed)
+        self.logger.record("profile/update_s", self.update_seconds)
+
+        phases = self._phase_totals()
+        lines = [
+            f"{steps / elapsed:.1f} steps/sec, {episodes / elapsed:.2f} episodes/sec"
+        ]
+        for phase, (seconds, calls) in sorted(phases.items()):
+            last_seconds, last_calls = self._last_phases.get(phase, (0.0, 0))
+            seconds -= last_seconds
+            calls -= last_calls
+            self.logger.record(f"profile/{phase}_s", seconds)
+            self.logger.record(f"profile/{phase}_calls", calls)
+            lines.append(f"  {phase:<16} {seconds:8.3f}s {calls:8d} calls")
+        lines.append(f"  {'update':<16} {self.update_seconds:8.3f}s")
+
+        if self.verbose:
+            print("\n".join(lines))
+
+        self._last_time = now
+        self._last_timesteps = self.num_timesteps
+        self._last_episodes = self.episodes
+        self._last_phases = phases
+        self.update_seconds = 0.0
@@ -0,0 +1,229 @@
+"""
+Afterstate environment: one step per play instead of per checker.
+
+Board's action space is single checker moves, so a turn takes up to four
+steps and Board.play regenerates every partial play for each of them. Here
+the plays of a roll are generated once, and the agent picks one by index:
+
+    observation["position"]     (F,)    the position before the play
+    observation["afterstates"]  (K, F)  the position after each legal play,
+                                        padded with zeros to max_plays rows
+    observation["mask"]         (K,)    1 for real plays, 0 for padding
+
+Positions are encoded with encode_boards, from the point of view of the side
+to move, using the GNUBG inputs without encode_board's padding. The action is
+an index into the afterstates, and action_masks() returns the mask for
+sb3-contrib's MaskablePPO.
+
+A game is a cubeless money game. The opponent gets the same observation for
+its own plays and answers through make_decision(observation, action_mask).
+The reward, at the end of the game, is the points won or lost.
+"""
+
+from typing import Any, Optional
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+
+from pybg.core.board import BACKGAMMON_STARTING_POSITION_ID, CHECKERS, Board
+from pybg.gnubg.neural_net import encode_boards
+from pybg.gnubg.position import Position
+
+# The inputs encode_board fills before its padding. Pip counts are scaled by
+# 167, so they stay below 3.
+AFTERSTATE_FEATURES = 139
+FEATURE_BOUND = 3.0
+# Turns with more distinct plays than this are rare (about 1% in random
+# play) and only come with doubles.
+MAX_PLAYS = 128
+INVALID_ACTION_REWARD = -10
+
+
+def afterstate_observation(position, plays, max_plays=MAX_PLAYS):
+    """
+    Returns the observation for choosing among the first max_plays of plays
+    from position, as AfterstateEnv shows it.
+    """
+    plays = plays[:max_plays]
+    encoded = encode_boards(
+        [position] + [play.position for play in plays], AFTERSTATE_FEATURES
+    )
+    afterstates = np.zeros((max_plays, AFTERSTATE_FEATURES), dtype=np.float32)
+    afterstates[: len(plays)] = encoded[1:]
+    mask = np.zeros(max_plays, dtype=np.int8)
+    mask[: len(plays)] = 1
+    return {"position": encoded[0], "afterstates": afterstates, "mask": mask}
+
+
+class AfterstateEnv(gym.Env):
+    """
+    Args:
+        opponent: Agent choosing the opponent's plays. By default they are
+            random, drawn from the environment's seeded generator.
+        max_plays (int): K, the afterstates shown per step. Plays beyond it
+            are dropped, and counted in info["dropped plays"].
+        skip_forced (bool): Play the agent's turns that have only one play,
+            or none, without a step.
+    """
+
+    metadata = {"render_modes": ["human"]}
+
+    def __init__(self, opponent=None, max_plays=MAX_PLAYS, skip_forced=True):
+        self.max_plays = max_plays
+        self.skip_forced = skip_forced
+        self.opponent = opponent
+
+        self.observation_space = spaces.Dict(
+            {
+                "position": spaces.Box(
+                    -FEATURE_BOUND,
+                    FEATURE_BOUND,
+                    (AFTERSTATE_FEATURES,),
+                    dtype=np.float32,
+                ),
+                "afterstates": spaces.Box(
+                    -FEATURE_BOUND,
+                    FEATURE_BOUND,
+                    (max_plays, AFTERSTATE_FEATURES),
+                    dtype=np.float32,
+                ),
+                "mask": spaces.MultiBinary(max_plays),
+            }
+        )
+        self.action_space = spaces.Discrete(max_plays)
+
+        # Only used for generate_plays, multiplier and rendering.
+        self.board = Board()
+        self.plays = []
+        self.invalid_actions_taken = 0
+        self.dropped_plays = 0
+        self.turns = 0
+
+    def roll(self):
+        dice = self.np_random.integers(1, 7, size=2)
+        self.board.match.dice = (int(dice[0]), int(dice[1]))
+
+    def generate_plays(self):
+        """Lists the plays of the position and dice on the board, at most K."""
+        plays = self.board.generate_plays()
+        if len(plays) > self.max_plays:
+            self.dropped_plays += len(plays) - self.max_plays
+            plays = plays[: self.max_plays]
+        return plays
+
+    def observe(self, plays):
+        """Returns the observation for choosing among plays."""
+        return afterstate_observation(self.board.position, plays, self.max_plays)
+
+    def action_masks(self):
+        mask = np.zeros(self.max_plays, dtype=bool)
+        mask[: len(self.plays)] = True
+        return mask
+
+    def finish_turn(self, play):
+        """
+        Plays a play for the side to move.
+
+        Returns:
+            int: The points it won with this play, 0 if the game goes on.
+        """
+        self.board.position = play.position
+        if play.position.player_off == CHECKERS:
+            return int(self.board.multiplier())
+        self.board.position = play.position.swap_players()
+        self.roll()
+        self.turns += 1
+        return 0
+
+    def opponent_turn(self):
+        """Plays the opponent's turn. Returns the points the opponent won."""
+        plays = self.generate_plays()
+        if len(plays) == 1:
+            return self.finish_turn(plays[0])
+
+        if self.opponent is None:
+            return self.finish_turn(plays[self.np_random.integers(len(plays))])
+
+        observation = self.observe(plays)
+        mask = observation["mask"].astype(bool)
+        choice = self.opponent.make_decision(observation, mask)
+        if isinstance(choice, (list, np.ndarray)):
+            choice = np.ravel(choice)[0]
+        choice = int(choice)
+        if not 0 <= choice < len(plays):
+            choice = 0
+        return self.finish_turn(plays[choice])
+
+    def advance(self):
+        """
+        Plays the opponent's turn and any forced turns of the agent.
+
+        Returns:
+            int: The agent's points if the game ended, negative if it lost.
+        """
+        while True:
+            points = self.opponent_turn()
+            if points:
+                return -points
+            self.plays = self.generate_plays()
+            if not self.skip_forced or len(self.plays) > 1:
+                return 0
+            points = self.finish_turn(self.plays[0])
+            if points:
+                return points
+
+    def reset(
+        self,
+        *,
+        seed: Optional[int] = None,
+        options: Optional[dict[str, Any]] = None,
+    ):
+        super().reset(seed=seed)
+        self.board.position = Position.decode(BACKGAMMON_STARTING_POSITION_ID)
+        self.turns = 0
+
+        # The opening roll is never a double; the higher die moves first.
+        while True:
+            self.roll()
+            first, second = self.board.match.dice
+            if first != second:
+                break
+        if first > second:
+            self.plays = self.generate_plays()
+        else:
+            self.advance()
+
+        return self.observe(self.plays), self.get_info()
+
+    def step(self, action):
+        action = int(action)
+        if not 0 <= action < len(self.plays):
+            self.invalid_actions_taken += 1
+            return (
+                self.observe(self.plays),
+                INVALID_ACTION_REWARD,
+                False,
+                False,
+                self.get_info(),
+            )
+
+        reward = self.finish_turn(self.plays[action])
+        if not reward:
+            reward = self.advance()
+
+        terminated = reward != 0
+        if terminated:
+            self.plays = []
+        return self.observe(self.plays), reward, terminated, False, self.get_info()
+
+    def get_info(self):
+        return {
+            "invalid actions taken": self.invalid_actions_taken,
+            "dropped plays": self.dropped_plays,
+            "turns": self.turns,
+        }
+
+    def render(self, mode="human"):
+        if mode == "human":
+            print(str(self.board))
@@ -5,6 +5,7 @@ import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 
+from pybg.core.profiler import StepProfiler
 from pybg.rl.agents import RandomAgent, PolicyAgent, HumanAgent
 from pybg.rl.game import ALL_ACTIONS
 from pybg.rl.game import Game
@@ -90,7 +91,10 @@ class BackgammonEnv(gym.Env):
 
         # Game initialization.
         self.__opponent = opponent
-        self._game: Game = Game("amca", opponent)
+        self._game: Game = Game("amca", opponent, array_board=True)
+
+        # Set by enable_profiling().
+        self.profiler = None
 
     def render(self, mode="human"):
         """Renders the board. 'w' is player1 and 'b' is player2."""
@@ -106,7 +110,9 @@ class BackgammonEnv(gym.Env):
     ) -> tuple[ObsType, dict[str, Any]]:
         """Restarts the game."""
 
-        self._game: Game = Game(self, self.__opponent)
+        self._game: Game = Game(self, self.__opponent, array_board=True)
+        if self.profiler is not None:
+            self._profile_game()
 
         return np.array(self._game.get_observation(), dtype=np.float32), {}
 
@@ -146,6 +152,26 @@ class BackgammonEnv(gym.Env):
             info,
         )
 
+    def enable_profiling(self, profiler=None):
+        """Times each phase of step() and the opponent's decisions. Returns the
+        StepProfiler, which is also available as env.profiler."""
+
+        self.profiler = profiler or self.profiler or StepProfiler()
+        self.profiler.attach(self, "step")
+        if hasattr(self, "get_action_mask"):
+            self.profiler.attach(self, "get_action_mask", "action_mask")
+        self.profiler.attach(self.__opponent, "make_decision", "opponent")
+        self._profile_game()
+        return self.profiler
+
+    def _profile_game(self):
+        """Instruments the current game, which is replaced on every reset."""
+
+        self.profiler.attach(self._game, "get_valid_actions", "generate_plays")
+        self.profiler.attach(self._game, "get_observation")
+        self.profiler.attach(self._game, "player_turn")
+        self.profiler.attach(self._game, "opponent_turn")
+
     def get_info(self):
         """Returns useful info for debugging, etc."""
 
@@ -187,12 +213,17 @@ class BackgammonHumanEnv(BackgammonEnv):
 
 
 class BackgammonRandomEnv(BackgammonMaskableEnv):
-    def __init__(self, opponent=RandomAgent(spaces.Discrete(len(ALL_ACTIONS)))):
+    def __init__(
+        self, opponent=RandomAgent(spaces.Discrete(len(ALL_ACTIONS)), ALL_ACTIONS)
+    ):
         super().__init__(opponent)
 
 
 class BackgammonPolicyEnv(BackgammonEnv):
-    def __init__(self, opponent=PolicyAgent("ppo", "models/amca.zip")):
+    def __init__(self, opponent=None):
+        # The default opponent loads its model when the environment is made.
+        if opponent is None:
+            opponent = PolicyAgent("ppo", "models/amca.zip")
         super().__init__(opponent)
 
 
@@ -202,10 +233,15 @@ class BackgammonHumanContinuousEnv(BackgammonEnv):
 
 
 class BackgammonPolicyContinuousEnv(BackgammonEnv):
-    def __init__(self, opponent=RandomAgent(spaces.Discrete(len(ALL_ACTIONS)))):
+    def __init__(
+        self, opponent=RandomAgent(spaces.Discrete(len(ALL_ACTIONS)), ALL_ACTIONS)
+    ):
         super().__init__(opponent, cont=True)
 
 
 class BackgammonRandomContinuousEnv(BackgammonEnv):
-    def __init__(self, opponent=PolicyAgent("ppo", "models/amca.zip")):
+    def __init__(self, opponent=None):
+        # The default opponent loads its model when the environment is made.
+        if opponent is None:
+            opponent = PolicyAgent("ppo", "models/amca.zip")
         super().__init__(opponent, cont=True)
@@ -0,0 +1,53 @@
+"""
+A DummyVecEnv that steps its environments on a thread pool.
+
+The game logic holds the GIL, so this is no faster on its own. It exists for
+environments whose step() blocks on something outside Python, like a
+BatchedPolicyAgent waiting for its PolicyServer: stepped one after another,
+every opponent request would be a batch of one.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+
+class ThreadedVecEnv(DummyVecEnv):
+    """
+    Args:
+        env_fns: Functions that create the environments, as for DummyVecEnv.
+        threads (int): Pool size, one thread per environment by default.
+    """
+
+    def __init__(self, env_fns, threads=None):
+        super().__init__(env_fns)
+        self._pool = ThreadPoolExecutor(threads or self.num_envs)
+
+    def _step_env(self, env_idx):
+        # DummyVecEnv.step_wait() for a single environment.
+        obs, self.buf_rews[env_idx], terminated, truncated, self.buf_infos[env_idx] = (
+            self.envs[env_idx].step(self.actions[env_idx])
+        )
+        self.buf_dones[env_idx] = terminated or truncated
+        self.buf_infos[env_idx]["TimeLimit.truncated"] = truncated and not terminated
+
+        if self.buf_dones[env_idx]:
+            self.buf_infos[env_idx]["terminal_observation"] = obs
+            obs, self.reset_infos[env_idx] = self.envs[env_idx].reset()
+        self._save_obs(env_idx, obs)
+
+    def step_wait(self):
+        # list() re-raises the first exception of any environment.
+        list(self._pool.map(self._step_env, range(self.num_envs)))
+        return (
+            self._obs_from_buf(),
+            np.copy(self.buf_rews),
+            np.copy(self.buf_dones),
+            deepcopy(self.buf_infos),
+        )
+
+    def close(self):
+        self._pool.shutdown()
+        super().close()
@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+"""
+Vectorized backgammon environment.
+
+`BackgammonVectorEnv` plays N independent cubeless money games at once. Instead of one
+`Board` of Python objects per game, every piece of game state lives in a NumPy
+array with one row per game:
+
+    points      (N, 24) int8   signed checkers, positive = side to move
+    bar         (N, 2)  int8   [player, opponent] checkers on the bar
+    off         (N, 2)  int8   [player, opponent] checkers borne off
+    dice        (N, 6)  int8   remaining uses of each die face (1..6)
+    roll        (N, 2)  int8   the dice as rolled, for the observation
+
+Like `Position`, the board is always stored from the perspective of the side
+to move. Between calls to `step()` that is always the learning agent; the
+opponent's turns are played inside `step()` by a random policy over the same
+vectorized move generator.
+
+The action space is `Discrete(150)`: `action = source * 6 + (die - 1)` where
+`source` is a point index (0..23) or 24 for the bar. Bearing off is a move
+whose destination falls below point 0. There is no cube, so there are no
+cube actions. This space is not Board's nor BackgammonEnv's, so a model
+trained here can neither be continued on those envs nor served to them as a
+PolicyAgent or PolicyServer opponent.
+
+The class implements the stable-baselines3 `VecEnv` interface and exposes
+`action_masks()`, so it can be passed directly to SB3 algorithms and to
+sb3-contrib's `MaskablePPO`. Finished games are reset automatically and their
+final observation is returned in `info["terminal_observation"]`.
+`enable_profiling()` times the step phases for ThroughputCallback.
+"""
+
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from pybg.core.board import BACKGAMMON_STARTING_POSITION_ID
+from pybg.core.profiler import StepProfiler
+from pybg.gnubg.position import Position
+
+POINTS = 24
+BAR = 24
+SOURCES = 25
+DIE_FACES = 6
+ACTION_COUNT = SOURCES * DIE_FACES
+OBSERVATION_SIZE = 54
+CHECKERS = 15
+
+INVALID_ACTION_REWARD = -10
+
+# DESTINATIONS[source, die - 1] is the point a checker lands on. Negative
+# values are bear-offs (-1 is an exact bear-off).
+DESTINATIONS = np.array(
+    [[s - d for d in range(1, DIE_FACES + 1)] for s in range(POINTS)]
+    + [[POINTS - d for d in range(1, DIE_FACES + 1)]],
+    dtype=np.int64,
+)
+
+
+def swap_players(points, bar, off) -> None:
+    """
+    Mirror the given rows in place so the other side is to move.
+    """
+    points[:] = -points[:, ::-1]
+    bar[:] = bar[:, ::-1]
+    off[:] = off[:, ::-1]
+
+
+def legal_moves(points, bar, off, dice) -> np.ndarray:
+    """
+    Return a (M, 25, 6) boolean array of single checker moves that are legal
+    for the side to move with the remaining dice.
+
+    This only checks the pip rules of each move on its own; `action_masks`
+    applies the rule that as many dice as possible must be played.
+    """
+    rows = points.shape[0]
+    mask = np.zeros((rows, SOURCES, DIE_FACES), dtype=bool)
+    if rows == 0:
+        return mask
+
+    has_die = dice > 0
+    own = np.maximum(points, 0)
+    on_bar = bar[:, 0] > 0
+
+    # Entering from the bar: the only legal moves while a checker is there.
+    entry = points[:, DESTINATIONS[BAR]] >= -1
+    mask[:, BAR, :] = entry & has_die & on_bar[:, None]
+
+    # Moves and bear-offs from the board.
+    dest = DESTINATIONS[:POINTS]
+    landing = np.take(points, np.clip(dest, 0, POINTS - 1), axis=1)
+    open_point = (dest[None] >= 0) & (landing >= -1)
+
+    all_home = (own[:, POINTS // 4 :].sum(axis=1) == 0) & ~on_bar
+    home = own[:, : POINTS // 4]
+    # Checkers on home points strictly higher than each home point.
+    higher = np.cumsum(home[:, ::-1], axis=1)[:, ::-1] - home
+    higher = np.concatenate(
+        [higher, np.ones((rows, POINTS - POINTS // 4), dtype=higher.dtype)], axis=1
+    )
+    exact = dest[None] == -1
+    over = (dest[None] < -1) & (higher[:, :, None] == 0)
+    bear_off = (exact | over) & all_home[:, None, None]
+
+    board = (open_point | bear_off) & (own[:, :, None] > 0)
+    mask[:, :POINTS, :] = board & has_die[:, None, :] & ~on_bar[:, None, None]
+    return mask
+
+
+def apply_moves(points, bar, off, dice, sources, faces) -> None:
+    """
+    Apply one checker move per row in place and consume the die used.
+    """
+    rows = np.arange(points.shape[0])
+    dest = DESTINATIONS[sources, faces]
+
+    from_bar = sources == BAR
+    bar[from_bar, 0] -= 1
+    points[rows[~from_bar], sources[~from_bar]] -= 1
+
+    borne = dest < 0
+    off[borne, 0] += 1
+
+    landed = rows[~borne]
+    target = dest[~borne]
+    hit = points[landed, target] == -1
+    bar[landed[hit], 1] += 1
+    points[landed[hit], target[hit]] = 0
+    points[landed, target] += 1
+
+    dice[rows, faces] -= 1
+
+
+def winning_multiplier(points, bar, off) -> np.ndarray:
+    """
+    Return the single/gammon/backgammon multiplier for rows where the side
+    to move has just borne off its last checker.
+    """
+    loser_home = np.minimum(points[:, : POINTS // 4], 0).sum(axis=1) < 0
+    backgammon = loser_home | (bar[:, 1] > 0)
+    return np.where(off[:, 1] > 0, 1, np.where(backgammon, 3, 2))
+
+
+class BackgammonVectorEnv(VecEnv):
+    """
+    N money games against a random opponent, stepped together.
+
+    Args:
+        num_envs: number of games held in the arrays.
+        position_id: starting position of every game.
+        seed: optional seed for the dice and the opponent.
+    """
+
+    metadata = {"render_modes": []}
+
+    def __init__(
+        self,
+        num_envs: int = 64,
+        position_id: str = BACKGAMMON_STARTING_POSITION_ID,
+        seed: Optional[int] = None,
+    ):
+        self.render_mode = None
+        self.starting_position = self.decode_position(position_id)
+
+        self.points = np.zeros((num_envs, POINTS), dtype=np.int8)
+        self.bar = np.zeros((num_envs, 2), dtype=np.int8)
+        self.off = np.zeros((num_envs, 2), dtype=np.int8)
+        self.dice = np.zeros((num_envs, DIE_FACES), dtype=np.int8)
+        self.roll = np.zeros((num_envs, 2), dtype=np.int8)
+
+        self.episode_returns = np.zeros(num_envs, dtype=np.float32)
+        self.episode_lengths = np.zeros(num_envs, dtype=np.int64)
+        self.invalid_actions_taken = 0
+        self._last_multiplier = np.zeros(num_envs, dtype=np.int64)
+
+        self._rng = np.random.default_rng(seed)
+        self._actions: Optional[np.ndarray] = None
+
+        # Set by enable_profiling().
+        self.profiler: Optional[StepProfiler] = None
+
+        super().__init__(
+            num_envs,
+            spaces.Box(low=0, high=15, shape=(OBSERVATION_SIZE,), dtype=np.float32),
+            spaces.Discrete(ACTION_COUNT),
+        )
+
+    @staticmethod
+    def decode_position(position_id: str) -> tuple:
+        """
+        Decode a GNUBG position ID into (points, bar, off) rows.
+        """
+        position = Position.decode(position_id)
+        return (
+            np.array(position.board_points, dtype=np.int8),
+            np.array([position.player_bar, position.opponent_bar], dtype=np.int8),
+            np.array([position.player_off, position.opponent_off], dtype=np.int8),
+        )
+
+    # ------------------------------------------------------------------
+    # VecEnv interface
+    # ------------------------------------------------------------------
+    def reset(self) -> np.ndarray:
+        if self._seeds[0] is not None:
+            self._rng = np.random.default_rng(self._seeds[0])
+        self._reset_seeds()
+        self._reset_games(np.arange(self.num_envs))
+        return self.observations()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        actions, self._actions = self._actions, None
+        rows = np.arange(self.num_envs)
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+
+        # Replace illegal actions with a random legal move, as Game does.
+        masks = self.action_masks()
+        valid = masks[rows, actions]
+        if not valid.all():
+            self.invalid_actions_taken += int((~valid).sum())
+            actions = np.where(valid, actions, self._sample(masks))
+            rewards[~valid] = INVALID_ACTION_REWARD
+
+        sources, faces = np.divmod(actions, DIE_FACES)
+        apply_moves(self.points, self.bar, self.off, self.dice, sources, faces)
+
+        dones = np.zeros(self.num_envs, dtype=bool)
+        won = self.off[:, 0] == CHECKERS
+        if won.any():
+            multiplier = winning_multiplier(
+                self.points[won], self.bar[won], self.off[won]
+            )
+            rewards[won] += multiplier
+            dones |= won
+
+        # Games where the agent has nothing left to play pass to the opponent.
+        finished = ~dones & ~self.action_masks().any(axis=1)
+        if finished.any():
+            lost = self._opponent_turns(np.flatnonzero(finished))
+            rewards[lost] -= self._last_multiplier[lost]
+            dones[lost] = True
+
+        self.episode_returns += rewards
+        self.episode_lengths += 1
+        observations = self.observations()
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = observations[i].copy()
+            infos[i]["episode"] = {
+                "r": float(self.episode_returns[i]),
+                "l": int(self.episode_lengths[i]),
+                "t": time.time(),
+            }
+            infos[i]["TimeLimit.truncated"] = False
+
+        if dones.any():
+            self._reset_games(np.flatnonzero(dones))
+            observations[dones] = self.observations()[dones]
+
+        return observations, rewards, dones, infos
+
+    def close(self) -> None:
+        pass
+
+    def _per_game(self, value: Any) -> bool:
+        return isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,)
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        """
+        Return an attribute per game: the game's row of arrays held one row
+        per game, the shared value of anything else.
+        """
+        value = getattr(self, attr_name)
+        if self._per_game(value):
+            return [value[i] for i in self._get_indices(indices)]
+        return [value for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        """
+        Set an attribute for the games of `indices`: their rows of arrays held
+        one row per game, or the shared value of anything else.
+        """
+        current = getattr(self, attr_name, None)
+        if indices is not None and self._per_game(current):
+            current[list(self._get_indices(indices))] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs):
+        """
+        Call a batched method once and split its result per game.
+        """
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result[i] for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def enable_profiling(self, profiler: Optional[StepProfiler] = None) -> StepProfiler:
+        """
+        Times each phase of step_wait(), the opponent's turns included. Every
+        game reports the same profiler, as one call times them all.
+
+        Returns:
+            StepProfiler: The profiler recording this env.
+        """
+        self.profiler = profiler or self.profiler or StepProfiler()
+        self.profiler.attach(self, "step_wait", "step")
+        self.profiler.attach(self, "action_masks")
+        self.profiler.attach(self, "observations")
+        self.profiler.attach(self, "_opponent_turns", "opponent")
+        return self.profiler
+
+    # ------------------------------------------------------------------
+    # Game state
+    # ------------------------------------------------------------------
+    def observations(self) -> np.ndarray:
+        """
+        Return the (N, 54) observation matrix, laid out like
+        `Board.get_observation`.
+        """
+        obs = np.zeros((self.num_envs, OBSERVATION_SIZE), dtype=np.float32)
+        obs[:, 0:2] = self.roll
+        obs[:, 2] = self.bar[:, 1]
+        obs[:, 3] = self.bar[:, 0]
+        obs[:, 4] = self.off[:, 1]
+        obs[:, 5] = self.off[:, 0]
+        obs[:, 6::2] = np.sign(self.points) % 3
+        obs[:, 7::2] = np.abs(self.points)
+        return obs
+
+    def action_masks(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Return the (M, 150) mask of legal actions.
+
+        A move is only allowed if it still lets the player use as many of
+        the remaining dice as any other move would; for non-doubles this is
+        exactly the "play both dice if you can" rule, for doubles it is
+        checked one move ahead.
+        """
+        if rows is None:
+            rows = np.arange(self.num_envs)
+        points, bar, off = self.points[rows], self.bar[rows], self.off[rows]
+        dice = self.dice[rows]
+
+        mask = legal_moves(points, bar, off, dice)
+        candidates = np.nonzero(mask & (dice.sum(axis=1) > 1)[:, None, None])
+        if candidates[0].size:
+            row, source, face = candidates
+            after = (
+                points[row].copy(),
+                bar[row].copy(),
+                off[row].copy(),
+                dice[row].copy(),
+            )
+            apply_moves(*after, source, face)
+            continues = legal_moves(*after).any(axis=(1, 2))
+            can_continue = np.zeros(len(rows), dtype=bool)
+            np.logical_or.at(can_continue, row, continues)
+            mask[row, source, face] = continues | ~can_continue[row]
+
+        return mask.reshape(len(rows), ACTION_COUNT)
+
+    def _sample(self, masks: np.ndarray) -> np.ndarray:
+        """
+        Pick a uniformly random legal action for each row of `masks`.
+        """
+        keys = np.where(masks, self._rng.random(masks.shape), -1.0)
+        return keys.argmax(axis=1)
+
+    def _roll(self, rows: np.ndarray, opening: bool = False) -> None:
+        roll = self._rng.integers(1, DIE_FACES + 1, size=(len(rows), 2))
+        if opening:
+            doubles = roll[:, 0] == roll[:, 1]
+            while doubles.any():
+                roll[doubles] = self._rng.integers(
+                    1, DIE_FACES + 1, size=(doubles.sum(), 2)
+                )
+                doubles = roll[:, 0] == roll[:, 1]
+
+        self.roll[rows] = roll
+        self.dice[rows] = 0
+        np.add.at(self.dice, (rows, roll[:, 0] - 1), 1)
+        np.add.at(self.dice, (rows, roll[:, 1] - 1), 1)
+        doubles = roll[:, 0] == roll[:, 1]
+        self.dice[rows[doubles], roll[doubles, 0] - 1] = 4
+
+    def _reset_games(self, rows: np.ndarray) -> None:
+        points, bar, off = self.starting_position
+        self.points[rows] = points
+        self.bar[rows] = bar
+        self.off[rows] = off
+        self.episode_returns[rows] = 0
+        self.episode_lengths[rows] = 0
+
+        # The higher opening die moves first, playing the opening roll.
+        self._roll(rows, opening=True)
+        opponent_first = self.roll[rows, 0] < self.roll[rows, 1]
+        if opponent_first.any():
+            self._opponent_turns(rows[opponent_first], opening=True)
+
+        agent_first = rows[~opponent_first]
+        stuck = agent_first[~self.action_masks(agent_first).any(axis=1)]
+        if stuck.size:
+            self._opponent_turns(stuck)
+
+    def _opponent_turns(self, rows: np.ndarray, opening: bool = False) -> np.ndarray:
+        """
+        Play the opponent's turn for each of `rows`, then roll for the agent,
+        passing back to the opponent while the agent has no legal move.
+
+        Returns a boolean array over all games marking those the opponent won.
+        """
+        lost = np.zeros(self.num_envs, dtype=bool)
+        self._last_multiplier[:] = 0
+
+        while rows.size:
+            points, bar, off = self.points, self.bar, self.off
+            sub = (points[rows], bar[rows], off[rows])
+            swap_players(*sub)
+            points[rows], bar[rows], off[rows] = sub
+            if not opening:
+                self._roll(rows)
+            opening = False
+
+            # Play the opponent's checkers until each game runs out of moves.
+            active = rows
+            while active.size:
+                masks = self.action_masks(active)
+                playable = masks.any(axis=1)
+                active, masks = active[playable], masks[playable]
+                if not active.size:
+                    break
+                sources, faces = np.divmod(self._sample(masks), DIE_FACES)
+                sub = (points[active], bar[active], off[active], self.dice[active])
+                apply_moves(*sub, sources, faces)
+                points[active], bar[active], off[active], self.dice[active] = sub
+
+                won = off[active, 0] == CHECKERS
+                if won.any():
+                    winners = active[won]
+                    lost[winners] = True
+                    self._last_multiplier[winners] = winning_multiplier(
+                        points[winners], bar[winners], off[winners]
+                    )
+                    active = active[~won]
+
+            sub = (points[rows], bar[rows], off[rows])
+            swap_players(*sub)
+            points[rows], bar[rows], off[rows] = sub
+
+            # Back to the agent; pass again if it cannot move.
+            rows = rows[~lost[rows]]
+            if not rows.size:
+                break
+            self._roll(rows)
+            rows = rows[~self.action_masks(rows).any(axis=1)]
+
+        return lost
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+"""
+An array-backed drop-in for the Point-based Board.
+
+The 24 points are a signed array('b'): positive counts are white ('w')
+checkers and negative counts black ('b') ones. Alongside it the board keeps
+24-bit occupancy masks per colour (any checkers, and blots), updated with each
+change, so a die's legal targets for every checker are found with one shift
+and a few bitwise operations instead of scanning index lists.
+
+The update_* operations and getters match Board, and valid_actions() returns
+the same actions, in the same order, as Game.get_valid_actions does for one die.
+"""
+
+from array import array
+from itertools import chain
+
+from pybg.rl.game.board import Point
+
+POINTS = 24
+ALL_POINTS = (1 << POINTS) - 1
+SIGN = {"w": 1, "b": -1}
+OPPONENT = {"w": "b", "b": "w"}
+
+# The occupied points of Board() as signed counts.
+STARTING_POINTS = {0: -2, 5: 5, 7: 3, 11: -5, 12: 5, 16: -3, 18: -5, 23: 2}
+
+# BEAR_OFF[color][roll] has a bit for every point whose distance home is
+# below roll, i.e. that roll may bear off from. White's home is points 0-5.
+BEAR_OFF = {
+    "w": [(1 << roll) - 1 for roll in range(7)],
+    "b": [ALL_POINTS ^ ((1 << (POINTS - roll)) - 1) for roll in range(7)],
+}
+WHITE_OUTSIDE_HOME = ALL_POINTS ^ ((1 << 6) - 1)
+BLACK_OUTSIDE_HOME = (1 << 18) - 1
+
+# get_observation's [color, count] pair for each signed count.
+OBSERVATION_PAIRS = {
+    count: (1 if count > 0 else 2 if count < 0 else 0, abs(count))
+    for count in range(-15, 16)
+}
+
+
+def bits(mask):
+    """Yields the indices of the set bits of mask, lowest first."""
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ArrayBoard:
+    """Defines a board as a signed array with occupancy bitmasks."""
+
+    def __init__(self):
+        self.points = array("b", [0] * POINTS)
+        for index, count in STARTING_POINTS.items():
+            self.points[index] = count
+        self.__hit = {"w": 0, "b": 0}
+        self.__bourne_off = {"w": 0, "b": 0}
+        self.refresh()
+
+    def refresh(self):
+        """Rebuilds the occupancy masks from the points."""
+
+        self.occupied = {"w": 0, "b": 0}
+        self.blots = {"w": 0, "b": 0}
+        for index in range(POINTS):
+            self.refresh_point(index)
+
+    def refresh_point(self, index):
+        count = self.points[index]
+        keep = ~(1 << index)
+        for color in ("w", "b"):
+            self.occupied[color] &= keep
+            self.blots[color] &= keep
+        if count:
+            color = "w" if count > 0 else "b"
+            self.occupied[color] |= 1 << index
+            if count in (1, -1):
+                self.blots[color] |= 1 << index
+
+    def get_board(self):
+        """Returns the points as Point objects, for code that expects them."""
+
+        board = []
+        for count in self.points:
+            if count > 0:
+                board.append(Point("w", count))
+            elif count < 0:
+                board.append(Point("b", -count))
+            else:
+                board.append(Point())
+        return board
+
+    def set_board(self, board):
+        """Sets the points from Point objects or signed counts."""
+
+        if len(board) and isinstance(board[0], Point):
+            board = [
+                SIGN.get(point.get_color(), 0) * point.get_count() for point in board
+            ]
+        self.points = array("b", board)
+        self.refresh()
+
+    def get_hit(self):
+        return self.__hit
+
+    def set_hit(self, hit):
+        self.__hit = hit
+
+    def get_bourne_off(self):
+        return self.__bourne_off
+
+    def set_bourne_off(self, bourne_off):
+        self.__bourne_off = bourne_off
+
+    def add_checker(self, color, index):
+        """Adds a checker the way Point does: an empty point takes color, an
+        occupied one just grows, whatever its color."""
+
+        count = self.points[index]
+        if count == 0:
+            self.points[index] = SIGN[color]
+        else:
+            self.points[index] = count + (1 if count > 0 else -1)
+        self.refresh_point(index)
+
+    def remove_checker(self, index):
+        count = self.points[index]
+        assert count != 0
+        self.points[index] = count - (1 if count > 0 else -1)
+        self.refresh_point(index)
+
+    def update_move(self, color, source_point_index, target_point_index):
+        self.add_checker(color, target_point_index)
+        self.remove_checker(source_point_index)
+
+    def update_hit(self, color, source_point_index, target_point_index):
+        self.remove_checker(source_point_index)
+        self.points[target_point_index] = SIGN[color]
+        self.refresh_point(target_point_index)
+        self.__hit[OPPONENT[color]] += 1
+
+    def update_bearoff(self, color, source_point_index):
+        self.remove_checker(source_point_index)
+        self.__bourne_off[color] += 1
+
+    def update_reenter(self, color, target_index):
+        self.add_checker(color, target_index)
+        self.__hit[color] -= 1
+
+    def update_reenterhit(self, color, target_index):
+        self.points[target_index] = SIGN[color]
+        self.refresh_point(target_index)
+        self.__hit[OPPONENT[color]] += 1
+        self.__hit[color] -= 1
+
+    def has_checkers(self, color):
+        return self.occupied[color] != 0
+
+    def home_board(self, color):
+        """Whether all of color's checkers on the board are in its home board.
+        Raises ValueError if it has none, like max() of an empty list."""
+
+        occupied = self.occupied[color]
+        if not occupied:
+            raise ValueError(f"No {color} checkers on the board")
+        if color == "w":
+            return not occupied & WHITE_OUTSIDE_HOME
+        return not occupied & BLACK_OUTSIDE_HOME
+
+    def reentry(self, color, roll):
+        """Returns ([action], [reward]) for entering a checker with roll."""
+
+        target = POINTS - roll if color == "w" else roll - 1
+        bit = 1 << target
+        if not self.occupied[OPPONENT[color]] & bit:
+            return [("reenter", target)], [roll]
+        if self.blots[OPPONENT[color]] & bit:
+            return [("reenter_hit", target)], [24]
+        return [], []
+
+    def valid_actions(self, color, roll, canbearoff):
+        """
+        Returns the (actions, rewards) for moving one checker of color by roll
+        when none are on the bar, checker by checker from point 0 upwards.
+        """
+
+        own = self.occupied[color]
+        opponent = OPPONENT[color]
+        open_points = ALL_POINTS & ~self.occupied[opponent]
+        blots = self.blots[opponent]
+
+        # Shift the target masks onto the source points.
+        if color == "w":
+            moves = own & (open_points << roll)
+            hits = own & (blots << roll)
+            step = -roll
+        else:
+            moves = own & (open_points >> roll)
+            hits = own & (blots >> roll)
+            step = roll
+        bearoffs = own & BEAR_OFF[color][roll] if canbearoff else 0
+
+        actions, rewards = [], []
+        for index in bits(moves | hits | bearoffs):
+            bit = 1 << index
+            if moves & bit:
+                actions.append(("move", index, index + step))
+                rewards.append(roll)
+            if hits & bit:
+                actions.append(("hit", index, index + step))
+                rewards.append(index if color == "w" else 24 - index)
+            if bearoffs & bit:
+                actions.append(("bearoff", index))
+                rewards.append(roll)
+        return actions, rewards
+
+    def observation(self):
+        """Returns the [color, count] pairs of get_observation, flattened, with
+        1 for white and 2 for black."""
+
+        return list(
+            chain.from_iterable(map(OBSERVATION_PAIRS.__getitem__, self.points))
+        )
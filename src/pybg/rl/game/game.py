@@ -16,6 +16,7 @@ import random
 import copy
 
 import numpy as np
+from pybg.rl.game.array_board import ArrayBoard
 from pybg.rl.game.board import Board
 
 
@@ -80,9 +81,10 @@ class Game:
     the opponent. The opponent can either be a random agent, a human, or a
     policy agent."""
 
-    def __init__(self, player1, player2):
+    def __init__(self, player1, player2, array_board=False):
         # Initialize game vars
-        self.__gameboard = Board()
+        self.__array_board = array_board
+        self.__gameboard = ArrayBoard() if array_board else Board()
         self.__w_hitted = 0
         self.__b_hitted = 0
         self.__w_bourne_off = 0
@@ -198,6 +200,12 @@ class Game:
     def get_action(self, actionint):
         """Returns the action tuple associated with the actionint."""
 
+        # Agents sharing the core interface return a list of actions.
+        # PolicyAgent returns predict()'s array, 0-d for one observation.
+        if isinstance(actionint, list):
+            actionint = actionint[0]
+        elif isinstance(actionint, np.ndarray):
+            actionint = actionint.flat[0]
         return ALL_ACTIONS[actionint]
 
     def get_valid_actions(self):
@@ -218,6 +226,9 @@ class Game:
             .
         ]
         """
+        if self.__array_board:
+            return self.get_valid_array_actions()
+
         acts = []
         rews = []
         points = self.__gameboard.get_board()
@@ -299,6 +310,32 @@ class Game:
 
         return acts, rews
 
+    def get_valid_array_actions(self):
+        """get_valid_actions for an ArrayBoard."""
+
+        board = self.__gameboard
+        if board.home_board("w") and (self.__w_hitted == 0):
+            self.__w_canbearoff = True
+        if board.home_board("b") and (self.__b_hitted == 0):
+            self.__b_canbearoff = True
+
+        if self.__turn == 1:
+            color, hitted, canbearoff = "w", self.__w_hitted, self.__w_canbearoff
+        else:
+            color, hitted, canbearoff = "b", self.__b_hitted, self.__b_canbearoff
+
+        acts = []
+        rews = []
+        for roll in self.__dice:
+            if hitted > 0:
+                actions, rewards = board.reentry(color, roll)
+            else:
+                actions, rewards = board.valid_actions(color, roll, canbearoff)
+            acts.append(actions)
+            rews.append(rewards)
+
+        return acts, rews
+
     def act(self, action):
         """Takes an action and updates the board as neccessary, including the
         checkers hit and bourne off."""
@@ -364,6 +401,9 @@ class Game:
         statevec.append(self.__w_bourne_off)
         statevec.append(self.__b_bourne_off)
 
+        if self.__array_board:
+            return statevec + self.__gameboard.observation()
+
         for point in self.__gameboard.get_board():
             if point.get_color() == "w":
                 statevec.append(1)
@@ -449,6 +489,10 @@ class Game:
     def get_done(self):
         """Returns if the game is over or not."""
 
+        if self.__array_board:
+            board = self.__gameboard
+            return not board.has_checkers("w") or not board.has_checkers("b")
+
         points = self.__gameboard.get_board()
         i = 0
         for color in ["w", "b"]:
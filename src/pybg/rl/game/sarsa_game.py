@@ -15,15 +15,29 @@ This script contains the classes required to play backgammon.
 import random
 
 from pybg.rl.game import Board
+from pybg.rl.game.array_board import ArrayBoard
+
+# get_state3 characters for each signed point count, white then black.
+WHITE_LETTERS = "0123456789RUTVWYZ"
+BLACK_LETTERS = "0ABCDEFGHIJKLMNOPQ"
+STATE3_PIECES = {
+    count: (
+        WHITE_LETTERS[count] + "0"
+        if count > 0
+        else BLACK_LETTERS[-count] if count < 0 else "0"
+    )
+    for count in range(-15, 16)
+}
 
 
 class SarsaGame:
     """Defines a backgammon game object."""
 
-    def __init__(self, w_player, b_player):
+    def __init__(self, w_player, b_player, array_board=False):
         self.__w_player = w_player
         self.__b_player = b_player
-        self.__gameboard = Board()
+        self.__array_board = array_board
+        self.__gameboard = ArrayBoard() if array_board else Board()
         self.__dice = []
 
         self.__w_hitted = 0
@@ -112,6 +126,10 @@ class SarsaGame:
     def get_state3(self, adice):
         statestr = str(adice)
 
+        if self.__array_board:
+            points = self.__gameboard.points.tolist()
+            return statestr + "".join([STATE3_PIECES[count] for count in points])
+
         for point in self.__gameboard.get_board():
             if point.get_color() == "w":
                 statestr += self.letterx("w", point.get_count())
@@ -190,6 +208,9 @@ class SarsaGame:
                      the dice after all of your checkers have been brought into
                      your home board."""
 
+        if self.__array_board:
+            return self.get_array_actions(player, roll)
+
         points = self.__gameboard.get_board()
 
         w_indices = []
@@ -269,10 +290,51 @@ class SarsaGame:
             return [("Nomove", 0, 0)], [0]
         return actions, rewards
 
+    def get_array_actions(self, player, roll):
+        """get_actions for an ArrayBoard."""
+
+        board = self.__gameboard
+        if board.home_board("w") and (self.__w_hitted == 0):
+            self.__w_canbearoff = True
+        if board.home_board("b") and (self.__b_hitted == 0):
+            self.__b_canbearoff = True
+
+        actions = []
+        rewards = []
+        if player == self.__w_player:
+            if self.__w_hitted > 0:
+                # Entry is offered whenever white has a checker on the board.
+                if board.has_checkers("w"):
+                    actions, rewards = [("reenter", 24 - roll)], [roll]
+                else:
+                    actions, rewards = board.reentry("w", roll)
+
+                if len(actions) < 1:
+                    return [("Nomove", 0, 0)], [0]
+                return actions, rewards
+
+            actions, rewards = board.valid_actions("w", roll, self.__w_canbearoff)
+
+        if player == self.__b_player:
+            if self.__b_hitted > 0:
+                if board.has_checkers("b"):
+                    return [("reenter", roll - 1)], [roll]
+                return board.reentry("b", roll)
+
+            actions, rewards = board.valid_actions("b", roll, self.__b_canbearoff)
+
+        if len(actions) < 1:
+            return [("Nomove", 0, 0)], [0]
+        return actions, rewards
+
     def is_over(self):
         """Returns a tuple of which the first element is a boolean of the game
         being over or not and the second element is the winner."""
 
+        if self.__array_board:
+            board = self.__gameboard
+            return not board.has_checkers("w") or not board.has_checkers("b")
+
         points = self.__gameboard.get_board()
 
         for color in ["w", "b"]:
@@ -290,6 +352,12 @@ class SarsaGame:
         """Returns a tuple of which the first element is a boolean of the game
         being over or not and the second element is the winner."""
 
+        if self.__array_board:
+            for color in ["w", "b"]:
+                if not self.__gameboard.has_checkers(color):
+                    return (True, self.get_player(color))
+            return (False, None)
+
         points = self.__gameboard.get_board()
         i = 0
         for color in ["w", "b"]:
@@ -312,6 +380,9 @@ class SarsaGame:
         statevec.append(self.__w_bourne_off)
         statevec.append(self.__b_bourne_off)
 
+        if self.__array_board:
+            return statevec + self.__gameboard.observation()
+
         for point in self.__gameboard.get_board():
             if point.get_color() == "w":
                 statevec.append(1)
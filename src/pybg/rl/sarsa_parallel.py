@@ -0,0 +1,245 @@
+"""
+Parallel SARSA training.
+
+Each worker process keeps its own copy of the Q-table and plays games with the
+sequential train() loop. After every round the master averages the changes
+each worker made to every (state, action) pair, applies them to its table and
+sends the new values back, so all copies agree again before the next round.
+"""
+
+import multiprocessing as mp
+import pickle
+import random
+import time
+from typing import NamedTuple
+
+from pybg.rl.agents.random import RandomSarsaAgent
+from pybg.rl.agents.sarsa import SarsaAgent
+from pybg.rl.sarsa_train import train
+
+
+class TrackedQ:
+    """
+    Wraps a Q mapping and remembers what each key held before its first write
+    since the last clear(), so a worker can report deltas instead of values.
+    """
+
+    def __init__(self, q):
+        self.q = q
+        self.start = {}
+
+    def get(self, key, default=None):
+        return self.q.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key not in self.start:
+            self.start[key] = self.q.get(key, 0.0)
+        self.q[key] = value
+
+    def __contains__(self, key):
+        return key in self.q
+
+    def __len__(self):
+        return len(self.q)
+
+    def deltas(self):
+        return {key: self.q[key] - value for key, value in self.start.items()}
+
+    def clear(self):
+        self.start = {}
+
+
+class WorkerReport(NamedTuple):
+    worker: int
+    games: int
+    seconds: float
+    exceptions: int
+    last_exception: str
+    deltas: dict
+
+
+def merge(q, reports):
+    """
+    Adds the mean of the workers' deltas for each key to q.
+
+    Returns:
+        dict: The new value of every key that changed.
+    """
+    totals, counts = {}, {}
+    for report in reports:
+        for key, delta in report.deltas.items():
+            totals[key] = totals.get(key, 0.0) + delta
+            counts[key] = counts.get(key, 0) + 1
+
+    updates = {}
+    for key, total in totals.items():
+        updates[key] = q.get(key, 0.0) + total / counts[key]
+        q[key] = updates[key]
+    return updates
+
+
+def copy_q(q):
+    return pickle.loads(pickle.dumps(q))
+
+
+def run_worker(connection, worker, seed, q, settings):
+    """Plays rounds of games until it receives None."""
+    random.seed(seed)
+    tracked = TrackedQ(q)
+    agent = SarsaAgent(
+        epsilon=settings["epsilon"],
+        alpha=settings["alpha"],
+        gamma=settings["gamma"],
+        q=tracked,
+    )
+    opponent = RandomSarsaAgent("opponent")
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        games, updates, snapshot = message
+
+        # Master values overwrite local ones without counting as changes.
+        for key, value in updates.items():
+            q[key] = value
+        if snapshot:
+            opponent = SarsaAgent(epsilon=settings["epsilon"], q=copy_q(q))
+
+        exceptions, last_exception = 0, ""
+        start = time.perf_counter()
+        for _ in range(games):
+            try:
+                train(agent, opponent, maxmove=settings["maxmove"])
+            except Exception as e:
+                exceptions += 1
+                last_exception = repr(e)
+
+        connection.send(
+            WorkerReport(
+                worker,
+                games,
+                time.perf_counter() - start,
+                exceptions,
+                last_exception,
+                tracked.deltas(),
+            )
+        )
+        tracked.clear()
+
+
+class ParallelSarsaTrainer:
+    """
+    Trains agent.q with several worker processes.
+
+    Args:
+        agent (SarsaAgent): The master agent. Its q may be a dict or a QTable.
+        workers (int): Number of worker processes.
+        games_per_round (int): Games each worker plays between merges.
+        opponent (str): "random" for RandomSarsaAgent, or "snapshot" to play
+            a frozen copy of the master table, refreshed every snapshot_every rounds.
+        snapshot_every (int): Rounds between opponent snapshots.
+        maxmove (int): Maximum number of moves per game.
+        seed (int): Worker i is seeded with seed + i.
+    """
+
+    def __init__(
+        self,
+        agent,
+        workers=4,
+        games_per_round=100,
+        opponent="random",
+        snapshot_every=10,
+        maxmove=100,
+        seed=0,
+    ):
+        if opponent not in ("random", "snapshot"):
+            raise ValueError(f"Unknown opponent: {opponent}")
+
+        self.agent = agent
+        self.workers = workers
+        self.games_per_round = games_per_round
+        self.opponent = opponent
+        self.snapshot_every = snapshot_every
+        self.settings = {
+            "epsilon": agent.epsilon,
+            "alpha": agent.alpha,
+            "gamma": agent.gamma,
+            "maxmove": maxmove,
+        }
+        self.seed = seed
+        self.games = 0
+        self.exceptions = [0] * workers
+
+    def train(self, games, checkpoint=None, checkpoint_every=0, verbose=1):
+        """
+        Plays at least `games` games in total.
+
+        Args:
+            checkpoint (callable): Called with the master agent every
+                checkpoint_every games, e.g. to save its table.
+        """
+        connections, processes = [], []
+        for worker in range(self.workers):
+            parent, child = mp.Pipe()
+            process = mp.Process(
+                target=run_worker,
+                args=(
+                    child,
+                    worker,
+                    self.seed + worker,
+                    copy_q(self.agent.q),
+                    self.settings,
+                ),
+                daemon=True,
+            )
+            process.start()
+            connections.append(parent)
+            processes.append(process)
+
+        updates, rounds, next_checkpoint = {}, 0, checkpoint_every
+        try:
+            while self.games < games:
+                snapshot = self.opponent == "snapshot" and (
+                    rounds % self.snapshot_every == 0
+                )
+                start = time.perf_counter()
+                for connection in connections:
+                    connection.send((self.games_per_round, updates, snapshot))
+                reports = [connection.recv() for connection in connections]
+                updates = merge(self.agent.q, reports)
+                elapsed = time.perf_counter() - start
+
+                rounds += 1
+                self.games += sum(report.games for report in reports)
+                for report in reports:
+                    self.exceptions[report.worker] += report.exceptions
+
+                if verbose:
+                    self.report(reports, elapsed)
+                if checkpoint and checkpoint_every and self.games >= next_checkpoint:
+                    checkpoint(self.agent)
+                    next_checkpoint += checkpoint_every
+        finally:
+            for connection in connections:
+                connection.send(None)
+            for process in processes:
+                process.join()
+
+        return self.agent
+
+    def report(self, reports, elapsed):
+        games = sum(report.games for report in reports)
+        print(
+            f"{self.games} games, {games / elapsed:.1f} games/sec, "
+            f"{len(self.agent.q)} Q-values"
+        )
+        for report in reports:
+            line = (
+                f"  worker {report.worker}: "
+                f"{report.games / max(report.seconds, 1e-9):.1f} games/sec, "
+                f"{report.exceptions} exceptions ({self.exceptions[report.worker]} total)"
+            )
+            if report.last_exception:
+                line += f", last: {report.last_exception}"
+            print(line)
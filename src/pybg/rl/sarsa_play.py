@@ -15,6 +15,8 @@ This script allows us to play against a SARSA Backgammon agent.
 import argparse
 import pickle
 
+from pybg.rl.agents.qtable import QTable
+from pybg.rl.agents.sarsa import SarsaAgent
 from pybg.rl.game.sarsa_game import SarsaGame
 
 if __name__ == "__main__":
@@ -28,12 +30,22 @@ if __name__ == "__main__":
     )
     PARSER.add_argument("--games", "-g", help="Number of games to play.", default=1)
 
+    PARSER.add_argument(
+        "--qtable",
+        "-q",
+        help="Directory of a compact Q-table to play against instead of --name.",
+        default=None,
+    )
+
     ARGS = PARSER.parse_args()
 
-    filename = ARGS.name
-    infile = open(filename, "rb")
-    agent = pickle.load(infile)
-    infile.close()
+    if ARGS.qtable:
+        agent = SarsaAgent(q=QTable.load(ARGS.qtable, mmap_mode="r"))
+    else:
+        filename = ARGS.name
+        infile = open(filename, "rb")
+        agent = pickle.load(infile)
+        infile.close()
 
     # TODO Make human player 1
     opponent = "human"
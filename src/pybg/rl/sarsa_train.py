@@ -1,13 +1,16 @@
 import argparse
+import os
 import pickle
 
+from pybg.core.logger import strip_debug
 from pybg.rl.game.sarsa_game import SarsaGame
 from pybg.rl.agents.sarsa import SarsaAgent
 from pybg.rl.agents.random import RandomSarsaAgent
+from pybg.rl.agents.qtable import QTable
 
 
 def train(agent_train, opponent, maxmove):
-    gamei = SarsaGame(agent_train, opponent)
+    gamei = SarsaGame(agent_train, opponent, array_board=True)
     num_move = 0
     gamei.roll_dice()
     while (num_move < maxmove) and (not gamei.is_over()):
@@ -40,7 +43,7 @@ def train(agent_train, opponent, maxmove):
             gamei.roll_dice()
             for i in range(2):
                 if not gamei.is_over():
-                    nextstate = gamei.get_dice(i)
+                    nextstate = gamei.get_state3(gamei.get_dice(i))
                     possible_actions, their_rewards = gamei.get_actions(
                         opponent, gamei.get_dice(i)
                     )
@@ -80,16 +83,74 @@ if __name__ == "__main__":
         default=0,
     )
 
+    PARSER.add_argument(
+        "--qtable",
+        "-q",
+        help="Directory for a compact, memory-mapped Q-table instead of a pickle.",
+        default=None,
+    )
+    PARSER.add_argument(
+        "--checkpoint",
+        help="Write an incremental Q-table checkpoint every N games.",
+        default=0,
+        type=int,
+    )
+    PARSER.add_argument(
+        "--workers",
+        "-w",
+        help="Train in N worker processes, merging their Q updates every round.",
+        default=1,
+        type=int,
+    )
+    PARSER.add_argument(
+        "--round", help="Games per worker between merges.", default=100, type=int
+    )
+    PARSER.add_argument(
+        "--opponent",
+        help="Opponent for parallel training: 'random' or 'snapshot'.",
+        default="random",
+    )
+
     ARGS = PARSER.parse_args()
+    strip_debug()
 
-    if bool(int(ARGS.continued)):
+    if ARGS.qtable:
+        if bool(int(ARGS.continued)) and os.path.exists(ARGS.qtable):
+            agent = SarsaAgent(q=QTable.load(ARGS.qtable))
+        else:
+            agent = SarsaAgent(q=QTable())
+    elif bool(int(ARGS.continued)):
         infilename = ARGS.name
         with open(infilename, "rb") as f:
             agent = pickle.load(f)
     else:
         agent = SarsaAgent()
 
-    for i in range(int(ARGS.games)):
+    def save_checkpoint(agent):
+        if ARGS.qtable:
+            agent.q.checkpoint(ARGS.qtable)
+        else:
+            with open(ARGS.name, "wb") as f:
+                pickle.dump(agent, f)
+
+    if ARGS.workers > 1:
+        from pybg.rl.sarsa_parallel import ParallelSarsaTrainer
+
+        trainer = ParallelSarsaTrainer(
+            agent,
+            workers=ARGS.workers,
+            games_per_round=ARGS.round,
+            opponent=ARGS.opponent,
+            maxmove=int(ARGS.maxmove),
+        )
+        agent = trainer.train(
+            int(ARGS.games),
+            checkpoint=save_checkpoint,
+            checkpoint_every=ARGS.checkpoint,
+            verbose=int(ARGS.verbose),
+        )
+
+    for i in range(int(ARGS.games) if ARGS.workers <= 1 else 0):
         if int(ARGS.verbose):
             print("Completed {} games".format(i))
         try:
@@ -98,10 +159,15 @@ if __name__ == "__main__":
             )
         except:
             pass
+        if ARGS.checkpoint and (i + 1) % ARGS.checkpoint == 0:
+            save_checkpoint(agent)
 
-    if bool(int(ARGS.continued)):
-        outfilename = "{}-updated.pkl".format(ARGS.name)
+    if ARGS.qtable:
+        agent.q.save(ARGS.qtable)
     else:
-        outfilename = ARGS.name
-    with open(outfilename, "wb") as f:
-        pickle.dump(agent, f)
+        if bool(int(ARGS.continued)):
+            outfilename = "{}-updated.pkl".format(ARGS.name)
+        else:
+            outfilename = ARGS.name
+        with open(outfilename, "wb") as f:
+            pickle.dump(agent, f)
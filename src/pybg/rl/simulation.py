@@ -0,0 +1,409 @@
+"""
+Vectorized playouts: many complete cubeless games stepped in lockstep.
+
+Games are held the way BackgammonVectorEnv holds them, one row per game of
+NumPy arrays from the point of view of the side to move, and are moved with
+its legal_moves and apply_moves. Each turn, generate_afterstates expands the
+rolls of every active game a checker at a time, all games together, into the
+distinct positions their legal plays lead to. A player then scores all of
+those afterstates in one batch and each game takes its best one:
+
+    random   uniformly random among the distinct plays
+    pubeval  Tesauro's pubeval, vectorized over the afterstates
+    network  the cubeless equity of the contact, crashed and race networks
+             of a GNUBG weights file, such as one td_train exports
+
+simulate() plays a number of games, in chunks across a process pool, and
+returns per-game arrays: the winner, the points won (1 single, 2 gammon,
+3 backgammon), the turns played, and each side's hits and dances.
+summarize() reduces them.
+
+    python -m pybg.rl.simulation --games 20000 --players pubeval random
+    python -m pybg.rl.simulation --players network random --weights td.weights
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from pybg.core.board import BACKGAMMON_STARTING_POSITION_ID
+from pybg.core.logger import strip_debug
+from pybg.gnubg.analysis import NetworkEvaluator
+from pybg.gnubg.neural_net import WEIGHTS_FILE, classify_boards, equity
+from pybg.gnubg.pub_eval import gwc, gwr
+from pybg.rl.envs.vector_env import (
+    CHECKERS,
+    DIE_FACES,
+    POINTS,
+    BackgammonVectorEnv,
+    apply_moves,
+    legal_moves,
+    swap_players,
+    winning_multiplier,
+)
+
+PLAYERS = ("random", "pubeval", "network")
+# Afterstates scored this high are wins, which every player takes.
+WIN_SCORE = 1e9
+MAX_TURNS = 1000
+BATCH_SIZE = 1024
+# Games played by a task, from one seed, whatever the number of workers.
+CHUNK_SIZE = 8192
+
+
+def roll_dice(rolls):
+    """Returns the (N, 6) remaining uses of each face for (N, 2) rolls."""
+    dice = np.zeros((len(rolls), DIE_FACES), dtype=np.int8)
+    rows = np.arange(len(rolls))
+    np.add.at(dice, (rows, rolls[:, 0] - 1), 1)
+    np.add.at(dice, (rows, rolls[:, 1] - 1), 1)
+    doubles = rolls[:, 0] == rolls[:, 1]
+    dice[rows[doubles], rolls[doubles, 0] - 1] = 4
+    return dice
+
+
+# Columns of the states generate_afterstates searches: the game each belongs
+# to, as the bytes of an int32, then points, bar, off and remaining dice.
+OWNER, BOARD, DICE = slice(0, 4), slice(4, 32), slice(32, 38)
+
+
+def split(states):
+    """Returns views of the points, bar, off and dice columns of states."""
+    return states[:, 4:28], states[:, 28:30], states[:, 30:32], states[:, DICE]
+
+
+def owners(states):
+    return np.ascontiguousarray(states[:, OWNER]).view(np.int32).ravel()
+
+
+def distinct(rows):
+    """Returns the indexes of the first of each distinct row, in order."""
+    rows = np.ascontiguousarray(rows)
+    keys = rows.view(np.dtype((np.void, rows.shape[1]))).ravel()
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(first)
+
+
+def generate_afterstates(points, bar, off, dice):
+    """
+    Returns the distinct positions the legal plays of N games lead to.
+
+    Args:
+        points, bar, off: The games, as BackgammonVectorEnv holds them.
+        dice: (N, 6) remaining uses of each face, from roll_dice.
+
+    Returns:
+        tuple: owner (M,), the game of each afterstate in ascending order,
+            its points, bar and off, still from the mover's point of view,
+            and the pips the play used. A game with no legal play has one
+            afterstate, its position, with 0 pips used.
+    """
+    games = len(points)
+    game = np.arange(games, dtype=np.int32).view(np.int8).reshape(games, 4)
+    states = np.concatenate([game, points, bar, off, dice], axis=1).astype(np.int8)
+    done = []
+
+    while len(states):
+        # Plays that have used all their dice need no more move generation.
+        rows = np.flatnonzero(states[:, DICE].any(axis=1))
+        searched = states[rows]
+        mask = legal_moves(*split(searched))
+        movable = mask.any(axis=(1, 2))
+        finished = np.ones(len(states), dtype=bool)
+        finished[rows[movable]] = False
+        done.append(states[finished])
+
+        row, source, face = np.nonzero(mask[movable])
+        states = searched[np.flatnonzero(movable)[row]]
+        apply_moves(*split(states), source, face)
+        states = states[distinct(states)]
+
+    done = np.concatenate(done)
+    owner = owners(done)
+    # As many dice as possible must be played, and the higher one when only
+    # one can be: the legal plays are those leaving the fewest pips unused.
+    faces = np.arange(1, DIE_FACES + 1)
+    unused = done[:, DICE] @ faces
+    fewest = np.full(games, np.iinfo(np.int64).max)
+    np.minimum.at(fewest, owner, unused)
+    legal = np.flatnonzero(unused == fewest[owner])
+    keep = legal[distinct(done[legal, : BOARD.stop])]
+    keep = keep[np.argsort(owner[keep], kind="stable")]
+    afterstates = done[keep]
+    pips = (dice @ faces)[owner[keep]] - unused[keep]
+    return (owner[keep], *split(afterstates)[:3], pips)
+
+
+def best(owner, scores, games):
+    """
+    Returns the index of the highest scored afterstate of each game, given
+    afterstates sorted by owner, as generate_afterstates returns them.
+    """
+    starts = np.searchsorted(owner, np.arange(games))
+    top = np.maximum.reduceat(scores, starts)
+    candidates = np.flatnonzero(scores == top[owner])
+    return candidates[np.searchsorted(owner[candidates], np.arange(games))]
+
+
+def pubeval_table(weights):
+    """
+    Returns the (24, 31) contributions to pubeval's score of -15 to 15
+    checkers on each point.
+    """
+    n = np.arange(-CHECKERS, CHECKERS + 1)
+    features = np.stack(
+        [n == -1, n == 1, n >= 2, n == 3, np.where(n >= 4, (n - 3) / 2.0, 0.0)],
+        axis=1,
+    )
+    return weights[: POINTS * 5].reshape(POINTS, 5) @ features.T
+
+
+# Contact weights, then race weights.
+PUBEVAL_TABLES = np.stack([pubeval_table(gwc), pubeval_table(gwr)])
+PUBEVAL_WEIGHTS = np.stack([gwc[POINTS * 5 :], gwr[POINTS * 5 :]])
+
+
+def pubeval_scores(points, bar, off):
+    """
+    Tesauro's pubeval of afterstates for the side that has just moved,
+    as pubeval_x rates them, for all rows at once.
+    """
+    contact, _ = classify_boards(points)
+    race = (~contact).astype(np.int64)
+    board = PUBEVAL_TABLES[
+        race[:, None], np.arange(POINTS), points.astype(np.int64) + CHECKERS
+    ].sum(axis=1)
+    weights = PUBEVAL_WEIGHTS[race]
+    scores = board + weights[:, 0] * bar[:, 1] / 2.0 + weights[:, 1] * off[:, 0] / 15.0
+    return np.where(off[:, 0] == CHECKERS, WIN_SCORE, scores)
+
+
+class RandomPlayer:
+    def scores(self, points, bar, off, rng):
+        return rng.random(len(points))
+
+
+class PubevalPlayer:
+    def scores(self, points, bar, off, rng):
+        return pubeval_scores(points, bar, off)
+
+
+class NetworkPlayer:
+    """Scores afterstates by the networks' cubeless equity for the mover."""
+
+    def __init__(self, weights_file=WEIGHTS_FILE):
+        self.evaluator = NetworkEvaluator(weights_file)
+
+    def scores(self, points, bar, off, rng):
+        won = off[:, 0] == CHECKERS
+        scores = np.full(len(points), WIN_SCORE)
+        if (~won).any():
+            # The opponent is on roll after the play.
+            opponent = -points[~won, ::-1]
+            bars_offs = np.stack(
+                [bar[~won, 1], off[~won, 1], bar[~won, 0], off[~won, 0]], axis=1
+            )
+            scores[~won] = -equity(self.evaluator.evaluate_arrays(opponent, bars_offs))
+        return scores
+
+
+def make_player(name, weights_file=None):
+    """Builds one of PLAYERS."""
+    if name == "random":
+        return RandomPlayer()
+    if name == "pubeval":
+        return PubevalPlayer()
+    if name == "network":
+        return NetworkPlayer(weights_file or WEIGHTS_FILE)
+    raise ValueError(f"Unknown player: {name}")
+
+
+def opening_rolls(rng, games):
+    """The opening roll has no doubles; its higher die's side plays it."""
+    rolls = rng.integers(1, DIE_FACES + 1, size=(games, 2))
+    doubles = rolls[:, 0] == rolls[:, 1]
+    while doubles.any():
+        rolls[doubles] = rng.integers(1, DIE_FACES + 1, size=(doubles.sum(), 2))
+        doubles = rolls[:, 0] == rolls[:, 1]
+    return rolls
+
+
+def play_games(players, games, rng, batch_size=BATCH_SIZE, max_turns=MAX_TURNS):
+    """
+    Plays games from the starting position, batch_size of them at a time in
+    lockstep. A finished game's place in the batch goes to the next game.
+
+    Args:
+        players: The two players' scorers, for seats 0 and 1.
+        games (int): The number of games.
+        rng (np.random.Generator): The dice, and the random players' choices.
+
+    Returns:
+        dict: Per-game arrays, as simulate() returns them.
+    """
+    start = BackgammonVectorEnv.decode_position(BACKGAMMON_STARTING_POSITION_ID)
+    points, bar, off = (np.tile(a, (games, 1)) for a in start)
+    side = np.zeros(games, dtype=np.int8)
+    result = {
+        "winner": np.full(games, -1, dtype=np.int8),
+        "points": np.zeros(games, dtype=np.int8),
+        "turns": np.zeros(games, dtype=np.int32),
+        "hits": np.zeros((games, 2), dtype=np.int32),
+        "dances": np.zeros((games, 2), dtype=np.int32),
+    }
+    active = np.zeros(0, dtype=np.int64)
+    started = 0
+
+    while started < games or len(active):
+        fresh = np.arange(started, min(games, started + batch_size - len(active)))
+        started += len(fresh)
+        opening = opening_rolls(rng, len(fresh))
+        side[fresh] = opening[:, 0] < opening[:, 1]
+        rolls = np.concatenate(
+            [rng.integers(1, DIE_FACES + 1, size=(len(active), 2)), opening]
+        )
+        active = np.concatenate([active, fresh])
+
+        owner, after_points, after_bar, after_off, pips = generate_afterstates(
+            points[active], bar[active], off[active], roll_dice(rolls)
+        )
+        seats = side[active]
+        scores = np.zeros(len(owner))
+        for seat, player in enumerate(players):
+            rows = seats[owner] == seat
+            if rows.any():
+                scores[rows] = player.scores(
+                    after_points[rows], after_bar[rows], after_off[rows], rng
+                )
+        chosen = best(owner, scores, len(active))
+
+        hits = after_bar[chosen, 1] - bar[active, 1]
+        np.add.at(result["hits"], (active, seats), hits)
+        np.add.at(result["dances"], (active, seats), pips[chosen] == 0)
+        result["turns"][active] += 1
+        points[active] = after_points[chosen]
+        bar[active] = after_bar[chosen]
+        off[active] = after_off[chosen]
+
+        won = off[active, 0] == CHECKERS
+        if won.any():
+            winners = active[won]
+            result["winner"][winners] = side[winners]
+            result["points"][winners] = winning_multiplier(
+                points[winners], bar[winners], off[winners]
+            )
+        active = active[~won & (result["turns"][active] < max_turns)]
+
+        rows = (points[active], bar[active], off[active])
+        swap_players(*rows)
+        points[active], bar[active], off[active] = rows
+        side[active] ^= 1
+    return result
+
+
+_WORKER = {}
+
+
+def init_worker(players, batch_size, weights_file):
+    _WORKER["players"] = [make_player(name, weights_file) for name in players]
+    _WORKER["batch_size"] = batch_size
+
+
+def run_chunk(task):
+    games, seed = task
+    rng = np.random.default_rng(seed)
+    return play_games(_WORKER["players"], games, rng, _WORKER["batch_size"])
+
+
+def simulate(
+    games,
+    players=("random", "random"),
+    batch_size=BATCH_SIZE,
+    seed=None,
+    weights_file=None,
+    workers=0,
+):
+    """
+    Plays cubeless money games between two players.
+
+    Args:
+        games (int): The number of games.
+        players: Names from PLAYERS for seats 0 and 1.
+        batch_size (int): Games stepped together.
+        seed (int): Seeds the dice and the random players. Each chunk of
+            CHUNK_SIZE games gets its own seed from it, so the results do
+            not depend on workers.
+        weights_file (str): The network player's weights.
+        workers (int): Processes to play the chunks in, 0 for this one.
+
+    Returns:
+        dict: Arrays with a row per game: "winner" (the seat), "points",
+            "turns", and "hits" and "dances" per seat. Games still unfinished
+            after MAX_TURNS turns have winner -1. They are empty when games
+            is not positive.
+    """
+    sizes = [min(CHUNK_SIZE, games - done) for done in range(0, games, CHUNK_SIZE)]
+    # A single empty chunk still gives the arrays their dtypes and shapes.
+    sizes = sizes or [0]
+    tasks = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    args = (players, batch_size, weights_file)
+    if workers > 0:
+        with mp.Pool(workers, initializer=init_worker, initargs=args) as pool:
+            chunks = pool.map(run_chunk, tasks)
+    else:
+        init_worker(*args)
+        chunks = [run_chunk(task) for task in tasks]
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+
+def summarize(result):
+    """Returns the win rates, gammon rates and points per game of seat 0."""
+    winner, points = result["winner"], result["points"].astype(np.int64)
+    games = len(winner)
+    signed = np.where(winner == 0, points, np.where(winner == 1, -points, 0))
+    return {
+        "games": games,
+        "wins": [int((winner == 0).sum()), int((winner == 1).sum())],
+        "win_rate": float((winner == 0).mean()),
+        "gammons": float((points == 2).mean()),
+        "backgammons": float((points == 3).mean()),
+        "points_per_game": float(signed.mean()),
+        "turns": float(result["turns"].mean()),
+        "hits": result["hits"].mean(axis=0).tolist(),
+        "dances": result["dances"].mean(axis=0).tolist(),
+    }
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Vectorized cubeless playouts.")
+    PARSER.add_argument("--games", type=int, default=10000)
+    PARSER.add_argument(
+        "--players", nargs=2, choices=PLAYERS, default=["random", "random"]
+    )
+    PARSER.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    PARSER.add_argument("--seed", type=int)
+    PARSER.add_argument("--weights", help="Weights file of the network player.")
+    PARSER.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="0 for none."
+    )
+    ARGS = PARSER.parse_args()
+    if ARGS.games < 1:
+        PARSER.error("--games must be at least 1")
+    strip_debug()
+
+    START = time.perf_counter()
+    RESULT = simulate(
+        ARGS.games,
+        ARGS.players,
+        ARGS.batch_size,
+        ARGS.seed,
+        ARGS.weights,
+        ARGS.workers,
+    )
+    ELAPSED = time.perf_counter() - START
+    for KEY, VALUE in summarize(RESULT).items():
+        print(f"{KEY:>16}: {VALUE}")
+    print(f"{ARGS.games * 60 / ELAPSED:,.0f} games/min")
@@ -0,0 +1,468 @@
+"""
+TD(λ) self-play training for GNUBG-shaped networks.
+
+Like TD-Gammon, both sides of every game are played by the networks being
+trained: each turn, Board.generate_plays lists the legal plays, the resulting
+positions are encoded with encode_boards and evaluated in one batch per
+network, and the play leaving the opponent the lowest equity is chosen.
+
+There is a network for each of the contact, crashed and race classes, with the
+shapes GnubgEvaluator expects; bearoff positions use the race network. Worker
+processes play games with numpy copies of the networks and send the encoded
+positions to the learner, which updates the torch networks with TD(λ) and
+sends the new weights out for the next round.
+
+Values are the five GNUBG outputs (win, win gammon, win backgammon, lose
+gammon, lose backgammon) for the side on roll. For the update they are turned
+into player 0's point of view, so that successive positions of a game can be
+compared. export() writes an nngnubg.weights file that GnubgEvaluator loads.
+"""
+
+import argparse
+import multiprocessing as mp
+import random
+import time
+from typing import NamedTuple
+
+import numpy as np
+import torch
+from torch import nn
+
+from pybg.core.board import BACKGAMMON_STARTING_POSITION_ID, CHECKERS, Board
+from pybg.core.logger import strip_debug
+from pybg.gnubg.neural_net import (
+    GnubgEvaluator,
+    GnubgNetwork,
+    encode_boards,
+    equity,
+    network_keys,
+    outcome,
+    save_all_networks,
+)
+from pybg.gnubg.position import Position, PositionClass
+
+# encode_board's width. Only its first 139 entries are features and the rest
+# padding, so a network and its prune copy, cut to 200 inputs, agree.
+FEATURES = 250
+OUTPUTS = 5
+
+NETWORKS = {
+    "contact_contact250": PositionClass.CONTACT,
+    "crashed": PositionClass.CRASHED,
+    "race": PositionClass.RACE,
+}
+PRUNE_NETWORKS = {
+    "prune_contact": "contact_contact250",
+    "prune_crashed": "crashed",
+    "prune_race": "race",
+}
+
+
+def flip(outputs):
+    """Returns the same (..., 5) outputs from the other side's point of view."""
+    if isinstance(outputs, torch.Tensor):
+        stack = torch.stack
+    else:
+        stack = np.stack
+    return stack(
+        [
+            1 - outputs[..., 0],
+            outputs[..., 3],
+            outputs[..., 4],
+            outputs[..., 1],
+            outputs[..., 2],
+        ],
+        -1,
+    )
+
+
+class TDNetwork(nn.Module):
+    """
+    A GnubgNetwork as a torch module:
+        hidden = sigmoid(-beta_hidden * (inputs @ weights1 + bias1))
+        outputs = sigmoid(-beta_output * (hidden @ weights2 + bias2))
+    """
+
+    def __init__(self, inputs, hidden=128, beta_hidden=0.1, beta_output=1.0):
+        super().__init__()
+        self.beta_hidden = beta_hidden
+        self.beta_output = beta_output
+        self.weights1 = nn.Parameter(torch.empty(inputs, hidden))
+        self.bias1 = nn.Parameter(torch.zeros(hidden))
+        self.weights2 = nn.Parameter(torch.empty(hidden, OUTPUTS))
+        self.bias2 = nn.Parameter(torch.zeros(OUTPUTS))
+        nn.init.uniform_(self.weights1, -(inputs**-0.5), inputs**-0.5)
+        nn.init.uniform_(self.weights2, -(hidden**-0.5), hidden**-0.5)
+
+    @property
+    def inputs(self):
+        return self.weights1.shape[0]
+
+    def forward(self, features):
+        hidden = torch.sigmoid(
+            -self.beta_hidden * (features @ self.weights1 + self.bias1)
+        )
+        return torch.sigmoid(-self.beta_output * (hidden @ self.weights2 + self.bias2))
+
+    @classmethod
+    def from_gnubg(cls, net):
+        module = cls(net.cInput, net.cHidden, net.rBetaHidden, net.rBetaOutput)
+        with torch.no_grad():
+            for name in ("weights1", "weights2", "bias1", "bias2"):
+                getattr(module, name).copy_(torch.from_numpy(getattr(net, name)))
+        return module
+
+    def to_gnubg(self, trained=0, inputs=None):
+        """
+        Returns a numpy GnubgNetwork copy. inputs keeps only the first weights,
+        e.g. for a prune network.
+        """
+        inputs = inputs or self.inputs
+        weights = {
+            name: getattr(self, name).detach().numpy().astype(float)
+            for name in ("weights1", "weights2", "bias1", "bias2")
+        }
+        return GnubgNetwork(
+            inputs,
+            weights["weights1"].shape[1],
+            OUTPUTS,
+            trained,
+            self.beta_hidden,
+            self.beta_output,
+            weights["weights1"][:inputs],
+            weights["weights2"],
+            weights["bias1"],
+            weights["bias2"],
+        )
+
+
+class GreedyPlayer:
+    """
+    Chooses the play with the best equity for the side to move, evaluating
+    all of a roll's resulting positions in one batch per network.
+
+    Args:
+        networks (dict): GnubgNetwork for each key of NETWORKS.
+        epsilon (float): Chance of a random play instead.
+        rng (random.Random): Source of exploration.
+    """
+
+    def __init__(self, networks, epsilon=0.0, rng=random):
+        self.networks = networks
+        self.epsilon = epsilon
+        self.rng = rng
+
+    @staticmethod
+    def encode(positions):
+        """Returns the (N, FEATURES) encoded positions and their network keys."""
+        return encode_boards(positions, FEATURES), network_keys(positions)
+
+    def evaluate(self, positions):
+        """
+        Returns the (N, 5) outputs of positions, with no finished side, for
+        their side on roll.
+        """
+        features, keys = self.encode(positions)
+        outputs = np.zeros((len(positions), OUTPUTS))
+        for key in set(keys):
+            rows = [i for i, k in enumerate(keys) if k == key]
+            net = self.networks[key]
+            outputs[rows] = net.evaluate(features[rows, : net.cInput])
+        return outputs
+
+    def choose(self, plays):
+        if len(plays) == 1:
+            return plays[0]
+        if self.epsilon and self.rng.random() < self.epsilon:
+            return self.rng.choice(plays)
+
+        equities = np.zeros(len(plays))
+        pending = []
+        for i, play in enumerate(plays):
+            if play.position.player_off == CHECKERS:
+                equities[i] = equity(outcome(play.position))
+            else:
+                pending.append(i)
+        if pending:
+            # The opponent is on roll after the play.
+            outputs = self.evaluate([plays[i].position.swap_players() for i in pending])
+            equities[pending] = -equity(outputs)
+        return plays[int(np.argmax(equities))]
+
+
+class Trajectory(NamedTuple):
+    """
+    One self-play game.
+
+    features: (T, FEATURES) float32 encoded positions, from the side on roll.
+    keys: The network key of each position.
+    movers: (T,) int8, the player on roll in each position.
+    outcome: (5,) float32 result from player 0's point of view.
+    """
+
+    features: np.ndarray
+    keys: list
+    movers: np.ndarray
+    outcome: np.ndarray
+
+
+def play_game(player, board=None, rng=random, max_moves=1000):
+    """
+    Plays a game of player against itself.
+
+    Returns:
+        Trajectory: The game, or None if it lasted more than max_moves turns.
+    """
+    board = board or Board()
+    position = Position.decode(BACKGAMMON_STARTING_POSITION_ID)
+    mover = rng.randrange(2)
+    positions, movers = [], []
+
+    for _ in range(max_moves):
+        positions.append(position)
+        movers.append(mover)
+
+        board.position = position
+        board.match.dice = (rng.randint(1, 6), rng.randint(1, 6))
+        position = player.choose(board.generate_plays()).position
+
+        if position.player_off == CHECKERS:
+            result = outcome(position)
+            features, keys = player.encode(positions)
+            return Trajectory(
+                features.astype(np.float32),
+                keys,
+                np.array(movers, dtype=np.int8),
+                result if mover == 0 else flip(result),
+            )
+        position = position.swap_players()
+        mover = 1 - mover
+    return None
+
+
+class TDTrainer:
+    """
+    Trains contact, crashed and race networks by TD(λ) self-play.
+
+    Args:
+        hidden (int): Hidden units of new networks.
+        alpha (float): Learning rate.
+        lam (float): Trace decay λ.
+        epsilon (float): Chance of a random play while training.
+        workers (int): Worker processes playing games, 0 to play in-process.
+        games_per_round (int): Games each worker plays between updates.
+        max_moves (int): Turns after which a game is abandoned.
+        seed (int): Worker i is seeded with seed + i.
+        weights_file (str): Continue from the networks in a weights file.
+    """
+
+    def __init__(
+        self,
+        hidden=128,
+        alpha=0.1,
+        lam=0.7,
+        epsilon=0.0,
+        workers=0,
+        games_per_round=10,
+        max_moves=1000,
+        seed=0,
+        weights_file=None,
+    ):
+        if weights_file:
+            loaded = GnubgEvaluator(weights_file).load_all_networks()
+            self.networks = {key: TDNetwork.from_gnubg(loaded[key]) for key in NETWORKS}
+        else:
+            torch.manual_seed(seed)
+            self.networks = {
+                key: TDNetwork(position_class.net_input_count, hidden)
+                for key, position_class in NETWORKS.items()
+            }
+        self.optimizer = torch.optim.SGD(
+            [p for net in self.networks.values() for p in net.parameters()], lr=alpha
+        )
+        self.lam = lam
+        self.epsilon = epsilon
+        self.workers = workers
+        self.games_per_round = games_per_round
+        self.max_moves = max_moves
+        self.seed = seed
+        self.games = 0
+        self.abandoned = 0
+
+    def values(self, trajectory):
+        """Returns the (T, 5) outputs of a game from player 0's point of view."""
+        features = torch.from_numpy(trajectory.features)
+        outputs = [None] * len(trajectory.keys)
+        for key in set(trajectory.keys):
+            rows = [i for i, k in enumerate(trajectory.keys) if k == key]
+            net = self.networks[key]
+            for row, value in zip(rows, net(features[rows, : net.inputs])):
+                outputs[row] = value
+        outputs = torch.stack(outputs)
+        movers = torch.from_numpy(trajectory.movers).bool().unsqueeze(1)
+        return torch.where(movers, flip(outputs), outputs)
+
+    def update(self, trajectory):
+        """
+        Applies TD(λ) with accumulating eligibility traces over one game.
+
+        With traces e_t = λ e_t-1 + ∇y_t and errors δ_t = y_t+1 - y_t, the
+        game's total change Σ_t δ_t · e_t equals Σ_t D_t · ∇y_t, where
+        D_t = δ_t + λ D_t+1. The second form needs one backward pass for the
+        whole game instead of a gradient per position and output.
+        """
+        values = self.values(trajectory)
+        with torch.no_grad():
+            targets = torch.cat(
+                [values[1:], torch.from_numpy(trajectory.outcome)[None]]
+            )
+            errors = targets - values
+            traced = torch.zeros_like(errors)
+            carry = torch.zeros(OUTPUTS)
+            for t in range(len(errors) - 1, -1, -1):
+                carry = errors[t] + self.lam * carry
+                traced[t] = carry
+
+        self.optimizer.zero_grad()
+        # SGD descends, so the step of -Σ D_t · y_t is +α Σ D_t · ∇y_t.
+        (-(traced * values).sum()).backward()
+        self.optimizer.step()
+        return float(errors.abs().mean())
+
+    def gnubg_networks(self):
+        """Returns numpy copies of the networks, prune networks included."""
+        networks = {key: net.to_gnubg(self.games) for key, net in self.networks.items()}
+        for prune, key in PRUNE_NETWORKS.items():
+            inputs = NETWORKS[key].prune_input_count
+            networks[prune] = self.networks[key].to_gnubg(self.games, inputs)
+        return networks
+
+    def export(self, path):
+        """Writes the networks as an nngnubg.weights file."""
+        save_all_networks(self.gnubg_networks(), path)
+
+    def train(self, games, checkpoint=None, checkpoint_every=0, verbose=1):
+        """
+        Plays at least `games` games in total.
+
+        Args:
+            checkpoint (callable): Called with the trainer every
+                checkpoint_every games, e.g. to export its networks.
+        """
+        connections, processes = [], []
+        for worker in range(self.workers):
+            parent, child = mp.Pipe()
+            process = mp.Process(
+                target=run_worker,
+                args=(child, self.seed + worker, self.epsilon, self.max_moves),
+                daemon=True,
+            )
+            process.start()
+            connections.append(parent)
+            processes.append(process)
+
+        rng = random.Random(self.seed)
+        board = Board()
+        next_checkpoint = checkpoint_every
+        try:
+            while self.games < games:
+                start = time.perf_counter()
+                networks = self.gnubg_networks()
+                if connections:
+                    for connection in connections:
+                        connection.send((self.games_per_round, networks))
+                    trajectories = [t for c in connections for t in c.recv()]
+                else:
+                    player = GreedyPlayer(networks, self.epsilon, rng)
+                    trajectories = [
+                        play_game(player, board, rng, self.max_moves)
+                        for _ in range(self.games_per_round)
+                    ]
+
+                played = time.perf_counter()
+                errors = [self.update(t) for t in trajectories if t is not None]
+                self.games += len(trajectories)
+                self.abandoned += trajectories.count(None)
+
+                if verbose:
+                    end = time.perf_counter()
+                    print(
+                        f"{self.games} games, "
+                        f"{len(trajectories) / (end - start):.1f} games/sec "
+                        f"({played - start:.2f}s playing, {end - played:.2f}s learning), "
+                        f"mean |TD error| {np.mean(errors) if errors else 0:.4f}"
+                    )
+                if checkpoint and checkpoint_every and self.games >= next_checkpoint:
+                    checkpoint(self)
+                    next_checkpoint += checkpoint_every
+        finally:
+            for connection in connections:
+                connection.send(None)
+            for process in processes:
+                process.join()
+
+        return self
+
+
+def run_worker(connection, seed, epsilon, max_moves):
+    """Plays rounds of games with the networks it is sent, until it gets None."""
+    rng = random.Random(seed)
+    board = Board()
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        games, networks = message
+        player = GreedyPlayer(networks, epsilon, rng)
+        connection.send(
+            [play_game(player, board, rng, max_moves) for _ in range(games)]
+        )
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(
+        description="Train GNUBG-shaped networks by TD(λ) self-play"
+    )
+    PARSER.add_argument("--games", "-g", default=1000, type=int)
+    PARSER.add_argument("--workers", "-w", default=0, type=int)
+    PARSER.add_argument(
+        "--round", "-r", default=10, type=int, help="Games per worker per update"
+    )
+    PARSER.add_argument("--hidden", default=128, type=int)
+    PARSER.add_argument("--alpha", "-a", default=0.1, type=float)
+    PARSER.add_argument("--lam", "-l", default=0.7, type=float)
+    PARSER.add_argument("--epsilon", "-e", default=0.0, type=float)
+    PARSER.add_argument(
+        "--init", "-i", default=None, help="Optional: weights file to continue from"
+    )
+    PARSER.add_argument("--output", "-o", default="models/td.weights")
+    PARSER.add_argument(
+        "--checkpoint",
+        "-c",
+        default=0,
+        type=int,
+        help="Optional: export the networks every N games",
+    )
+    PARSER.add_argument("--seed", "-s", default=0, type=int)
+    PARSER.add_argument("--verbose", "-v", default=1, type=int)
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    TRAINER = TDTrainer(
+        hidden=ARGS.hidden,
+        alpha=ARGS.alpha,
+        lam=ARGS.lam,
+        epsilon=ARGS.epsilon,
+        workers=ARGS.workers,
+        games_per_round=ARGS.round,
+        seed=ARGS.seed,
+        weights_file=ARGS.init,
+    )
+    TRAINER.train(
+        ARGS.games,
+        checkpoint=lambda trainer: trainer.export(ARGS.output),
+        checkpoint_every=ARGS.checkpoint,
+        verbose=ARGS.verbose,
+    )
+    TRAINER.export(ARGS.output)
+    print(f"Saved {ARGS.output} ({TRAINER.abandoned} games abandoned)")
@@ -0,0 +1,587 @@
+"""
+Bot-vs-bot tournaments with ratings.
+
+Entrants are players that pick one of Board.generate_plays' plays each turn.
+They are given as specs, "kind" or "kind:arg:...", looked up in PLAYERS:
+
+    random                  a uniformly random play
+    pubeval                 the best play by Tesauro's pubeval
+    td:weights              the best play by the GNUBG-shaped networks of
+                            a weights file exported by td_train
+    policy:algorithm:model  an SB3 model trained on AfterstateEnv
+
+register_player() adds more kinds. Every pairing of a round-robin, or of the
+first entrant against each other one in a gauntlet, plays a series of
+cubeless money games, or of N-point matches, spread over a process pool.
+
+Each game or match draws its dice from its own seed, so results do not depend
+on the number of workers or the order they finish in. The same seeds are used
+by every pairing, and with mirroring each seed is played twice with the seats
+swapped: each player gets the dice the other had, which takes much of the
+luck out of the comparison. Results are written to a JSON lines file as they
+arrive, and summarize() turns them into win rates, points per game with 95%
+confidence intervals, maximum likelihood Elo ratings and FIBS ratings.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import random
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from pybg.core.board import BACKGAMMON_STARTING_POSITION_ID, CHECKERS, Board
+from pybg.core.logger import strip_debug
+from pybg.gnubg.neural_net import GnubgEvaluator
+from pybg.gnubg.position import Position
+from pybg.gnubg.pub_eval import pubeval_x
+from pybg.rl.td_train import NETWORKS, GreedyPlayer, network_keys
+
+FORMATS = ("round-robin", "gauntlet")
+# Ratings start, and Elo ratings are centred, here.
+INITIAL_RATING = 1500.0
+# Pseudo-games won by each side of a pairing before the Elo fit, so that a
+# clean sweep gives a finite rating difference.
+ELO_PRIOR = 0.5
+Z_95 = 1.96
+# Abandoned games after which a match is given up, undecided.
+MAX_ABANDONED = 10
+
+
+class RandomPlayer:
+    def choose(self, position, plays, rng):
+        return rng.choice(plays)
+
+
+class PubevalPlayer:
+    """Picks the play whose position pubeval rates highest."""
+
+    def choose(self, position, plays, rng):
+        if len(plays) == 1:
+            return plays[0]
+        positions = [play.position for play in plays]
+        races = [key == "race" for key in network_keys(positions)]
+        scores = [
+            pubeval_x(race, position.to_array())
+            for race, position in zip(races, positions)
+        ]
+        return plays[int(np.argmax(scores))]
+
+
+class NetworkPlayer:
+    """Picks the best play by the contact, crashed and race networks of a
+    GNUBG-format weights file."""
+
+    def __init__(self, weights_file):
+        networks = GnubgEvaluator(weights_file).load_all_networks()
+        self.greedy = GreedyPlayer({key: networks[key] for key in NETWORKS})
+
+    def choose(self, position, plays, rng):
+        return self.greedy.choose(plays)
+
+
+class PolicyPlayer:
+    """Picks plays with a model trained on AfterstateEnv observations."""
+
+    def __init__(self, algorithm, model):
+        # Imported here so that tournaments without policies do not need SB3.
+        from sb3_contrib import MaskablePPO
+
+        from pybg.rl.agents.policy import algorithm_class
+
+        self.model = algorithm_class(algorithm).load(model, device="cpu")
+        self.masked = isinstance(self.model, MaskablePPO)
+        self.max_plays = int(self.model.action_space.n)
+
+    def choose(self, position, plays, rng):
+        from pybg.rl.envs.afterstate_env import afterstate_observation
+
+        if len(plays) == 1:
+            return plays[0]
+        observation = afterstate_observation(position, plays, self.max_plays)
+        kwargs = {"action_masks": observation["mask"].astype(bool)}
+        action, _ = self.model.predict(
+            observation, deterministic=True, **(kwargs if self.masked else {})
+        )
+        action = int(np.ravel(action)[0])
+        return plays[action if action < len(plays) else 0]
+
+
+PLAYERS = {
+    "random": RandomPlayer,
+    "pubeval": PubevalPlayer,
+    "td": NetworkPlayer,
+    "policy": PolicyPlayer,
+}
+
+
+def register_player(kind, factory):
+    """
+    Makes `kind` usable in specs. factory is called with the spec's arguments
+    and returns an object with a choose(position, plays, rng) method, which
+    picks one of the plays from position, the side on roll's point of view.
+    """
+    PLAYERS[kind] = factory
+
+
+def make_player(spec):
+    """Builds the player for a spec like "td:models/td.weights"."""
+
+    kind, *args = spec.split(":")
+    try:
+        factory = PLAYERS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown player kind: {kind}")
+    return factory(*args)
+
+
+class Unit(NamedTuple):
+    """A game, or a match, of a pairing, with the seat each player takes."""
+
+    pairing: tuple
+    game: int
+    seed: str
+    seats: tuple
+
+
+def play_game(players, dice, choices, board, max_turns=1000):
+    """
+    Plays a cubeless game between the players in seats 0 and 1.
+
+    Args:
+        dice (random.Random): Source of the dice.
+        choices (random.Random): Source of the players' random choices.
+
+    Returns:
+        tuple: (winning seat, points, turns). The seat is None and the points
+        0 if the game lasted more than max_turns turns.
+    """
+    position = Position.decode(BACKGAMMON_STARTING_POSITION_ID)
+    while True:
+        # The opening roll is one die each; the higher one moves first.
+        first, second = dice.randint(1, 6), dice.randint(1, 6)
+        if first != second:
+            break
+    mover = 0 if first > second else 1
+    roll = (first, second)
+
+    for turn in range(1, max_turns + 1):
+        board.position = position
+        board.match.dice = roll
+        position = (
+            players[mover].choose(position, board.generate_plays(), choices).position
+        )
+        if position.player_off == CHECKERS:
+            board.position = position
+            return mover, int(board.multiplier()), turn
+        position = position.swap_players()
+        mover = 1 - mover
+        roll = (dice.randint(1, 6), dice.randint(1, 6))
+    return None, 0, max_turns
+
+
+def play_unit(
+    players, unit, length=0, max_turns=1000, board=None, max_abandoned=MAX_ABANDONED
+):
+    """
+    Plays a unit between the players, given by entrant name.
+
+    Returns:
+        dict: The result record. "points" are the points the pairing's first
+        player won, negative if it lost; for a match, "score" is the final
+        score in pairing order and "abandoned" the games that were. A match
+        with max_abandoned abandoned games is given up with no winner.
+    """
+    board = board or Board()
+    dice = random.Random(unit.seed)
+    choices = random.Random(f"{unit.seed}:{unit.seats[0]}")
+    seated = [players[name] for name in unit.seats]
+    first = unit.pairing[0]
+
+    record = {
+        "pairing": list(unit.pairing),
+        "game": unit.game,
+        "seed": unit.seed,
+        "seats": list(unit.seats),
+    }
+    if not length:
+        seat, points, turns = play_game(seated, dice, choices, board, max_turns)
+        winner = None if seat is None else unit.seats[seat]
+        record.update(
+            winner=winner,
+            points=points if winner == first else -points,
+            turns=turns,
+        )
+        return record
+
+    # A cubeless match: games until a side reaches `length` points.
+    score = {name: 0 for name in unit.pairing}
+    games = turns = abandoned = 0
+    while max(score.values()) < length and abandoned < max_abandoned:
+        seat, points, game_turns = play_game(seated, dice, choices, board, max_turns)
+        games += 1
+        turns += game_turns
+        if seat is None:
+            abandoned += 1
+        else:
+            score[unit.seats[seat]] += points
+    if max(score.values()) < length:
+        winner, points = None, 0
+    else:
+        winner = max(score, key=score.get)
+        points = 1 if winner == first else -1
+    record.update(
+        winner=winner,
+        points=points,
+        score=[score[name] for name in unit.pairing],
+        games=games,
+        turns=turns,
+        abandoned=abandoned,
+    )
+    return record
+
+
+# Each worker builds its players once.
+_WORKER = {}
+
+
+def init_worker(entrants, length, max_turns):
+    _WORKER["players"] = {name: make_player(spec) for name, spec in entrants.items()}
+    _WORKER["board"] = Board()
+    _WORKER["length"] = length
+    _WORKER["max_turns"] = max_turns
+
+
+def run_unit(unit):
+    return play_unit(
+        _WORKER["players"],
+        unit,
+        _WORKER["length"],
+        _WORKER["max_turns"],
+        _WORKER["board"],
+    )
+
+
+class Tournament:
+    """
+    Args:
+        entrants (dict): Player spec of each entrant, by name.
+        format (str): "round-robin", or "gauntlet" for the first entrant
+            against each of the others.
+        games (int): Games, or matches, per pairing. With mirroring an odd
+            number is rounded up.
+        length (int): Match length in points, 0 for money games.
+        mirror (bool): Play each dice seed twice, with the seats swapped.
+        seed (int): Base of the dice seeds.
+        workers (int): Processes to play in, 0 to play in this one.
+        max_turns (int): Turns after which a game is abandoned, as a draw. A
+            match is given up after MAX_ABANDONED abandoned games.
+    """
+
+    def __init__(
+        self,
+        entrants,
+        format="round-robin",
+        games=100,
+        length=0,
+        mirror=True,
+        seed=0,
+        workers=0,
+        max_turns=1000,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown tournament format: {format}")
+        if len(entrants) < 2:
+            raise ValueError("A tournament needs at least two entrants")
+        self.entrants = dict(entrants)
+        self.format = format
+        self.games = games + games % 2 if mirror else games
+        self.length = length
+        self.mirror = mirror
+        self.seed = seed
+        self.workers = workers
+        self.max_turns = max_turns
+
+    def pairings(self):
+        names = list(self.entrants)
+        if self.format == "gauntlet":
+            return [(names[0], name) for name in names[1:]]
+        return list(itertools.combinations(names, 2))
+
+    def units(self):
+        """Lists every game of the tournament, pairing by pairing."""
+
+        units = []
+        for pairing in self.pairings():
+            for game in range(self.games):
+                if self.mirror:
+                    seed = f"{self.seed}:{game // 2}"
+                    seats = pairing if game % 2 == 0 else pairing[::-1]
+                else:
+                    seed, seats = f"{self.seed}:{game}", pairing
+                units.append(Unit(pairing, game, seed, seats))
+        return units
+
+    def run(self, output=None, verbose=0):
+        """
+        Plays the tournament.
+
+        Args:
+            output (str): JSON lines file to append each record to as it
+                arrives.
+            verbose (int): Print progress every `verbose` records.
+
+        Returns:
+            list: The records, in the order of units().
+        """
+        units = self.units()
+        initargs = (self.entrants, self.length, self.max_turns)
+        records = []
+        stream = open(output, "a") if output else None
+        start = time.perf_counter()
+        try:
+            if self.workers:
+                pool = mp.Pool(self.workers, initializer=init_worker, initargs=initargs)
+                results = pool.imap_unordered(run_unit, units)
+            else:
+                pool = None
+                init_worker(*initargs)
+                results = map(run_unit, units)
+
+            for record in results:
+                records.append(record)
+                if stream:
+                    stream.write(json.dumps(record) + "\n")
+                    stream.flush()
+                if verbose and len(records) % verbose == 0:
+                    rate = len(records) / (time.perf_counter() - start)
+                    print(f"{len(records)}/{len(units)} played, {rate:.1f}/sec")
+            if pool:
+                pool.close()
+                pool.join()
+        finally:
+            if stream:
+                stream.close()
+
+        order = {(tuple(u.pairing), u.game): i for i, u in enumerate(units)}
+        records.sort(key=lambda r: order[(tuple(r["pairing"]), r["game"])])
+        return records
+
+
+def load_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def confidence_interval(values, paired=False):
+    """
+    Returns the mean of values and the half-width of its 95% confidence
+    interval. With paired, values come in mirrored pairs, and the interval is
+    worked out from the pair means, which keeps the luck the pairs share out
+    of it.
+    """
+    values = np.asarray(values, dtype=float)
+    if paired and len(values) >= 4 and len(values) % 2 == 0:
+        values = values.reshape(-1, 2).mean(axis=1)
+    if len(values) < 2:
+        return float(values.mean()) if len(values) else 0.0, math.inf
+    return float(values.mean()), Z_95 * values.std(ddof=1) / math.sqrt(len(values))
+
+
+def elo_ratings(wins, names, prior=ELO_PRIOR, iterations=1000):
+    """
+    Fits Elo ratings to win counts by maximum likelihood (Bradley-Terry),
+    centred on INITIAL_RATING.
+
+    Args:
+        wins (dict): Wins of a against b by (a, b).
+    """
+    index = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    won = np.zeros((n, n))
+    for (a, b), count in wins.items():
+        won[index[a], index[b]] += count
+    played = won + won.T
+    met = played > 0
+    won[met] += prior
+    played[met] += 2 * prior
+
+    strength = np.ones(n)
+    for _ in range(iterations):
+        pair = strength[:, None] + strength[None, :]
+        denominator = (played / pair).sum(axis=1)
+        updated = np.where(
+            denominator > 0,
+            won.sum(axis=1) / np.where(denominator > 0, denominator, 1),
+            strength,
+        )
+        updated /= np.exp(np.log(updated).mean())
+        if np.allclose(updated, strength, rtol=1e-10, atol=0):
+            break
+        strength = updated
+
+    ratings = 400 * np.log10(strength)
+    ratings += INITIAL_RATING - ratings.mean()
+    return {name: float(ratings[index[name]]) for name in names}
+
+
+def fibs_ratings(records, names, length=1):
+    """
+    Rates the players by FIBS' formula, record by record: the winner of an
+    N-point match takes 4·√N times the chance it had of losing from the
+    loser, whose chance comes from the rating difference D as
+    1 / (10^(D·√N / 2000) + 1). Money games count as 1-point matches.
+    """
+    ratings = {name: INITIAL_RATING for name in names}
+    factor = math.sqrt(max(length, 1))
+    for record in records:
+        winner = record["winner"]
+        if winner is None:
+            continue
+        a, b = record["pairing"]
+        loser = b if winner == a else a
+        difference = ratings[winner] - ratings[loser]
+        upset = 1 / (10 ** (difference * factor / 2000) + 1)
+        change = 4 * factor * upset
+        ratings[winner] += change
+        ratings[loser] -= change
+    return ratings
+
+
+def summarize(records, length=0, mirror=True):
+    """
+    Returns the statistics of a tournament's records.
+
+    Returns:
+        dict: "pairings", one entry per pairing with the first player's wins,
+        win rate and points per game, or per match, and its confidence
+        interval; "players", each player's totals over all its pairings, with
+        "elo" and "fibs" ratings.
+    """
+    by_pairing = {}
+    for record in records:
+        by_pairing.setdefault(tuple(record["pairing"]), []).append(record)
+    names = list(dict.fromkeys(name for pairing in by_pairing for name in pairing))
+
+    pairings, wins = [], {}
+    totals = {name: {"played": 0, "won": 0, "points": 0} for name in names}
+    for (a, b), results in by_pairing.items():
+        results.sort(key=lambda r: r["game"])
+        points = [r["points"] for r in results]
+        a_wins = sum(r["winner"] == a for r in results)
+        b_wins = sum(r["winner"] == b for r in results)
+        mean, half_width = confidence_interval(points, paired=mirror)
+        pairings.append(
+            {
+                "players": [a, b],
+                "played": len(results),
+                "wins": [a_wins, b_wins],
+                "win rate": a_wins / len(results),
+                "ppg": mean,
+                "ppg 95%": half_width,
+            }
+        )
+        wins[(a, b)], wins[(b, a)] = a_wins, b_wins
+        for name, won, sign in ((a, a_wins, 1), (b, b_wins, -1)):
+            totals[name]["played"] += len(results)
+            totals[name]["won"] += won
+            totals[name]["points"] += sign * sum(points)
+
+    elo = elo_ratings(wins, names)
+    ordered = sorted(records, key=lambda r: (tuple(r["pairing"]), r["game"]))
+    fibs = fibs_ratings(ordered, names, length or 1)
+    players = {
+        name: {
+            "played": total["played"],
+            "win rate": total["won"] / total["played"],
+            "ppg": total["points"] / total["played"],
+            "elo": elo[name],
+            "fibs": fibs[name],
+        }
+        for name, total in totals.items()
+    }
+    return {"pairings": pairings, "players": players}
+
+
+def format_summary(summary):
+    lines = [
+        f"{'pairing':<32} {'played':>6} {'win rate':>8} {'ppg':>17}",
+    ]
+    for p in summary["pairings"]:
+        lines.append(
+            f"{' vs '.join(p['players']):<32} {p['played']:>6} "
+            f"{p['win rate']:>8.3f} {p['ppg']:>+8.3f} ± {p['ppg 95%']:<6.3f}"
+        )
+    lines.append("")
+    lines.append(
+        f"{'player':<16} {'played':>6} {'win rate':>8} {'ppg':>7} {'elo':>7} {'fibs':>7}"
+    )
+    ranked = sorted(summary["players"].items(), key=lambda item: -item[1]["elo"])
+    for name, p in ranked:
+        lines.append(
+            f"{name:<16} {p['played']:>6} {p['win rate']:>8.3f} {p['ppg']:>+7.3f} "
+            f"{p['elo']:>7.0f} {p['fibs']:>7.0f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_entrant(text):
+    """Splits "name=spec"; a bare spec is its own name."""
+
+    name, separator, spec = text.partition("=")
+    # Names are plain words; an "=" after a "kind:" belongs to the spec.
+    if not separator or ":" in name:
+        return text, text
+    return name, spec
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Play a bot-vs-bot tournament")
+    PARSER.add_argument(
+        "entrants",
+        nargs="*",
+        help='Players as "spec" or "name=spec", e.g. random, pubeval, '
+        "td=td:models/td.weights, ppo=policy:ppo:models/afterstate",
+    )
+    PARSER.add_argument("--format", "-f", default="round-robin", choices=FORMATS)
+    PARSER.add_argument(
+        "--games", "-g", default=100, type=int, help="Games or matches per pairing"
+    )
+    PARSER.add_argument(
+        "--length", "-l", default=0, type=int, help="Match length, 0 for money games"
+    )
+    PARSER.add_argument(
+        "--no_mirror", action="store_true", help="Do not replay dice with seats swapped"
+    )
+    PARSER.add_argument("--workers", "-w", default=0, type=int)
+    PARSER.add_argument("--seed", "-s", default=0, type=int)
+    PARSER.add_argument(
+        "--output", "-o", default=None, help="Optional: JSON lines file for results"
+    )
+    PARSER.add_argument(
+        "--summarize",
+        default=None,
+        help="Optional: summarize an existing results file instead of playing",
+    )
+    PARSER.add_argument("--verbose", "-v", default=0, type=int)
+    ARGS = PARSER.parse_args()
+    strip_debug()
+
+    if ARGS.summarize:
+        RECORDS = load_records(ARGS.summarize)
+    else:
+        TOURNAMENT = Tournament(
+            dict(parse_entrant(entrant) for entrant in ARGS.entrants),
+            format=ARGS.format,
+            games=ARGS.games,
+            length=ARGS.length,
+            mirror=not ARGS.no_mirror,
+            seed=ARGS.seed,
+            workers=ARGS.workers,
+        )
+        RECORDS = TOURNAMENT.run(ARGS.output, ARGS.verbose)
+    print(format_summary(summarize(RECORDS, ARGS.length, not ARGS.no_mirror)))
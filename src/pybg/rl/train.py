@@ -5,16 +5,21 @@ import numpy as np
 import os
 from gymnasium.envs.registration import register
 from stable_baselines3 import A2C, DDPG, DQN, SAC, PPO
-from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.results_plotter import load_results, ts2xy
 from stable_baselines3.common.utils import set_random_seed
-from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecMonitor
 from stable_baselines3.ddpg import policies as ddpg_policies
 from stable_baselines3.dqn import policies as dqn_policies
 from stable_baselines3.ppo import MlpPolicy, CnnPolicy
 from stable_baselines3.sac import policies as sac_policies
 
+from callbacks import ThroughputCallback
+from envs.vector_env import BackgammonVectorEnv
+from pybg.core.logger import strip_debug
+from pybg.rl.agents.batched_policy import PolicyServer
+
 # Manual registration
 register(
     id="BackgammonRandomEnv-v0",
@@ -46,10 +51,15 @@ class EpisodeLimitCallback(BaseCallback):
         return True
 
 
-def make_env(env_id, algorithm, rank, seed=0):
+def make_env(env_id, algorithm, rank, seed=0, opponent=None):
     def _init():
-        env = gym.make(env_id)
+        if opponent is None:
+            env = gym.make(env_id)
+        else:
+            env = gym.make(env_id, opponent=opponent)
         env.seed(seed + rank)
+        if ARGS.profile > 0:
+            env.unwrapped.enable_profiling()
         os.makedirs(ARGS.log_directory, exist_ok=True)
         env = Monitor(env, ARGS.log_directory, allow_early_resets=True)
         return env
@@ -90,11 +100,42 @@ if __name__ == "__main__":
         help="Optional: number of episodes instead of timesteps",
     )
     PARSER.add_argument("--multiprocess", "-m", default=1, type=int)
+    PARSER.add_argument(
+        "--vectorized",
+        "-V",
+        default=0,
+        type=int,
+        help="Optional: number of games to step together in one BackgammonVectorEnv. "
+        "Its games are cubeless against a random opponent, and its action space is "
+        "its own: models trained on it do not fit BackgammonRandomEnv (--cont) "
+        "or --opponent",
+    )
+    PARSER.add_argument(
+        "--profile",
+        "-P",
+        default=0,
+        type=int,
+        help="Optional: report throughput and step-phase timings every N steps",
+    )
+    PARSER.add_argument(
+        "--opponent",
+        "-o",
+        default=None,
+        help="Optional: model file of a policy opponent, served to every env in batches",
+    )
+    PARSER.add_argument("--opponent_algorithm", default="ppo")
+    PARSER.add_argument(
+        "--torch_threads",
+        default=0,
+        type=int,
+        help="Optional: torch.set_num_threads() for the opponent server",
+    )
     PARSER.add_argument("--graph", "-g", default=1, type=int)
     PARSER.add_argument("--window", "-w", default=50, type=int)
     PARSER.add_argument("--verbose", "-v", default=1, type=int)
 
     ARGS = PARSER.parse_args()
+    strip_debug()
 
     if ARGS.algorithm.lower() == "a2c":
         algorithm = A2C
@@ -128,13 +169,44 @@ if __name__ == "__main__":
         else "BackgammonRandomEnv-v0"
     )
 
+    if ARGS.vectorized > 0:
+        if ARGS.opponent:
+            PARSER.error("--vectorized plays a random opponent; drop --opponent")
+        if ARGS.multiprocess > 1:
+            PARSER.error("--vectorized and --multiprocess cannot be combined")
+        if algorithm in [DDPG, SAC]:
+            PARSER.error(
+                f"--vectorized needs a discrete action space, not {ARGS.algorithm}"
+            )
+
+    server = None
+    if ARGS.opponent:
+        server = PolicyServer(
+            ARGS.opponent,
+            ARGS.opponent_algorithm,
+            torch_threads=ARGS.torch_threads or None,
+        ).start()
+
     os.makedirs(ARGS.log_directory, exist_ok=True)
-    if ARGS.multiprocess > 1:
+    if ARGS.vectorized > 0:
+        env = BackgammonVectorEnv(num_envs=ARGS.vectorized)
+        if ARGS.profile > 0:
+            env.enable_profiling()
+        env = VecMonitor(env, ARGS.log_directory)
+    elif ARGS.multiprocess > 1:
         env = SubprocVecEnv(
-            [make_env(env_id, algorithm, i) for i in range(ARGS.multiprocess)]
+            [
+                make_env(env_id, algorithm, i, opponent=server and server.client())
+                for i in range(ARGS.multiprocess)
+            ]
         )
     else:
-        env = gym.make(env_id)
+        if server is None:
+            env = gym.make(env_id)
+        else:
+            env = gym.make(env_id, opponent=server.client())
+        if ARGS.profile > 0:
+            env.unwrapped.enable_profiling()
         env = Monitor(env, ARGS.log_directory, allow_early_resets=True)
         env = DummyVecEnv([lambda: env])
 
@@ -144,18 +216,33 @@ if __name__ == "__main__":
         model = algorithm.load(ARGS.cont, verbose=ARGS.verbose)
         model.set_env(env)
 
+    callbacks = []
+    if ARGS.profile > 0:
+        callbacks.append(ThroughputCallback(ARGS.profile, verbose=ARGS.verbose))
+
     if ARGS.episodes > 0:
-        callback = EpisodeLimitCallback(
-            max_episodes=ARGS.episodes, verbose=ARGS.verbose
+        callbacks.append(
+            EpisodeLimitCallback(max_episodes=ARGS.episodes, verbose=ARGS.verbose)
         )
         model.learn(
-            total_timesteps=int(1e9), callback=callback, tb_log_name=ARGS.algorithm
+            total_timesteps=int(1e9),
+            callback=CallbackList(callbacks),
+            tb_log_name=ARGS.algorithm,
         )
     else:
         timesteps = ARGS.timesteps if ARGS.timesteps is not None else 100_000
-        model.learn(total_timesteps=timesteps, tb_log_name=ARGS.algorithm)
+        model.learn(
+            total_timesteps=timesteps,
+            callback=CallbackList(callbacks),
+            tb_log_name=ARGS.algorithm,
+        )
 
     model.save(ARGS.name)
+    if server is not None:
+        print(
+            f"Opponent batches: {server.batches}, mean size {server.mean_batch_size:.1f}"
+        )
+        server.stop()
 
     if ARGS.graph:
         plot_results(ARGS.log_directory, ARGS.algorithm, ARGS.window)
@@ -1,7 +1,11 @@
 """AceyDeucy subclass"""
 
+from typing import List
+
+from pybg.core.aceydeucey_moves import ACEY_DEUCEY, generate_acey_deucey_plays
 from pybg.core.board import Board
-from pybg.gnubg.match import STARTING_MATCH_ID
+from pybg.core.moves import Play
+from pybg.gnubg.match import STARTING_MATCH_ID, GameState
 
 # AceyDeucy board settings
 STARTING_POSITION_ID = "AAAA/38AAAD/fw"
@@ -15,6 +19,28 @@ class AceyDeucey(Board):
     ):
         super().__init__(position_id, match_id)
 
+    def generate_plays(self, partial: bool = False) -> List[Play]:
+        """
+        Generate and return legal plays, with checkers entering at will and
+        the 1-2 played with a double of the player's choosing.
+
+        If `partial` is True, return all partial plays too (not just max-length).
+        """
+        return generate_acey_deucey_plays(self.position, self.match.dice, partial)
+
+    def end_turn(self) -> None:
+        """
+        Ends a turn, or after a 1-2 leaves the player on roll again.
+        """
+        if (
+            self.match.game_state != GameState.GAME_OVER
+            and tuple(sorted(self.match.dice, reverse=True)) == ACEY_DEUCEY
+        ):
+            self.match.reset_dice()
+            self.match.game_state = GameState.ON_ROLL
+        else:
+            super().end_turn()
+
     def __repr__(self):
         position_id: str = self.position.encode()
         match_id: str = self.match.encode()
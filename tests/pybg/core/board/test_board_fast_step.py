@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from pybg.core.board import Board, GameState
+
+pytestmark = pytest.mark.unit
+
+
+def test_fast_observation_matches_default():
+    board = Board(position_id="/wEAAO4/AADAAQ")
+    fast = Board(position_id="/wEAAO4/AADAAQ", fast=True)
+    fast.match = board.match
+
+    board.roll()
+    expected = board.get_observation()
+    observation = fast.get_observation()
+
+    assert observation.shape == expected.shape
+    assert np.array_equal(observation, expected)
+
+
+def test_fast_buffers_are_reused_until_state_changes():
+    board = Board(fast=True)
+    board.roll()
+
+    observation = board.get_observation()
+    mask = board.action_mask()
+    snapshot = mask.copy()
+    assert board.get_observation() is observation
+    assert board.action_mask() is mask
+
+    board.fast = False
+    assert np.array_equal(board.action_mask(), snapshot)
+    board.fast = True
+
+    play = board.generate_plays()[0]
+    board.play(tuple((m.source, m.destination) for m in play.moves))
+
+    assert board.get_observation() is observation
+    assert board.action_mask() is mask
+    assert not np.array_equal(mask, snapshot)
+
+
+def test_fast_info_skips_timing():
+    board = Board(fast=True)
+    board.invalid_actions_taken = 3
+    info = board.get_info()
+
+    assert info == {"invalid actions taken": 3}
+    assert board.get_info() is info
+
+
+def test_fast_mask_follows_cube_and_crawford():
+    board = Board(fast=True)
+    board.match.game_state = GameState.ON_ROLL
+    double = board.action_index["double"]
+    assert board.action_mask()[double]
+
+    board.match.crawford = True
+    assert not board.action_mask()[double]
@@ -8,6 +8,7 @@ from pybg.core.board import (
     BACKGAMMON_STARTING_POSITION_ID,
     Board,
     BoardError,
+    MAX_CUBE,
     GameState,
     Resign,
 )
@@ -1106,3 +1107,90 @@ v|                  |BAR|                  |     $0 money game (Cube: 1)
  |                  | X |                O |     0 points
  +12-11-10--9--8--7-------6--5--4--3--2--1-+     O: player0"""
     assert str(board) == bg.__str__()
+
+
+@pytest.mark.parametrize(
+    "position",
+    [
+        # A checker on the bar.
+        Position(
+            (
+                -2,
+                0,
+                0,
+                0,
+                0,
+                4,
+                0,
+                3,
+                0,
+                0,
+                0,
+                -5,
+                5,
+                0,
+                0,
+                0,
+                -3,
+                0,
+                -5,
+                0,
+                0,
+                0,
+                0,
+                2,
+            ),
+            1,
+            0,
+            0,
+            0,
+        ),
+        # Bearing off.
+        Position((2, 3, 3, 3, 2, 2) + (0,) * 12 + (-5, -3, -3, -2, -1, -1), 0, 0, 0, 0),
+    ],
+)
+def test_play_accepts_bar_entries_and_bearoffs(position):
+    """Moves from the bar or off the board are matched by source and destination."""
+    bg = Board(position_id=BACKGAMMON_STARTING_POSITION_ID)
+    bg.position = position
+    bg.match.dice = (6, 5)
+    bg.match.game_state = GameState.ROLLED
+    turn = bg.match.turn
+
+    for play in bg.generate_plays():
+        bg.position = position
+        bg.match.turn = turn
+        bg.play(tuple((m.source, m.destination) for m in play.moves))
+        assert bg.match.turn != turn
+
+
+def test_double_stops_at_max_cube():
+    bg = Board(position_id=BACKGAMMON_STARTING_POSITION_ID)
+    bg.match.player = bg.match.turn = PlayerType.ZERO
+    bg.match.game_state = GameState.ON_ROLL
+    bg.match.cube_value = MAX_CUBE
+
+    assert "double" not in bg.valid_actions()
+    with pytest.raises(BoardError):
+        bg.double()
+
+
+def test_crawford_game_follows_reaching_one_away():
+    bg = Board(position_id=BACKGAMMON_STARTING_POSITION_ID)
+    bg.match.length = 5
+    bg.update_score(1, int(Resign.GAMMON), 0)
+    assert not bg.match.crawford
+
+    bg.update_score(1, int(Resign.SINGLE_GAME), 1)
+    bg.update_score(2, int(Resign.SINGLE_GAME), 0)
+    assert bg.match.crawford
+    bg.match.player = bg.match.turn = PlayerType.ZERO
+    bg.match.game_state = GameState.ON_ROLL
+    assert "double" not in bg.valid_actions()
+    with pytest.raises(BoardError, match="Crawford"):
+        bg.double()
+
+    # Only once a match: not when the trailer reaches 1-away too.
+    bg.update_score(3, int(Resign.SINGLE_GAME), 1)
+    assert not bg.match.crawford
+    assert "double" in bg.valid_actions()
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from pybg.core.board import (
+    BACKGAMMON_STARTING_MATCH_ID,
+    BACKGAMMON_STARTING_POSITION_ID,
+)
+from pybg.core.journal import HEADER_SIZE, RECORD_SIZE, MatchJournal
+from pybg.headless import HeadlessShell
+
+pytestmark = pytest.mark.unit
+
+STATE = (BACKGAMMON_STARTING_POSITION_ID, BACKGAMMON_STARTING_MATCH_ID, "opening")
+
+
+def test_journal_reloads_matches_from_disk(tmp_path):
+    path = str(tmp_path / "session")
+    journal = MatchJournal(path, sync_every=2)
+    journal.matches["a"] = []
+    journal.matches["b"] = []
+    journal.matches["a"].append(STATE)
+    journal.matches["b"].append(("4HPwATDgc/ABMA", "cIkKAAAAAAAA", "ü 8/5 6/5"))
+    journal.matches["a"].append(("4HPwATDgc/ABMA", "cAgAAAAAAAAA", ""))
+    del journal.matches["b"]
+    journal.close()
+    assert os.path.getsize(path + ".pbj") == HEADER_SIZE + 6 * RECORD_SIZE
+
+    journal = MatchJournal(path)
+    assert list(journal.matches) == ["a"]
+    moves = journal.matches["a"]
+    assert len(moves) == 2
+    assert moves[0] == STATE
+    assert moves[-1][2] == ""
+    journal.matches["a"].append(STATE)
+    assert journal.matches["a"][2] == STATE
+    journal.close()
+
+
+def test_journal_drops_a_torn_tail(tmp_path):
+    path = str(tmp_path / "session")
+    journal = MatchJournal(path)
+    journal.matches["a"] = []
+    for _ in range(3):
+        journal.matches["a"].append(STATE)
+    journal.close()
+
+    with open(path + ".pbj", "r+b") as f:
+        # Half a record, after a record whose checksum no longer matches.
+        f.seek(-RECORD_SIZE + 5, os.SEEK_END)
+        f.write(b"\xff")
+        f.seek(0, os.SEEK_END)
+        f.write(b"\x01" * (RECORD_SIZE // 2))
+
+    journal = MatchJournal(path)
+    assert len(journal.matches["a"]) == 2
+    assert os.path.getsize(path + ".msg") == len("a") + 2 * len("opening")
+    journal.close()
+
+
+def test_history_is_journaled_when_the_setting_is_on(tmp_path):
+    shell = HeadlessShell(
+        {
+            "player_agent": "random",
+            "opponent_agent": "random",
+            "history_journal": str(tmp_path),
+        }
+    )
+    shell.play_games(2)
+    history = shell.history_module
+    assert history.journal is not None
+    ref = history.get_current_match_ref()
+    recorded = len(history.matches[ref])
+    assert recorded > 1
+    shell.run_command("goto 1")
+    assert "wins the opening roll" in shell.output_text
+    history.journal.close()
+
+    (journal_file,) = tmp_path.glob("*.pbj")
+    history.load_from_file(str(journal_file))
+    assert len(history.match_refs) == 2
+    assert len(history.matches[ref]) == recorded
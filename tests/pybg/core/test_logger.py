@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+
+from pybg.core.logger import LazyLogger
+
+pytestmark = pytest.mark.unit
+
+
+def test_lazy_logger_creates_powertools_logger_for_the_first_record_shown():
+    log = LazyLogger("test", "warning")
+    log.debug("dropped")
+    log.info("dropped")
+    assert log._logger is None
+    assert not log.isEnabledFor(logging.INFO)
+
+    log.error("shown")
+    assert log._logger is not None
+    log.setLevel("DEBUG")
+    assert log._logger.log_level == logging.DEBUG
+
+
+class Expensive:
+    formatted = 0
+
+    def __str__(self):
+        Expensive.formatted += 1
+        return "expensive"
+
+
+def test_disabled_and_stripped_debug_never_formats_its_arguments():
+    log = LazyLogger("test", "info")
+    log.debug("value %s", Expensive())
+    assert not log.debug_enabled
+
+    log.setLevel("debug")
+    assert log.debug_enabled
+    log.strip_debug()
+    log.setLevel("debug")
+    assert not log.debug_enabled
+    assert not log.isEnabledFor(logging.DEBUG)
+    log.debug("value %s", Expensive())
+    assert Expensive.formatted == 0
@@ -0,0 +1,133 @@
+import io
+
+import pytest
+
+from pybg.core.match_file import (
+    GameStart,
+    MatchFileError,
+    export_matches,
+    load_matches,
+    parse,
+    parse_moves,
+    replay,
+    write_match,
+)
+from pybg.gnubg.match import GameState, Match
+from pybg.gnubg.position import Position
+from pybg.headless import HeadlessShell
+
+pytestmark = pytest.mark.unit
+
+MATCH = """\
+; [Site "somewhere"]
+; [Player 1 "alice"]
+; [Player 2 "bob"]
+
+ 3 point match
+
+ Game 1
+ alice : 0                          bob : 0
+  1) 31: 8/5 6/5                    64: 24/18 13/9
+  2) 62: 24/18 18/16*              51: bar/24 6/1*
+  3) 66:                            Doubles => 2
+  4)  Takes                         55: 13/8(2) 8/3(2)
+  5)  Doubles => 4                   Drops
+      Wins 2 points
+
+ Game 2
+ alice : 2                          bob : 0
+  1)                                 21: 13/11 6/5
+"""
+
+
+def test_parse_reads_both_columns():
+    events = list(parse(MATCH.splitlines()))
+    assert events[0] == GameStart(1, 3, ("alice", "bob"), (0, 0), events[0].tags)
+    assert events[0].tags["Site"] == "somewhere"
+    actions = [(e.side, str(e)) for e in events if not isinstance(e, GameStart)]
+    assert actions[:4] == [(0, "31: 8/5 6/5"), (1, "64: 24/18 13/9")] + [
+        (0, "62: 24/18 18/16*"),
+        (1, "51: bar/24 6/1*"),
+    ]
+    assert (1, "Doubles => 2") in actions and (0, "Takes") in actions
+    assert actions[-2:] == [(0, "Wins 2 points"), (1, "21: 13/11 6/5")]
+
+
+def test_parse_moves():
+    assert parse_moves("bar/22* 13/11(2) 6/off") == [
+        (-1, 21),
+        (12, 10),
+        (12, 10),
+        (5, -1),
+    ]
+    assert parse_moves("13/7*/5") == [(12, 6), (6, 4)]
+
+
+def test_replay_follows_the_match():
+    steps = list(replay(MATCH.splitlines()))
+    assert [s.action for s in steps][-2:] == ["Wins 2 points", "21: 13/11 6/5"]
+
+    dance = next(s for s in steps if s.action == "66:")
+    position = Position.decode(dance.position_id)
+    assert position.player_bar == 1 and position.board_points[18] == -4
+
+    take = Match.decode(next(s for s in steps if s.action == "Takes").match_id)
+    assert take.game_state == GameState.DOUBLED and take.cube_value == 2
+    win = Match.decode(next(s for s in steps if s.action.startswith("Wins")).match_id)
+    assert (win.player_0_score, win.player_1_score, win.game_state) == (
+        2,
+        0,
+        GameState.GAME_OVER,
+    )
+    assert Match.decode(steps[-1].match_id).crawford
+
+
+def test_replay_rejects_illegal_moves():
+    with pytest.raises(MatchFileError, match="Line 9"):
+        list(replay(MATCH.replace("31: 8/5 6/5", "31: 8/4 6/5").splitlines()))
+
+
+def test_recorded_matches_round_trip():
+    shell = HeadlessShell({"player_agent": "random", "opponent_agent": "random"})
+    shell.play_games(3)
+    for states in shell.history_module.matches.values():
+        out = io.StringIO()
+        assert write_match(states, out) >= 1
+        steps = list(replay(out.getvalue().splitlines()))
+
+        rolled = []
+        for position_id, match_id, _ in states:
+            match = Match.decode(match_id)
+            if match.game_state == GameState.ROLLED:
+                rolled.append((position_id, match.dice))
+        moves = [
+            (s.position_id, Match.decode(s.match_id).dice)
+            for s in steps
+            if s.action[0].isdigit()
+        ]
+        assert moves == rolled
+        assert "and the match" in out.getvalue()
+
+
+@pytest.mark.parametrize("saved", ["journal", "json"])
+def test_exported_histories_replay(tmp_path, saved):
+    settings = {"player_agent": "random", "opponent_agent": "random"}
+    if saved == "journal":
+        settings["history_journal"] = str(tmp_path / "journals")
+    shell = HeadlessShell(settings)
+    shell.play_games(2)
+    history = shell.history_module
+    if saved == "journal":
+        history.journal.close()
+        (path,) = (tmp_path / "journals").glob("*.pbj")
+    else:
+        path = tmp_path / "history.json"
+        history.save_to_file(str(path))
+
+    matches = load_matches(str(path))
+    assert list(matches) == list(history.matches)
+    written = export_matches(matches, str(tmp_path / "out"))
+    assert len(written) == len(history.matches)
+    for mat in written:
+        with open(mat) as f:
+            assert list(replay(f))
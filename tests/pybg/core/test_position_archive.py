@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from pybg.core.journal import pack_id
+from pybg.core.position_archive import CLASSES, PositionArchive, describe
+from pybg.gnubg.position import Position
+from pybg.headless import HeadlessShell
+
+pytestmark = pytest.mark.unit
+
+
+def test_decode_reads_the_player_bar():
+    points = (2, 0, 0, 0, 0, 4) + (0,) * 17 + (-2,)
+    position = Position(points, 3, 6, 1, 0)
+    decoded = Position.decode(position.encode())
+    assert (decoded.player_bar, decoded.opponent_bar) == (3, 1)
+
+
+def test_describe_matches_position():
+    positions = ["4HPwATDgc/ABMA", "AAAAAAAAAAAAAA", "wufgATDIZ+IBMA", "AQAAFAAAAAAAAA"]
+    described = describe(
+        np.array([list(pack_id(p, 10)) for p in positions], dtype=np.uint8)
+    )
+    for i, position_id in enumerate(positions):
+        position = Position.decode(position_id)
+        pips = (described["player_pips"][i], described["opponent_pips"][i])
+        assert pips == position.pip_count()
+    assert CLASSES[described["position_class"][0]] == "contact"
+    assert CLASSES[described["position_class"][1]] == "over"
+    assert CLASSES[described["position_class"][3]] == "bearoff2"
+
+
+def test_archive_indexes_journaled_games(tmp_path):
+    shell = HeadlessShell(
+        {
+            "player_agent": "random",
+            "opponent_agent": "random",
+            "history_journal": str(tmp_path / "journals"),
+        }
+    )
+    shell.play_games(2)
+    shell.history_module.journal.close()
+    (journal,) = (tmp_path / "journals").glob("*.pbj")
+
+    archive = PositionArchive(str(tmp_path / "archive"))
+    added = archive.ingest_file(str(journal))
+    assert added > 2
+    position_id = archive.rows([added - 1])[0]["position_id"]
+    assert archive.ingest_file(str(journal)) == added
+
+    archive = PositionArchive(str(tmp_path / "archive"))
+    assert len(archive) == 2 * added
+    assert isinstance(archive.columns["position"], np.memmap)
+    assert len(archive.find(position_id)) >= 2
+    for row in archive.rows(archive.find(position_id)):
+        assert row["position_id"] == position_id
+
+    contact = archive.by_class("contact")
+    assert len(contact) and set(archive.columns["position_class"][contact]) == {2}
+    pips = archive.by_pips(100, 167)
+    assert np.all((archive.columns["player_pips"][pips] >= 100))
+    assert np.all((archive.columns["player_pips"][pips] <= 167))
+    signature = int(archive.columns["player_bearoff"][added - 1])
+    assert added - 1 in archive.by_bearoff(signature)
+
+    # Several files are ingested in one rewrite, with the same rows.
+    together = PositionArchive(str(tmp_path / "together"))
+    assert together.ingest_files([str(journal), str(journal)]) == 2 * added
+    assert np.array_equal(together.columns["position"], archive.columns["position"])
+    assert together.meta["games"] == archive.meta["games"]
@@ -0,0 +1,57 @@
+import pickle
+
+import pytest
+
+from pybg.core.board import Board
+from pybg.core.profiler import StepProfiler
+
+pytestmark = pytest.mark.unit
+
+
+class Counter:
+    def __init__(self):
+        self.total = 0
+
+    def add(self, n):
+        self.total += n
+        return self.total
+
+
+def test_attach_counts_calls_and_time():
+    counter = Counter()
+    profiler = StepProfiler()
+    profiler.attach(counter, "add", "adding")
+    profiler.attach(counter, "add", "again")
+
+    assert counter.add(2) == 2
+    assert counter.add(3) == 5
+
+    seconds, calls = profiler.snapshot()["adding"]
+    assert calls == 2
+    assert seconds >= 0.0
+    assert "again" not in profiler.snapshot()
+
+    profiler.reset()
+    assert profiler.snapshot()["adding"] == (0.0, 0)
+
+
+def test_profiler_pickles_without_wrapped_methods():
+    counter = Counter()
+    profiler = StepProfiler()
+    profiler.attach(counter, "add")
+    counter.add(1)
+
+    restored = pickle.loads(pickle.dumps(profiler))
+    assert restored.snapshot() == profiler.snapshot()
+
+
+def test_board_enable_profiling():
+    board = Board()
+    profiler = board.enable_profiling()
+    board.roll()
+    board.action_mask()
+
+    snapshot = profiler.snapshot()
+    assert snapshot["action_mask"][1] == 1
+    assert snapshot["generate_plays"][1] >= 1
+    assert snapshot["step"][1] == 0
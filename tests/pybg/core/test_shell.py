@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from pybg.core.player import PlayerType
+from pybg.core.shell import BaseShell
+from pybg.core.worker import BackgroundWorker
+from pybg.headless import HeadlessShell
+
+pytestmark = pytest.mark.unit
+
+
+def wait_for(worker):
+    for _ in range(500):
+        result = worker.poll()
+        if result is not None:
+            return result
+        time.sleep(0.01)
+    raise AssertionError("The worker did not finish")
+
+
+def test_worker_returns_results_and_errors_with_their_key():
+    worker = BackgroundWorker()
+    worker.submit("sum", sum, [1, 2, 3])
+    assert worker.busy
+    with pytest.raises(RuntimeError):
+        worker.submit("again", sum, [])
+    assert wait_for(worker) == ("sum", 6, None)
+    assert not worker.busy
+
+    worker.submit("error", int, "x")
+    result = wait_for(worker)
+    assert result.key == "error"
+    assert isinstance(result.error, ValueError)
+    worker.stop()
+
+
+@pytest.fixture
+def shell():
+    """A game where the bot, player one, is on turn, and thinks until released."""
+    shell = HeadlessShell({"player_agent": "human", "opponent_agent": "random"})
+    BaseShell.execute(shell, "new")
+    while shell.game.match.turn != PlayerType.ONE:
+        BaseShell.execute(shell, "new")
+
+    release = threading.Event()
+    bot = shell.player1_agent
+    decide = bot.make_decision
+
+    def slow_decision(*args, **kwargs):
+        release.wait(5)
+        return decide(*args, **kwargs)
+
+    bot.make_decision = slow_decision
+    shell.release = release
+    return shell
+
+
+def test_bot_turns_do_not_block_the_frame_loop(shell):
+    shell.opponent_delay = 10
+    now = 0
+    start = time.perf_counter()
+    shell.update_opponent(now)
+    assert shell._worker.busy
+    for now in range(10):
+        shell.update_opponent(now)
+    assert time.perf_counter() - start < 1
+    assert shell.game.match.turn == PlayerType.ONE
+
+    shell.release.set()
+    for _ in range(500):
+        now += 10
+        shell.update_opponent(now)
+        if shell.game.match.turn == PlayerType.ZERO and not shell.opponent_playing:
+            break
+        time.sleep(0.01)
+    assert shell.game.match.turn == PlayerType.ZERO
+    assert "Opponent" in shell.output_text
+
+
+def test_decisions_for_a_replaced_game_are_dropped(shell):
+    shell.update_opponent(0)
+    old_game = shell.game
+    shell.player1_agent = None  # The new game's bot never gets asked.
+    shell.game = type(old_game)()
+    shell.release.set()
+
+    for now in range(500):
+        shell.update_opponent(now)
+        if not shell._worker.busy:
+            break
+        time.sleep(0.01)
+    assert not shell._worker.busy
+    assert not shell.opponent_steps
+    assert not shell.opponent_playing
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+from pybg.core.text_renderer import FrameTimer, TextRenderer
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def renderer():
+    pygame.font.init()
+    return TextRenderer(pygame.font.Font(None, 16), line_height=20)
+
+
+def test_render_only_redraws_changed_rows(renderer):
+    surface = pygame.Surface((200, 100))
+    board = ["+---+", "| o |", "+---+"]
+
+    assert renderer.render(surface, [(10, 10, board)]) == [surface.get_rect()]
+    assert renderer.render(surface, [(10, 10, board)]) == []
+
+    board[1] = "| x |"
+    assert renderer.render(surface, [(10, 10, board)]) == [pygame.Rect(10, 30, 190, 20)]
+    # The frame around it came from the cache.
+    assert renderer.misses == 3
+
+    assert renderer.render(surface, [(10, 10, board[:2])]) == [
+        pygame.Rect(10, 50, 190, 20)
+    ]
+    renderer.invalidate()
+    assert renderer.render(surface, [(10, 10, board)]) == [surface.get_rect()]
+
+
+def test_line_cache_drops_least_recently_used(renderer):
+    renderer.cache_size = 2
+    first = renderer.line_surface("a")
+    renderer.line_surface("b")
+    assert renderer.line_surface("a") is first
+    renderer.line_surface("c")
+    assert list(renderer.cache) == ["a", "c"]
+
+
+def test_frame_timer_counts_idle_frames():
+    timer = FrameTimer()
+    for drew in (True, False, False):
+        timer.start()
+        timer.stop(drew)
+    stats = timer.stats()
+    assert (stats["frames"], stats["idle_frames"]) == (3, 2)
+    assert 0 <= stats["mean_ms"] <= stats["worst_ms"]
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+from pybg.gnubg.analysis import (
+    Analyser,
+    CsvWriter,
+    JsonLinesWriter,
+    analyse_stream,
+)
+
+pytestmark = pytest.mark.unit
+
+OPENING = "4HPwATDgc/ABMA"
+# Player 0 to play a 3-1 in the opening position.
+OPENING_31 = "cIkMAAAAAAAA"
+
+
+def test_analysis_ranks_the_plays_of_a_roll():
+    result = Analyser("pubeval", plays=3).analyse(OPENING, OPENING_31)
+    assert result["dice"] == [1, 3]
+    equities = [play["equity"] for play in result["plays"]]
+    assert len(equities) == 3
+    assert equities == sorted(equities, reverse=True)
+    assert result["equity"] == equities[0]
+
+
+def test_one_ply_averages_the_rolls():
+    static = Analyser("pubeval").analyse(OPENING)
+    one_ply = Analyser("pubeval", depth=1).analyse(OPENING)
+    assert 0 < one_ply["win"] < 1
+    assert one_ply["win"] != static["win"]
+    # A side with every checker off has won.
+    assert Analyser("pubeval", depth=1).analyse("AAAAAAAAAAAAAA")["win"] == 0
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_stream_writes_results_in_input_order(workers):
+    lines = [f"{OPENING}:{OPENING_31}\n", "\n", "# comment\n", "bad:id\n", OPENING]
+    stream = io.StringIO()
+    count = analyse_stream(
+        lines, JsonLinesWriter(stream), workers=workers, chunk_size=1, in_flight=2
+    )
+    assert count == 3
+    results = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["position_id"] for r in results] == [OPENING, "bad", OPENING]
+    assert "error" in results[1]
+    assert results[0]["plays"]
+
+
+def test_csv_has_the_best_play():
+    stream = io.StringIO()
+    writer = CsvWriter(stream)
+    writer.write(Analyser("pubeval").analyse(OPENING, OPENING_31))
+    header, row = stream.getvalue().splitlines()
+    assert header.startswith("position_id,match_id")
+    assert row.split(",")[4] == "13"
+    assert "/" in row.split(",")[-2]
+
+
+def test_cube_decision_before_the_roll():
+    result = Analyser("pubeval").analyse(OPENING, "cAgAAAAAAAAA")
+    assert result["cube"]["action"] == "no double, take"
+    assert "cube" not in Analyser("pubeval").analyse(OPENING, OPENING_31)
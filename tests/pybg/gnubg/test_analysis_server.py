@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from pybg.gnubg.analysis_server import AnalysisServer
+
+pytestmark = pytest.mark.unit
+
+OPENING = "4HPwATDgc/ABMA"
+
+
+async def request(port, method, target, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nContent-Length: {len(data)}\r\n"
+        "Connection: close\r\n\r\n".encode() + data
+    )
+    status = int((await reader.readline()).split()[1])
+    response = (await reader.read()).split(b"\r\n\r\n", 1)[1]
+    writer.close()
+    return status, json.loads(response)
+
+
+def serve(test, **kwargs):
+    async def run():
+        server = AnalysisServer(workers=0, **kwargs)
+        listening = await server.start(port=0)
+        try:
+            await test(server, listening.sockets[0].getsockname()[1])
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+
+def test_concurrent_requests_are_batched_and_cached():
+    async def test(server, port):
+        results = await asyncio.gather(
+            *(server.analyse(OPENING, "", 0) for _ in range(3)),
+            *(server.analyse(OPENING, "cIkMAAAAAAAA", 0) for _ in range(3)),
+        )
+        assert results[0] == results[2]
+        assert results[3]["plays"]
+        assert server.metrics.batches == 1
+        assert server.metrics.shared == 4
+
+        status, response = await request(
+            port, "POST", "/analyse", {"positions": [OPENING, "bad:x"]}
+        )
+        assert status == 200
+        first, bad = response["results"]
+        assert first == results[0]
+        assert "error" in bad
+        assert server.metrics.cache_hits == 1
+
+    serve(test)
+
+
+def test_deep_analysis_and_stats():
+    async def test(server, port):
+        status, result = await request(
+            port, "GET", f"/analyse?position_id={OPENING}&depth=1"
+        )
+        assert status == 200
+        assert result["depth"] == 1 and 0 < result["win"] < 1
+
+        status, stats = await request(port, "GET", "/stats")
+        assert stats["requests"] == 1 and stats["deep_analyses"] == 1
+        assert "p50" in stats["latency_ms"]
+
+        assert (await request(port, "GET", "/analyse?position_id=x&depth=5"))[0] == 400
+        assert (await request(port, "POST", "/analyse", {}))[0] == 400
+        assert (await request(port, "GET", "/nowhere"))[0] == 404
+
+    serve(test, max_depth=2)
+
+
+def test_cube_decisions_are_cached_by_cube_and_score():
+    async def test(server, port):
+        cubeless = await server.analyse(OPENING, "", 0)
+        centred = await server.analyse(OPENING, "MAAAAAAAAAAA", 0)
+        assert "cube" not in cubeless
+        assert "cube" in centred
+        assert (await server.analyse(OPENING, "MAAAAAAAAAAA", 0)) == centred
+        assert server.metrics.cache_hits == 1
+
+    serve(test)
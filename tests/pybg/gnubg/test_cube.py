@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from pybg.agents import GnubgAgent
+from pybg.core import shell
+from pybg.gnubg.cube import (
+    CENTERED,
+    OWNED,
+    UNAVAILABLE,
+    CubeInfo,
+    cube_info,
+    decide_cube,
+    match_equity_table,
+    money_equity,
+)
+from pybg.gnubg.match import GameState
+from pybg.core.player import PlayerType
+from pybg.variants import Backgammon
+
+pytestmark = pytest.mark.unit
+
+
+def outputs(win, gammons=0.0):
+    return np.array([win, gammons, 0.0, gammons / 2, 0.0])
+
+
+def test_match_equity_table():
+    met = match_equity_table(11)
+    assert met is match_equity_table(11)
+    pre = met.pre[1:, 1:]
+    assert np.allclose(pre + pre.T, 1)
+    assert np.allclose(np.diag(pre), 0.5)
+    # Leading is worth more the further ahead, and the Crawford game more
+    # to the leader than the post-Crawford games after it.
+    assert np.all(np.diff(met.pre[1:, 5]) < 0)
+    assert met.post[1] == 0.5
+    assert 0.5 < met.post[3] < met.pre[1, 3]
+    assert met.mwc(0, 3) == 1 and met.mwc(3, 0) == 0
+    assert met.mwc(4, 1, post_crawford=True) == 1 - met.post[4]
+
+
+def test_money_cube_actions():
+    actions = [
+        decide_cube(outputs(win, 0.15), CubeInfo(1, CENTERED)).action
+        for win in (0.5, 0.72, 0.8, 0.9)
+    ]
+    assert actions == [
+        "no double, take",
+        "double, take",
+        "double, pass",
+        "too good, pass",
+    ]
+    # Owning the cube is worth more than it being centered, and that more
+    # than the opponent owning it.
+    equities = [
+        money_equity(outputs(0.6), owner) for owner in (OWNED, CENTERED, UNAVAILABLE)
+    ]
+    assert equities == sorted(equities, reverse=True)
+    assert not decide_cube(outputs(0.8), CubeInfo(1, UNAVAILABLE)).available
+
+
+def test_match_cube_actions():
+    # Never double in the Crawford game; the trailer doubles at once after it.
+    crawford = CubeInfo(1, CENTERED, 4, 1, crawford=True)
+    assert decide_cube(outputs(0.6), crawford).action == "no double"
+    post_crawford = CubeInfo(1, CENTERED, 4, 1, post_crawford=True)
+    assert decide_cube(outputs(0.5), post_crawford).double
+
+    decision = decide_cube(outputs(0.85), CubeInfo(1, CENTERED, 5, 5))
+    assert decision.double and not decision.take
+    assert decision.double_pass == match_equity_table().pre[4, 5]
+
+
+def test_cube_info_of_an_offered_double():
+    board = Backgammon()
+    board.start()
+    board.match.length = 7
+    board.match.reset_dice()
+    board.match.game_state = GameState.ON_ROLL
+    board.match.player_1_score = 6
+    board.double()
+    info = cube_info(board.match)
+    away = (7, 1) if board.match.player == PlayerType.ZERO else (1, 7)
+    assert (info.cube, info.owner, info.away, info.opponent_away) == (
+        1,
+        CENTERED,
+    ) + away
+    assert info.post_crawford and not info.money
+
+    # The bot takes a double at the start of a game.
+    assert shell.decide(GnubgAgent(board.actions), board) == ["take"]
+
+
+def test_bots_decide_the_cube_with_their_own_analyser():
+    class Crushing:
+        depth = 0
+
+        def values(self, positions, depth):
+            # Wins a gammon every game: too good to double, a drop.
+            return np.array([[1.0, 1.0, 0.0, 0.0, 0.0]] * len(positions))
+
+    board = Backgammon()
+    board.start()
+    board.match.reset_dice()
+    board.match.game_state = GameState.ON_ROLL
+    board.double()
+
+    agent = GnubgAgent(board.actions)
+    assert shell.decide(agent, board) == ["take"]
+    agent._analyser = Crushing()
+    assert shell.decide(agent, board) == ["drop"]
+
+
+def test_bots_skip_the_cube_when_they_cannot_double():
+    class Counting:
+        depth = 0
+        calls = 0
+
+        def values(self, positions, depth):
+            Counting.calls += 1
+            return np.array([[0.75, 0.0, 0.0, 0.0, 0.0]] * len(positions))
+
+    board = Backgammon()
+    board.start()
+    board.match.reset_dice()
+    board.match.game_state = GameState.ON_ROLL
+    agent = GnubgAgent(board.actions)
+    agent._analyser = Counting()
+
+    board.match.crawford = True
+    assert shell.decide(agent, board) == ["roll"]
+    assert Counting.calls == 0
+
+    board.match.crawford = False
+    assert shell.decide(agent, board) == ["double"]
+    assert Counting.calls == 1
@@ -2,7 +2,12 @@
 import pytest
 import numpy as np
 from pybg.core.board import Board
-from pybg.gnubg.neural_net import GnubgEvaluator, GnubgNetwork, encode_board
+from pybg.gnubg.neural_net import (
+    GnubgEvaluator,
+    GnubgNetwork,
+    encode_board,
+    encode_boards,
+)
 
 pytestmark = pytest.mark.unit
 
@@ -44,6 +49,17 @@ def test_encode_board_length():
     assert features.dtype == np.float32
 
 
+def test_encode_boards_matches_encode_board():
+    """The batched encoder gives the same rows as encoding one at a time."""
+    board = Board(position_id="4HPwATDgc/ABMA")
+    board.match.dice = (6, 5)
+    positions = [play.position for play in board.generate_plays()]
+    positions.append(positions[0].swap_players())
+    for cInput in (250, 214, 100):
+        expected = np.stack([encode_board(p, cInput) for p in positions])
+        assert np.array_equal(encode_boards(positions, cInput), expected)
+
+
 def test_evaluate_position_keys(evaluator):
     """Check that evaluator output contains the correct keys."""
     board = Board(position_id="4HPwATDgc/ABMA")
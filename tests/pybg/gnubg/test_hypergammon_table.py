@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from pybg.core.moves import generate_plays
+from pybg.gnubg import eval as gnubg_eval
+from pybg.gnubg import hypergammon
+from pybg.gnubg.analysis import ROLL_WEIGHTS, ROLLS, flip
+from pybg.gnubg.eval import Eval
+from pybg.gnubg.hypergammon import (
+    HypergammonTable,
+    boards,
+    conflicts,
+    position_index,
+    sides,
+    solve,
+)
+from pybg.gnubg.neural_net import equity
+from pybg.gnubg.position import Position
+from pybg.variants import Hypergammon
+
+pytestmark = pytest.mark.unit
+
+
+def to_position(index, checkers):
+    """The Position of an index, counting missing checkers as borne off."""
+    points, bar, off = (row[0] for row in boards(np.array([index]), checkers))
+    return Position(
+        tuple(int(p) for p in points),
+        int(bar[0]),
+        int(off[0]) + 15 - checkers,
+        int(bar[1]),
+        int(off[1]) + 15 - checkers,
+    )
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("hypergammon") / "hypergammon1.npy")
+    solve(1, path)
+    return HypergammonTable(path)
+
+
+def test_positions_have_dense_indexes():
+    assert len(sides(3)[0]) == 3276
+    indexes = np.flatnonzero(~conflicts(3))
+    for index in np.random.default_rng(0).choice(indexes, 200):
+        assert position_index(to_position(index, 3)) == index
+    assert position_index(Position.decode("AACgAgAAKgAAAA")) is not None
+    assert position_index(Position.decode("4HPwATDgc/ABMA")) is None
+
+
+def test_solution_satisfies_the_move_rules(table):
+    values = table.values
+    # Both checkers a step from home: the side on roll wins a gammon.
+    position = Position((1,) + (0,) * 22 + (-1,), 0, 14, 0, 14)
+    assert np.allclose(table.outputs(position), [1, 1, 0, 0, 0])
+
+    rng = np.random.default_rng(1)
+    checked = 0
+    for index in rng.permutation(len(values)):
+        position = to_position(index, 1)
+        if checked == 40 or position.player_off == 15 or position.opponent_off == 15:
+            continue
+        if position_index(position, 1) != index:
+            continue  # both sides on one point
+        expected = np.zeros(5)
+        for roll, weight in zip(ROLLS, ROLL_WEIGHTS):
+            plays = generate_plays(position, roll)
+            # When only one die can be played it must be the higher one,
+            # which generate_plays leaves to its callers.
+            if plays and len(plays[0].moves) == 1:
+                plays = [p for p in plays if p.moves[0].pips == max(roll)] or plays
+            after = [p.position for p in plays] or [position]
+            outputs = flip(np.array([table.outputs(p.swap_players()) for p in after]))
+            expected += weight * outputs[np.argmax(equity(outputs))]
+        assert np.allclose(table.outputs(position), expected, atol=1e-5)
+        checked += 1
+    assert checked == 40
+
+
+def test_spilled_graph_gives_the_same_table(table, tmp_path, monkeypatch):
+    monkeypatch.setattr(hypergammon, "CACHE_LIMIT", 0)
+    values = solve(1, str(tmp_path / "spilled.npy"), chunk_size=64)
+    assert np.allclose(values, table.values, atol=1e-5)
+
+
+def test_eval_uses_the_table(table, monkeypatch):
+    monkeypatch.setattr(gnubg_eval, "load_table", lambda: table)
+    board = Hypergammon()
+    board.position = Position((0, 1) + (0,) * 20 + (-1, 0), 0, 14, 0, 14)
+    result = Eval(None).evaluate(board)
+    assert [result[key] for key in ("win", "win_gammon")] == pytest.approx(
+        table.outputs(board.position)[:2]
+    )
@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from pybg.agents import GnubgAgent
+from pybg.core import shell
+from pybg.core.moves import generate_plays
+from pybg.gnubg.opening_book import (
+    OPENING_ROLLS,
+    ROLLS,
+    OpeningBook,
+    after,
+    build_book,
+    write_book,
+)
+from pybg.gnubg.position import Position
+from pybg.modules import core_module
+from pybg.modules.core_module import CoreModule
+from pybg.variants import Backgammon
+
+pytestmark = pytest.mark.unit
+
+START = Position.decode("4HPwATDgc/ABMA")
+
+
+@pytest.fixture(scope="module")
+def book(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("book") / "book.npz")
+    write_book(build_book(("backgammon",), depth=0, replies=1), path, "pubeval", 0)
+    return OpeningBook(path)
+
+
+def test_book_has_openings_and_replies(book):
+    # Replies to different openings can share a position.
+    assert len(book) <= len(OPENING_ROLLS) * (1 + len(ROLLS))
+    assert all(book.lookup(START, dice) for dice in OPENING_ROLLS)
+    assert (book.evaluator, book.depth) == ("pubeval", 0)
+    assert book.lookup(START, (6, 6)) is None
+    assert book.lookup(START, (0, 0)) is None
+
+    entries = book.lookup(START, (3, 1))
+    assert entries == book.lookup(START, (1, 3))
+    equities = [entry.equity for entry in entries]
+    assert equities == sorted(equities, reverse=True)
+
+    reply = after(START, entries[0].moves).swap_players()
+    for roll in ROLLS:
+        assert book.lookup(reply, roll)
+
+
+def test_rank_returns_legal_plays(book):
+    plays = generate_plays(START, (6, 4))
+    ranked = book.rank(START, (6, 4), plays)
+    assert ranked and all(play in plays for _, play in ranked)
+    assert book.best_play(START, (6, 4), plays) is ranked[0][1]
+    assert np.isclose(ranked[0][0], book.lookup(START, (6, 4))[0].equity)
+
+
+def test_bots_play_the_book(book, monkeypatch):
+    monkeypatch.setattr(shell, "load_book", lambda: book)
+    board = Backgammon()
+    board.start()
+    dice = board.match.dice
+    agent = GnubgAgent(board.actions)
+    best = book.lookup(board.position, dice)[0]
+    actions = shell.decide(agent, board)
+    moves = [(source, destination) for _, source, destination in actions]
+    assert after(board.position, moves) == after(board.position, best.moves)
+
+
+def test_hint_adds_the_plays_the_book_leaves_out(book, monkeypatch):
+    monkeypatch.setattr(core_module, "load_book", lambda: book)
+    board = Backgammon()
+    board.start()
+    board.player = board.match.player
+    board.match.dice = (6, 4)
+    shell = MagicMock(game=board, settings={})
+    shell.update_output_text = lambda output_message, show_board: output_message
+    lines = CoreModule(shell).cmd_hint(["99"]).splitlines()
+
+    booked = book.rank(board.position, board.match.dice, board.generate_plays())
+    assert len(lines) == len(board.generate_plays()) > len(booked)
+    assert all(line.endswith("(book)") for line in lines[: len(booked)])
+    assert all(line.endswith("(pubeval)") for line in lines[len(booked) :])
@@ -0,0 +1,107 @@
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(scope="module")
+def model():
+    pytest.importorskip("sb3_contrib")
+    from gymnasium import spaces
+    from sb3_contrib import MaskablePPO
+
+    from pybg.rl.agents import RandomAgent
+    from pybg.rl.envs.backgammon_envs import BackgammonMaskableEnv
+    from pybg.rl.game import ALL_ACTIONS
+
+    env = BackgammonMaskableEnv(
+        RandomAgent(spaces.Discrete(len(ALL_ACTIONS)), ALL_ACTIONS)
+    )
+    return MaskablePPO("MlpPolicy", env, n_steps=64, seed=0)
+
+
+def test_clients_get_the_models_actions(model):
+    from pybg.rl.agents.batched_policy import PolicyServer
+
+    rng = np.random.default_rng(0)
+    observations = rng.integers(0, 6, size=(8, 54)).astype(np.float32)
+    masks = np.zeros((8, model.action_space.n), dtype=bool)
+    masks[np.arange(8), rng.integers(0, model.action_space.n, size=8)] = True
+
+    answers = [None] * 8
+    with PolicyServer(model, max_wait=0.01, deterministic=True) as server:
+        clients = [server.client() for _ in range(8)]
+
+        def decide(i):
+            answers[i] = clients[i].make_decision(observations[i], masks[i])
+
+        threads = [threading.Thread(target=decide, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert answers == [int(np.flatnonzero(mask)[0]) for mask in masks]
+    assert server.requests == 8
+    assert server.batches <= 8
+
+
+def test_client_pickles_without_its_connection(model):
+    from pybg.rl.agents.batched_policy import PolicyServer
+
+    with PolicyServer(model) as server:
+        client = server.client()
+        client.make_decision(np.zeros(54, dtype=np.float32))
+        copy = pickle.loads(pickle.dumps(client))
+        assert copy.make_decision(np.zeros(54, dtype=np.float32)) in range(
+            model.action_space.n
+        )
+        client.close()
+        copy.close()
+
+
+def test_server_errors_are_raised_in_the_client(model):
+    from pybg.rl.agents.batched_policy import PolicyServer
+
+    with PolicyServer(model) as server:
+        with pytest.raises(ValueError):
+            server.client().make_decision(np.zeros(3, dtype=np.float32))
+
+
+def test_threaded_vec_env_batches_opponents(model):
+    from pybg.rl.agents.batched_policy import PolicyServer
+    from pybg.rl.envs.backgammon_envs import BackgammonMaskableEnv
+    from pybg.rl.envs.threaded_vec_env import ThreadedVecEnv
+
+    with PolicyServer(model) as server:
+        clients = [server.client() for _ in range(4)]
+        vec_env = ThreadedVecEnv(
+            [lambda client=client: BackgammonMaskableEnv(client) for client in clients]
+        )
+        vec_env.reset()
+        for _ in range(20):
+            vec_env.step(np.array([vec_env.action_space.sample() for _ in range(4)]))
+        vec_env.close()
+
+    assert server.requests > 0
+
+
+def test_server_survives_clients_leaving_mid_batch(model):
+    from pybg.rl.agents.batched_policy import PolicyServer
+
+    observation = np.zeros(54, dtype=np.float32)
+    with PolicyServer(model, max_wait=0.05) as server:
+        for _ in range(3):
+            gone = server.client()
+            gone.make_decision(observation)
+            gone._connection.send((observation, None))
+            gone.close()
+        client = server.client()
+        assert client.make_decision(observation) in range(model.action_space.n)
+        client.close()
+
+    assert not server._serving.is_alive()
+    assert not server._accepting.is_alive()
@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from pybg.rl.agents.qtable import QTable
+from pybg.rl.agents.sarsa import SarsaAgent
+
+pytestmark = pytest.mark.unit
+
+
+def fill(q, states=50, actions=4):
+    rng = np.random.default_rng(0)
+    for s in range(states):
+        for a in range(actions):
+            q[(f"{s % 6 + 1}state{s}", ("move", s, a))] = float(rng.normal())
+
+
+def test_behaves_like_a_dict():
+    table, reference = QTable(capacity=2), {}
+    fill(table)
+    fill(reference)
+
+    assert len(table) == len(reference)
+    for key, value in reference.items():
+        assert key in table
+        assert table.get(key) == value
+    assert table.get(("unknown", ("move", 0, 0)), 0.0) == 0.0
+    assert ("1state0", ("hit", 0, 0)) not in table
+
+
+def test_sarsa_agent_learns_the_same_with_a_qtable():
+    plain, compact = SarsaAgent(), SarsaAgent(q=QTable())
+    for agent in (plain, compact):
+        for step in range(200):
+            state, action = f"s{step % 7}", ("move", step % 5, 0)
+            agent.learn(state, action, step % 3, f"s{step % 11}", ("move", 1, 0))
+
+    for (state, action), value in plain.q.items():
+        assert compact.getQ(state, action) == pytest.approx(value)
+
+
+def test_save_load_and_checkpoints(tmp_path):
+    path = str(tmp_path / "q")
+    table, reference = QTable(), {}
+    fill(table)
+    fill(reference)
+    table.save(path)
+
+    for key in list(reference)[::3]:
+        reference[key] += 1.0
+        table[key] = reference[key]
+    for key in [("6state999", ("bearoff", 3)), ("1state0", ("reenter", 5))]:
+        reference[key] = 2.5
+        table[key] = 2.5
+    table.checkpoint()
+
+    table[("6state999", ("bearoff", 3))] = reference[("6state999", ("bearoff", 3))] = -1
+    table.checkpoint()
+
+    loaded = QTable.load(path)
+    assert isinstance(loaded._base_values, np.memmap)
+    assert len(loaded) == len(reference)
+    for key, value in reference.items():
+        assert loaded.get(key) == pytest.approx(value)
+
+    loaded.save(path)
+    assert not list(tmp_path.glob("q/delta-*"))
+    assert QTable.load(path).get(("1state0", ("reenter", 5))) == 2.5
+
+
+def test_pickles_compactly():
+    table = QTable()
+    fill(table)
+    restored = pickle.loads(pickle.dumps(table))
+
+    assert len(restored) == len(table)
+    assert restored.get(("1state0", ("move", 0, 1))) == table.get(
+        ("1state0", ("move", 0, 1))
+    )
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from pybg.rl.envs.afterstate_env import INVALID_ACTION_REWARD, AfterstateEnv
+
+pytestmark = pytest.mark.unit
+
+
+def play(env, seed):
+    """Plays a game taking the first play every turn."""
+    env.reset(seed=seed)
+    steps = 0
+    while True:
+        steps += 1
+        _, reward, terminated, _, info = env.step(0)
+        if terminated:
+            return reward, steps, info["turns"]
+
+
+def test_observation_pads_afterstates_and_masks_them():
+    env = AfterstateEnv(max_plays=32)
+    observation, _ = env.reset(seed=0)
+
+    assert env.observation_space.contains(observation)
+    plays = len(env.plays)
+    assert plays > 1
+    assert observation["mask"].sum() == plays
+    assert np.array_equal(observation["mask"].astype(bool), env.action_masks())
+    assert observation["afterstates"][:plays].any(axis=1).all()
+    assert not observation["afterstates"][plays:].any()
+
+
+def test_games_end_with_the_points_won_and_repeat_with_a_seed():
+    env = AfterstateEnv()
+    reward, steps, turns = play(env, seed=3)
+
+    assert abs(reward) in (1, 2, 3)
+    assert steps <= turns
+    assert play(env, seed=3) == (reward, steps, turns)
+
+
+def test_invalid_play_index_is_penalised_without_moving():
+    env = AfterstateEnv(max_plays=64)
+    env.reset(seed=1)
+    position = env.board.position
+
+    _, reward, terminated, _, info = env.step(63)
+
+    assert reward == INVALID_ACTION_REWARD
+    assert not terminated
+    assert info["invalid actions taken"] == 1
+    assert env.board.position == position
+
+
+def test_maskable_ppo_learns_on_afterstates():
+    pytest.importorskip("sb3_contrib")
+    from sb3_contrib import MaskablePPO
+
+    env = AfterstateEnv(max_plays=32)
+    model = MaskablePPO("MultiInputPolicy", env, n_steps=32, batch_size=16, n_epochs=1)
+    model.learn(total_timesteps=32)
+    assert env.invalid_actions_taken == 0
@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+
+from pybg.core.board import Board
+from pybg.gnubg.position import Position
+from pybg.rl.envs.vector_env import (
+    ACTION_COUNT,
+    BAR,
+    DIE_FACES,
+    OBSERVATION_SIZE,
+    BackgammonVectorEnv,
+    apply_moves,
+)
+
+pytestmark = pytest.mark.unit
+
+
+def to_position(env, i, points=None, bar=None, off=None) -> Position:
+    points = env.points[i] if points is None else points
+    bar = env.bar[i] if bar is None else bar
+    off = env.off[i] if off is None else off
+    return Position(
+        board_points=tuple(int(p) for p in points),
+        player_bar=int(bar[0]),
+        player_off=int(off[0]),
+        opponent_bar=int(bar[1]),
+        opponent_off=int(off[1]),
+    )
+
+
+def final_positions(env, i) -> set:
+    """Play out every masked move sequence for game i and collect the results."""
+    results = set()
+    stack = [
+        (
+            env.points[i : i + 1].copy(),
+            env.bar[i : i + 1].copy(),
+            env.off[i : i + 1].copy(),
+            env.dice[i : i + 1].copy(),
+        )
+    ]
+    while stack:
+        state = stack.pop()
+        saved = (env.points[i].copy(), env.bar[i].copy(), env.off[i].copy())
+        saved_dice = env.dice[i].copy()
+        env.points[i], env.bar[i], env.off[i], env.dice[i] = (s[0] for s in state)
+        mask = env.action_masks(np.array([i]))[0]
+        env.points[i], env.bar[i], env.off[i] = saved
+        env.dice[i] = saved_dice
+
+        actions = np.flatnonzero(mask)
+        if not actions.size:
+            results.add(to_position(env, i, state[0][0], state[1][0], state[2][0]))
+        for action in actions:
+            after = tuple(s.copy() for s in state)
+            source, face = divmod(int(action), DIE_FACES)
+            apply_moves(*after, np.array([source]), np.array([face]))
+            stack.append(after)
+    return results
+
+
+def test_reset_shapes():
+    env = BackgammonVectorEnv(num_envs=8, seed=1)
+    obs = env.reset()
+    assert obs.shape == (8, OBSERVATION_SIZE)
+    assert env.action_masks().shape == (8, ACTION_COUNT)
+    assert env.action_masks().any(axis=1).all()
+    assert (env.off == 0).all()
+
+
+def test_masks_match_board_generate_plays():
+    env = BackgammonVectorEnv(num_envs=16, seed=7)
+    env.reset()
+    checked = 0
+    for _ in range(150):
+        for i in range(env.num_envs):
+            if env.dice[i].sum() != 2 or env.dice[i].max() != 1:
+                continue
+            board = Board()
+            board.position = to_position(env, i)
+            board.match.dice = tuple(int(d) for d in env.roll[i])
+            expected = {play.position for play in board.generate_plays()}
+            assert final_positions(env, i) == expected
+            checked += 1
+        env.step(env._sample(env.action_masks()))
+    assert checked > 100
+
+
+def test_games_finish_and_auto_reset():
+    env = BackgammonVectorEnv(num_envs=32, seed=3)
+    env.reset()
+    finished = 0
+    for _ in range(400):
+        obs, rewards, dones, infos = env.step(env._sample(env.action_masks()))
+        for i in np.flatnonzero(dones):
+            finished += 1
+            assert rewards[i] in (-3, -2, -1, 1, 2, 3)
+            assert "terminal_observation" in infos[i]
+            assert env.off[i].sum() == 0
+        assert env.action_masks().any(axis=1).all()
+        assert (
+            (env.points.clip(min=0).sum(1) + env.bar[:, 0] + env.off[:, 0]) == 15
+        ).all()
+        assert (
+            (-env.points.clip(max=0)).sum(1) + env.bar[:, 1] + env.off[:, 1] == 15
+        ).all()
+    assert finished > 0
+
+
+def test_invalid_action_is_penalised():
+    env = BackgammonVectorEnv(num_envs=4, seed=5)
+    env.reset()
+    masks = env.action_masks()
+    illegal = np.array([np.flatnonzero(~m)[0] for m in masks])
+    _, rewards, _, _ = env.step(illegal)
+    assert (rewards <= -10 + 3).all()
+    assert env.invalid_actions_taken == 4
+
+
+def test_bar_entry_is_forced():
+    env = BackgammonVectorEnv(num_envs=1, seed=0)
+    env.reset()
+    env.bar[0] = (1, 0)
+    env.points[0, 5] -= 1
+    env.dice[0] = 0
+    env.dice[0, [2, 3]] = 1
+    mask = env.action_masks().reshape(-1, DIE_FACES)
+    assert mask[BAR].any()
+    assert not mask[:BAR].any()
+
+
+def test_works_with_maskable_ppo():
+    sb3_contrib = pytest.importorskip("sb3_contrib")
+    env = BackgammonVectorEnv(num_envs=4, seed=0)
+    model = sb3_contrib.MaskablePPO("MlpPolicy", env, n_steps=32, batch_size=64)
+    model.learn(total_timesteps=128)
+
+
+def test_attributes_and_seed_follow_indices():
+    env = BackgammonVectorEnv(num_envs=4)
+    env.reset()
+    assert np.array_equal(env.get_attr("points", [1, 3])[1], env.points[3])
+    assert env.get_attr("num_envs", 2) == [4]
+
+    env.set_attr("episode_returns", 5.0, indices=[0, 2])
+    assert env.episode_returns.tolist() == [5.0, 0.0, 5.0, 0.0]
+
+    env.seed(7)
+    first = env.reset()
+    env.seed(7)
+    assert np.array_equal(env.reset(), first)
+
+
+def test_profiling_times_the_step_phases():
+    env = BackgammonVectorEnv(num_envs=4, seed=0)
+    profiler = env.enable_profiling()
+    env.reset()
+    for _ in range(5):
+        env.step(env._sample(env.action_masks()))
+
+    assert env.get_attr("profiler") == [profiler] * 4
+    assert profiler.calls["step"] == 5
+    assert profiler.seconds["action_masks"] > 0
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from pybg.rl.game import ALL_ACTIONS, Board, Game, SarsaGame
+from pybg.rl.game.array_board import ArrayBoard
+
+pytestmark = pytest.mark.unit
+
+
+class SeededPlayer:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def make_decision(self, observation):
+        return self.rng.randrange(len(ALL_ACTIONS))
+
+
+def test_update_operations_match_point_board():
+    board, array_board = Board(), ArrayBoard()
+    for update in [
+        ("update_move", "w", 5, 3),
+        ("update_hit", "b", 0, 3),
+        ("update_reenter", "w", 20),
+        ("update_reenterhit", "w", 0),
+        ("update_bearoff", "b", 23),
+    ]:
+        getattr(board, update[0])(*update[1:])
+        getattr(array_board, update[0])(*update[1:])
+
+        points = [(p.get_color(), p.get_count()) for p in board.get_board()]
+        assert points == [
+            (p.get_color(), p.get_count()) for p in array_board.get_board()
+        ]
+        assert board.get_hit() == array_board.get_hit()
+        assert board.get_bourne_off() == array_board.get_bourne_off()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_game_plays_identically(seed):
+    games = []
+    for array_board in (False, True):
+        random.seed(seed)
+        np.random.seed(seed)
+        games.append(Game(None, SeededPlayer(seed), array_board=array_board))
+
+    rng = random.Random(seed)
+    for _ in range(300):
+        if games[0].get_done():
+            break
+        actions = games[0].get_valid_actions()
+        assert actions == games[1].get_valid_actions()
+        assert games[0].get_observation() == games[1].get_observation()
+
+        flat = [a for s in actions[0] for a in s]
+        actionint = ALL_ACTIONS.index(rng.choice(flat)) if flat else 0
+        state = (random.getstate(), np.random.get_state())
+        reward = games[0].player_turn(actionint)
+        random.setstate(state[0])
+        np.random.set_state(state[1])
+        assert games[1].player_turn(actionint) == reward
+
+    assert games[0].get_done() == games[1].get_done()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sarsa_game_plays_identically(seed):
+    games = [SarsaGame("a", "b"), SarsaGame("a", "b", array_board=True)]
+    rng = random.Random(seed)
+    for turn in range(400):
+        if games[0].is_over():
+            break
+        player = "a" if turn % 2 == 0 else "b"
+        roll = rng.randint(1, 6)
+
+        assert games[0].get_state3(roll) == games[1].get_state3(roll)
+        actions = games[0].get_actions(player, roll)
+        assert actions == games[1].get_actions(player, roll)
+
+        action = rng.choice(actions[0])
+        if action[0] != "Nomove":
+            for game in games:
+                game.update_board(player, action)
+
+    assert games[0].is_over2() == games[1].is_over2()
@@ -0,0 +1,32 @@
+import pytest
+
+pytestmark = pytest.mark.unit
+
+
+def test_throughput_callback_reports_profiled_phases():
+    pytest.importorskip("sb3_contrib")
+    from gymnasium import spaces
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.monitor import Monitor
+    from stable_baselines3.common.vec_env import DummyVecEnv
+
+    from pybg.rl.agents import RandomAgent
+    from pybg.rl.callbacks import ThroughputCallback
+    from pybg.rl.envs.backgammon_envs import BackgammonMaskableEnv
+    from pybg.rl.game import ALL_ACTIONS
+
+    env = BackgammonMaskableEnv(
+        RandomAgent(spaces.Discrete(len(ALL_ACTIONS)), ALL_ACTIONS)
+    )
+    env.enable_profiling()
+    vec_env = DummyVecEnv([lambda: Monitor(env)])
+
+    callback = ThroughputCallback(interval=32)
+    model = PPO("MlpPolicy", vec_env, n_steps=64, batch_size=32, n_epochs=1)
+    model.learn(total_timesteps=128, callback=callback)
+
+    assert callback.n_calls >= 128
+    phases = callback._last_phases
+    assert phases["step"][1] > 0
+    assert phases["generate_plays"][1] > 0
+    assert "opponent" in phases
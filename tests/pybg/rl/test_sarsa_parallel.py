@@ -0,0 +1,45 @@
+import pytest
+
+from pybg.rl.agents.qtable import QTable
+from pybg.rl.agents.sarsa import SarsaAgent
+from pybg.rl.sarsa_parallel import ParallelSarsaTrainer, TrackedQ, WorkerReport, merge
+
+pytestmark = pytest.mark.unit
+
+
+def test_tracked_q_reports_deltas():
+    tracked = TrackedQ({"a": 1.0})
+    tracked["a"] = 1.5
+    tracked["a"] = 3.0
+    tracked["b"] = 2.0
+
+    assert tracked.deltas() == {"a": 2.0, "b": 2.0}
+    tracked.clear()
+    assert tracked.deltas() == {}
+
+
+def test_merge_averages_deltas():
+    q = {"a": 1.0}
+    reports = [
+        WorkerReport(0, 1, 1.0, 0, "", {"a": 1.0, "b": 4.0}),
+        WorkerReport(1, 1, 1.0, 0, "", {"a": 3.0}),
+    ]
+
+    assert merge(q, reports) == {"a": 3.0, "b": 4.0}
+    assert q == {"a": 3.0, "b": 4.0}
+
+
+@pytest.mark.parametrize("opponent", ["random", "snapshot"])
+def test_parallel_training_fills_the_master_table(opponent, capsys):
+    agent = SarsaAgent(q=QTable())
+    checkpoints = []
+    trainer = ParallelSarsaTrainer(
+        agent, workers=2, games_per_round=2, opponent=opponent, maxmove=20
+    )
+
+    trainer.train(8, checkpoint=checkpoints.append, checkpoint_every=4)
+
+    assert trainer.games == 8
+    assert len(agent.q) > 0
+    assert checkpoints == [agent, agent]
+    assert "games/sec" in capsys.readouterr().out
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from pybg.core.moves import generate_plays
+from pybg.gnubg.analysis import NetworkEvaluator
+from pybg.gnubg.neural_net import network_keys
+from pybg.gnubg.position import Position
+from pybg.gnubg.pub_eval import pubeval_x
+from pybg.rl.simulation import (
+    generate_afterstates,
+    pubeval_scores,
+    roll_dice,
+    simulate,
+    summarize,
+)
+
+pytestmark = pytest.mark.unit
+
+POSITIONS = [
+    "4HPwATDgc/ABMA",
+    "wufgATDIZ+IBMA",
+    "AQAAFAAAAAAAAA",
+    "sNvBAyDAs4HBAw",
+]
+ROLLS = [(2, 1), (6, 5), (3, 3), (6, 6), (4, 1)]
+
+
+def arrays(positions):
+    return (
+        np.array([p.board_points for p in positions], dtype=np.int8),
+        np.array([(p.player_bar, p.opponent_bar) for p in positions], dtype=np.int8),
+        np.array([(p.player_off, p.opponent_off) for p in positions], dtype=np.int8),
+    )
+
+
+def test_afterstates_are_the_legal_plays():
+    positions = [Position.decode(p) for p in POSITIONS for _ in ROLLS]
+    rolls = np.array(ROLLS * len(POSITIONS))
+    owner, points, bar, off, pips = generate_afterstates(
+        *arrays(positions), roll_dice(rolls)
+    )
+    assert np.all(np.diff(owner) >= 0)
+    for i, (position, roll) in enumerate(zip(positions, rolls)):
+        rows = np.flatnonzero(owner == i)
+        found = {
+            Position(
+                tuple(int(n) for n in points[r]),
+                int(bar[r, 0]),
+                int(off[r, 0]),
+                int(bar[r, 1]),
+                int(off[r, 1]),
+            )
+            for r in rows
+        }
+        plays = generate_plays(position, tuple(roll))
+        assert found == ({play.position for play in plays} or {position})
+
+
+def test_pubeval_scores_match_pubeval():
+    positions = [
+        play.position for play in generate_plays(Position.decode(POSITIONS[1]), (3, 1))
+    ]
+    races = [key == "race" for key in network_keys(positions)]
+    expected = [pubeval_x(race, p.to_array()) for race, p in zip(races, positions)]
+    assert np.allclose(pubeval_scores(*arrays(positions)), expected)
+
+
+def test_network_evaluates_arrays_like_positions():
+    evaluator = NetworkEvaluator()
+    positions = [Position.decode(p) for p in POSITIONS]
+    points, bar, off = arrays(positions)
+    bars_offs = np.stack([bar[:, 0], off[:, 0], bar[:, 1], off[:, 1]], axis=1)
+    assert np.allclose(
+        evaluator.evaluate_arrays(points, bars_offs), evaluator.evaluate(positions)
+    )
+
+
+def test_simulate_plays_complete_games():
+    result = simulate(200, ("pubeval", "random"), batch_size=64, seed=3)
+    assert set(np.unique(result["winner"])) <= {0, 1}
+    assert set(np.unique(result["points"])) <= {1, 2, 3}
+    assert np.all(result["turns"] > 0)
+
+    assert summarize(result)["win_rate"] > 0.8
+    again = simulate(200, ("pubeval", "random"), batch_size=64, seed=3)
+    assert all(np.array_equal(result[key], again[key]) for key in result)
+
+
+def test_simulate_without_games_is_empty():
+    result = simulate(0, seed=3)
+    assert set(result) == {"winner", "points", "turns", "hits", "dances"}
+    assert all(len(value) == 0 for value in result.values())
+    assert result["hits"].shape == (0, 2)
+    assert simulate(-5)["winner"].dtype == np.int8
@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.unit
+
+torch = pytest.importorskip("torch")
+
+from pybg.core.board import Board
+from pybg.gnubg.neural_net import GnubgEvaluator
+from pybg.rl.td_train import GreedyPlayer, TDTrainer, flip, play_game
+
+
+def test_flip_twice_is_identity():
+    outputs = np.array([0.6, 0.2, 0.05, 0.1, 0.01])
+    assert np.allclose(flip(flip(outputs)), outputs)
+    assert flip(outputs)[0] == pytest.approx(0.4)
+
+
+def test_export_loads_in_gnubg_evaluator(tmp_path):
+    trainer = TDTrainer(hidden=8)
+    path = tmp_path / "td.weights"
+    trainer.export(str(path))
+
+    loaded = GnubgEvaluator(str(path)).load_all_networks()
+    features = np.random.default_rng(0).random((4, 250))
+    for key, net in trainer.gnubg_networks().items():
+        assert loaded[key].weights1.shape == net.weights1.shape
+        assert np.allclose(
+            loaded[key].evaluate(features[:, : net.cInput]),
+            net.evaluate(features[:, : net.cInput]),
+            atol=1e-5,
+        )
+
+    # Prune networks see the same features, so they agree with the full ones.
+    networks = trainer.gnubg_networks()
+    assert np.allclose(
+        networks["prune_contact"].evaluate(features[:, :200] * (np.arange(200) < 139)),
+        networks["contact_contact250"].evaluate(
+            features[:, :250] * (np.arange(250) < 139)
+        ),
+    )
+
+
+def test_update_with_lambda_one_moves_values_to_the_outcome():
+    trainer = TDTrainer(hidden=16, alpha=0.05, lam=1.0)
+    player = GreedyPlayer(trainer.gnubg_networks(), rng=random.Random(1))
+    trajectory = play_game(player, Board(), random.Random(1))
+    assert trajectory is not None
+    assert len(trajectory.keys) == len(trajectory.features)
+
+    def distance():
+        with torch.no_grad():
+            values = trainer.values(trajectory).numpy()
+        return np.abs(values - trajectory.outcome).sum()
+
+    before = distance()
+    trainer.update(trajectory)
+    assert distance() < before
+
+
+def test_train_with_a_worker_process():
+    trainer = TDTrainer(hidden=8, workers=1, games_per_round=1)
+    trainer.train(1, verbose=0)
+    assert trainer.games == 1
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from pybg.rl.tournament import (
+    INITIAL_RATING,
+    Tournament,
+    Unit,
+    elo_ratings,
+    fibs_ratings,
+    make_player,
+    parse_entrant,
+    play_unit,
+    summarize,
+)
+
+pytestmark = pytest.mark.unit
+
+
+def test_mirrored_games_share_dice_with_seats_swapped():
+    tournament = Tournament({"a": "random", "b": "random", "c": "pubeval"}, games=3)
+    units = tournament.units()
+
+    assert tournament.games == 4
+    assert {u.pairing for u in units} == {("a", "b"), ("a", "c"), ("b", "c")}
+    first, second = units[0], units[1]
+    assert first.seed == second.seed
+    assert first.seats == second.seats[::-1]
+    # Every pairing plays the same seeds.
+    assert [u.seed for u in units[:4]] == [u.seed for u in units[4:8]]
+
+
+def test_gauntlet_pairs_the_first_entrant_with_each_other():
+    tournament = Tournament(
+        {"hero": "pubeval", "x": "random", "y": "random"}, format="gauntlet"
+    )
+    assert tournament.pairings() == [("hero", "x"), ("hero", "y")]
+
+
+def test_results_stream_and_do_not_depend_on_workers(tmp_path):
+    output = tmp_path / "results.jsonl"
+    tournament = Tournament({"random": "random", "pubeval": "pubeval"}, games=6)
+
+    records = tournament.run(str(output))
+    streamed = [json.loads(line) for line in output.read_text().splitlines()]
+    tournament.workers = 2
+
+    assert sorted(streamed, key=lambda r: r["game"]) == records
+    assert tournament.run() == records
+    for record in records:
+        assert record["winner"] in ("random", "pubeval")
+        assert abs(record["points"]) in (1, 2, 3)
+        assert (record["points"] > 0) == (record["winner"] == "random")
+
+
+def test_matches_are_played_to_length():
+    tournament = Tournament({"a": "random", "b": "random"}, games=2, length=3)
+    for record in tournament.run():
+        assert max(record["score"]) >= 3
+        assert (
+            record["winner"]
+            == record["pairing"][record["score"].index(max(record["score"]))]
+        )
+
+
+def test_summary_ranks_the_stronger_player():
+    records = Tournament({"random": "random", "pubeval": "pubeval"}, games=20).run()
+    summary = summarize(records)
+
+    (pairing,) = summary["pairings"]
+    assert pairing["played"] == 20
+    assert pairing["ppg"] < 0
+    assert pairing["ppg 95%"] > 0
+    players = summary["players"]
+    assert players["pubeval"]["elo"] > players["random"]["elo"]
+    assert players["pubeval"]["fibs"] > players["random"]["fibs"]
+
+
+def test_ratings():
+    elo = elo_ratings({("a", "b"): 75, ("b", "a"): 25}, ["a", "b"], prior=0)
+    # 75% corresponds to about 191 Elo points.
+    assert elo["a"] - elo["b"] == pytest.approx(190.8, abs=0.5)
+    assert (elo["a"] + elo["b"]) / 2 == pytest.approx(INITIAL_RATING)
+
+    fibs = fibs_ratings([{"pairing": ["a", "b"], "winner": "a"}], ["a", "b"], 1)
+    # Equal ratings: the winner of a 1-point match gains 4 * 0.5.
+    assert fibs["a"] == pytest.approx(INITIAL_RATING + 2)
+    assert fibs["b"] == pytest.approx(INITIAL_RATING - 2)
+
+
+def test_unknown_player_kind():
+    with pytest.raises(ValueError):
+        make_player("gnubg-world-class")
+
+
+def test_matches_of_abandoned_games_are_given_up():
+    players = {"a": make_player("random"), "b": make_player("random")}
+    unit = Unit(("a", "b"), 0, "0:0", ("a", "b"))
+    record = play_unit(players, unit, length=3, max_turns=1, max_abandoned=4)
+
+    assert record["winner"] is None
+    assert record["points"] == 0
+    assert record["games"] == record["abandoned"] == 4
+
+
+def test_parse_entrant():
+    assert parse_entrant("pubeval") == ("pubeval", "pubeval")
+    assert parse_entrant("td=td:models/lr=0.1.weights") == (
+        "td",
+        "td:models/lr=0.1.weights",
+    )
+    assert parse_entrant("td:models/lr=0.1.weights") == (
+        "td:models/lr=0.1.weights",
+        "td:models/lr=0.1.weights",
+    )
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pybg.headless import HeadlessShell, parse_setting
+
+pytestmark = pytest.mark.unit
+
+BOTS = {"player_agent": "random", "opponent_agent": "random", "game_mode": "money"}
+
+
+def test_headless_shell_does_not_import_pygame():
+    code = "import sys, pybg.headless; print('pygame' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_script_skips_comments_and_stops_at_quit():
+    shell = HeadlessShell({"player_agent": "human", "opponent_agent": "random"})
+    script = ["# a comment", "", "new", "show", "quit", "show"]
+
+    commands = [command for command, _ in shell.run_script(script)]
+
+    assert commands == ["new", "show", "quit"]
+    assert shell.game is not None
+    assert not shell.running
+
+
+def test_bots_play_games_to_the_end():
+    shell = HeadlessShell(BOTS)
+    results = shell.play_games(3)
+
+    assert len(results) == 3
+    for zero, one in results:
+        assert (zero > 0) != (one > 0)
+
+
+def test_games_need_two_bots():
+    shell = HeadlessShell({**BOTS, "player_agent": "human"})
+    with pytest.raises(ValueError):
+        shell.play_games(1)
+
+
+def test_set_changes_settings_without_saving(monkeypatch):
+    shell = HeadlessShell(BOTS)
+    saved = []
+    monkeypatch.setattr("pybg.core.shell.BaseShell.save_settings", saved.append)
+
+    shell.execute("set variant nackgammon")
+
+    assert shell.settings["variant"] == "nackgammon"
+    assert saved == []
+
+
+def test_parse_setting():
+    assert parse_setting("jacoby=true") == ("jacoby", True)
+    assert parse_setting("match_length=7") == ("match_length", 7)
+    assert parse_setting("variant=nackgammon") == ("variant", "nackgammon")
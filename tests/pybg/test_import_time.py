@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+HEAVY = ("gymnasium", "torch", "stable_baselines3", "aws_lambda_powertools")
+# Seconds for the rules engine, NumPy included; it takes about 0.15s.
+RULES_BUDGET = 1.0
+
+
+def import_time(*modules):
+    """
+    Imports modules in a fresh interpreter under -X importtime.
+
+    Returns:
+        tuple: (seconds for each module imported, heavy modules loaded)
+    """
+    code = (
+        f"import sys\nimport {', '.join(modules)}\n"
+        f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    seconds = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                seconds[name.strip()] = int(cumulative) / 1e6
+    heavy = process.stdout.strip()
+    return seconds, heavy.split(",") if heavy else []
+
+
+def test_rules_engine_imports_only_numpy_within_budget():
+    modules = ("pybg.gnubg.position", "pybg.gnubg.match", "pybg.core.moves")
+    seconds, heavy = import_time(*modules)
+    assert heavy == []
+    assert sum(seconds[m] for m in modules) < RULES_BUDGET
+
+
+def test_environments_load_models_on_first_use():
+    _, heavy = import_time("pybg.rl.envs.backgammon_envs", "pybg.gnubg.gnubg_inputs")
+    assert "torch" not in heavy
+    assert "stable_baselines3" not in heavy
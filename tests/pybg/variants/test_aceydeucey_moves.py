@@ -0,0 +1,103 @@
+"""Unit tests for aceydeucey_moves.py"""
+
+import random
+
+import pytest
+
+from pybg.core.aceydeucey_moves import dice_sequences, generate_acey_deucey_plays
+from pybg.core.moves import generate_plays
+from pybg.gnubg.match import GameState
+from pybg.gnubg.position import Position
+from pybg.variants.aceydeucey import STARTING_POSITION_ID, AceyDeucey
+
+pytestmark = pytest.mark.unit
+
+
+def reference_plays(position, dice):
+    """Final positions of every move sequence, walked recursively."""
+
+    def single(position, pips):
+        found = []
+        if position.player_bar > 0:
+            found.append(position.enter(pips)[0])
+        if (
+            position.player_bar == 0
+            and sum(position.player_home()) + position.player_off == 15
+        ):
+            found.extend(position.off(point, pips)[0] for point in range(6))
+        else:
+            found.extend(position.move(point, pips)[0] for point in range(24))
+        return [p for p in found if p]
+
+    def walk(position, sequence, depth, finals):
+        finals.setdefault(depth, set()).add(position)
+        if depth < len(sequence):
+            for new_position in single(position, sequence[depth]):
+                walk(new_position, sequence, depth + 1, finals)
+
+    finals = {}
+    for sequence in dice_sequences(dice):
+        walk(position, sequence, 0, finals)
+    most = max(finals)
+    if most == 1 and dice[0] != dice[1]:
+        return set(single(position, max(dice))) or finals[1]
+    return finals[most]
+
+
+def random_positions(count, seed=0):
+    rng = random.Random(seed)
+    position = Position.decode(STARTING_POSITION_ID)
+    positions = []
+    while len(positions) < count:
+        dice = (rng.randint(3, 6), rng.randint(3, 6))
+        position = rng.choice(generate_acey_deucey_plays(position, dice)).position
+        positions.append(position)
+        position = position.swap_players()
+    return positions
+
+
+def test_opening_entry():
+    start = Position.decode(STARTING_POSITION_ID)
+    plays = generate_acey_deucey_plays(start, (3, 1))
+    # Both checkers enter, or one enters and moves on to the 20 point.
+    assert {play.position.board_points[20] for play in plays} == {0, 1}
+    assert len(plays) == 2
+    assert generate_acey_deucey_plays(start, (0, 0)) == []
+
+
+def test_acey_deucey_roll():
+    start = Position.decode(STARTING_POSITION_ID)
+    plays = generate_acey_deucey_plays(start, (1, 2))
+    assert all(len(play.moves) == 6 for play in plays)
+    assert {play.moves[-1].pips for play in plays} == set(range(1, 7))
+    assert len(plays) == len({play.position for play in plays})
+
+
+def test_matches_reference():
+    positions = random_positions(20)
+    # The recursive walk of a 1-2 is slow once a few checkers are in play.
+    cases = [(p, d) for p in positions for d in [(4, 4), (6, 3), (5, 1)]]
+    cases += [(p, (2, 1)) for p in positions[:4]]
+    for position, dice in cases:
+        plays = generate_acey_deucey_plays(position, dice)
+        assert {play.position for play in plays} == reference_plays(position, dice)
+
+
+def test_matches_backgammon_without_bar():
+    position = Position.decode("4HPwATDgc/ABMA")
+    for dice in [(3, 1), (6, 6), (5, 2)]:
+        assert {p.position for p in generate_acey_deucey_plays(position, dice)} == {
+            p.position for p in generate_plays(position, dice)
+        }
+
+
+def test_extra_roll():
+    game = AceyDeucey()
+    game.match.dice = (1, 2)
+    game.match.game_state = GameState.ROLLED
+    turn = game.match.turn
+    play = game.generate_plays()[0]
+    game.play(tuple((move.source, move.destination) for move in play.moves))
+    assert game.match.turn == turn
+    assert game.match.game_state == GameState.ON_ROLL
+    assert game.position == play.position